@@ -0,0 +1,103 @@
+"""
+Leader unavailability under flaky peers, with and without pre-vote.
+
+Runs each scenario on a SimulatedCluster (in-memory network, virtual clock)
+for a range of seeds and reports, per configuration, the total seconds the
+cluster had no leader holding a majority-backed lease, the number and
+longest of those windows, and how many terms were used up.
+"""
+
+import logging
+import random
+import statistics
+import time
+
+from src.replication.simulation import SimulatedCluster
+
+DURATION = 600  # simulated seconds per run
+SEEDS = range(10)
+CLUSTER_SIZE = 5
+
+
+def flaky_follower(cluster, rng):
+    """A follower drops off the network for a while, then comes back."""
+    while cluster.now < DURATION:
+        leader_id = cluster.leader()
+        candidates = [s for s in cluster.nodes if s != leader_id]
+        victim = rng.choice(candidates)
+        cluster.isolate(victim)
+        cluster.run_for(rng.uniform(5, 20))
+        cluster.heal()
+        cluster.run_for(rng.uniform(5, 20))
+
+
+def flapping_link(cluster, rng):
+    """One link between two followers keeps going up and down."""
+    while cluster.now < DURATION:
+        leader_id = cluster.leader()
+        followers = [s for s in cluster.nodes if s != leader_id]
+        a, b = rng.sample(followers, 2)
+        cluster.partition(a, b)
+        cluster.run_for(rng.uniform(2, 10))
+        cluster.heal()
+        cluster.run_for(rng.uniform(2, 10))
+
+
+def lossy_network(cluster, rng):
+    """Every message has a 20% chance of being lost."""
+    cluster.network.drop_rate = 0.2
+    cluster.run_for(DURATION)
+
+
+SCENARIOS = {
+    "flaky_follower": flaky_follower,
+    "flapping_link": flapping_link,
+    "lossy_network": lossy_network,
+}
+
+
+def run(scenario, pre_vote, seed):
+    cluster = SimulatedCluster(size=CLUSTER_SIZE, seed=seed, pre_vote=pre_vote)
+    cluster.run_until_leader(timeout=60)
+    started = cluster.now
+    SCENARIOS[scenario](cluster, random.Random(seed))
+    windows = cluster.unavailable_windows[1:]
+    if cluster.unavailable_since is not None:
+        windows.append(cluster.now - cluster.unavailable_since)
+    return {
+        "unavailable": sum(windows),
+        "windows": len(windows),
+        "longest": max(windows, default=0.0),
+        "terms": cluster.max_term(),
+        "simulated": cluster.now - started,
+        "steps": cluster.steps,
+    }
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+
+    print(f"Leader unavailability over {DURATION}s, {CLUSTER_SIZE} replicas, {len(SEEDS)} seeds")
+    print("=" * 86)
+    print(
+        f"{'scenario':<16} {'pre-vote':<9} {'unavail s (mean)':>17} {'windows':>8} "
+        f"{'longest s':>10} {'terms':>7} {'sim s/wall s':>13}"
+    )
+    for scenario in SCENARIOS:
+        for pre_vote in (False, True):
+            wall_start = time.perf_counter()
+            results = [run(scenario, pre_vote, seed) for seed in SEEDS]
+            wall = time.perf_counter() - wall_start
+
+            print(
+                f"{scenario:<16} {'on' if pre_vote else 'off':<9} "
+                f"{statistics.mean(r['unavailable'] for r in results):>17.1f} "
+                f"{statistics.mean(r['windows'] for r in results):>8.1f} "
+                f"{max(r['longest'] for r in results):>10.1f} "
+                f"{statistics.mean(r['terms'] for r in results):>7.1f} "
+                f"{sum(r['simulated'] for r in results) / wall:>13.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+The SQLite and in-memory storage engines side by side.
+
+Sends MESSAGES messages between USERS users through each engine, one call
+per message as ``SendChatMessage`` does, and again in replicated batches of
+APPLY_BATCH_SIZE as a follower applies them. Then times the reads behind
+``GetMessages``, ``GetChats`` and ``GetUsersToDisplay``. The difference is
+what a benchmark or test cluster saves by running its replicas in memory.
+
+    PYTHONPATH=. python benchmarks/storage/engine_benchmark.py [messages]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from src.replication.config import APPLY_BATCH_SIZE
+from src.services.storage_factory import StorageFactory
+
+MESSAGES = 20_000
+USERS = 100
+READS = 200
+SEED = 7
+
+
+def chat(a, b):
+    return f"{min(a, b)}_{max(a, b)}"
+
+
+def conversation(count):
+    """(chat_id, sender) of ``count`` messages between random users."""
+    rng = random.Random(SEED)
+    for _ in range(count):
+        sender, receiver = rng.sample([f"user{i}" for i in range(1, USERS + 1)], 2)
+        yield chat(sender, receiver), sender
+
+
+def send_one_by_one(engine, count):
+    started = time.perf_counter()
+    for chat_id, sender in conversation(count):
+        engine.send_chat_message(chat_id, sender, "hello there, how are you today?")
+    return time.perf_counter() - started
+
+
+def send_in_batches(engine, count):
+    operations = [
+        (1, i, lambda chat_id=chat_id, sender=sender: engine.send_chat_message(
+            chat_id, sender, "hello there, how are you today?"
+        )["success"])
+        for i, (chat_id, sender) in enumerate(conversation(count), start=1)
+    ]
+    started = time.perf_counter()
+    for start in range(0, count, APPLY_BATCH_SIZE):
+        engine.apply_batch(operations[start:start + APPLY_BATCH_SIZE])
+    return time.perf_counter() - started
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def new_engine(name, path):
+    engine = StorageFactory.get_engine(name, path)
+    for i in range(1, USERS + 1):
+        engine.add_user(f"user{i}", f"User {i}", "pw")
+    return engine
+
+
+def measure(name, directory, count):
+    single = send_one_by_one(new_engine(name, os.path.join(directory, "single.db")), count)
+    engine = new_engine(name, os.path.join(directory, "batched.db"))
+    batched = send_in_batches(engine, count)
+
+    rng = random.Random(SEED)
+    users = [f"user{rng.randint(1, USERS)}" for _ in range(READS)]
+    others = [f"user{rng.randint(1, USERS)}" for _ in range(READS)]
+    reads = {
+        "GetMessages": [timed(engine.get_messages, chat(a, b), a) for a, b in zip(users, others)],
+        "GetChats": [timed(engine.get_chats, user) for user in users],
+        "GetUsersToDisplay": [timed(engine.get_users_to_display, user, "user1") for user in users],
+    }
+    return single, batched, reads
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES
+    results = {}
+    # DBManager prints on every send
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        for name in ("sqlite", "memory"):
+            with tempfile.TemporaryDirectory() as directory:
+                results[name] = measure(name, directory, count)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"Writes, messages/s ({count:,} messages between {USERS} users)")
+    print("=" * 60)
+    print(f"{'engine':<10} {'one by one':>14} {f'batches of {APPLY_BATCH_SIZE}':>16}")
+    for name, (single, batched, _) in results.items():
+        print(f"{name:<10} {count / single:>14,.0f} {count / batched:>16,.0f}")
+    print()
+
+    print(f"Reads, p50 ms over {READS} random users")
+    print("=" * 60)
+    print(f"{'read':<20} {'sqlite':>10} {'memory':>10} {'speedup':>9}")
+    for read in results["sqlite"][2]:
+        on_disk = statistics.median(results["sqlite"][2][read])
+        in_memory = statistics.median(results["memory"][2][read])
+        print(f"{read:<20} {on_disk:>10.3f} {in_memory:>10.3f} {on_disk / in_memory:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Full-text message search over a generated corpus.
+
+Loads MESSAGES messages between USERS users into a fresh database (words
+drawn from a Zipf-like vocabulary, so some are everywhere and some are
+rare) and reports the load rate with the FTS5 index kept up by triggers,
+then the latency of ``DBManager.search_messages`` against the only option
+without it: fetching every message of the user and filtering them, as a
+client would after downloading its conversations.
+
+    PYTHONPATH=. python benchmarks/storage/search_benchmark.py [messages]
+"""
+
+import os
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from src.services.db_manager import DBManager
+
+MESSAGES = 2_000_000
+USERS = 500
+VOCABULARY = 20_000
+WORDS_PER_MESSAGE = (3, 15)
+QUERIES = 50  # random users per word
+BATCH = 50_000  # messages per insert transaction
+SEED = 7
+
+
+def word(rank):
+    return f"w{rank}"
+
+
+def generate(rng, count):
+    """(sender_id, receiver_id, content) tuples; user ids are 1..USERS."""
+    ranks = range(1, VOCABULARY + 1)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in ranks))
+    for _ in range(count):
+        sender, receiver = rng.sample(range(1, USERS + 1), 2)
+        words = rng.choices(ranks, cum_weights=cum_weights, k=rng.randint(*WORDS_PER_MESSAGE))
+        yield sender, receiver, " ".join(word(rank) for rank in words)
+
+
+def load(db, count):
+    with db._get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (username, nickname, password) VALUES (?, ?, 'pw')",
+            [(f"user{i}", f"User {i}") for i in range(1, USERS + 1)],
+        )
+        conn.commit()
+
+    rng = random.Random(SEED)
+    started = time.perf_counter()
+    rows = generate(rng, count)
+    timestamp = 1_700_000_000_000_000
+    loaded = 0
+    while loaded < count:
+        batch = [
+            (sender, receiver, content, timestamp + loaded + i, loaded + i + 1)
+            for i, (sender, receiver, content) in zip(range(min(BATCH, count - loaded)), rows)
+        ]
+        with db._get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO messages (sender_id, receiver_id, content, timestamp, seq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.commit()
+        loaded += len(batch)
+    return time.perf_counter() - started
+
+
+def scan(db, user, term):
+    """Messages of ``user`` containing ``term``, without the index."""
+    with db._get_connection() as conn:
+        user_key = db._user_id(conn.cursor(), user)
+        rows = conn.execute(
+            "SELECT id, content FROM messages WHERE sender_id = ? OR receiver_id = ?",
+            (user_key, user_key),
+        ).fetchall()
+    return [row for row in rows if term in row[1].split()]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.db")
+        db = DBManager(path)
+        db.initialize_database()
+
+        seconds = load(db, count)
+        print(f"Loaded {count:,} messages in {seconds:.1f}s ({count / seconds:,.0f}/s, FTS index kept by triggers)")
+        print(f"Database size: {os.path.getsize(path) / 2**20:,.0f} MiB")
+        print()
+
+        rng = random.Random(SEED)
+        print(f"Search latency, ms over {QUERIES} users (20 results per page)")
+        print("=" * 78)
+        print(f"{'word':<22} {'FTS p50':>9} {'FTS p95':>9} {'scan p50':>10} {'scan p95':>10} {'speedup':>9}")
+        for label, rank in (("common (rank 1)", 1), ("medium (rank 100)", 100), ("rare (rank 10000)", 10_000)):
+            users = [f"user{rng.randint(1, USERS)}" for _ in range(QUERIES)]
+            fts = [timed(db.search_messages, user, word(rank)) for user in users]
+            like = [timed(scan, db, user, word(rank)) for user in users]
+            print(
+                f"{label:<22} {statistics.median(fts):>9.2f} {percentile(fts, 0.95):>9.2f} "
+                f"{statistics.median(like):>10.2f} {percentile(like, 0.95):>10.2f} "
+                f"{statistics.median(like) / statistics.median(fts):>8.1f}x"
+            )
+
+        # A phrase of two common words, narrowed to one chat
+        users = [(f"user{rng.randint(1, USERS)}", f"user{rng.randint(1, USERS)}") for _ in range(QUERIES)]
+        fts = [timed(db.search_messages, a, f"{word(1)} {word(2)}", f"{a}_{b}") for a, b in users]
+        print(f"{'two words, one chat':<22} {statistics.median(fts):>9.2f} {percentile(fts, 0.95):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
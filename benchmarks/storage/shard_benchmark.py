@@ -0,0 +1,91 @@
+"""
+Write throughput of one replica with its messages split across shard files.
+
+SENDERS threads each send their share of MESSAGES messages, one call per
+message as concurrent ``SendChatMessage`` requests on a leader do, each in
+a chat of its own. The single-file engine serializes every commit on one
+write lock; the sharded engine only serializes senders whose chats share a
+shard. Then times ``GetChats``, which reads every shard.
+
+    PYTHONPATH=. python benchmarks/storage/shard_benchmark.py [messages]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from src.services.sharded_db import ShardedDBManager
+from src.services.storage_factory import StorageFactory
+
+MESSAGES = 4_000
+SENDERS = 16
+SHARDS = (2, 4, 8)
+READS = 200
+
+
+def new_engine(directory, shards):
+    path = os.path.join(directory, "chat.db")
+    if shards == 1:
+        engine = StorageFactory.get_engine("sqlite", path)
+    else:
+        engine = ShardedDBManager(path, shards=shards)
+        engine.initialize_database()
+    engine.add_user("hub", "Hub", "pw")
+    for i in range(SENDERS):
+        engine.add_user(f"user{i}", f"User {i}", "pw")
+    return engine
+
+
+def send(engine, sender, count):
+    for _ in range(count):
+        engine.send_chat_message(f"hub_{sender}", sender, "hello there, how are you today?")
+
+
+def measure(directory, shards, count):
+    engine = new_engine(directory, shards)
+    threads = [
+        threading.Thread(target=send, args=(engine, f"user{i}", count // SENDERS))
+        for i in range(SENDERS)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    reads = []
+    for _ in range(READS):
+        started = time.perf_counter()
+        engine.get_chats("hub")
+        reads.append((time.perf_counter() - started) * 1000)
+    return count // SENDERS * SENDERS / elapsed, statistics.median(reads)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES
+    results = {}
+    # DBManager prints on every send
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        for shards in (1,) + SHARDS:
+            with tempfile.TemporaryDirectory() as directory:
+                results[shards] = measure(directory, shards, count)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{count:,} messages from {SENDERS} concurrent senders, one chat each ({os.cpu_count()} CPUs)")
+    print("=" * 60)
+    print(f"{'files':<10} {'messages/s':>12} {'speedup':>9} {'GetChats p50 ms':>17}")
+    base = results[1][0]
+    for shards, (rate, chats) in results.items():
+        name = "1 (sqlite)" if shards == 1 else str(shards)
+        print(f"{name:<10} {rate:>12,.0f} {rate / base:>8.1f}x {chats:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
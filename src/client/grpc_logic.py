@@ -1,14 +1,25 @@
+import concurrent.futures
 import grpc
 import logging
 import time
 from src.protocol.grpc import chat_pb2, chat_pb2_grpc
 from src.protocol.grpc import replication_pb2, replication_pb2_grpc
+from src.protocol.cursor import encode_cursor
+from src.replication.config import (
+    LEADER_ADDRESS_METADATA_KEY,
+    LEADER_TERM_METADATA_KEY,
+    MAX_READ_LAG,
+    READ_CONSISTENCY_METADATA_KEY,
+    READ_REPLICA_REFRESH_INTERVAL,
+)
+from src.replication.sharding import ShardMap, chat_recipient, shard_key
 from .utils import hash_password
 from functools import wraps
 
 # Configuration parameters
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # seconds
+USER_LOOKUP_PAGE = 50  # users per page when checking that a recipient exists
 
 logger = logging.getLogger(__name__)
 
@@ -68,7 +79,21 @@ class ChatAppLogicGRPC:
         # For replication and failover
         self.known_replicas = {self.primary_address: True}  # Map of address -> is_available
         self.current_leader = None
+        self.leader_term = -1  # Term of the last leader hint we accepted
         self.replication_stub = replication_pb2_grpc.ReplicationServiceStub(self.channel)
+
+        # Followers within MAX_READ_LAG of the leader, used round-robin for reads
+        self.read_replicas = []
+        self.read_index = 0
+        self.read_stubs = {}  # address -> (channel, stub)
+        self.last_discovery = 0.0
+
+        # Routing table when users and chats are sharded over replica groups
+        self.shard_map = None
+        self.group_leaders = {}  # group_id -> address that last served it
+        self.group_stubs = {}  # address -> (channel, stub)
+        self.fanout_pool = None
+        self.known_users = set()  # recipients whose account was found
         
         # Try to get network state to discover other replicas
         self._discover_replicas()
@@ -82,29 +107,100 @@ class ChatAppLogicGRPC:
 
     def _discover_replicas(self):
         """Discover other replicas in the network."""
+        self.last_discovery = time.monotonic()
         try:
             request = replication_pb2.NetworkStateRequest(server_id="client")
             response = self.replication_stub.GetNetworkState(request)
             
             # Update known replicas
+            read_replicas = []
             for server in response.servers:
                 self.known_replicas[server.address] = True
                 if server.role == "leader":
                     self.current_leader = server.address
+                elif server.role == "follower" and server.lag <= MAX_READ_LAG:
+                    read_replicas.append(server.address)
+            self._set_read_replicas(read_replicas)
+
+            # Several groups: route each request to the group owning its data
+            if len(response.shards) > 1:
+                self.shard_map = ShardMap.from_proto(response.shards)
+                logger.info(f"Shard groups: {self.shard_map.groups}")
                     
             logger.info(f"Discovered replicas: {list(self.known_replicas.keys())}")
             logger.info(f"Current leader: {self.current_leader}")
+            logger.info(f"Read replicas: {self.read_replicas}")
             
         except grpc.RpcError as e:
             logger.warning(f"Failed to discover replicas: {e}")
     
+    def _set_read_replicas(self, addresses):
+        """Replace the read replica list, closing channels we no longer use."""
+        self.read_replicas = list(addresses)
+        for address in list(self.read_stubs):
+            if address not in self.read_replicas:
+                channel, _ = self.read_stubs.pop(address)
+                channel.close()
+
+    def _get_read_stub(self, address):
+        """Cached stub for a read replica."""
+        if address not in self.read_stubs:
+            channel = grpc.insecure_channel(address)
+            self.read_stubs[address] = (channel, chat_pb2_grpc.ChatServiceStub(channel))
+        return self.read_stubs[address][1]
+
+    def _execute_read(self, method_name, request):
+        """
+        Send a read to the next follower within the staleness bound
+        (round-robin), so read capacity grows with the number of replicas.
+        Falls back to the primary (leader) path when no follower can answer.
+        """
+        if self.shard_map:
+            return self._execute_sharded(method_name, request)
+
+        if time.monotonic() - self.last_discovery > READ_REPLICA_REFRESH_INTERVAL:
+            self._discover_replicas()
+
+        replicas = self.read_replicas
+        if replicas:
+            start = self.read_index % len(replicas)
+            self.read_index += 1
+            for address in replicas[start:] + replicas[:start]:
+                try:
+                    method = getattr(self._get_read_stub(address), method_name)
+                    # The follower checks its own lag and forwards if too stale
+                    return method(
+                        request, metadata=((READ_CONSISTENCY_METADATA_KEY, "bounded"),)
+                    )
+                except grpc.RpcError as e:
+                    logger.warning(f"Read {method_name} from {address} failed: {e}")
+                    self._set_read_replicas(
+                        [a for a in self.read_replicas if a != address]
+                    )
+
+        return self._execute_with_failover(method_name, request)
+
     def _execute_with_failover(self, method_name, request, retry_count=MAX_RETRIES):
         """Execute a gRPC call with failover to other replicas if the current one fails."""
+        if self.shard_map:
+            return self._execute_sharded(method_name, request)
+
         # Try the current connection first
         try:
             method = getattr(self.stub, method_name)
             return method(request)
         except grpc.RpcError as e:
+            # A replica that rejected us may have said who the leader is: go
+            # straight there instead of walking every known replica
+            leader_address = self._get_leader_hint(e)
+            if leader_address and leader_address != self.primary_address:
+                logger.info(f"Redirecting {method_name} to leader at {leader_address}")
+                self._switch_primary(leader_address)
+                try:
+                    return getattr(self.stub, method_name)(request)
+                except grpc.RpcError as redirect_error:
+                    e = redirect_error
+
             logger.warning(f"Request to {self.primary_address} failed: {e}")
             
             # Mark current server as unavailable
@@ -124,11 +220,7 @@ class ChatAppLogicGRPC:
                         response = method(request)
                         
                         # If successful, update our primary connection
-                        self.primary_address = address
-                        self.channel.close()
-                        self.channel = grpc.insecure_channel(address)
-                        self.stub = chat_pb2_grpc.ChatServiceStub(self.channel)
-                        self.replication_stub = replication_pb2_grpc.ReplicationServiceStub(self.channel)
+                        self._switch_primary(address)
                         
                         # Try to discover more replicas from this working node
                         self._discover_replicas()
@@ -140,7 +232,207 @@ class ChatAppLogicGRPC:
             
             # If we get here, all known replicas failed
             raise Exception(f"All known replicas are unavailable. Last error: {e}")
+
+    def _execute_sharded(self, method_name, request):
+        """
+        Send a request to the replica group owning its user or chat, or to
+        every group (in parallel) when it spans all of them, merging the
+        answers.
+        """
+        # A chat's group only knows of accounts deleted elsewhere, not of
+        # ones that never existed: ask the group holding the recipient
+        if method_name == "SendChatMessage":
+            recipient = chat_recipient(request.chat_id, request.sender)
+            if recipient is None:
+                return chat_pb2.MessageResponse(
+                    success=False, error_message="Sender is not part of this chat."
+                )
+            error_message = self._check_user_exists(recipient)
+            if error_message:
+                return chat_pb2.MessageResponse(success=False, error_message=error_message)
+
+        key = shard_key(method_name, request)
+        if key is not None:
+            group_id = self.shard_map.group_for_key(key)
+            return self._execute_on_group(group_id, method_name, request)
+
+        if self.fanout_pool is None:
+            self.fanout_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self.shard_map), thread_name_prefix="shard-fanout"
+            )
+        futures = [
+            self.fanout_pool.submit(self._execute_on_group, group_id, method_name, request)
+            for group_id in self.shard_map.group_ids
+        ]
+        # Every group must answer; a failed one raises for the retry decorator
+        responses = [future.result() for future in futures]
+        return self._merge_responses(method_name, request, responses)
+
+    def _check_user_exists(self, username):
+        """
+        Look ``username`` up in the group holding user records like it;
+        returns why a message to them is refused, "" if it is not. Found
+        users are remembered: deleting them later is caught by the chat's
+        group itself.
+        """
+        if username in self.known_users:
+            return ""
+
+        group_id = self.shard_map.group_for_user(username)
+        after = ""
+        while True:
+            request = chat_pb2.GetUsersToDisplayRequest(
+                search_pattern=username, current_page=1, users_per_page=USER_LOOKUP_PAGE, after=after
+            )
+            response = self._execute_on_group(group_id, "GetUsersToDisplay", request)
+            if response.error_message:
+                return response.error_message
+            if username in response.usernames:
+                self.known_users.add(username)
+                return ""
+            # Pages are in username order, so past it means it is missing
+            if not response.next_cursor or response.usernames[-1] > username:
+                return f"Cannot send message. User '{username}' does not exist."
+            after = response.next_cursor
+
+    def _merge_responses(self, method_name, request, responses):
+        """Combine the answers of every group to a request that spans them all."""
+        errors = [r.error_message for r in responses if r.error_message]
+        error_message = "; ".join(errors)
+
+        if method_name == "GetChats":
+            # Most recent first, as one group lists them
+            chats = sorted(
+                (chat for r in responses for chat in r.chats),
+                key=lambda chat: chat.last_message_time,
+                reverse=True,
+            )
+            return chat_pb2.ChatsResponse(chats=chats, error_message=error_message)
+
+        if method_name == "GetUsersToDisplay":
+            # Each group returned its first pages, or its page after the
+            # cursor; cut the requested page from the union
+            usernames = sorted(u for r in responses for u in r.usernames)
+            start = 0 if request.after else (request.current_page - 1) * request.users_per_page
+            end = start + request.users_per_page
+            page = usernames[start:end]
+            more = page and (len(usernames) > end or any(r.next_cursor for r in responses))
+            total_users = sum(r.total_users for r in responses)
+            return chat_pb2.UsersDisplayResponse(
+                usernames=page,
+                total_pages=-(-total_users // request.users_per_page),
+                total_users=total_users,
+                next_cursor=encode_cursor(page[-1]) if more else "",
+                error_message=error_message,
+            )
+
+        if method_name == "SearchMessages":
+            # Likewise for search results, merged by rank
+            matches = sorted((m for r in responses for m in r.matches), key=lambda m: m.rank)
+            start = (request.page - 1) * request.page_size
+            end = start + request.page_size
+            return chat_pb2.SearchMessagesResponse(
+                matches=matches[start:end],
+                has_more=len(matches) > end or any(r.has_more for r in responses),
+                error_message=error_message,
+            )
+
+        # Writes applied in every group (DeleteUser) succeed only if all did
+        return chat_pb2.StatusResponse(
+            success=all(r.success for r in responses), error_message=error_message
+        )
+
+    def _execute_on_group(self, group_id, method_name, request):
+        """Call a replica group, starting with the member that last answered."""
+        # Groups only return their own first pages; the caller paginates.
+        # Cursors name a username, so every group can start after one.
+        if method_name == "GetUsersToDisplay" and not request.after:
+            request = chat_pb2.GetUsersToDisplayRequest(
+                exclude_username=request.exclude_username,
+                search_pattern=request.search_pattern,
+                current_page=1,
+                users_per_page=request.current_page * request.users_per_page,
+            )
+        elif method_name == "SearchMessages" and not request.chat_id:
+            request = chat_pb2.SearchMessagesRequest(
+                current_user=request.current_user,
+                query=request.query,
+                page=1,
+                page_size=request.page * request.page_size,
+            )
+
+        members = self.shard_map.groups[group_id]
+        preferred = self.group_leaders.get(group_id)
+        addresses = ([preferred] if preferred else []) + [
+            a for a in members if a != preferred
+        ]
+
+        last_error = None
+        for address in addresses:
+            try:
+                response = getattr(self._get_group_stub(address), method_name)(request)
+                self.group_leaders[group_id] = address
+                return response
+            except grpc.RpcError as e:
+                last_error = e
+                logger.warning(f"{method_name} on group {group_id} at {address} failed: {e}")
+                leader_address, _ = self._read_leader_hint(e)
+                if leader_address in members and leader_address != address:
+                    self.group_leaders[group_id] = leader_address
+                    try:
+                        return getattr(self._get_group_stub(leader_address), method_name)(request)
+                    except grpc.RpcError as redirect_error:
+                        last_error = redirect_error
+
+        raise last_error
+
+    def _get_group_stub(self, address):
+        """Cached stub for a member of a shard group."""
+        if address not in self.group_stubs:
+            channel = grpc.insecure_channel(address)
+            self.group_stubs[address] = (channel, chat_pb2_grpc.ChatServiceStub(channel))
+        return self.group_stubs[address][1]
+
+    def _switch_primary(self, address):
+        """Point the primary channel and stubs at another replica."""
+        self.primary_address = address
+        self.known_replicas[address] = True
+        self.channel.close()
+        self.channel = grpc.insecure_channel(address)
+        self.stub = chat_pb2_grpc.ChatServiceStub(self.channel)
+        self.replication_stub = replication_pb2_grpc.ReplicationServiceStub(self.channel)
+
+    def _get_leader_hint(self, error):
+        """
+        Read the leader address a replica attached to a rejection's trailing
+        metadata, and cache it unless it is older than the leader we know.
+        """
+        leader_address, term = self._read_leader_hint(error)
+        if not leader_address:
+            return None
+
+        if term < self.leader_term:
+            logger.debug(f"Ignoring stale leader hint {leader_address} (term {term})")
+            return None
+
+        self.leader_term = term
+        self.current_leader = leader_address
+        return leader_address
     
+    def _read_leader_hint(self, error):
+        """(leader address, term) from a rejection's trailing metadata, if any."""
+        trailing_metadata = getattr(error, "trailing_metadata", None)
+        if not callable(trailing_metadata):
+            return None, -1
+
+        metadata = dict(trailing_metadata() or ())
+        leader_address = metadata.get(LEADER_ADDRESS_METADATA_KEY)
+        try:
+            term = int(metadata.get(LEADER_TERM_METADATA_KEY, -1))
+        except ValueError:
+            term = -1
+        return leader_address, term
+
     def _handle_grpc_error(self, operation, error):
         """Handle gRPC errors in a standardized way."""
         if error.code() == grpc.StatusCode.UNAVAILABLE:
@@ -207,16 +499,70 @@ class ChatAppLogicGRPC:
             current_page=current_page or 1,
             users_per_page=users_per_page or 10,
         )
-        response = self._execute_with_failover("GetUsersToDisplay", request)
+        response = self._execute_read("GetUsersToDisplay", request)
         return response.usernames, response.error_message
 
+    @with_retry_and_logging("get_users")
+    def get_users_page(self, current_user, search_pattern, after, users_per_page):
+        """
+        Retrieve the page of users after the ``after`` cursor ("" for the first).
+
+        Returns:
+            tuple: ({"users", "next_cursor", "total_users"}, error_message).
+            The total is only counted for the first page.
+        """
+        request = chat_pb2.GetUsersToDisplayRequest(
+            exclude_username=current_user,
+            search_pattern=search_pattern or "",
+            current_page=1,
+            users_per_page=users_per_page or 10,
+            after=after or "",
+        )
+        response = self._execute_read("GetUsersToDisplay", request)
+        page = {
+            "users": list(response.usernames),
+            "next_cursor": response.next_cursor,
+            "total_users": response.total_users,
+        }
+        return page, response.error_message
+
+    @with_retry_and_logging("search_messages")
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        """
+        Search the messages of a user, or of one of their chats, best
+        matches first. Returns a page of matches and an error message.
+        """
+        request = chat_pb2.SearchMessagesRequest(
+            current_user=current_user,
+            query=query,
+            chat_id=chat_id or "",
+            page=page or 1,
+            page_size=page_size or 20,
+        )
+        response = self._execute_read("SearchMessages", request)
+        if response.error_message:
+            return [], response.error_message
+
+        matches = [
+            {
+                "chat_id": match.chat_id,
+                "sender": match.message.sender,
+                "content": match.message.content,
+                "timestamp": match.message.timestamp,
+                "seq": match.message.seq,
+                "snippet": match.snippet,
+            }
+            for match in response.matches
+        ]
+        return matches, ""
+
     @with_retry_and_logging("get_chats")
     def get_chats(self, user_id):
         """Retrieve all chats for a user."""
         logger.debug(f"GetChats called for user_id: {user_id} of type {type(user_id)}")
         request = chat_pb2.GetChatsRequest(user_id=user_id)
         
-        response = self._execute_with_failover("GetChats", request)
+        response = self._execute_read("GetChats", request)
 
         if response.error_message:
             return [], response.error_message
@@ -240,14 +586,21 @@ class ChatAppLogicGRPC:
         return other_user
 
     @with_retry_and_logging("get_messages")
-    def get_messages(self, chat_id, current_user):
-        """Retrieve messages for a given chat."""
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        """
+        Retrieve messages for a given chat, only those between ``after_seq``
+        and ``before_seq`` if given, and only the newest ``limit`` if set.
+        """
         request = chat_pb2.GetMessagesRequest(
             chat_id=chat_id,
             current_user=current_user,
+            after_seq=after_seq,
+            before_seq=before_seq,
+            limit=limit,
         )
         logger.debug(f"Get message request: id {request.chat_id} and user {request.current_user}")
         
+        # Opening a chat marks it read, so it goes to the leader like a write
         response = self._execute_with_failover("GetMessages", request)
         if response.error_message:
             return [], response.error_message
@@ -260,6 +613,7 @@ class ChatAppLogicGRPC:
                     "sender": msg.sender,
                     "content": msg.content,
                     "timestamp": msg.timestamp,
+                    "seq": msg.seq,
                 }
             )
         return messages_list, ""
@@ -280,16 +634,17 @@ class ChatAppLogicGRPC:
     def get_user_message_limit(self, current_user):
         """Get the user's message limit (for UI or logic checks)."""
         request = chat_pb2.GetUserMessageLimitRequest(username=current_user)
-        response = self._execute_with_failover("GetUserMessageLimit", request)
+        response = self._execute_read("GetUserMessageLimit", request)
         return response.limit, response.error_message
 
     @with_retry_and_logging("delete_messages")
-    def delete_messages(self, chat_id, message_indices, current_user):
-        """Send a request to delete specific messages in a chat."""
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        """Send a request to delete specific messages in a chat, by seq if known."""
         request = chat_pb2.DeleteMessagesRequest(
             chat_id=chat_id,
             message_indices=message_indices,
             current_user=current_user,
+            message_seqs=message_seqs or [],
         )
         response = self._execute_with_failover("DeleteMessages", request)
         return response.success, response.error_message
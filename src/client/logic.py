@@ -19,15 +19,18 @@ class ChatAppLogic:
         response = self.client.receive_message()
         return response.get("success"), response.get("error_message", "")
 
-    def delete_messages(self, chat_id, message_indices, current_user):
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
         # TODO: error handling for messages trying to be deleted if not from that user
         unauthorized_attempt = False
-        self.client.send_message({
+        request = {
             "action": "delete_messages",
             "chat_id": chat_id,
             "message_indices": message_indices,
             "current_user": current_user
-        })
+        }
+        if message_seqs:
+            request["message_seqs"] = message_seqs
+        self.client.send_message(request)
         response = self.client.receive_message()
         return response.get("success"), response.get("error_message", "")
 
@@ -111,6 +114,23 @@ class ChatAppLogic:
         response = self.client.receive_message()
         return response.get("users", []), response.get("error_message", "")
 
+    def get_users_page(self, current_user, search_pattern, after, users_per_page):
+        """Page of users after the ``after`` cursor ("" for the first)."""
+        self.client.send_message({
+            "action": "get_users_to_display",
+            "current_user": current_user,
+            "search_pattern": search_pattern,
+            "users_per_page": users_per_page,
+            "after": after,
+        })
+        response = self.client.receive_message()
+        page = {
+            "users": response.get("users", []),
+            "next_cursor": response.get("next_cursor", ""),
+            "total_users": response.get("total_users", 0),
+        }
+        return page, response.get("error_message", "")
+
     def delete_account(self, current_user):
         # Remove user from all chats
 
@@ -154,13 +174,17 @@ class ChatAppLogic:
         """Get the other user in the chat."""
         return self.chat_cache.get(chat_id, {}).get("other_user")
 
-    def get_messages(self, chat_id, current_user):
-        """Get messages for a chat."""
-        self.client.send_message({
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        """Get messages for a chat, only those between the given seqs and the newest ``limit`` if set."""
+        request = {
             "action": "get_messages",
             "chat_id": chat_id,
             "current_user": current_user
-        })
+        }
+        for key, value in (("after_seq", after_seq), ("before_seq", before_seq), ("limit", limit)):
+            if value:
+                request[key] = value
+        self.client.send_message(request)
         response = self.client.receive_message()
         print("response: is what we r getting and giving to display ", response)
         return response.get("messages", []), response.get("error_message", "")
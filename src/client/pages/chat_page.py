@@ -10,6 +10,8 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QTimer
 from ..components import DarkPushButton, MessageWidget
 
+MESSAGE_PAGE_SIZE = 50  # messages - fetched on opening a chat and per "Show earlier messages"
+
 
 class ChatPage(QWidget):
     """Chat page widget that displays messages between users."""
@@ -27,7 +29,8 @@ class ChatPage(QWidget):
         self.chat_id = chat_id
         self.other_user = other_user
         self.message_widgets = []
-        self.last_message_count = 0  # Track number of messages for updates
+        self.message_seqs = []  # Sequence number of each displayed message
+        self.newest_seq = 0  # Only messages after this one are polled for
 
         self._setup_ui()
 
@@ -68,6 +71,12 @@ class ChatPage(QWidget):
         delete_btn.clicked.connect(self._delete_selected_messages)
         layout.addWidget(delete_btn)
 
+        # Older messages are only fetched when asked for
+        self.earlier_btn = DarkPushButton("Show earlier messages")
+        self.earlier_btn.clicked.connect(self._show_earlier_messages)
+        self.earlier_btn.hide()
+        layout.addWidget(self.earlier_btn)
+
         # Messages area
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -103,40 +112,56 @@ class ChatPage(QWidget):
     def _check_new_messages(self):
         """Check for new messages and update the display if necessary."""
         messages, error = self.main_window.logic.get_messages(
-            self.chat_id, self.main_window.current_user
+            self.chat_id, self.main_window.current_user, after_seq=self.newest_seq
         )
 
         if error:
             print(f"Error checking for new messages: {error}")
             return
 
-        if len(messages) > self.last_message_count:
-            # New messages found
-            new_messages = messages[self.last_message_count:]
-            for message in new_messages:
-                is_sender = message["sender"] == self.main_window.current_user
-                msg_widget = MessageWidget(message["content"], is_sender)
-                self.message_widgets.append(msg_widget)
-                self.messages_layout.addWidget(msg_widget)
-
-            self.last_message_count = len(messages)
+        for message in messages:
+            self._add_message(message, len(self.message_widgets))
 
     def _display_messages(self):
-        """Display messages in the chat."""
+        """Display the newest page of messages in the chat."""
         messages, error = self.main_window.logic.get_messages(
-            self.chat_id, self.main_window.current_user
+            self.chat_id, self.main_window.current_user, limit=MESSAGE_PAGE_SIZE
         )
         if error:
             QMessageBox.critical(self, "Error", f"Failed to fetch messages: {error}")
             return
 
         for message in messages:
-            is_sender = message["sender"] == self.main_window.current_user
-            msg_widget = MessageWidget(message["content"], is_sender)
-            self.message_widgets.append(msg_widget)
-            self.messages_layout.addWidget(msg_widget)
+            self._add_message(message, len(self.message_widgets))
+        self.earlier_btn.setVisible(len(messages) == MESSAGE_PAGE_SIZE)
 
-        self.last_message_count = len(messages)
+    def _show_earlier_messages(self):
+        """Display the page of messages before the oldest one shown."""
+        if not self.message_seqs:
+            return
+        messages, error = self.main_window.logic.get_messages(
+            self.chat_id,
+            self.main_window.current_user,
+            before_seq=self.message_seqs[0],
+            limit=MESSAGE_PAGE_SIZE,
+        )
+        if error:
+            QMessageBox.critical(self, "Error", f"Failed to fetch messages: {error}")
+            return
+
+        for i, message in enumerate(messages):
+            self._add_message(message, i)
+        self.earlier_btn.setVisible(len(messages) == MESSAGE_PAGE_SIZE)
+
+    def _add_message(self, message, index):
+        """Display a message at ``index`` among the displayed ones."""
+        is_sender = message["sender"] == self.main_window.current_user
+        msg_widget = MessageWidget(message["content"], is_sender)
+        self.message_widgets.insert(index, msg_widget)
+        self.message_seqs.insert(index, message.get("seq"))
+        # After the spacer that keeps messages at the bottom
+        self.messages_layout.insertWidget(index + 1, msg_widget)
+        self.newest_seq = max(self.newest_seq, message.get("seq") or 0)
 
     def _delete_selected_messages(self):
         """Delete selected messages."""
@@ -160,8 +185,13 @@ class ChatPage(QWidget):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
+            # Sequence numbers still name the right messages if the chat changed
+            seqs = [self.message_seqs[i] for i in messages_to_delete]
             success, error = self.main_window.logic.delete_messages(
-                self.chat_id, messages_to_delete, self.main_window.current_user
+                self.chat_id,
+                messages_to_delete,
+                self.main_window.current_user,
+                message_seqs=seqs if all(seqs) else None,
             )
 
             if not success:
@@ -171,8 +201,7 @@ class ChatPage(QWidget):
             for i in sorted(messages_to_delete, reverse=True):
                 widget = self.message_widgets.pop(i)
                 widget.setParent(None)
-
-            self.last_message_count -= len(messages_to_delete)
+                self.message_seqs.pop(i)
 
     def _send_chat_message(self):
         """Send a new message."""
@@ -8,8 +8,11 @@ from PyQt6.QtWidgets import (
     QLineEdit,
     QScrollArea,
 )
+from PyQt6.QtCore import QTimer
 from ..components import DarkPushButton, ChatWidget
 
+SEARCH_DELAY = 250  # ms - typing pause before the user list is searched
+
 
 class UsersPage(QWidget):
     """Users page widget that displays available users for chat."""
@@ -22,7 +25,9 @@ class UsersPage(QWidget):
         """
         super().__init__(parent)
         self.main_window = parent
-        self.current_page = 0
+        self.page_cursors = [""]  # Cursor of each page up to the current one
+        self.next_cursor = ""
+        self.total_users = 0
         self.users_per_page = 10
         self._setup_ui()
 
@@ -42,7 +47,12 @@ class UsersPage(QWidget):
         # Search bar
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search users...")
-        self.search_input.textChanged.connect(self._update_users_display)
+        # Search once typing pauses, not on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self._search)
+        self.search_input.textChanged.connect(lambda _: self.search_timer.start())
         layout.addWidget(self.search_input)
 
         # Scroll area for users
@@ -57,11 +67,35 @@ class UsersPage(QWidget):
 
         # Pagination controls
         pagination_layout = QHBoxLayout()
+        self.prev_button = DarkPushButton("Previous")
+        self.prev_button.clicked.connect(self._previous_page)
+        pagination_layout.addWidget(self.prev_button)
+        self.page_label = QLabel()
+        pagination_layout.addWidget(self.page_label)
+        self.next_button = DarkPushButton("Next")
+        self.next_button.clicked.connect(self._next_page)
+        pagination_layout.addWidget(self.next_button)
 
         layout.addLayout(pagination_layout)
 
         # Initialize display
         self._update_users_display()
+
+    def _search(self):
+        """Show the first page of users matching the search."""
+        self.page_cursors = [""]
+        self._update_users_display()
+
+    def _next_page(self):
+        if self.next_cursor:
+            self.page_cursors.append(self.next_cursor)
+            self._update_users_display()
+
+    def _previous_page(self):
+        if len(self.page_cursors) > 1:
+            self.page_cursors.pop()
+            self._update_users_display()
+
     def _update_users_display(self):
         """Update the users display based on search and pagination."""
         # Clear current display
@@ -75,10 +109,10 @@ class UsersPage(QWidget):
 
         # Get users to display
         search_pattern = self.search_input.text().strip()
-        users_to_display, error = self.main_window.logic.get_users_to_display(
+        page, error = self.main_window.logic.get_users_page(
             self.main_window.current_user,
             search_pattern,
-            self.current_page,
+            self.page_cursors[-1],
             self.users_per_page,
         )
 
@@ -86,6 +120,16 @@ class UsersPage(QWidget):
             print(f"Error fetching users: {error}")
             return
 
+        users_to_display = page["users"]
+        self.next_cursor = page["next_cursor"]
+        # Only the first page counts the matching users
+        if len(self.page_cursors) == 1:
+            self.total_users = page["total_users"]
+        total_pages = max(1, -(-self.total_users // self.users_per_page))
+        self.page_label.setText(f"Page {len(self.page_cursors)} of {total_pages}")
+        self.prev_button.setEnabled(len(self.page_cursors) > 1)
+        self.next_button.setEnabled(bool(self.next_cursor))
+
         # Store fetched users in filtered_users
         self.main_window.logic.filtered_users = users_to_display
 
@@ -0,0 +1,19 @@
+"""
+Opaque page cursors, shared by the servers and the clients.
+
+A cursor names the last row of a page by its sort key, so the next page
+starts right after it: fetching it costs the same however deep it is, and
+rows added to earlier pages do not shift it.
+"""
+
+import base64
+
+
+def encode_cursor(key):
+    """Cursor for the page following the row whose sort key is ``key``."""
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Sort key named by ``cursor``; raises ValueError if it is malformed."""
+    return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\"E\n\rSignupRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08nickname\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"m\n\x0cUserResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12\x0f\n\x07user_id\x18\x03 \x01(\x05\x12\x10\n\x08nickname\x18\x04 \x01(\t\x12\x12\n\nview_limit\x18\x05 \x01(\x05\">\n\x04User\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08nickname\x18\x02 \x01(\t\x12\x12\n\nview_limit\x18\x03 \x01(\x05\"%\n\x11\x44\x65leteUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\".\n\x1aGetUserMessageLimitRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"<\n\x14MessageLimitResponse\x12\r\n\x05limit\x18\x01 \x01(\t\x12\x15\n\rerror_message\x18\x02 \x01(\t\">\n\x13SaveSettingsRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rmessage_limit\x18\x02 \x01(\t\"<\n\x10StartChatRequest\x12\x14\n\x0c\x63urrent_user\x18\x01 \x01(\t\x12\x12\n\nother_user\x18\x02 \x01(\t\"P\n\x0c\x43hatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12\x18\n\x04\x63hat\x18\x03 \x01(\x0b\x32\n.chat.Chat\"A\n\x04\x43hat\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x12\n\nother_user\x18\x02 \x01(\t\x12\x14\n\x0cunread_count\x18\x03 \x01(\x05\"\"\n\x0fGetChatsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"A\n\rChatsResponse\x12\x19\n\x05\x63hats\x18\x01 \x03(\x0b\x32\n.chat.Chat\x12\x15\n\rerror_message\x18\x02 \x01(\t\"W\n\x15\x44\x65leteMessagesRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x17\n\x0fmessage_indices\x18\x02 \x03(\x05\x12\x14\n\x0c\x63urrent_user\x18\x03 \x01(\t\";\n\x12GetMessagesRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x14\n\x0c\x63urrent_user\x18\x02 \x01(\t\"W\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x0c\n\x04read\x18\x05 \x01(\x05\"J\n\x10MessagesResponse\x12\x1f\n\x08messages\x18\x01 \x03(\x0b\x32\r.chat.Message\x12\x15\n\rerror_message\x18\x02 \x01(\t\"F\n\x12SendMessageRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"9\n\x0fMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\"z\n\x18GetUsersToDisplayRequest\x12\x18\n\x10\x65xclude_username\x18\x01 \x01(\t\x12\x16\n\x0esearch_pattern\x18\x02 \x01(\t\x12\x14\n\x0c\x63urrent_page\x18\x03 \x01(\x05\x12\x16\n\x0eusers_per_page\x18\x04 \x01(\x05\"U\n\x14UsersDisplayResponse\x12\x11\n\tusernames\x18\x01 \x03(\t\x12\x13\n\x0btotal_pages\x18\x02 \x01(\x05\x12\x15\n\rerror_message\x18\x03 \x01(\t\"8\n\x0eStatusResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t2\xd0\x05\n\x0b\x43hatService\x12\x31\n\x06Signup\x12\x13.chat.SignupRequest\x1a\x12.chat.UserResponse\x12/\n\x05Login\x12\x12.chat.LoginRequest\x1a\x12.chat.UserResponse\x12;\n\nDeleteUser\x12\x17.chat.DeleteUserRequest\x1a\x14.chat.StatusResponse\x12S\n\x13GetUserMessageLimit\x12 .chat.GetUserMessageLimitRequest\x1a\x1a.chat.MessageLimitResponse\x12?\n\x0cSaveSettings\x12\x19.chat.SaveSettingsRequest\x1a\x14.chat.StatusResponse\x12O\n\x11GetUsersToDisplay\x12\x1e.chat.GetUsersToDisplayRequest\x1a\x1a.chat.UsersDisplayResponse\x12\x36\n\x08GetChats\x12\x15.chat.GetChatsRequest\x1a\x13.chat.ChatsResponse\x12\x37\n\tStartChat\x12\x16.chat.StartChatRequest\x1a\x12.chat.ChatResponse\x12?\n\x0bGetMessages\x12\x18.chat.GetMessagesRequest\x1a\x16.chat.MessagesResponse\x12\x42\n\x0fSendChatMessage\x12\x18.chat.SendMessageRequest\x1a\x15.chat.MessageResponse\x12\x43\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x14.chat.StatusResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nchat.proto\x12\x04\x63hat\"E\n\rSignupRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08nickname\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"m\n\x0cUserResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12\x0f\n\x07user_id\x18\x03 \x01(\x05\x12\x10\n\x08nickname\x18\x04 \x01(\t\x12\x12\n\nview_limit\x18\x05 \x01(\x05\">\n\x04User\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08nickname\x18\x02 \x01(\t\x12\x12\n\nview_limit\x18\x03 \x01(\x05\"%\n\x11\x44\x65leteUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\".\n\x1aGetUserMessageLimitRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"<\n\x14MessageLimitResponse\x12\r\n\x05limit\x18\x01 \x01(\t\x12\x15\n\rerror_message\x18\x02 \x01(\t\">\n\x13SaveSettingsRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rmessage_limit\x18\x02 \x01(\t\"<\n\x10StartChatRequest\x12\x14\n\x0c\x63urrent_user\x18\x01 \x01(\t\x12\x12\n\nother_user\x18\x02 \x01(\t\"P\n\x0c\x43hatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\x12\x18\n\x04\x63hat\x18\x03 \x01(\x0b\x32\n.chat.Chat\"\\\n\x04\x43hat\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x12\n\nother_user\x18\x02 \x01(\t\x12\x14\n\x0cunread_count\x18\x03 \x01(\x05\x12\x19\n\x11last_message_time\x18\x04 \x01(\x03\"\"\n\x0fGetChatsRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\"A\n\rChatsResponse\x12\x19\n\x05\x63hats\x18\x01 \x03(\x0b\x32\n.chat.Chat\x12\x15\n\rerror_message\x18\x02 \x01(\t\"m\n\x15\x44\x65leteMessagesRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x17\n\x0fmessage_indices\x18\x02 \x03(\x05\x12\x14\n\x0c\x63urrent_user\x18\x03 \x01(\t\x12\x14\n\x0cmessage_seqs\x18\x04 \x03(\x03\"q\n\x12GetMessagesRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x14\n\x0c\x63urrent_user\x18\x02 \x01(\t\x12\x11\n\tafter_seq\x18\x03 \x01(\x03\x12\x12\n\nbefore_seq\x18\x04 \x01(\x03\x12\r\n\x05limit\x18\x05 \x01(\x05\"d\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12\x0c\n\x04read\x18\x05 \x01(\x05\x12\x0b\n\x03seq\x18\x06 \x01(\x03\"J\n\x10MessagesResponse\x12\x1f\n\x08messages\x18\x01 \x03(\x0b\x32\r.chat.Message\x12\x15\n\rerror_message\x18\x02 \x01(\t\"f\n\x12SendMessageRequest\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\x12\x0b\n\x03seq\x18\x05 \x01(\x03\"n\n\x15SearchMessagesRequest\x12\x14\n\x0c\x63urrent_user\x18\x01 \x01(\t\x12\r\n\x05query\x18\x02 \x01(\t\x12\x0f\n\x07\x63hat_id\x18\x03 \x01(\t\x12\x0c\n\x04page\x18\x04 \x01(\x05\x12\x11\n\tpage_size\x18\x05 \x01(\x05\"^\n\x0cMessageMatch\x12\x0f\n\x07\x63hat_id\x18\x01 \x01(\t\x12\x1e\n\x07message\x18\x02 \x01(\x0b\x32\r.chat.Message\x12\x0f\n\x07snippet\x18\x03 \x01(\t\x12\x0c\n\x04rank\x18\x04 \x01(\x01\"f\n\x16SearchMessagesResponse\x12#\n\x07matches\x18\x01 \x03(\x0b\x32\x12.chat.MessageMatch\x12\x10\n\x08has_more\x18\x02 \x01(\x08\x12\x15\n\rerror_message\x18\x03 \x01(\t\"9\n\x0fMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t\"\x89\x01\n\x18GetUsersToDisplayRequest\x12\x18\n\x10\x65xclude_username\x18\x01 \x01(\t\x12\x16\n\x0esearch_pattern\x18\x02 \x01(\t\x12\x14\n\x0c\x63urrent_page\x18\x03 \x01(\x05\x12\x16\n\x0eusers_per_page\x18\x04 \x01(\x05\x12\r\n\x05\x61\x66ter\x18\x05 \x01(\t\"\x7f\n\x14UsersDisplayResponse\x12\x11\n\tusernames\x18\x01 \x03(\t\x12\x13\n\x0btotal_pages\x18\x02 \x01(\x05\x12\x15\n\rerror_message\x18\x03 \x01(\t\x12\x13\n\x0btotal_users\x18\x04 \x01(\x05\x12\x13\n\x0bnext_cursor\x18\x05 \x01(\t\"8\n\x0eStatusResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x15\n\rerror_message\x18\x02 \x01(\t2\x9d\x06\n\x0b\x43hatService\x12\x31\n\x06Signup\x12\x13.chat.SignupRequest\x1a\x12.chat.UserResponse\x12/\n\x05Login\x12\x12.chat.LoginRequest\x1a\x12.chat.UserResponse\x12;\n\nDeleteUser\x12\x17.chat.DeleteUserRequest\x1a\x14.chat.StatusResponse\x12S\n\x13GetUserMessageLimit\x12 .chat.GetUserMessageLimitRequest\x1a\x1a.chat.MessageLimitResponse\x12?\n\x0cSaveSettings\x12\x19.chat.SaveSettingsRequest\x1a\x14.chat.StatusResponse\x12O\n\x11GetUsersToDisplay\x12\x1e.chat.GetUsersToDisplayRequest\x1a\x1a.chat.UsersDisplayResponse\x12\x36\n\x08GetChats\x12\x15.chat.GetChatsRequest\x1a\x13.chat.ChatsResponse\x12\x37\n\tStartChat\x12\x16.chat.StartChatRequest\x1a\x12.chat.ChatResponse\x12?\n\x0bGetMessages\x12\x18.chat.GetMessagesRequest\x1a\x16.chat.MessagesResponse\x12\x42\n\x0fSendChatMessage\x12\x18.chat.SendMessageRequest\x1a\x15.chat.MessageResponse\x12\x43\n\x0e\x44\x65leteMessages\x12\x1b.chat.DeleteMessagesRequest\x1a\x14.chat.StatusResponse\x12K\n\x0eSearchMessages\x12\x1b.chat.SearchMessagesRequest\x1a\x1c.chat.SearchMessagesResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -52,29 +52,35 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_CHATRESPONSE']._serialized_start=593
   _globals['_CHATRESPONSE']._serialized_end=673
   _globals['_CHAT']._serialized_start=675
-  _globals['_CHAT']._serialized_end=740
-  _globals['_GETCHATSREQUEST']._serialized_start=742
-  _globals['_GETCHATSREQUEST']._serialized_end=776
-  _globals['_CHATSRESPONSE']._serialized_start=778
-  _globals['_CHATSRESPONSE']._serialized_end=843
-  _globals['_DELETEMESSAGESREQUEST']._serialized_start=845
-  _globals['_DELETEMESSAGESREQUEST']._serialized_end=932
-  _globals['_GETMESSAGESREQUEST']._serialized_start=934
-  _globals['_GETMESSAGESREQUEST']._serialized_end=993
-  _globals['_MESSAGE']._serialized_start=995
-  _globals['_MESSAGE']._serialized_end=1082
-  _globals['_MESSAGESRESPONSE']._serialized_start=1084
-  _globals['_MESSAGESRESPONSE']._serialized_end=1158
-  _globals['_SENDMESSAGEREQUEST']._serialized_start=1160
-  _globals['_SENDMESSAGEREQUEST']._serialized_end=1230
-  _globals['_MESSAGERESPONSE']._serialized_start=1232
-  _globals['_MESSAGERESPONSE']._serialized_end=1289
-  _globals['_GETUSERSTODISPLAYREQUEST']._serialized_start=1291
-  _globals['_GETUSERSTODISPLAYREQUEST']._serialized_end=1413
-  _globals['_USERSDISPLAYRESPONSE']._serialized_start=1415
-  _globals['_USERSDISPLAYRESPONSE']._serialized_end=1500
-  _globals['_STATUSRESPONSE']._serialized_start=1502
-  _globals['_STATUSRESPONSE']._serialized_end=1558
-  _globals['_CHATSERVICE']._serialized_start=1561
-  _globals['_CHATSERVICE']._serialized_end=2281
+  _globals['_CHAT']._serialized_end=767
+  _globals['_GETCHATSREQUEST']._serialized_start=769
+  _globals['_GETCHATSREQUEST']._serialized_end=803
+  _globals['_CHATSRESPONSE']._serialized_start=805
+  _globals['_CHATSRESPONSE']._serialized_end=870
+  _globals['_DELETEMESSAGESREQUEST']._serialized_start=872
+  _globals['_DELETEMESSAGESREQUEST']._serialized_end=981
+  _globals['_GETMESSAGESREQUEST']._serialized_start=983
+  _globals['_GETMESSAGESREQUEST']._serialized_end=1096
+  _globals['_MESSAGE']._serialized_start=1098
+  _globals['_MESSAGE']._serialized_end=1198
+  _globals['_MESSAGESRESPONSE']._serialized_start=1200
+  _globals['_MESSAGESRESPONSE']._serialized_end=1274
+  _globals['_SENDMESSAGEREQUEST']._serialized_start=1276
+  _globals['_SENDMESSAGEREQUEST']._serialized_end=1378
+  _globals['_SEARCHMESSAGESREQUEST']._serialized_start=1380
+  _globals['_SEARCHMESSAGESREQUEST']._serialized_end=1490
+  _globals['_MESSAGEMATCH']._serialized_start=1492
+  _globals['_MESSAGEMATCH']._serialized_end=1586
+  _globals['_SEARCHMESSAGESRESPONSE']._serialized_start=1588
+  _globals['_SEARCHMESSAGESRESPONSE']._serialized_end=1690
+  _globals['_MESSAGERESPONSE']._serialized_start=1692
+  _globals['_MESSAGERESPONSE']._serialized_end=1749
+  _globals['_GETUSERSTODISPLAYREQUEST']._serialized_start=1752
+  _globals['_GETUSERSTODISPLAYREQUEST']._serialized_end=1889
+  _globals['_USERSDISPLAYRESPONSE']._serialized_start=1891
+  _globals['_USERSDISPLAYRESPONSE']._serialized_end=2018
+  _globals['_STATUSRESPONSE']._serialized_start=2020
+  _globals['_STATUSRESPONSE']._serialized_end=2076
+  _globals['_CHATSERVICE']._serialized_start=2079
+  _globals['_CHATSERVICE']._serialized_end=2876
 # @@protoc_insertion_point(module_scope)
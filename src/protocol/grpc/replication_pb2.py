@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11replication.proto\x12\x0breplication\">\n\nServerInfo\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04role\x18\x03 \x01(\t\"T\n\x10HeartbeatRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x03\x12\x0c\n\x04role\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\"S\n\x11HeartbeatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x11\n\tserver_id\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\x12\x0c\n\x04role\x18\x04 \x01(\t\"\x90\x01\n\x10OperationRequest\x12\x14\n\x0cservice_name\x18\x01 \x01(\t\x12\x13\n\x0bmethod_name\x18\x02 \x01(\t\x12\x1a\n\x12serialized_request\x18\x03 \x01(\x0c\x12\x14\n\x0coperation_id\x18\x04 \x01(\x03\x12\x11\n\tserver_id\x18\x05 \x01(\t\x12\x0c\n\x04term\x18\x06 \x01(\x03\"7\n\x11OperationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x11\n\tserver_id\x18\x02 \x01(\t\"1\n\x0bJoinRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\"\xec\x01\n\x0cJoinResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12(\n\x07servers\x18\x02 \x03(\x0b\x32\x17.replication.ServerInfo\x12\x11\n\tleader_id\x18\x03 \x01(\t\x12\x0c\n\x04term\x18\x04 \x01(\x03\x12H\n\x10server_addresses\x18\x05 \x03(\x0b\x32..replication.JoinResponse.ServerAddressesEntry\x1a\x36\n\x14ServerAddressesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"(\n\x13NetworkStateRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\"a\n\x14NetworkStateResponse\x12(\n\x07servers\x18\x01 \x03(\x0b\x32\x17.replication.ServerInfo\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\x32\xd9\x02\n\x12ReplicationService\x12L\n\tHeartbeat\x12\x1d.replication.HeartbeatRequest\x1a\x1e.replication.HeartbeatResponse\"\x00\x12U\n\x12ReplicateOperation\x12\x1d.replication.OperationRequest\x1a\x1e.replication.OperationResponse\"\x00\x12\x44\n\x0bJoinNetwork\x12\x18.replication.JoinRequest\x1a\x19.replication.JoinResponse\"\x00\x12X\n\x0fGetNetworkState\x12 .replication.NetworkStateRequest\x1a!.replication.NetworkStateResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11replication.proto\x12\x0breplication\"i\n\nServerInfo\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04role\x18\x03 \x01(\t\x12\x1c\n\x14\x61pplied_operation_id\x18\x04 \x01(\x03\x12\x0b\n\x03lag\x18\x05 \x01(\x03\"o\n\x10HeartbeatRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x03\x12\x0c\n\x04role\x18\x03 \x01(\t\x12\x11\n\ttimestamp\x18\x04 \x01(\x03\x12\x19\n\x11last_operation_id\x18\x05 \x01(\x03\"q\n\x11HeartbeatResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x11\n\tserver_id\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\x12\x0c\n\x04role\x18\x04 \x01(\t\x12\x1c\n\x14\x61pplied_operation_id\x18\x05 \x01(\x03\"L\n\x0ePreVoteRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0c\n\x04term\x18\x02 \x01(\x03\x12\x19\n\x11last_operation_id\x18\x03 \x01(\x03\"C\n\x0fPreVoteResponse\x12\x0f\n\x07granted\x18\x01 \x01(\x08\x12\x11\n\tserver_id\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\"\x90\x01\n\x10OperationRequest\x12\x14\n\x0cservice_name\x18\x01 \x01(\t\x12\x13\n\x0bmethod_name\x18\x02 \x01(\t\x12\x1a\n\x12serialized_request\x18\x03 \x01(\x0c\x12\x14\n\x0coperation_id\x18\x04 \x01(\x03\x12\x11\n\tserver_id\x18\x05 \x01(\t\x12\x0c\n\x04term\x18\x06 \x01(\x03\"7\n\x11OperationResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x11\n\tserver_id\x18\x02 \x01(\t\"1\n\x0bJoinRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\"\xec\x01\n\x0cJoinResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12(\n\x07servers\x18\x02 \x03(\x0b\x32\x17.replication.ServerInfo\x12\x11\n\tleader_id\x18\x03 \x01(\t\x12\x0c\n\x04term\x18\x04 \x01(\x03\x12H\n\x10server_addresses\x18\x05 \x03(\x0b\x32..replication.JoinResponse.ServerAddressesEntry\x1a\x36\n\x14ServerAddressesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"(\n\x13NetworkStateRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\"1\n\nShardGroup\x12\x10\n\x08group_id\x18\x01 \x01(\t\x12\x11\n\taddresses\x18\x02 \x03(\t\"\x9c\x01\n\x14NetworkStateResponse\x12(\n\x07servers\x18\x01 \x03(\x0b\x32\x17.replication.ServerInfo\x12\x11\n\tleader_id\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\x12\'\n\x06shards\x18\x04 \x03(\x0b\x32\x17.replication.ShardGroup\x12\x10\n\x08group_id\x18\x05 \x01(\t\"/\n\rDigestRequest\x12\r\n\x05table\x18\x01 \x01(\t\x12\x0f\n\x07\x62uckets\x18\x02 \x03(\x05\"$\n\x07KeyHash\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x0c\n\x04hash\x18\x02 \x01(\x0c\"K\n\x0e\x44igestResponse\x12\x15\n\rbucket_hashes\x18\x01 \x03(\x0c\x12\"\n\x04keys\x18\x02 \x03(\x0b\x32\x14.replication.KeyHash\"*\n\x0bRowsRequest\x12\r\n\x05table\x18\x01 \x01(\t\x12\x0c\n\x04keys\x18\x02 \x03(\t\"!\n\x0cRowsResponse\x12\x11\n\trows_json\x18\x01 \x01(\t\",\n\x17ReplicationStatsRequest\x12\x11\n\tserver_id\x18\x01 \x01(\t\"G\n\tHistogram\x12\x0e\n\x06\x62ounds\x18\x01 \x03(\x01\x12\x0e\n\x06\x63ounts\x18\x02 \x03(\x03\x12\r\n\x05\x63ount\x18\x03 \x01(\x03\x12\x0b\n\x03sum\x18\x04 \x01(\x01\"p\n\tPeerStats\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x13\n\x0bmatch_index\x18\x02 \x01(\x03\x12\x0b\n\x03lag\x18\x03 \x01(\x03\x12\x0b\n\x03rtt\x18\x04 \x01(\x01\x12\x0c\n\x04srtt\x18\x05 \x01(\x01\x12\x13\n\x0bqueue_depth\x18\x06 \x01(\x05\"\x81\x05\n\x18ReplicationStatsResponse\x12\x11\n\tserver_id\x18\x01 \x01(\t\x12\x0c\n\x04role\x18\x02 \x01(\t\x12\x0c\n\x04term\x18\x03 \x01(\x03\x12\x11\n\tleader_id\x18\x04 \x01(\t\x12\x19\n\x11last_operation_id\x18\x05 \x01(\x03\x12!\n\x19last_applied_operation_id\x18\x06 \x01(\x03\x12\x17\n\x0freplication_lag\x18\x07 \x01(\x03\x12\x1a\n\x12operation_log_size\x18\x08 \x01(\x03\x12%\n\x05peers\x18\t \x03(\x0b\x32\x16.replication.PeerStats\x12\x33\n\x13replication_latency\x18\n \x01(\x0b\x32\x16.replication.Histogram\x12.\n\x0e\x63ommit_latency\x18\x0b \x01(\x0b\x32\x16.replication.Histogram\x12-\n\rheartbeat_rtt\x18\x0c \x01(\x0b\x32\x16.replication.Histogram\x12\x31\n\x11\x65lection_duration\x18\r \x01(\x0b\x32\x16.replication.Histogram\x12\x11\n\telections\x18\x0e \x01(\x03\x12\x15\n\relections_won\x18\x0f \x01(\x03\x12\x1a\n\x12heartbeat_interval\x18\x10 \x01(\x01\x12\x1b\n\x13purge_pending_users\x18\x11 \x01(\x03\x12\x16\n\x0epurge_messages\x18\x12 \x01(\x03\x12\x15\n\rpurge_batches\x18\x13 \x01(\x03\x12\x18\n\x10\x61rchive_messages\x18\x14 \x01(\x03\x12\x16\n\x0e\x61rchive_blocks\x18\x15 \x01(\x03\x32\x91\x05\n\x12ReplicationService\x12L\n\tHeartbeat\x12\x1d.replication.HeartbeatRequest\x1a\x1e.replication.HeartbeatResponse\"\x00\x12\x46\n\x07PreVote\x12\x1b.replication.PreVoteRequest\x1a\x1c.replication.PreVoteResponse\"\x00\x12U\n\x12ReplicateOperation\x12\x1d.replication.OperationRequest\x1a\x1e.replication.OperationResponse\"\x00\x12\x44\n\x0bJoinNetwork\x12\x18.replication.JoinRequest\x1a\x19.replication.JoinResponse\"\x00\x12X\n\x0fGetNetworkState\x12 .replication.NetworkStateRequest\x1a!.replication.NetworkStateResponse\"\x00\x12\x46\n\tGetDigest\x12\x1a.replication.DigestRequest\x1a\x1b.replication.DigestResponse\"\x00\x12@\n\x07GetRows\x12\x18.replication.RowsRequest\x1a\x19.replication.RowsResponse\"\x00\x12\x64\n\x13GetReplicationStats\x12$.replication.ReplicationStatsRequest\x1a%.replication.ReplicationStatsResponse\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,25 +34,49 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._loaded_options = None
   _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._serialized_options = b'8\001'
   _globals['_SERVERINFO']._serialized_start=34
-  _globals['_SERVERINFO']._serialized_end=96
-  _globals['_HEARTBEATREQUEST']._serialized_start=98
-  _globals['_HEARTBEATREQUEST']._serialized_end=182
-  _globals['_HEARTBEATRESPONSE']._serialized_start=184
-  _globals['_HEARTBEATRESPONSE']._serialized_end=267
-  _globals['_OPERATIONREQUEST']._serialized_start=270
-  _globals['_OPERATIONREQUEST']._serialized_end=414
-  _globals['_OPERATIONRESPONSE']._serialized_start=416
-  _globals['_OPERATIONRESPONSE']._serialized_end=471
-  _globals['_JOINREQUEST']._serialized_start=473
-  _globals['_JOINREQUEST']._serialized_end=522
-  _globals['_JOINRESPONSE']._serialized_start=525
-  _globals['_JOINRESPONSE']._serialized_end=761
-  _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._serialized_start=707
-  _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._serialized_end=761
-  _globals['_NETWORKSTATEREQUEST']._serialized_start=763
-  _globals['_NETWORKSTATEREQUEST']._serialized_end=803
-  _globals['_NETWORKSTATERESPONSE']._serialized_start=805
-  _globals['_NETWORKSTATERESPONSE']._serialized_end=902
-  _globals['_REPLICATIONSERVICE']._serialized_start=905
-  _globals['_REPLICATIONSERVICE']._serialized_end=1250
+  _globals['_SERVERINFO']._serialized_end=139
+  _globals['_HEARTBEATREQUEST']._serialized_start=141
+  _globals['_HEARTBEATREQUEST']._serialized_end=252
+  _globals['_HEARTBEATRESPONSE']._serialized_start=254
+  _globals['_HEARTBEATRESPONSE']._serialized_end=367
+  _globals['_PREVOTEREQUEST']._serialized_start=369
+  _globals['_PREVOTEREQUEST']._serialized_end=445
+  _globals['_PREVOTERESPONSE']._serialized_start=447
+  _globals['_PREVOTERESPONSE']._serialized_end=514
+  _globals['_OPERATIONREQUEST']._serialized_start=517
+  _globals['_OPERATIONREQUEST']._serialized_end=661
+  _globals['_OPERATIONRESPONSE']._serialized_start=663
+  _globals['_OPERATIONRESPONSE']._serialized_end=718
+  _globals['_JOINREQUEST']._serialized_start=720
+  _globals['_JOINREQUEST']._serialized_end=769
+  _globals['_JOINRESPONSE']._serialized_start=772
+  _globals['_JOINRESPONSE']._serialized_end=1008
+  _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._serialized_start=954
+  _globals['_JOINRESPONSE_SERVERADDRESSESENTRY']._serialized_end=1008
+  _globals['_NETWORKSTATEREQUEST']._serialized_start=1010
+  _globals['_NETWORKSTATEREQUEST']._serialized_end=1050
+  _globals['_SHARDGROUP']._serialized_start=1052
+  _globals['_SHARDGROUP']._serialized_end=1101
+  _globals['_NETWORKSTATERESPONSE']._serialized_start=1104
+  _globals['_NETWORKSTATERESPONSE']._serialized_end=1260
+  _globals['_DIGESTREQUEST']._serialized_start=1262
+  _globals['_DIGESTREQUEST']._serialized_end=1309
+  _globals['_KEYHASH']._serialized_start=1311
+  _globals['_KEYHASH']._serialized_end=1347
+  _globals['_DIGESTRESPONSE']._serialized_start=1349
+  _globals['_DIGESTRESPONSE']._serialized_end=1424
+  _globals['_ROWSREQUEST']._serialized_start=1426
+  _globals['_ROWSREQUEST']._serialized_end=1468
+  _globals['_ROWSRESPONSE']._serialized_start=1470
+  _globals['_ROWSRESPONSE']._serialized_end=1503
+  _globals['_REPLICATIONSTATSREQUEST']._serialized_start=1505
+  _globals['_REPLICATIONSTATSREQUEST']._serialized_end=1549
+  _globals['_HISTOGRAM']._serialized_start=1551
+  _globals['_HISTOGRAM']._serialized_end=1622
+  _globals['_PEERSTATS']._serialized_start=1624
+  _globals['_PEERSTATS']._serialized_end=1736
+  _globals['_REPLICATIONSTATSRESPONSE']._serialized_start=1739
+  _globals['_REPLICATIONSTATSRESPONSE']._serialized_end=2380
+  _globals['_REPLICATIONSERVICE']._serialized_start=2383
+  _globals['_REPLICATIONSERVICE']._serialized_end=3040
 # @@protoc_insertion_point(module_scope)
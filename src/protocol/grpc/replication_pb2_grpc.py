@@ -40,6 +40,11 @@ class ReplicationServiceStub(object):
                 request_serializer=replication__pb2.HeartbeatRequest.SerializeToString,
                 response_deserializer=replication__pb2.HeartbeatResponse.FromString,
                 _registered_method=True)
+        self.PreVote = channel.unary_unary(
+                '/replication.ReplicationService/PreVote',
+                request_serializer=replication__pb2.PreVoteRequest.SerializeToString,
+                response_deserializer=replication__pb2.PreVoteResponse.FromString,
+                _registered_method=True)
         self.ReplicateOperation = channel.unary_unary(
                 '/replication.ReplicationService/ReplicateOperation',
                 request_serializer=replication__pb2.OperationRequest.SerializeToString,
@@ -55,6 +60,21 @@ class ReplicationServiceStub(object):
                 request_serializer=replication__pb2.NetworkStateRequest.SerializeToString,
                 response_deserializer=replication__pb2.NetworkStateResponse.FromString,
                 _registered_method=True)
+        self.GetDigest = channel.unary_unary(
+                '/replication.ReplicationService/GetDigest',
+                request_serializer=replication__pb2.DigestRequest.SerializeToString,
+                response_deserializer=replication__pb2.DigestResponse.FromString,
+                _registered_method=True)
+        self.GetRows = channel.unary_unary(
+                '/replication.ReplicationService/GetRows',
+                request_serializer=replication__pb2.RowsRequest.SerializeToString,
+                response_deserializer=replication__pb2.RowsResponse.FromString,
+                _registered_method=True)
+        self.GetReplicationStats = channel.unary_unary(
+                '/replication.ReplicationService/GetReplicationStats',
+                request_serializer=replication__pb2.ReplicationStatsRequest.SerializeToString,
+                response_deserializer=replication__pb2.ReplicationStatsResponse.FromString,
+                _registered_method=True)
 
 
 class ReplicationServiceServicer(object):
@@ -68,6 +88,13 @@ class ReplicationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def PreVote(self, request, context):
+        """Ask whether a vote would be granted, without changing anyone's term
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ReplicateOperation(self, request, context):
         """Replicate operation to followers
         """
@@ -89,6 +116,27 @@ class ReplicationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetDigest(self, request, context):
+        """Anti-entropy: hashes of a table's buckets, or of the keys in some buckets
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetRows(self, request, context):
+        """Anti-entropy: the rows of some keys of a table
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicationStats(self, request, context):
+        """Replication lag, latency and election statistics of the responder
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ReplicationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -97,6 +145,11 @@ def add_ReplicationServiceServicer_to_server(servicer, server):
                     request_deserializer=replication__pb2.HeartbeatRequest.FromString,
                     response_serializer=replication__pb2.HeartbeatResponse.SerializeToString,
             ),
+            'PreVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.PreVote,
+                    request_deserializer=replication__pb2.PreVoteRequest.FromString,
+                    response_serializer=replication__pb2.PreVoteResponse.SerializeToString,
+            ),
             'ReplicateOperation': grpc.unary_unary_rpc_method_handler(
                     servicer.ReplicateOperation,
                     request_deserializer=replication__pb2.OperationRequest.FromString,
@@ -112,6 +165,21 @@ def add_ReplicationServiceServicer_to_server(servicer, server):
                     request_deserializer=replication__pb2.NetworkStateRequest.FromString,
                     response_serializer=replication__pb2.NetworkStateResponse.SerializeToString,
             ),
+            'GetDigest': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetDigest,
+                    request_deserializer=replication__pb2.DigestRequest.FromString,
+                    response_serializer=replication__pb2.DigestResponse.SerializeToString,
+            ),
+            'GetRows': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetRows,
+                    request_deserializer=replication__pb2.RowsRequest.FromString,
+                    response_serializer=replication__pb2.RowsResponse.SerializeToString,
+            ),
+            'GetReplicationStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicationStats,
+                    request_deserializer=replication__pb2.ReplicationStatsRequest.FromString,
+                    response_serializer=replication__pb2.ReplicationStatsResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'replication.ReplicationService', rpc_method_handlers)
@@ -151,6 +219,33 @@ class ReplicationService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def PreVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replication.ReplicationService/PreVote',
+            replication__pb2.PreVoteRequest.SerializeToString,
+            replication__pb2.PreVoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ReplicateOperation(request,
             target,
@@ -231,3 +326,84 @@ class ReplicationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetDigest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replication.ReplicationService/GetDigest',
+            replication__pb2.DigestRequest.SerializeToString,
+            replication__pb2.DigestResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetRows(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replication.ReplicationService/GetRows',
+            replication__pb2.RowsRequest.SerializeToString,
+            replication__pb2.RowsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetReplicationStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/replication.ReplicationService/GetReplicationStats',
+            replication__pb2.ReplicationStatsRequest.SerializeToString,
+            replication__pb2.ReplicationStatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
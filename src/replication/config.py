@@ -4,9 +4,69 @@ Configuration constants for the fault-tolerant server.
 """
 
 # Timing constants
-HEARTBEAT_INTERVAL = 1  # seconds - How often leader sends heartbeats
+HEARTBEAT_INTERVAL = 1  # seconds - How often leader sends heartbeats (before RTT is measured)
+HEARTBEAT_INTERVAL_MIN = 0.2  # seconds - Floor for the RTT-adapted heartbeat interval
+HEARTBEAT_INTERVAL_MAX = 1  # seconds - Ceiling; a missed round must not lapse the lease or trip an election
+HEARTBEAT_RTT_MULTIPLIER = 4  # Round trips of slack left before a follower would time out
+HEARTBEAT_RPC_TIMEOUT = 0.5  # seconds - Per-peer deadline within a heartbeat round
+HEARTBEAT_METRICS_WINDOW = 100  # Number of recent heartbeat rounds kept for metrics
+TIMER_TICK = 0.05  # seconds - Resolution of the shared timer wheel
+TIMER_WHEEL_SIZE = 512  # Slots in the timer wheel (one revolution = TICK * SIZE)
 ELECTION_TIMEOUT_MIN = 3  # seconds - Minimum time before starting election
 ELECTION_TIMEOUT_MAX = 6  # seconds - Maximum time before starting election
+VOTE_RPC_TIMEOUT = 2  # seconds - Deadline for vote requests and leader announcements
+PRE_VOTE = True  # Check a majority would vote for us before incrementing the term
+ELECTION_BACKOFF_MAX = 30  # seconds - Cap on the election timeout after repeated failed attempts
 MAX_MISSED_HEARTBEATS = (
     3  # Number of missed heartbeats before considering a server failed
 )
+
+# Peer sender workers
+PEER_QUEUE_SIZE = 128  # Max calls waiting per peer before producers are throttled
+PEER_ENQUEUE_TIMEOUT = 1  # seconds - How long a producer waits on a full peer queue
+REPLICATION_RPC_TIMEOUT = 2  # seconds - Deadline for a single ReplicateOperation call
+REPLICATION_RETRIES = 2  # Extra attempts per follower after a timed-out or unavailable call
+REPLICATION_DEADLINE = 4  # seconds - Total time a follower gets for one operation, queued time and retries included
+APPLY_DEDUP_WINDOW = 10000  # operations - Applied operation ids followers remember to drop retries
+APPLY_BATCH_SIZE = 64  # Max replicated operations a follower commits in one transaction
+
+# Anti-entropy between replicas
+ANTI_ENTROPY_INTERVAL = 30  # seconds - How often followers compare digests with the leader
+DIGEST_BUCKETS = 256  # Hash ranges per table in a database digest
+ANTI_ENTROPY_RPC_TIMEOUT = 5  # seconds - Deadline for digest and row transfers
+
+# Storage
+STORAGE_ENGINE = "sqlite"  # "sqlite" (database file per replica), "sharded" (messages split across files) or "memory" (lost on restart, no anti-entropy)
+DATABASE_SHARDS = 4  # files - Message databases of the "sharded" engine, each with its own write lock
+
+# Account deletion
+PURGE_BATCH_SIZE = 500  # messages - Deleted per purge transaction
+PURGE_BATCH_PAUSE = 0.05  # seconds - Between purge batches, leaving the write lock to foreground writes
+PURGE_IDLE_INTERVAL = 5  # seconds - How often an idle purger looks for deleted accounts
+
+# Message archive
+ARCHIVE_KEEP_MESSAGES = 200  # messages - Read messages of a chat behind its newest this many are archived
+ARCHIVE_MAX_AGE = 30 * 24 * 3600  # seconds - Read messages older than this are archived, however deep
+ARCHIVE_BLOCK_SIZE = 100  # messages - Consecutive messages of a chat per compressed block
+ARCHIVE_BATCH_PAUSE = 0.05  # seconds - Between archive blocks, leaving the write lock to foreground writes
+ARCHIVE_IDLE_INTERVAL = 60  # seconds - How often an idle archiver looks for cold chats
+
+# Metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds - Upper bounds of latency histogram buckets
+
+# Write forwarding from followers to the leader
+MAX_FORWARD_HOPS = 2  # Forwarded writes are rejected after this many proxy hops
+FORWARD_TIMEOUT = 5  # seconds - Deadline for a forwarded write when the client set none
+FORWARD_HOPS_METADATA_KEY = "x-forward-hops"
+
+# Leader hint sent in the trailing metadata of rejected requests
+LEADER_ID_METADATA_KEY = "x-leader-id"
+LEADER_ADDRESS_METADATA_KEY = "x-leader-address"
+LEADER_TERM_METADATA_KEY = "x-leader-term"
+
+# Reads
+READ_CONSISTENCY = "linearizable"  # "linearizable" (leader lease / read-index) or "local"
+LEASE_DURATION = 2  # seconds - Must stay below ELECTION_TIMEOUT_MIN to be safe
+MAX_READ_LAG = 10  # operations - Followers further behind than this don't serve reads
+READ_CONSISTENCY_METADATA_KEY = "x-read-consistency"  # "bounded" lets followers answer
+READ_REPLICA_REFRESH_INTERVAL = 5  # seconds - How often clients refresh follower lag
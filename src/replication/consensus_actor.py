@@ -0,0 +1,105 @@
+import concurrent.futures
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling the actor loop to exit
+_STOP = object()
+
+
+class ConsensusActor:
+    """
+    Single-threaded event loop that owns the consensus state.
+
+    Every change to ReplicaState (inbound heartbeats and votes, timer events,
+    RPC completions, joins) is a message in one mailbox handled by one
+    thread, so the managers never race each other and need no locks. When
+    the actor is not running (unit tests, the in-memory simulation) messages
+    run inline on the caller's thread, which is then the only thread.
+    """
+
+    def __init__(self, name="consensus"):
+        self.name = name
+        self.mailbox = queue.Queue()
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        """Start the event loop thread (idempotent)."""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=1):
+        """Stop after the messages already queued; later posts run inline."""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.mailbox.put(_STOP)
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def on_actor_thread(self):
+        """True if the caller is the actor's own thread."""
+        return self.thread is threading.current_thread()
+
+    def post(self, fn, *args):
+        """Queue ``fn(*args)`` to run on the actor without waiting for it."""
+        if not self.is_running or self.on_actor_thread():
+            self._execute(fn, args)
+            return
+        self.mailbox.put((None, fn, args))
+
+    def call(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the actor and return its result."""
+        if not self.is_running or self.on_actor_thread():
+            return fn(*args)
+
+        future = concurrent.futures.Future()
+        self.mailbox.put((future, fn, args))
+        return future.result(timeout)
+
+    def pending(self):
+        """Number of messages waiting in the mailbox."""
+        return self.mailbox.qsize()
+
+    def _execute(self, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Error handling {getattr(fn, '__name__', fn)}: {str(e)}")
+
+    def _handle(self, item):
+        future, fn, args = item
+        if future is None:
+            self._execute(fn, args)
+            return
+
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run(self):
+        """Event loop: handle one message at a time, in arrival order."""
+        while True:
+            item = self.mailbox.get()
+            if item is _STOP:
+                break
+            self._handle(item)
+
+        # Messages that raced with stop() are still handled
+        while True:
+            try:
+                item = self.mailbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                self._handle(item)
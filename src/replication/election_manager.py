@@ -1,17 +1,20 @@
+import functools
 import grpc
 import logging
 import random
-import threading
 import time
 from typing import Set
 
 import src.protocol.grpc.replication_pb2 as replication
-import src.protocol.grpc.replication_pb2_grpc as replication_grpc
 
 from .config import (
     ELECTION_TIMEOUT_MIN,
     ELECTION_TIMEOUT_MAX,
+    ELECTION_BACKOFF_MAX,
+    PRE_VOTE,
+    VOTE_RPC_TIMEOUT,
 )
+from .metrics import Histogram
 
 logger = logging.getLogger(__name__)
 
@@ -19,22 +22,76 @@ logger = logging.getLogger(__name__)
 class ElectionManager:
     """
     Manages all election-related functionality for this replica.
+
+    Runs on the consensus actor: vote requests go out through the transport
+    and their answers come back as ``handle_vote_response`` messages.
+
+    With pre-vote enabled, an election timeout first asks the peers whether
+    they would vote for us (``PreVote``) and only increments the term once a
+    majority says yes, so a node that cannot win (e.g. cut off from the
+    cluster) never inflates its term and later deposes a healthy leader.
+    Every attempt that doesn't produce a leader doubles the upper bound of
+    the randomized election timeout, up to ELECTION_BACKOFF_MAX.
     """
 
-    def __init__(self, state):
+    def __init__(
+        self,
+        state,
+        transport,
+        timer_service,
+        rng=None,
+        pre_vote=PRE_VOTE,
+        backoff_max=ELECTION_BACKOFF_MAX,
+    ):
         self.state = state
+        # Vote requests and leader announcements go out asynchronously over
+        # the persistent per-peer channels (or an in-memory network).
+        self.transport = transport
+        # Election timeouts live on the replica's shared timer wheel
+        self.timers = timer_service
+        self.random = rng if rng else random.Random()
+        self.pre_vote = pre_vote
+        self.backoff_max = backoff_max
+        # Election attempts since we last had a leader; widens the timeout
+        self.failed_attempts = 0
+        # Peers that would vote for us in the pre-vote round under way
+        self.pre_votes: Set[str] = set()
+        self.pre_vote_term = None
         # a set to track peers that are down/crashed.
         self.state.down_peers = set()
 
+        # Metrics: elections started and won, and how long we were without
+        # a leader from the first election timeout
+        self.elections = 0
+        self.elections_won = 0
+        self.election_duration = Histogram()
+        self.election_started_at = None
+
+    def election_timeout(self):
+        """Random election timeout, its upper bound doubling per failed attempt."""
+        upper = ELECTION_TIMEOUT_MAX * (2 ** min(self.failed_attempts, 16))
+        upper = max(ELECTION_TIMEOUT_MAX, min(upper, self.backoff_max))
+        return self.random.uniform(ELECTION_TIMEOUT_MIN, upper)
+
+    def leader_heard(self):
+        """A leader is in charge again: drop the election backoff."""
+        self.failed_attempts = 0
+        self.pre_vote_term = None
+        if self.election_started_at is not None:
+            self.election_duration.observe(self.state.clock() - self.election_started_at)
+            self.election_started_at = None
+
     def reset_election_timer(self):
         """Reset the election timeout with a random duration."""
-        if self.state.election_timer:
-            self.state.election_timer.cancel()
+        timeout = self.election_timeout()
 
-        timeout = random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
-        self.state.election_timer = threading.Timer(timeout, self.start_election)
-        self.state.election_timer.daemon = True
-        self.state.election_timer.start()
+        # Moving the existing timer to a new wheel slot is O(1): no new thread
+        if self.state.election_timer:
+            self.timers.reset(self.state.election_timer, timeout)
+        else:
+            self.state.election_timer = self.timers.schedule(
+                timeout, self.start_election
+            )
         logger.debug(f"Election timer reset with timeout: {timeout:.2f}s")
 
     def cancel_election_timer(self):
@@ -54,24 +111,75 @@ class ElectionManager:
             self.become_leader()
             self.reset_election_timer()
             return
-        # Increment term and vote for self
-        self.state.term += 1
-        self.state.role = "candidate"
-        self.state.voted_for = self.state.server_id
-        self.state.votes_received = {self.state.server_id}
 
+        # Each timeout that fires without a leader widens the next one
+        self.failed_attempts += 1
+        if self.election_started_at is None:
+            self.election_started_at = self.state.clock()
+
+        if self.pre_vote:
+            self.start_pre_vote()
+        else:
+            self.start_real_election()
+
+    def start_pre_vote(self):
+        """Ask peers whether they would vote for us, without changing any term."""
+        self.pre_vote_term = self.state.term + 1
+        self.pre_votes = {self.state.server_id}
         logger.info(
-            f"Starting election for term {self.state.term}. {self.state.server_id} votes for itself."
+            f"{self.state.server_id} starting pre-vote for term {self.pre_vote_term}"
         )
 
-        # Track unique addresses to avoid duplicate requests
-        contacted_addresses = set()
-        logger.info(f"Contacted addresses: {contacted_addresses}")
-        logger.info(f"Peers: {self.state.peers}")
-        logger.info(f"Down peers: {self.state.down_peers}")
+        request = replication.PreVoteRequest(
+            server_id=self.state.server_id,
+            term=self.pre_vote_term,
+            last_operation_id=self.state.last_applied_operation_id,
+        )
+        on_response = functools.partial(
+            self.handle_pre_vote_response, self.pre_vote_term
+        )
+        for peer_id, peer_address in self._vote_targets():
+            self.transport.pre_vote(
+                peer_id, peer_address, request, VOTE_RPC_TIMEOUT, on_response
+            )
 
-        # Request votes from all peers that aren't marked as down
-        for peer_id, peer_address in self.state.peers.items():
+        # Try again later if the pre-vote goes nowhere
+        self.reset_election_timer()
+
+    def handle_pre_vote_response(self, pre_vote_term, peer_id, response, error):
+        """Count a pre-vote; start the real election once a majority grants one."""
+        if error is not None:
+            self._note_failed_peer(peer_id, error)
+            return
+
+        if peer_id in self.state.down_peers:
+            self.state.down_peers.discard(peer_id)
+            logger.info(f"Peer {peer_id} is back online")
+
+        # A later attempt, a real election or a leader superseded this round
+        if (
+            self.pre_vote_term != pre_vote_term
+            or self.state.role == "leader"
+            or self.state.term + 1 != pre_vote_term
+        ):
+            return
+
+        if not response.granted:
+            return
+
+        self.pre_votes.add(peer_id)
+        if self._has_majority(self.pre_votes):
+            logger.info(
+                f"Pre-vote for term {pre_vote_term} granted by a majority, starting election"
+            )
+            self.pre_vote_term = None
+            self.start_real_election()
+
+    def _vote_targets(self):
+        """Peers to solicit: live ones, one per address."""
+        contacted_addresses = set()
+        targets = []
+        for peer_id, peer_address in list(self.state.peers.items()):
             if peer_id in self.state.down_peers:
                 logger.debug(f"Skipping down peer {peer_id}")
                 continue
@@ -84,81 +192,105 @@ class ElectionManager:
                 continue
 
             contacted_addresses.add(peer_address)
-            logger.info(f"Contacting peer {peer_id} at {peer_address}")
-            threading.Thread(
-                target=self.request_vote, args=(peer_id, peer_address)
-            ).start()
+            targets.append((peer_id, peer_address))
+        return targets
+
+    def _has_majority(self, supporters):
+        # Count only active peers for majority calculation
+        active_peers_count = len(self.state.peers) - len(self.state.down_peers)
+        return len(supporters) > (active_peers_count + 1) / 2
+
+    def _note_failed_peer(self, peer_id, error):
+        # Check the status code to determine if the peer is down
+        code = error.code() if callable(getattr(error, "code", None)) else None
+        if code == grpc.StatusCode.UNAVAILABLE:
+            logger.warning(
+                f"Peer {peer_id} appears to be down: {str(error)}. Marking as down."
+            )
+            # Add to down_peers set instead of removing from peers dictionary
+            self.state.down_peers.add(peer_id)
+        else:
+            logger.error(f"Error requesting vote from {peer_id}: {str(error)}")
+
+    def start_real_election(self):
+        """Increment the term, vote for ourselves and request votes."""
+        # Increment term and vote for self
+        self.elections += 1
+        self.state.term += 1
+        self.state.role = "candidate"
+        self.state.voted_for = self.state.server_id
+        self.state.votes_received = {self.state.server_id}
+
+        logger.info(
+            f"Starting election for term {self.state.term}. {self.state.server_id} votes for itself."
+        )
+
+        logger.debug(f"Peers: {self.state.peers}")
+        logger.debug(f"Down peers: {self.state.down_peers}")
+
+        # Using heartbeat for vote request
+        request = replication.HeartbeatRequest(
+            server_id=self.state.server_id,
+            term=self.state.term,
+            role="candidate",
+            timestamp=int(time.time()),
+        )
+        on_response = functools.partial(self.handle_vote_response, self.state.term)
+
+        # Request votes from all peers that aren't marked as down
+        for peer_id, peer_address in self._vote_targets():
+            logger.debug(f"Requesting vote from {peer_id} at {peer_address}")
+            self.transport.heartbeat(
+                peer_id, peer_address, request, VOTE_RPC_TIMEOUT, on_response
+            )
 
         # Reset the election timer for next round if needed
-        logger.info(f"Number of votes received: {len(self.state.votes_received)}")
         self.reset_election_timer()
 
-    def request_vote(self, peer_id: str, peer_address: str):
-        """Request a vote from a peer."""
-        try:
-            with grpc.insecure_channel(peer_address) as channel:
-                stub = replication_grpc.ReplicationServiceStub(channel)
-
-                # Using heartbeat for vote request
-                request = replication.HeartbeatRequest(
-                    server_id=self.state.server_id,
-                    term=self.state.term,
-                    role="candidate",
-                    timestamp=int(time.time()),
-                )
+    def handle_vote_response(self, election_term, peer_id, response, error):
+        """Count a vote (or handle a failed request) for the election in election_term."""
+        if error is not None:
+            self._note_failed_peer(peer_id, error)
+            return
 
-                response = stub.Heartbeat(request, timeout=2)
-
-                # If peer was marked as down but responds now, remove from down_peers
-                if peer_id in self.state.down_peers:
-                    self.state.down_peers.remove(peer_id)
-                    logger.info(f"Peer {peer_id} is back online")
-
-                if response.success and response.term == self.state.term:
-                    self.state.votes_received.add(peer_id)
-                    logger.info(
-                        f"Received vote from {peer_id} for term {self.state.term}"
-                    )
-
-                    # Check if we have majority
-                    # Count only active peers for majority calculation
-                    active_peers_count = len(self.state.peers) - len(
-                        self.state.down_peers
-                    )
-                    if len(self.state.votes_received) > (active_peers_count + 1) / 2:
-                        self.become_leader()
-                elif response.term > self.state.term:
-                    # Higher term discovered, revert to follower
-                    self.state.term = response.term
-                    self.state.role = "follower"
-                    self.state.voted_for = None
-                    self.reset_election_timer()
-                    logger.info(
-                        f"Discovered higher term {response.term}, reverting to follower"
-                    )
-
-                logger.info(f"response: {response}")
-        except grpc.RpcError as e:
-            # Check the status code to determine if the peer is down
-            status_code = e.code()
-            if status_code == grpc.StatusCode.UNAVAILABLE:
-                logger.warning(
-                    f"Peer {peer_id} at {peer_address} appears to be down: {str(e)}. Marking as down."
-                )
-                # Add to down_peers set instead of removing from peers dictionary
-                self.state.down_peers.add(peer_id)
-            else:
-                logger.error(f"Error requesting vote from {peer_id}: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error requesting vote from {peer_id}: {str(e)}")
+        # If peer was marked as down but responds now, remove from down_peers
+        if peer_id in self.state.down_peers:
+            self.state.down_peers.discard(peer_id)
+            logger.info(f"Peer {peer_id} is back online")
+
+        if response.term > self.state.term:
+            # Higher term discovered, revert to follower
+            self.state.term = response.term
+            self.state.role = "follower"
+            self.state.voted_for = None
+            self.reset_election_timer()
+            logger.info(
+                f"Discovered higher term {response.term}, reverting to follower"
+            )
+            return
+
+        # Answers to an election we already won, lost or abandoned
+        if self.state.role != "candidate" or self.state.term != election_term:
+            return
+
+        if response.success and response.term == self.state.term:
+            self.state.votes_received.add(peer_id)
+            logger.info(f"Received vote from {peer_id} for term {self.state.term}")
+
+            # Check if we have majority
+            if self._has_majority(self.state.votes_received):
+                self.become_leader()
 
     def become_leader(self):
         """Become the leader for the current term."""
         if self.state.role == "leader":
             return
 
+        if self.state.role == "candidate":
+            self.elections_won += 1
         self.state.role = "leader"
         self.state.leader_id = self.state.server_id
+        self.leader_heard()
         self.cancel_election_timer()
 
         # Update server info
@@ -176,23 +308,40 @@ class ElectionManager:
         )
 
         # Notify all peers of the new leader
-        for peer_id, peer_address in self.state.peers.items():
+        request = replication.HeartbeatRequest(
+            server_id=self.state.server_id,
+            term=self.state.term,
+            role="leader",
+            timestamp=int(time.time()),
+            last_operation_id=self.state.last_operation_id,
+        )
+        for peer_id, peer_address in list(self.state.peers.items()):
             # Skip peers that are known to be down
             if peer_id in self.state.down_peers:
                 logger.debug(f"Skipping down peer {peer_id} for leader notification")
                 continue
 
-            try:
-                with grpc.insecure_channel(peer_address) as channel:
-                    stub = replication_grpc.ReplicationServiceStub(channel)
+            self.transport.heartbeat(
+                peer_id,
+                peer_address,
+                request,
+                VOTE_RPC_TIMEOUT,
+                self.handle_announce_response,
+            )
 
-                    request = replication.HeartbeatRequest(
-                        server_id=self.state.server_id,
-                        term=self.state.term,
-                        role="leader",
-                        timestamp=int(time.time()),
-                    )
+    def handle_announce_response(self, peer_id, response, error):
+        """Check a peer's answer to our leadership announcement."""
+        if error is not None:
+            logger.error(f"Error notifying peer {peer_id} of new leader: {str(error)}")
+            return
 
-                    stub.Heartbeat(request)
-            except Exception as e:
-                logger.error(f"Error notifying peer {peer_id} of new leader: {str(e)}")
+        if response.term > self.state.term and self.state.role == "leader":
+            # Someone moved on while we were being elected
+            self.state.term = response.term
+            self.state.role = "follower"
+            self.state.leader_id = None
+            self.state.voted_for = None
+            self.reset_election_timer()
+            logger.info(
+                f"Discovered higher term {response.term}, reverting to follower"
+            )
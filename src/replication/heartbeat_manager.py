@@ -1,131 +1,402 @@
-import grpc
+import functools
 import logging
+import threading
 import time
-from typing import Dict
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
 
 import src.protocol.grpc.replication_pb2 as replication
-import src.protocol.grpc.replication_pb2_grpc as replication_grpc
 
+from .metrics import Histogram
+from .peer_sender import PeerSenderPool
+from .transport import GrpcTransport
 from .config import (
     HEARTBEAT_INTERVAL,
+    HEARTBEAT_INTERVAL_MIN,
+    HEARTBEAT_INTERVAL_MAX,
+    HEARTBEAT_RTT_MULTIPLIER,
+    HEARTBEAT_RPC_TIMEOUT,
+    HEARTBEAT_METRICS_WINDOW,
     MAX_MISSED_HEARTBEATS,
 )
 
 logger = logging.getLogger(__name__)
 
 
+class HeartbeatRound:
+    """One leader heartbeat round, settled when every peer has answered or timed out."""
+
+    def __init__(
+        self,
+        term,
+        start,
+        cluster_size,
+        peers,
+        last_heartbeat_time,
+        connection_failure_count,
+    ):
+        self.term = term
+        self.start = start
+        self.cluster_size = cluster_size
+        self.peers: Dict[str, str] = peers
+        self.pending: Set[str] = set(peers)
+        self.acks = 0
+        self.peers_to_remove: List[str] = []
+        # Peers left out because replication traffic already reached them
+        self.skipped: Set[str] = set()
+        self.last_heartbeat_time = last_heartbeat_time
+        self.connection_failure_count = connection_failure_count
+        # Set once settled; confirm_leadership waits on it from request threads
+        self.done = threading.Event()
+        self.confirmed = False
+
+
 class HeartbeatManager:
     """
     Manages heartbeat sending and checking for this replica
+
+    A peer that acknowledged a ReplicateOperation within the current
+    interval is skipped by periodic rounds: the write already told it who the
+    leader is. The interval itself adapts to the slowest peer's smoothed RTT,
+    leaving HEARTBEAT_RTT_MULTIPLIER round trips of slack under
+    HEARTBEAT_INTERVAL_MAX.
     """
 
-    def __init__(self, state):
+    def __init__(self, state, transport=None, actor=None):
         self.state = state
+        # Heartbeats go out asynchronously over the persistent per-peer
+        # channels (or an in-memory network)
+        self.transport = transport if transport else GrpcTransport(PeerSenderPool(state))
+        # Consensus actor that owns the state (optional; inline without it)
+        self.actor = actor
         # Reference to the election manager will be set after creation
         self.election_manager = None
+        # Read lease renewed by majority-acknowledged rounds (optional)
+        self.lease_manager = None
+
+        self.last_heartbeat_time = {}
+        self.connection_failure_count = {}  # Track consecutive failures
+        # Latest round, shared by concurrent leadership confirmations
+        self.current_round = None
+
+        # Send time of the latest acknowledged RPC per peer, with its term;
+        # a quorum of these keeps the read lease alive
+        self.peer_contact: Dict[str, Tuple[float, int]] = {}
+        # Send time of the latest acknowledged ReplicateOperation per peer
+        self.replication_contact: Dict[str, float] = {}
+
+        # Current heartbeat interval, adapted from peer RTTs
+        self.interval = HEARTBEAT_INTERVAL
+        self.tick_timer = None
+        self.timers = None
+        self.peer_srtt: Dict[str, float] = {}
+
+        # Metrics: recent round durations and last RTT per peer (seconds)
+        self.round_durations = deque(maxlen=HEARTBEAT_METRICS_WINDOW)
+        self.peer_rtts: Dict[str, float] = {}
+        self.heartbeat_rtt = Histogram()
+        self.heartbeats_sent = 0
+        self.heartbeats_skipped = 0
 
     def set_election_manager(self, election_manager):
         """Set the election manager reference."""
         self.election_manager = election_manager
 
-    def heartbeat_loop(self):
-        """Continuously send heartbeats if leader, or check leader liveness if follower."""
-        last_heartbeat_time = {}
-        connection_failure_count = {}  # Track consecutive failures
+    def set_lease_manager(self, lease_manager):
+        """Set the lease manager reference."""
+        self.lease_manager = lease_manager
 
-        while self.state.is_running:
-            try:
-                if self.state.role == "leader":
-                    self._send_heartbeats_as_leader(
-                        last_heartbeat_time, connection_failure_count
-                    )
-                elif self.state.role == "follower" and self.state.leader_id:
-                    self._check_leader_liveness(
-                        last_heartbeat_time, connection_failure_count
-                    )
+    def start_ticking(self, timer_service):
+        """Run heartbeat_tick periodically on the timer service; returns the timer."""
+        self.timers = timer_service
+        self.tick_timer = timer_service.schedule_periodic(
+            self.interval, self.heartbeat_tick
+        )
+        return self.tick_timer
 
-                time.sleep(HEARTBEAT_INTERVAL)
-            except Exception as e:
-                logger.error(f"Error in heartbeat loop: {str(e)}")
-                time.sleep(1)  # Avoid tight loops in case of persistent errors
-
-    def _send_heartbeats_as_leader(self, last_heartbeat_time, connection_failure_count):
-        """Send heartbeats to all followers if this node is the leader."""
-        peers_to_remove = []
-
-        for peer_id, peer_address in self.state.peers.items():
-            try:
-                with grpc.insecure_channel(peer_address) as channel:
-                    stub = replication_grpc.ReplicationServiceStub(channel)
-
-                    request = replication.HeartbeatRequest(
-                        server_id=self.state.server_id,
-                        term=self.state.term,
-                        role="leader",
-                        timestamp=int(time.time()),
-                    )
+    def heartbeat_tick(self):
+        """
+        One heartbeat step: send a round if leader, or check leader liveness
+        if follower. Runs every ``interval`` seconds on the shared timer
+        service (see start_ticking).
+        """
+        if self.state.role == "leader":
+            self._send_heartbeats_as_leader(
+                self.last_heartbeat_time, self.connection_failure_count
+            )
+        elif self.state.role == "follower" and self.state.leader_id:
+            self._check_leader_liveness(
+                self.last_heartbeat_time, self.connection_failure_count
+            )
 
-                    response = stub.Heartbeat(request, timeout=1)
-
-                    if response.term > self.state.term:
-                        # Higher term discovered, revert to follower
-                        self.state.term = response.term
-                        self.state.role = "follower"
-                        self.state.leader_id = None
-                        if self.election_manager:
-                            self.election_manager.reset_election_timer()
-                        logger.info(
-                            f"Discovered higher term {response.term}, reverting to follower"
-                        )
-                        break
-
-                    # Update server info
-                    self.state.servers_info[peer_id] = replication.ServerInfo(
-                        server_id=peer_id,
-                        address=peer_address,
-                        role=response.role,
-                    )
+    def record_replication_ack(self, peer_id, sent_at, term):
+        """
+        Note that a ReplicateOperation sent at ``sent_at`` in ``term`` was
+        acknowledged. Called from the peer sender workers; handled on the actor.
+        """
+        if self.actor:
+            self.actor.post(self._apply_replication_ack, peer_id, sent_at, term)
+        else:
+            self._apply_replication_ack(peer_id, sent_at, term)
+
+    def _apply_replication_ack(self, peer_id, sent_at, term):
+        if self.state.role != "leader" or term != self.state.term:
+            return
+        if peer_id not in self.state.peers:
+            return
+
+        self.replication_contact[peer_id] = max(
+            sent_at, self.replication_contact.get(peer_id, sent_at)
+        )
+        self.last_heartbeat_time[peer_id] = self.state.clock()
+        self.connection_failure_count[peer_id] = 0
+        self._record_contact(peer_id, sent_at, term)
+        self._renew_lease_from_quorum()
+
+    def _record_contact(self, peer_id, sent_at, term):
+        previous = self.peer_contact.get(peer_id)
+        if previous is None or previous[1] != term or previous[0] < sent_at:
+            self.peer_contact[peer_id] = (sent_at, term)
+
+    def _quorum_contact(self) -> Optional[float]:
+        """
+        Latest time by which a majority of the cluster had acknowledged us in
+        the current term, or None. The leader counts itself.
+        """
+        needed = (len(self.state.peers) + 1) // 2  # peers needed besides us
+        if needed == 0:
+            return self.state.clock()
+
+        times = sorted(
+            (
+                sent_at
+                for peer_id, (sent_at, term) in self.peer_contact.items()
+                if term == self.state.term and peer_id in self.state.peers
+            ),
+            reverse=True,
+        )
+        if len(times) < needed:
+            return None
+        return times[needed - 1]
+
+    def _renew_lease_from_quorum(self):
+        if not self.lease_manager or self.state.role != "leader":
+            return
+        quorum_at = self._quorum_contact()
+        if quorum_at is not None:
+            self.lease_manager.renew(quorum_at)
+
+    def _update_interval(self):
+        """Adapt the heartbeat interval to the slowest peer's smoothed RTT."""
+        slowest = max(self.peer_srtt.values(), default=0.0)
+        interval = HEARTBEAT_INTERVAL_MAX - HEARTBEAT_RTT_MULTIPLIER * slowest
+        interval = min(HEARTBEAT_INTERVAL_MAX, max(HEARTBEAT_INTERVAL_MIN, interval))
+        if abs(interval - self.interval) < 0.01:
+            return
+
+        self.interval = interval
+        if self.tick_timer and self.timers:
+            self.timers.set_interval(self.tick_timer, interval)
+        logger.debug(f"Heartbeat interval now {interval:.3f}s")
+
+    def confirm_leadership(self):
+        """
+        Run a heartbeat round now and report whether a majority still follows
+        us (the read-index check used when the read lease has lapsed).
+
+        Called from request threads. The round is started on the consensus
+        actor; callers that arrive while one is in flight share it instead of
+        starting another.
+        """
+        if self.state.role != "leader":
+            return False
+
+        heartbeat_round = self._on_actor(self._confirmation_round)
+        if heartbeat_round is None:
+            return True
+
+        # Every call in the round has a HEARTBEAT_RPC_TIMEOUT deadline; the
+        # slack covers the completions queueing on the actor
+        heartbeat_round.done.wait(HEARTBEAT_RPC_TIMEOUT * 2)
+        return heartbeat_round.confirmed
+
+    def _confirmation_round(self):
+        """Round to wait on for a leadership check (None if the lease holds)."""
+        if self.lease_manager and self.lease_manager.is_valid():
+            return None
+
+        current = self.current_round
+        if current and not current.done.is_set() and current.term == self.state.term:
+            return current
+        return self._send_heartbeats_as_leader(
+            self.last_heartbeat_time, self.connection_failure_count, force=True
+        )
+
+    def _on_actor(self, fn, *args):
+        """Run fn on the consensus actor (inline when there is none)."""
+        if self.actor:
+            return self.actor.call(fn, *args)
+        return fn(*args)
+
+    def _send_heartbeats_as_leader(
+        self, last_heartbeat_time, connection_failure_count, force=False
+    ):
+        """
+        Send heartbeats to all followers if this node is the leader.
+
+        Every peer is contacted at once through the transport, each call with
+        its own HEARTBEAT_RPC_TIMEOUT deadline, and nothing blocks: responses
+        come back as ``_on_heartbeat_response`` messages and the round is
+        settled by ``_finish_round`` when the last one arrives.
+
+        Unless ``force`` is set (leadership confirmation needs fresh acks from
+        everyone), peers that acknowledged replication traffic within the
+        current interval are skipped.
+
+        Returns the HeartbeatRound, whose ``done`` event is set once settled.
+        """
+        now = self.state.clock()
+        peers = dict(self.state.peers)
+        skipped = set()
+        if not force:
+            skipped = {
+                peer_id
+                for peer_id in peers
+                if now - self.replication_contact.get(peer_id, float("-inf"))
+                < self.interval
+            }
+        heartbeat_round = HeartbeatRound(
+            term=self.state.term,
+            start=now,
+            cluster_size=len(peers) + 1,
+            peers={p: a for p, a in peers.items() if p not in skipped},
+            last_heartbeat_time=last_heartbeat_time,
+            connection_failure_count=connection_failure_count,
+        )
+        heartbeat_round.skipped = skipped
+        self.current_round = heartbeat_round
+        self.heartbeats_skipped += len(skipped)
+
+        request = replication.HeartbeatRequest(
+            server_id=self.state.server_id,
+            term=self.state.term,
+            role="leader",
+            timestamp=int(time.time()),
+            last_operation_id=self.state.last_operation_id,
+        )
+
+        if not heartbeat_round.peers:
+            self._finish_round(heartbeat_round)
+            return heartbeat_round
+
+        on_response = functools.partial(self._on_heartbeat_response, heartbeat_round)
+        self.heartbeats_sent += len(heartbeat_round.peers)
+        for peer_id, peer_address in heartbeat_round.peers.items():
+            self.transport.heartbeat(
+                peer_id, peer_address, request, HEARTBEAT_RPC_TIMEOUT, on_response
+            )
+        return heartbeat_round
+
+    def _on_heartbeat_response(self, heartbeat_round, peer_id, response, error):
+        """Handle one peer's answer (or failure) in a heartbeat round."""
+        if peer_id not in heartbeat_round.pending:
+            return  # Round already settled
+        heartbeat_round.pending.discard(peer_id)
+
+        peer_address = heartbeat_round.peers[peer_id]
+        last_heartbeat_time = heartbeat_round.last_heartbeat_time
+        connection_failure_count = heartbeat_round.connection_failure_count
+        now = self.state.clock()
 
-                    # Reset failure count on successful connection
-                    connection_failure_count[peer_id] = 0
-                    last_heartbeat_time[peer_id] = time.time()
-            except Exception as e:
-                # Increment failure count
-                connection_failure_count[peer_id] = (
-                    connection_failure_count.get(peer_id, 0) + 1
+        if error is None:
+            rtt = now - heartbeat_round.start
+            self.peer_rtts[peer_id] = rtt
+            self.heartbeat_rtt.observe(rtt)
+            # Smoothed like TCP's SRTT (gain 1/8)
+            srtt = self.peer_srtt.get(peer_id)
+            self.peer_srtt[peer_id] = rtt if srtt is None else srtt + (rtt - srtt) / 8
+
+            if response.term > self.state.term:
+                # Higher term discovered, revert to follower
+                self.state.term = response.term
+                self.state.role = "follower"
+                self.state.leader_id = None
+                if self.election_manager:
+                    self.election_manager.reset_election_timer()
+                logger.info(
+                    f"Discovered higher term {response.term}, reverting to follower"
                 )
+                # The other answers no longer matter
+                heartbeat_round.pending.clear()
+                self._finish_round(heartbeat_round)
+                return
 
-                # Only log the first few failures to reduce noise
-                if connection_failure_count[peer_id] <= 5:
-                    logger.warning(
-                        f"Failed to send heartbeat to {peer_id} at {peer_address}: {str(e)}"
-                    )
-                elif (
-                    connection_failure_count[peer_id] % 30 == 0
-                ):  # Log periodically after that
-                    logger.warning(
-                        f"Still unable to reach {peer_id} after {connection_failure_count[peer_id]} attempts"
-                    )
+            if response.term == heartbeat_round.term:
+                heartbeat_round.acks += 1
+                self._record_contact(peer_id, heartbeat_round.start, heartbeat_round.term)
 
-                # Check if peer has been unresponsive for too long
-                if peer_id in last_heartbeat_time:
-                    if (
-                        time.time() - last_heartbeat_time[peer_id]
-                        > MAX_MISSED_HEARTBEATS * HEARTBEAT_INTERVAL
-                    ):
-                        # Mark for removal (don't remove during iteration)
-                        peers_to_remove.append(peer_id)
-                elif connection_failure_count[peer_id] >= MAX_MISSED_HEARTBEATS:
-                    # If we've never had a successful connection, remove after several attempts
-                    peers_to_remove.append(peer_id)
-
-        # Remove unresponsive peers outside the loop
-        for peer_id in peers_to_remove:
+            # Update server info, including how far behind the peer is
+            self.state.servers_info[peer_id] = replication.ServerInfo(
+                server_id=peer_id,
+                address=peer_address,
+                role=response.role,
+                applied_operation_id=response.applied_operation_id,
+                lag=max(
+                    0,
+                    self.state.last_operation_id - response.applied_operation_id,
+                ),
+            )
+
+            # Reset failure count on successful connection
+            connection_failure_count[peer_id] = 0
+            last_heartbeat_time[peer_id] = now
+        else:
+            # Increment failure count
+            connection_failure_count[peer_id] = (
+                connection_failure_count.get(peer_id, 0) + 1
+            )
+
+            # Only log the first few failures to reduce noise
+            if connection_failure_count[peer_id] <= 5:
+                logger.warning(
+                    f"Failed to send heartbeat to {peer_id} at {peer_address}: {str(error)}"
+                )
+            elif (
+                connection_failure_count[peer_id] % 30 == 0
+            ):  # Log periodically after that
+                logger.warning(
+                    f"Still unable to reach {peer_id} after {connection_failure_count[peer_id]} attempts"
+                )
+
+            # Check if peer has been unresponsive for too long
+            if peer_id in last_heartbeat_time:
+                if (
+                    now - last_heartbeat_time[peer_id]
+                    > MAX_MISSED_HEARTBEATS * self.interval
+                ):
+                    # Mark for removal once the round is settled
+                    heartbeat_round.peers_to_remove.append(peer_id)
+            elif connection_failure_count[peer_id] >= MAX_MISSED_HEARTBEATS:
+                # If we've never had a successful connection, remove after several attempts
+                heartbeat_round.peers_to_remove.append(peer_id)
+
+        if not heartbeat_round.pending:
+            self._finish_round(heartbeat_round)
+
+    def _finish_round(self, heartbeat_round):
+        """Remove unresponsive peers, renew the lease on a majority, record metrics."""
+        last_heartbeat_time = heartbeat_round.last_heartbeat_time
+        connection_failure_count = heartbeat_round.connection_failure_count
+
+        for peer_id in heartbeat_round.peers_to_remove:
             if peer_id in self.state.peers:
                 logger.warning(
                     f"Peer {peer_id} has been unresponsive, removing from peers"
                 )
                 del self.state.peers[peer_id]
+                self.peer_srtt.pop(peer_id, None)
+                self.peer_contact.pop(peer_id, None)
+                self.replication_contact.pop(peer_id, None)
                 if peer_id in self.state.servers_info:
                     del self.state.servers_info[peer_id]
                 if peer_id in last_heartbeat_time:
@@ -133,6 +404,48 @@ class HeartbeatManager:
                 if peer_id in connection_failure_count:
                     del connection_failure_count[peer_id]
 
+        # Majority is counted against the membership the round started with;
+        # skipped peers acknowledged replication within the interval
+        supporters = heartbeat_round.acks + len(heartbeat_round.skipped) + 1
+        heartbeat_round.confirmed = (
+            self.state.role == "leader"
+            and self.state.term == heartbeat_round.term
+            and supporters > heartbeat_round.cluster_size / 2
+        )
+        if heartbeat_round.confirmed:
+            self._renew_lease_from_quorum()
+
+        self._record_round(self.state.clock() - heartbeat_round.start)
+        self._update_interval()
+        heartbeat_round.done.set()
+
+    def _record_round(self, duration):
+        """Keep the duration of a heartbeat round for metrics."""
+        self.round_durations.append(duration)
+        if duration > self.interval:
+            logger.warning(
+                f"Heartbeat round took {duration:.3f}s, longer than the {self.interval:.3f}s interval"
+            )
+
+    def get_round_metrics(self):
+        """
+        Duration statistics (seconds) for recent heartbeat rounds, per-peer
+        RTTs, the current interval and how many heartbeats replication
+        traffic made unnecessary.
+        """
+        durations = list(self.round_durations)
+        metrics = {
+            "rounds": len(durations),
+            "last": durations[-1] if durations else 0.0,
+            "avg": sum(durations) / len(durations) if durations else 0.0,
+            "max": max(durations, default=0.0),
+            "peer_rtts": dict(self.peer_rtts),
+            "interval": self.interval,
+            "heartbeats_sent": self.heartbeats_sent,
+            "heartbeats_skipped": self.heartbeats_skipped,
+        }
+        return metrics
+
     def _check_leader_liveness(self, last_heartbeat_time, connection_failure_count):
         """Check if the current leader is still alive."""
         if self.state.leader_id in self.state.peers:
@@ -143,8 +456,8 @@ class HeartbeatManager:
 
             if self.state.leader_id in last_heartbeat_time:
                 if (
-                    time.time() - last_heartbeat_time[self.state.leader_id]
-                    > MAX_MISSED_HEARTBEATS * HEARTBEAT_INTERVAL
+                    self.state.clock() - last_heartbeat_time[self.state.leader_id]
+                    > MAX_MISSED_HEARTBEATS * self.interval
                 ):
                     logger.warning(
                         f"Leader {self.state.leader_id} has been unresponsive"
@@ -179,25 +492,38 @@ class HeartbeatManager:
                 f"Checking status of leader {self.state.leader_id} at {leader_address}"
             )
 
-            try:
-                with grpc.insecure_channel(leader_address) as channel:
-                    stub = replication_grpc.ReplicationServiceStub(channel)
+            request = replication.HeartbeatRequest(
+                server_id=self.state.server_id,
+                term=self.state.term,
+                role="follower",
+                timestamp=int(time.time()),
+            )
 
-                    request = replication.HeartbeatRequest(
-                        server_id=self.state.server_id,
-                        term=self.state.term,
-                        role="follower",
-                        timestamp=int(time.time()),
-                    )
+            # Short timeout to quickly detect failures
+            errors = []
+            answered = threading.Event()
 
-                    # Short timeout to quickly detect failures
-                    response = stub.Heartbeat(request, timeout=1)
-                    return True  # Leader is responsive
-            except Exception as e:
-                logger.warning(
-                    f"Leader {self.state.leader_id} appears to be down: {str(e)}"
-                )
-                if self.election_manager:
-                    self.election_manager.start_election()
-                return False
+            def on_response(peer_id, response, error):
+                errors.append(error)
+                answered.set()
+
+            self.transport.heartbeat(
+                self.state.leader_id,
+                leader_address,
+                request,
+                HEARTBEAT_RPC_TIMEOUT,
+                on_response,
+            )
+            answered.wait(HEARTBEAT_RPC_TIMEOUT * 2)
+
+            error = errors[0] if errors else "no response"
+            if error is None:
+                return True  # Leader is responsive
+
+            logger.warning(
+                f"Leader {self.state.leader_id} appears to be down: {str(error)}"
+            )
+            if self.election_manager:
+                self._on_actor(self.election_manager.start_election)
+            return False
         return None  # Not a follower or no leader to check
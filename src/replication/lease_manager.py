@@ -0,0 +1,84 @@
+import logging
+import threading
+
+from .config import LEASE_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """
+    Tracks the leader's read lease.
+
+    Each heartbeat round acknowledged by a majority extends the lease to
+    ``round start + LEASE_DURATION``. Followers refuse to vote for
+    ELECTION_TIMEOUT_MIN after hearing from the leader, so while the lease is
+    valid no other leader can have been elected and reads can be served from
+    the local database without a quorum round trip.
+    """
+
+    def __init__(self, state, duration=LEASE_DURATION, timer_service=None):
+        self.state = state
+        self.duration = duration
+        self.expiry = 0.0
+        self.term = None
+        self.lock = threading.Lock()
+
+        # Optional timer that drops the lease when it runs out
+        self.timers = timer_service
+        self.expiry_timer = None
+
+    def renew(self, round_start):
+        """Extend the lease after a majority acknowledged a round sent at round_start."""
+        if self.state.role != "leader":
+            return
+
+        with self.lock:
+            if self.term != self.state.term:
+                # New term: earlier grants don't carry over
+                self.term = self.state.term
+                self.expiry = 0.0
+            self.expiry = max(self.expiry, round_start + self.duration)
+            expiry = self.expiry
+
+        if self.timers:
+            delay = max(0.0, expiry - self.state.clock())
+            if self.expiry_timer:
+                self.timers.reset(self.expiry_timer, delay)
+            else:
+                self.expiry_timer = self.timers.schedule(delay, self._expire)
+
+        logger.debug(f"Read lease for term {self.term} valid until {self.expiry:.3f}")
+
+    def is_valid(self):
+        """True if this node is leader and holds an unexpired lease for its term."""
+        with self.lock:
+            return (
+                self.state.role == "leader"
+                and self.term == self.state.term
+                and self.state.clock() < self.expiry
+            )
+
+    def remaining(self):
+        """Seconds left on the lease (0 if not valid)."""
+        if not self.is_valid():
+            return 0.0
+        return max(0.0, self.expiry - self.state.clock())
+
+    def invalidate(self):
+        """Drop the lease, e.g. when stepping down."""
+        with self.lock:
+            self.expiry = 0.0
+            self.term = None
+
+    def _expire(self):
+        """Expiry timer callback: drop the lease unless it was renewed meanwhile."""
+        with self.lock:
+            if self.state.clock() < self.expiry:
+                return
+            expired_term = self.term
+            self.expiry = 0.0
+            self.term = None
+
+        if expired_term is not None:
+            logger.info(f"Read lease for term {expired_term} expired")
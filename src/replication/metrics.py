@@ -0,0 +1,201 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import src.protocol.grpc.replication_pb2 as replication
+
+from .config import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """
+    Latency histogram (seconds) with fixed bucket bounds.
+
+    ``counts[i]`` holds observations no larger than ``bounds[i]`` (and above
+    the previous bound); the extra last bucket holds everything larger.
+    Safe to observe from several threads.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "bounds": self.bounds,
+                "counts": list(self.counts),
+                "count": self.count,
+                "sum": self.sum,
+            }
+
+
+def histogram_to_proto(snapshot):
+    return replication.Histogram(
+        bounds=snapshot["bounds"],
+        counts=snapshot["counts"],
+        count=snapshot["count"],
+        sum=snapshot["sum"],
+    )
+
+
+def stats_to_proto(stats):
+    """ReplicationStatsResponse for ``ReplicaNode.get_replication_stats()``."""
+    return replication.ReplicationStatsResponse(
+        server_id=stats["server_id"],
+        role=stats["role"],
+        term=stats["term"],
+        leader_id=stats["leader_id"],
+        last_operation_id=stats["last_operation_id"],
+        last_applied_operation_id=stats["last_applied_operation_id"],
+        replication_lag=stats["replication_lag"],
+        operation_log_size=stats["operation_log_size"],
+        peers=[
+            replication.PeerStats(server_id=peer_id, **peer)
+            for peer_id, peer in sorted(stats["peers"].items())
+        ],
+        replication_latency=histogram_to_proto(stats["replication_latency"]),
+        commit_latency=histogram_to_proto(stats["commit_latency"]),
+        heartbeat_rtt=histogram_to_proto(stats["heartbeat_rtt"]),
+        election_duration=histogram_to_proto(stats["election_duration"]),
+        elections=stats["elections"],
+        elections_won=stats["elections_won"],
+        heartbeat_interval=stats["heartbeat_interval"],
+        # Only reported by servers purging and archiving a database
+        **{key: stats[key] for key in _PURGE_KEYS + _ARCHIVE_KEYS if key in stats},
+    )
+
+
+_PURGE_KEYS = ("purge_pending_users", "purge_messages", "purge_batches")
+_ARCHIVE_KEYS = ("archive_messages", "archive_blocks")
+
+# Gauges and counters of the text exposition: (name, stats key, type, help)
+_SCALARS = (
+    ("replica_term", "term", "gauge", "Current term"),
+    ("replica_last_operation_id", "last_operation_id", "gauge", "Latest operation id"),
+    ("replica_last_applied_operation_id", "last_applied_operation_id", "gauge", "Last operation applied locally"),
+    ("replica_replication_lag", "replication_lag", "gauge", "Operations this replica trails the leader"),
+    ("replica_operation_log_size", "operation_log_size", "gauge", "Entries in the operation log"),
+    ("replica_elections_total", "elections", "counter", "Elections started by this replica"),
+    ("replica_elections_won_total", "elections_won", "counter", "Elections won by this replica"),
+    ("replica_heartbeat_interval_seconds", "heartbeat_interval", "gauge", "Current heartbeat interval"),
+    ("replica_purge_pending_users", "purge_pending_users", "gauge", "Deleted users whose messages remain"),
+    ("replica_purge_messages_total", "purge_messages", "counter", "Messages of deleted users purged"),
+    ("replica_purge_batches_total", "purge_batches", "counter", "Purge transactions run"),
+    ("replica_archive_messages_total", "archive_messages", "counter", "Cold messages moved to the archive"),
+    ("replica_archive_blocks_total", "archive_blocks", "counter", "Archive blocks written"),
+)
+
+_PEER_GAUGES = (
+    ("replica_peer_match_index", "match_index", "Highest operation id the peer acknowledged"),
+    ("replica_peer_lag", "lag", "Operations the peer trails this leader"),
+    ("replica_peer_rtt_seconds", "rtt", "Last heartbeat round trip to the peer"),
+    ("replica_peer_srtt_seconds", "srtt", "Smoothed heartbeat round trip to the peer"),
+    ("replica_peer_queue_depth", "queue_depth", "Calls waiting in the peer's send queue"),
+)
+
+_HISTOGRAMS = (
+    ("replica_replication_rpc_seconds", "replication_latency", "ReplicateOperation call latency"),
+    ("replica_commit_seconds", "commit_latency", "Time for a write to reach a majority"),
+    ("replica_heartbeat_rtt_seconds", "heartbeat_rtt", "Heartbeat round trips"),
+    ("replica_election_seconds", "election_duration", "Time from the first election timeout to a leader"),
+)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_text(stats):
+    """Stats in the Prometheus text exposition format."""
+    lines = [
+        "# HELP replica_info Identity and role of this replica",
+        "# TYPE replica_info gauge",
+        f'replica_info{{server_id="{_label(stats["server_id"])}",'
+        f'role="{_label(stats["role"])}",leader_id="{_label(stats["leader_id"])}"}} 1',
+    ]
+
+    for name, key, kind, help_text in _SCALARS:
+        if key not in stats:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+
+    for name, key, help_text in _PEER_GAUGES:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for peer_id, peer in sorted(stats["peers"].items()):
+            lines.append(f'{name}{{peer="{_label(peer_id)}"}} {peer[key]}')
+
+    for name, key, help_text in _HISTOGRAMS:
+        snapshot = stats[key]
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(snapshot["bounds"] + ("+Inf",), snapshot["counts"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{name}_sum {snapshot['sum']}", f"{name}_count {snapshot['count']}"]
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves ``render_text(collect())`` at ``/metrics`` over plain HTTP, for
+    scrapers and ``curl``. Runs in a daemon thread until stop().
+    """
+
+    def __init__(self, collect, port, host=""):
+        self.collect = collect
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def _handler(self):
+        collect = self.collect
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = render_text(collect()).encode("utf-8")
+                except Exception as e:
+                    logger.error(f"Error collecting metrics: {str(e)}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, name="metrics-http"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Serving metrics on port {self.port}")
+
+    def stop(self):
+        if self.thread:
+            self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,167 @@
+import concurrent.futures
+import grpc
+import logging
+import queue
+import threading
+from typing import Dict
+
+from .config import (
+    PEER_QUEUE_SIZE,
+    PEER_ENQUEUE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling a sender's worker thread to exit
+_STOP = object()
+
+
+class PeerSender:
+    """
+    Long-lived sender for a single peer.
+
+    Owns a persistent channel to the peer and one worker thread that drains a
+    bounded queue of outbound calls, so a slow peer only ever holds one thread.
+    """
+
+    def __init__(self, peer_id: str, address: str, max_queue_size=PEER_QUEUE_SIZE):
+        self.peer_id = peer_id
+        self.address = address
+        self.channel = grpc.insecure_channel(address)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.is_running = True
+
+        self.thread = threading.Thread(
+            target=self._run, name=f"peer-sender-{peer_id}"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, fn, *args, timeout=PEER_ENQUEUE_TIMEOUT):
+        """
+        Queue ``fn(channel, *args)`` to run on this peer's worker.
+
+        When the queue is full the caller blocks for up to ``timeout`` seconds
+        (backpressure). If there is still no room, the returned future fails
+        with ``queue.Full`` instead of growing the backlog.
+        """
+        future = concurrent.futures.Future()
+
+        if not self.is_running:
+            future.set_exception(RuntimeError(f"Sender for {self.peer_id} is stopped"))
+            return future
+
+        try:
+            self.queue.put((future, fn, args), timeout=timeout)
+        except queue.Full:
+            logger.warning(
+                f"Send queue for {self.peer_id} is full ({self.queue.maxsize} pending), dropping call"
+            )
+            future.set_exception(queue.Full(f"Send queue for {self.peer_id} is full"))
+
+        return future
+
+    def queue_depth(self):
+        """Number of calls waiting to be sent to this peer."""
+        return self.queue.qsize()
+
+    def stop(self, timeout=None):
+        """Fail pending calls, stop the worker and close the channel."""
+        self.is_running = False
+
+        # Drain what is left so the worker sees the stop sentinel promptly
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                future, _, _ = item
+                future.cancel()
+
+        self.queue.put(_STOP)
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _run(self):
+        """Worker loop: run queued calls one after another on the shared channel."""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(fn(self.channel, *args))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.channel.close()
+
+
+class PeerSenderPool:
+    """
+    Per-peer sender workers owned by the ReplicaNode and shared by the managers.
+    """
+
+    def __init__(self, state, max_queue_size=PEER_QUEUE_SIZE):
+        self.state = state
+        self.max_queue_size = max_queue_size
+        self.senders: Dict[str, PeerSender] = {}
+        self.lock = threading.Lock()
+
+    def get_sender(self, peer_id: str, peer_address: str) -> PeerSender:
+        """Return the sender for a peer, (re)creating it if its address changed."""
+        stale = None
+        with self.lock:
+            sender = self.senders.get(peer_id)
+            if sender and sender.address == peer_address and sender.is_running:
+                return sender
+
+            stale = sender
+            sender = PeerSender(peer_id, peer_address, self.max_queue_size)
+            self.senders[peer_id] = sender
+
+        if stale:
+            logger.info(f"Peer {peer_id} moved to {peer_address}, replacing its sender")
+            stale.stop(timeout=0)
+        return sender
+
+    def submit(self, peer_id: str, peer_address: str, fn, *args):
+        """Queue ``fn(channel, *args)`` on the peer's worker and return its future."""
+        return self.get_sender(peer_id, peer_address).submit(fn, *args)
+
+    def get_channel(self, peer_id: str, peer_address: str):
+        """Persistent channel to a peer, for callers that need a direct RPC."""
+        return self.get_sender(peer_id, peer_address).channel
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Pending calls per peer."""
+        with self.lock:
+            return {
+                peer_id: sender.queue_depth() for peer_id, sender in self.senders.items()
+            }
+
+    def prune(self):
+        """Stop senders for peers that are no longer part of the network."""
+        with self.lock:
+            removed = [
+                peer_id for peer_id in self.senders if peer_id not in self.state.peers
+            ]
+            stale = [self.senders.pop(peer_id) for peer_id in removed]
+
+        for sender in stale:
+            logger.info(f"Stopping sender for removed peer {sender.peer_id}")
+            sender.stop(timeout=0)
+
+    def shutdown(self, timeout=1):
+        """Stop every sender worker."""
+        with self.lock:
+            senders = list(self.senders.values())
+            self.senders = {}
+
+        for sender in senders:
+            sender.stop(timeout)
@@ -1,16 +1,31 @@
 import grpc
 import logging
-import threading
 from typing import Dict, List, Optional
 
 from src.protocol.grpc import replication_pb2 as replication
 import src.protocol.grpc.replication_pb2_grpc as replication_grpc
-from src.protocol.grpc.chat_pb2_grpc import ChatServiceServicer as ChatService
+import src.protocol.grpc.chat_pb2_grpc as chat_grpc
 
 from .replica_state import ReplicaState
 from .election_manager import ElectionManager
 from .heartbeat_manager import HeartbeatManager
 from .replication_manager import ReplicationManager
+from .lease_manager import LeaseManager
+from .timer_service import TimerService
+from .peer_sender import PeerSenderPool
+from .consensus_actor import ConsensusActor
+from .transport import GrpcTransport
+from .config import (
+    ELECTION_TIMEOUT_MIN,
+    MAX_READ_LAG,
+    READ_CONSISTENCY_METADATA_KEY,
+    MAX_FORWARD_HOPS,
+    FORWARD_TIMEOUT,
+    FORWARD_HOPS_METADATA_KEY,
+    LEADER_ID_METADATA_KEY,
+    LEADER_ADDRESS_METADATA_KEY,
+    LEADER_TERM_METADATA_KEY,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,103 +35,334 @@ class ReplicaNode:
     Main Implementation of the replica state and operations
     """
 
-    def __init__(self, server_id: str, address: str, peers: List[str] = None):
+    def __init__(
+        self,
+        server_id: str,
+        address: str,
+        peers: List[str] = None,
+        transport=None,
+        timer_service=None,
+        clock=None,
+        rng=None,
+    ):
         # Initialize the node state
         self.state = ReplicaState(server_id, address, peers)
+        if clock:
+            self.state.clock = clock
+
+        # Every consensus state change runs on this one event loop
+        self.actor = ConsensusActor(name=f"consensus-{server_id}")
+
+        # Long-lived sender workers (one per peer), shared by the managers
+        self.peer_senders = PeerSenderPool(self.state)
+        # Heartbeats and votes; completions are posted back to the actor.
+        # The simulation passes an in-memory transport instead.
+        self.transport = (
+            transport
+            if transport
+            else GrpcTransport(self.peer_senders, dispatch=self.actor.post)
+        )
+        # One scheduler thread for election, heartbeat and lease timers,
+        # firing onto the actor
+        self.timers = (
+            timer_service if timer_service else TimerService(dispatch=self.actor.post)
+        )
 
         # Initialize specialized managers
-        self.election_manager = ElectionManager(self.state)
-        self.heartbeat_manager = HeartbeatManager(self.state)
-        self.replication_manager = ReplicationManager(self.state)
+        self.election_manager = ElectionManager(
+            self.state, self.transport, self.timers, rng
+        )
+        self.heartbeat_manager = HeartbeatManager(
+            self.state, self.transport, self.actor
+        )
+        self.replication_manager = ReplicationManager(self.state, self.peer_senders)
+        self.lease_manager = LeaseManager(self.state, timer_service=self.timers)
 
         # Set up cross-references between managers
         self.heartbeat_manager.set_election_manager(self.election_manager)
+        self.heartbeat_manager.set_lease_manager(self.lease_manager)
+        self.replication_manager.set_heartbeat_manager(self.heartbeat_manager)
 
         # Thread control
         self.is_running = False
-        self.heartbeat_thread = None
+        self.heartbeat_timer = None
 
     def start(self):
         """Start this replica operations."""
         self.is_running = True
         self.state.is_running = True
 
-        # Start election timer
-        self.election_manager.reset_election_timer()
-
-        # Start heartbeat thread
-        self.heartbeat_thread = threading.Thread(
-            target=self.heartbeat_manager.heartbeat_loop
-        )
-        self.heartbeat_thread.daemon = True
-        self.heartbeat_thread.start()
+        self.actor.start()
+        self.run_on_actor(self.start_consensus)
 
         # If we have peers, try to join the network
         if self.state.peers:
             self.join_network()
         else:
             # If no peers, become the initial leader
-            self.election_manager.become_leader()
-            logger.info(
-                f"No peers provided. {self.state.server_id} is the initial leader."
-            )
-            self.state.servers_info[self.state.server_id] = replication.ServerInfo(
-                server_id=self.state.server_id,
-                address=self.state.address,
-                role="leader",
-            )
+            self.run_on_actor(self._become_initial_leader)
+
+    def start_consensus(self):
+        """Arm the election timer and the periodic heartbeat tick."""
+        self.election_manager.reset_election_timer()
+
+        # Heartbeat ticks run on the timer service, not a dedicated thread
+        self.heartbeat_timer = self.heartbeat_manager.start_ticking(self.timers)
+
+    def _become_initial_leader(self):
+        self.election_manager.become_leader()
+        logger.info(f"No peers provided. {self.state.server_id} is the initial leader.")
+        self.state.servers_info[self.state.server_id] = replication.ServerInfo(
+            server_id=self.state.server_id,
+            address=self.state.address,
+            role="leader",
+        )
 
     def shutdown(self):
         """Shutdown this replica."""
         self.is_running = False
         self.state.is_running = False
-        self.election_manager.cancel_election_timer()
+        self.run_on_actor(self.election_manager.cancel_election_timer)
+        self.timers.stop()
+        self.actor.stop()
+        self.peer_senders.shutdown()
+
+    def run_on_actor(self, fn, *args):
+        """
+        Run ``fn(*args)`` on the consensus actor and return its result.
+
+        gRPC handlers and client-facing code use this for anything that reads
+        and then changes ReplicaState, so it never races the timers.
+        """
+        return self.actor.call(fn, *args)
+
+    def get_queue_depths(self):
+        """Pending outbound calls per peer, for monitoring backpressure."""
+        return self.peer_senders.queue_depths()
+
+    def get_heartbeat_metrics(self):
+        """Recent heartbeat round durations and per-peer RTTs."""
+        return self.heartbeat_manager.get_round_metrics()
+
+    def get_replication_stats(self):
+        """
+        Lag, latency and election statistics of this replica, served by
+        GetReplicationStats and the text metrics endpoint.
+        """
+        return self.run_on_actor(self._collect_replication_stats)
+
+    def _collect_replication_stats(self):
+        state = self.state
+        replication_manager = self.replication_manager
+        heartbeat_manager = self.heartbeat_manager
+
+        # Followers only know how far behind they are themselves
+        peers = {}
+        if state.role == "leader":
+            queue_depths = self.get_queue_depths()
+            for peer_id in state.peers:
+                info = state.servers_info.get(peer_id)
+                match_index = max(
+                    replication_manager.match_index.get(peer_id, 0),
+                    info.applied_operation_id if info else 0,
+                )
+                peers[peer_id] = {
+                    "match_index": match_index,
+                    "lag": max(0, state.last_operation_id - match_index),
+                    "rtt": heartbeat_manager.peer_rtts.get(peer_id, 0.0),
+                    "srtt": heartbeat_manager.peer_srtt.get(peer_id, 0.0),
+                    "queue_depth": queue_depths.get(peer_id, 0),
+                }
+
+        return {
+            "server_id": state.server_id,
+            "role": state.role,
+            "term": state.term,
+            "leader_id": state.leader_id or "",
+            "last_operation_id": state.last_operation_id,
+            "last_applied_operation_id": state.last_applied_operation_id,
+            "replication_lag": state.replication_lag(),
+            "operation_log_size": len(state.operation_log),
+            "peers": peers,
+            "replication_latency": replication_manager.replication_latency.snapshot(),
+            "commit_latency": replication_manager.commit_latency.snapshot(),
+            "heartbeat_rtt": heartbeat_manager.heartbeat_rtt.snapshot(),
+            "election_duration": self.election_manager.election_duration.snapshot(),
+            "elections": self.election_manager.elections,
+            "elections_won": self.election_manager.elections_won,
+            "heartbeat_interval": heartbeat_manager.interval,
+        }
 
     def check_leader_status(self):
         """Check if the current leader is still available."""
         return self.heartbeat_manager.check_leader_status()
 
+    def ensure_read_lease(self):
+        """
+        Whether this leader may serve a linearizable read from local state.
+
+        True straight away while the read lease holds; otherwise falls back to
+        confirming leadership with a heartbeat round (read-index), which also
+        renews the lease for the reads that follow.
+        """
+        if self.state.role != "leader":
+            return False
+        if self.lease_manager.is_valid():
+            return True
+
+        logger.debug("Read lease expired, confirming leadership with a quorum")
+        return self.heartbeat_manager.confirm_leadership()
+
+    def can_serve_bounded_read(self, context):
+        """
+        Whether this follower may answer a read from its own database.
+
+        Only when the client asked for bounded staleness, we heard from the
+        leader recently and we trail it by no more than MAX_READ_LAG operations.
+        """
+        if self.state.role != "follower" or not self.state.leader_id:
+            return False
+
+        metadata = dict(context.invocation_metadata() or ()) if context else {}
+        if metadata.get(READ_CONSISTENCY_METADATA_KEY) != "bounded":
+            return False
+
+        # Without a recent heartbeat we can't tell how far behind we are
+        if self.state.clock() - self.state.last_leader_contact >= ELECTION_TIMEOUT_MIN:
+            return False
+
+        return self.state.replication_lag() <= MAX_READ_LAG
+
     def replicate_to_followers(self, service_name, method_name, serialized_request):
-        """Replicate an operation to all followers."""
-        operation_id = self.get_next_operation_id()
+        """
+        Replicate an operation to all followers.
 
-        # -------------------
+        Returns:
+            bool: Whether the caller may apply the write: on the leader, once
+            a majority acknowledged it.
+        """
         logger.info("Replicating %s.%s", service_name, method_name)
 
         # If we're the leader, replicate to followers
         if self.state.role == "leader":
-            self.state.last_operation_id += 1
-            operation_id = self.state.last_operation_id
+            # One id per operation, so follower lag counts operations
+            operation_id = self.run_on_actor(self._assign_operation_id)
 
-            self.replication_manager.replicate_to_followers(
+            return self.replication_manager.replicate_to_followers(
                 service_name,
                 method_name,
                 serialized_request,
                 operation_id,
             )
 
-            return True
-
-        # If we're a follower, forward to leader
+        # If we're a follower with a known leader, the write should have been
+        # forwarded (see forward_to_leader); getting here means that failed
         elif (
             self.state.role == "follower"
             and self.state.leader_id
             and self.state.leader_id in self.state.peers
         ):
             logger.warning(
-                "TODO: Forwarding replication to leader from a follower NOT IMPLEMENTED yet. For now, client should retry other peers."
+                f"Could not forward {method_name} to leader {self.state.leader_id}; client should retry other peers."
             )
             return False
 
         # No known leader or couldn't contact leader, process locally
         logger.info(
-            f"No known leader or leader unavailable. We'll let caller process this locally as: {self.role}"
+            f"No known leader or leader unavailable. We'll let caller process this locally as: {self.state.role}"
         )
         logger.info("Also, we'll take on leader from now on.")
         # set ourselves as the leader
-        self.election_manager.become_leader()
+        self.run_on_actor(self.election_manager.become_leader)
         return True
 
+    def _assign_operation_id(self):
+        operation_id = self.get_next_operation_id()
+        self.state.last_applied_operation_id = operation_id
+        return operation_id
+
+    def forward_to_leader(self, method_name, request, context):
+        """
+        Proxy a client write to the current leader and return its response.
+
+        The leader's ChatService is called over the pooled channel to it, with
+        the caller's remaining deadline and an incremented hop count in the
+        metadata. Returns None when we are the leader, know no leader, the hop
+        budget is used up, or the leader call failed; the caller then rejects.
+        """
+        leader_id = self.state.leader_id
+        if (
+            self.state.role == "leader"
+            or not leader_id
+            or leader_id not in self.state.peers
+        ):
+            return None
+
+        hops = self._get_forward_hops(context)
+        if hops >= MAX_FORWARD_HOPS:
+            logger.warning(
+                f"Not forwarding {method_name}: already forwarded {hops} times"
+            )
+            return None
+
+        # Never wait longer than the original caller is willing to
+        timeout = FORWARD_TIMEOUT
+        remaining = context.time_remaining() if context else None
+        if isinstance(remaining, (int, float)):
+            timeout = min(timeout, remaining)
+
+        leader_address = self.state.peers[leader_id]
+        channel = self.peer_senders.get_channel(leader_id, leader_address)
+        method = getattr(chat_grpc.ChatServiceStub(channel), method_name)
+
+        try:
+            logger.info(f"Forwarding {method_name} to leader {leader_id}")
+            return method(
+                request,
+                timeout=timeout,
+                metadata=((FORWARD_HOPS_METADATA_KEY, str(hops + 1)),),
+            )
+        except grpc.RpcError as e:
+            logger.warning(
+                f"Forwarding {method_name} to leader {leader_id} failed: {str(e)}"
+            )
+            return None
+
+    def _get_forward_hops(self, context):
+        """Number of times an incoming request has already been forwarded."""
+        if not context:
+            return 0
+
+        for key, value in context.invocation_metadata() or ():
+            if key == FORWARD_HOPS_METADATA_KEY:
+                try:
+                    return int(value)
+                except ValueError:
+                    return MAX_FORWARD_HOPS
+        return 0
+
+    def get_leader_hint(self):
+        """
+        Trailing metadata naming the current leader, attached to rejections so
+        clients can redirect in one hop. Empty when no leader is known.
+        """
+        leader_id = self.state.leader_id
+        if not leader_id:
+            return ()
+
+        if leader_id == self.state.server_id:
+            leader_address = self.state.address
+        else:
+            leader_address = self.state.peers.get(leader_id)
+        if not leader_address:
+            return ()
+
+        return (
+            (LEADER_ID_METADATA_KEY, leader_id),
+            (LEADER_ADDRESS_METADATA_KEY, leader_address),
+            (LEADER_TERM_METADATA_KEY, str(self.state.term)),
+        )
+
     def log_operation(self, service, method, parameters, result, operation_id):
         """Log an operation to the operation log."""
         self.replication_manager.log_operation(
@@ -131,7 +377,7 @@ class ReplicaNode:
         """Join the existing network by contacting a peer."""
         joined = False
 
-        for peer_id, peer_address in self.state.peers.items():
+        for peer_id, peer_address in list(self.state.peers.items()):
             try:
                 with grpc.insecure_channel(peer_address) as channel:
                     stub = replication_grpc.ReplicationServiceStub(channel)
@@ -144,66 +390,7 @@ class ReplicaNode:
 
                     if response.success:
                         joined = True
-                        self.state.term = response.term
-                        self.state.leader_id = response.leader_id
-
-                        # Clear existing peers to avoid duplicates
-                        self.state.peers = {}
-                        self.state.servers_info = {}
-
-                        # Track addresses to avoid adding duplicates
-                        address_to_id = {}
-
-                        # Update peers list with all servers in the network
-                        for server in response.servers:
-                            if server.server_id != self.state.server_id:
-                                # Skip duplicate addresses
-                                if server.address in address_to_id:
-                                    logger.warning(
-                                        f"Skipping duplicate server {server.server_id} with address {server.address} (already mapped to {address_to_id[server.address]})"
-                                    )
-                                    continue
-
-                                self.state.peers[server.server_id] = server.address
-                                self.state.servers_info[server.server_id] = server
-                                address_to_id[server.address] = server.server_id
-
-                        # Update server addresses from the map
-                        for server_id, address in response.server_addresses.items():
-                            if server_id != self.state.server_id:
-                                # Skip duplicate addresses
-                                if (
-                                    address in address_to_id
-                                    and address_to_id[address] != server_id
-                                ):
-                                    logger.warning(
-                                        f"Skipping duplicate server {server_id} with address {address} (already mapped to {address_to_id[address]})"
-                                    )
-                                    continue
-
-                                self.state.peers[server_id] = address
-                                address_to_id[address] = server_id
-
-                        logger.info(
-                            f"Successfully joined the network through {peer_id}"
-                        )
-                        logger.info(
-                            f"Current leader is {self.state.leader_id} with term {self.state.term}"
-                        )
-                        logger.info(f"Network peers: {self.state.peers}")
-
-                        # Add self to servers info
-                        self.state.servers_info[self.state.server_id] = (
-                            replication.ServerInfo(
-                                server_id=self.state.server_id,
-                                address=self.state.address,
-                                role="follower",
-                            )
-                        )
-
-                        # Reset election timer
-                        if self.election_manager:
-                            self.election_manager.reset_election_timer()
+                        self.run_on_actor(self._apply_join, peer_id, response)
                         # break
             except Exception as e:
                 logger.error(f"Failed to join network through {peer_id}: {str(e)}")
@@ -213,4 +400,60 @@ class ReplicaNode:
                 "Failed to join network through any peer. Starting as leader."
             )
             if self.election_manager:
-                self.election_manager.become_leader()
+                self.run_on_actor(self.election_manager.become_leader)
+
+    def _apply_join(self, peer_id, response):
+        """Adopt the membership, term and leader from a JoinNetwork response."""
+        self.state.term = response.term
+        self.state.leader_id = response.leader_id
+
+        # Clear existing peers to avoid duplicates
+        self.state.peers = {}
+        self.state.servers_info = {}
+
+        # Track addresses to avoid adding duplicates
+        address_to_id = {}
+
+        # Update peers list with all servers in the network
+        for server in response.servers:
+            if server.server_id != self.state.server_id:
+                # Skip duplicate addresses
+                if server.address in address_to_id:
+                    logger.warning(
+                        f"Skipping duplicate server {server.server_id} with address {server.address} (already mapped to {address_to_id[server.address]})"
+                    )
+                    continue
+
+                self.state.peers[server.server_id] = server.address
+                self.state.servers_info[server.server_id] = server
+                address_to_id[server.address] = server.server_id
+
+        # Update server addresses from the map
+        for server_id, address in response.server_addresses.items():
+            if server_id != self.state.server_id:
+                # Skip duplicate addresses
+                if address in address_to_id and address_to_id[address] != server_id:
+                    logger.warning(
+                        f"Skipping duplicate server {server_id} with address {address} (already mapped to {address_to_id[address]})"
+                    )
+                    continue
+
+                self.state.peers[server_id] = address
+                address_to_id[address] = server_id
+
+        logger.info(f"Successfully joined the network through {peer_id}")
+        logger.info(
+            f"Current leader is {self.state.leader_id} with term {self.state.term}"
+        )
+        logger.info(f"Network peers: {self.state.peers}")
+
+        # Add self to servers info
+        self.state.servers_info[self.state.server_id] = replication.ServerInfo(
+            server_id=self.state.server_id,
+            address=self.state.address,
+            role="follower",
+        )
+
+        # Reset election timer
+        if self.election_manager:
+            self.election_manager.reset_election_timer()
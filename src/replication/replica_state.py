@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import Dict, List, Optional, Set
 
 import src.protocol.grpc.replication_pb2 as replication
@@ -19,6 +20,7 @@ class ReplicaState:
         self.term = 0
         self.role = "follower"  # Start as follower
         self.leader_id = None
+        self.last_leader_contact = 0.0  # clock() of last leader heartbeat
         self.peers: Dict[str, str] = {}  # server_id -> address mapping
         self.servers_info: Dict[str, replication.ServerInfo] = {}  # All server info
 
@@ -30,9 +32,14 @@ class ReplicaState:
         # Operation log
         self.operation_log = []
         self.last_operation_id = 0
+        self.last_applied_operation_id = 0  # Last operation applied locally
+        self.leader_operation_id = 0  # Leader's latest operation, from heartbeats
 
         # Thread control
         self.is_running = False
+        # Monotonic clock for timeouts and leases; the simulation swaps in
+        # its virtual clock
+        self.clock = time.monotonic
 
         # Add initial peers if provided
         if peers:
@@ -49,3 +56,17 @@ class ReplicaState:
         self.servers_info[self.server_id] = replication.ServerInfo(
             server_id=self.server_id, address=self.address, role="follower"
         )
+
+    def record_applied(self, operation_id: int):
+        """Record that an operation replicated from the leader was applied."""
+        if operation_id > self.last_applied_operation_id:
+            self.last_applied_operation_id = operation_id
+        # Keep the id sequence going if we are promoted to leader later
+        if operation_id > self.last_operation_id:
+            self.last_operation_id = operation_id
+
+    def replication_lag(self) -> int:
+        """Number of operations this replica is behind the leader."""
+        if self.role == "leader":
+            return 0
+        return max(0, self.leader_operation_id - self.last_applied_operation_id)
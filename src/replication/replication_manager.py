@@ -6,51 +6,94 @@ from typing import Dict, List
 import src.protocol.grpc.replication_pb2 as replication
 import src.protocol.grpc.replication_pb2_grpc as replication_grpc
 
+from .config import REPLICATION_DEADLINE, REPLICATION_RETRIES, REPLICATION_RPC_TIMEOUT
+from .metrics import Histogram
+from .peer_sender import PeerSenderPool
+
 logger = logging.getLogger(__name__)
 
+# Failures after which a ReplicateOperation is sent again
+RETRYABLE_CODES = (grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.UNAVAILABLE)
+
 
 class ReplicationManager:
     """
     Manages replication of operations to followers.
     """
 
-    def __init__(self, state):
+    def __init__(self, state, peer_senders=None):
         self.state = state
+        # Long-lived per-peer workers; shared with the other managers when
+        # the ReplicaNode passes its own pool in.
+        self.peer_senders = peer_senders if peer_senders else PeerSenderPool(state)
+        # Acks count as heartbeats when set (see HeartbeatManager)
+        self.heartbeat_manager = None
+
+        # Metrics: highest operation id each peer acknowledged, latency of
+        # single ReplicateOperation calls and of reaching a majority
+        self.match_index: Dict[str, int] = {}
+        self.replication_latency = Histogram()
+        self.commit_latency = Histogram()
+
+    def set_heartbeat_manager(self, heartbeat_manager):
+        """Set the heartbeat manager reference."""
+        self.heartbeat_manager = heartbeat_manager
 
     def replicate_to_followers(
         self, service_name, method_name, serialized_request, operation_id
     ):
-        """Replicate an operation to all followers."""
+        """
+        Replicate an operation to all followers.
+
+        Returns once a majority (the leader included) has acknowledged it, or
+        once every follower has answered or run out of time without one.
+        Slower followers keep receiving it on their own sender workers.
+
+        Returns:
+            bool: Whether a majority acknowledged the operation.
+        """
         if self.state.role != "leader":
             logger.warning("Only the leader can replicate operations")
-            return
+            return False
 
         successes = 1  # Count self as success
-        futures = []
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            for peer_id, peer_address in self.state.peers.items():
-                futures.append(
-                    executor.submit(
-                        self.replicate_to_one_follower,
-                        peer_id,
-                        peer_address,
-                        service_name,
-                        method_name,
-                        serialized_request,
-                        operation_id,
-                    )
-                )
-
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    if future.result():
-                        successes += 1
-                except Exception as e:
-                    logger.error(f"Error in replication: {str(e)}")
+        majority = (len(self.state.peers) + 1) / 2
+        started = self.state.clock()
+        deadline = started + REPLICATION_DEADLINE
+        if successes > majority:
+            self.commit_latency.observe(0.0)
+
+        # Drop workers of peers that left the network since the last write
+        self.peer_senders.prune()
+
+        futures = [
+            self.peer_senders.submit(
+                peer_id,
+                peer_address,
+                self.replicate_to_one_follower,
+                peer_id,
+                service_name,
+                method_name,
+                serialized_request,
+                operation_id,
+                deadline,
+            )
+            for peer_id, peer_address in list(self.state.peers.items())
+        ]
+
+        # Committed at quorum; stragglers finish on their workers
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                if future.result():
+                    successes += 1
+                    if successes == int(majority) + 1:
+                        self.commit_latency.observe(self.state.clock() - started)
+                        break
+            except Exception as e:
+                logger.error(f"Error in replication: {str(e)}")
 
         # Check if we have majority
-        if successes > (len(self.state.peers) + 1) / 2:
+        if successes > majority:
             logger.info(
                 f"Operation {operation_id} successfully replicated to majority of followers"
             )
@@ -58,42 +101,83 @@ class ReplicationManager:
             logger.warning(
                 f"Failed to replicate operation {operation_id} to majority of followers"
             )
+        return successes > majority
 
     def replicate_to_one_follower(
         self,
+        channel,
         peer_id,
-        peer_address,
         service_name,
         method_name,
         serialized_request,
         operation_id,
+        deadline=None,
     ):
-        """Replicate an operation to a single follower."""
+        """
+        Replicate an operation to a single follower over its persistent channel.
+
+        Attempts stop at ``deadline`` (a ``state.clock()`` time), however many
+        retries are left, so a follower that never answers holds its worker
+        for at most REPLICATION_DEADLINE per operation, and operations that
+        waited out their deadline in its queue are not sent at all.
+        """
+        if deadline is None:
+            deadline = self.state.clock() + REPLICATION_DEADLINE
         try:
-            with grpc.insecure_channel(peer_address) as channel:
-                stub = replication_grpc.ReplicationServiceStub(channel)
-
-                request = replication.OperationRequest(
-                    service_name=service_name,
-                    method_name=method_name,
-                    serialized_request=serialized_request,
-                    operation_id=operation_id,
-                    server_id=self.state.server_id,
-                    term=self.state.term,
-                )
-
-                response = stub.ReplicateOperation(request, timeout=2)
+            stub = replication_grpc.ReplicationServiceStub(channel)
+
+            request = replication.OperationRequest(
+                service_name=service_name,
+                method_name=method_name,
+                serialized_request=serialized_request,
+                operation_id=operation_id,
+                server_id=self.state.server_id,
+                term=self.state.term,
+            )
 
-                if response.success:
-                    logger.info(
-                        f"Successfully replicated {service_name}.{method_name} to {peer_id}"
+            # Followers apply each operation once, so a call that timed out
+            # (and may have been applied) is safe to send again
+            for attempt in range(REPLICATION_RETRIES + 1):
+                sent_at = self.state.clock()
+                remaining = deadline - sent_at
+                if remaining <= 0:
+                    logger.warning(f"Gave up replicating operation {operation_id} to {peer_id}: deadline passed")
+                    return False
+                try:
+                    response = stub.ReplicateOperation(
+                        request, timeout=min(REPLICATION_RPC_TIMEOUT, remaining)
                     )
-                    return True
-                else:
+                    self.replication_latency.observe(self.state.clock() - sent_at)
+                    break
+                except grpc.RpcError as e:
+                    self.replication_latency.observe(self.state.clock() - sent_at)
+                    if (
+                        attempt == REPLICATION_RETRIES
+                        or e.code() not in RETRYABLE_CODES
+                    ):
+                        raise
                     logger.warning(
-                        f"Failed to replicate {service_name}.{method_name} to {peer_id}"
+                        f"Retrying operation {operation_id} to {peer_id}: {e.code()}"
                     )
-                    return False
+
+            if response.success:
+                logger.info(
+                    f"Successfully replicated {service_name}.{method_name} to {peer_id}"
+                )
+                # Only this peer's sender worker writes its entry
+                self.match_index[peer_id] = max(
+                    operation_id, self.match_index.get(peer_id, 0)
+                )
+                if self.heartbeat_manager:
+                    self.heartbeat_manager.record_replication_ack(
+                        peer_id, sent_at, request.term
+                    )
+                return True
+            else:
+                logger.warning(
+                    f"Failed to replicate {service_name}.{method_name} to {peer_id}"
+                )
+                return False
         except Exception as e:
             logger.error(f"Error replicating to {peer_id}: {str(e)}")
             return False
@@ -0,0 +1,120 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import src.protocol.grpc.replication_pb2 as replication
+
+
+def canonical_chat_id(user_a, user_b):
+    """Chat id shared by both participants (smaller username first)."""
+    return f"{min(user_a, user_b)}_{max(user_a, user_b)}"
+
+
+def chat_recipient(chat_id, sender):
+    """
+    The participant of ``chat_id`` other than ``sender``, or None when
+    ``sender`` does not take part in it. Splitting around ``sender`` keeps
+    usernames containing ``_`` whole.
+    """
+    if chat_id.startswith(f"{sender}_"):
+        return chat_id[len(sender) + 1:]
+    if chat_id.endswith(f"_{sender}"):
+        return chat_id[: -len(sender) - 1]
+    return None
+
+
+def _chat_key(chat_id, user):
+    # Clients may send either participant first; both must land on one group
+    other = chat_recipient(chat_id, user)
+    return canonical_chat_id(user, other) if other is not None else chat_id
+
+
+# ChatService method -> the shard key of its request: ("user", username) or
+# ("chat", canonical chat id). Methods missing here span every group.
+SHARD_KEYS = {
+    "Signup": lambda r: ("user", r.username),
+    "Login": lambda r: ("user", r.username),
+    "GetUserMessageLimit": lambda r: ("user", r.username),
+    "SaveSettings": lambda r: ("user", r.username),
+    "StartChat": lambda r: ("chat", canonical_chat_id(r.current_user, r.other_user)),
+    "GetMessages": lambda r: ("chat", _chat_key(r.chat_id, r.current_user)),
+    "SendChatMessage": lambda r: ("chat", _chat_key(r.chat_id, r.sender)),
+    "DeleteMessages": lambda r: ("chat", _chat_key(r.chat_id, r.current_user)),
+    # Across all of a user's chats unless narrowed to one
+    "SearchMessages": lambda r: (
+        ("chat", _chat_key(r.chat_id, r.current_user)) if r.chat_id else None
+    ),
+}
+
+
+def shard_key(method_name, request) -> Optional[Tuple[str, str]]:
+    """Shard key of a ChatService request, or None if it spans every group."""
+    key = SHARD_KEYS.get(method_name)
+    return key(request) if key else None
+
+
+class ShardMap:
+    """
+    Routing table from user records and chats to replica groups.
+
+    Each group is an independent replica set (its own leader, terms and
+    database). User records are placed by username and chats (their
+    messages) by canonical chat id, with a stable hash so every client and
+    server computes the same owner.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        # group_id -> member addresses (host:port)
+        self.groups = {group_id: list(addresses) for group_id, addresses in groups.items()}
+        self.group_ids = sorted(self.groups)
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Build a map from ``"g1=host:port,host:port;g2=host:port,..."``, the
+        format of the server's ``--shards`` argument.
+        """
+        groups = {}
+        for entry in spec.split(";"):
+            if not entry.strip():
+                continue
+            group_id, _, addresses = entry.partition("=")
+            if not addresses:
+                raise ValueError(f"Shard group without members: {entry!r}")
+            groups[group_id.strip()] = [a.strip() for a in addresses.split(",") if a.strip()]
+        if not groups:
+            raise ValueError("Shard map has no groups")
+        return cls(groups)
+
+    @classmethod
+    def from_proto(cls, shards):
+        """Build a map from the ``shards`` of a NetworkStateResponse."""
+        return cls({shard.group_id: list(shard.addresses) for shard in shards})
+
+    def to_proto(self):
+        return [
+            replication.ShardGroup(group_id=group_id, addresses=self.groups[group_id])
+            for group_id in self.group_ids
+        ]
+
+    def __len__(self):
+        return len(self.group_ids)
+
+    def group_for_key(self, key):
+        """Group owning a shard key (a ("user"|"chat", value) pair)."""
+        _, value = key
+        index = zlib.crc32(value.encode("utf-8")) % len(self.group_ids)
+        return self.group_ids[index]
+
+    def group_for_user(self, username):
+        return self.group_for_key(("user", username))
+
+    def group_for_chat(self, chat_id, user):
+        """Group owning ``chat_id``, as named by its participant ``user``."""
+        return self.group_for_key(("chat", _chat_key(chat_id, user)))
+
+    def group_of_address(self, address) -> Optional[str]:
+        """Group the replica at ``address`` belongs to, if any."""
+        for group_id in self.group_ids:
+            if address in self.groups[group_id]:
+                return group_id
+        return None
@@ -0,0 +1,181 @@
+import logging
+import random
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.services.replication_servicer import ReplicationServicer
+
+from .config import TIMER_TICK
+from .replica_node import ReplicaNode
+from .timer_service import TimerService
+from .transport import InMemoryNetwork
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedCluster:
+    """
+    A replica cluster running on one thread against an InMemoryNetwork.
+
+    Each node is a real ReplicaNode (election, heartbeat and lease managers,
+    and the ReplicationServicer heartbeat handler) with an in-memory
+    transport, the network's virtual clock and a timer wheel advanced by
+    the simulation instead of a scheduler thread. Runs are reproducible from
+    the seed, and minutes of cluster time take milliseconds.
+    """
+
+    def __init__(
+        self,
+        size=3,
+        seed=0,
+        tick=TIMER_TICK,
+        min_latency=0.001,
+        max_latency=0.005,
+        drop_rate=0.0,
+        pre_vote=True,
+    ):
+        self.network = InMemoryNetwork(seed, min_latency, max_latency, drop_rate)
+        self.tick = tick
+        self.nodes: Dict[str, ReplicaNode] = {}
+        self.addresses: Dict[str, str] = {}
+
+        # (time, server_id, term) each time a node becomes leader
+        self.leader_history: List[Tuple[float, str, int]] = []
+        self.leaders_by_term: Dict[int, Set[str]] = {}
+        # Leader unavailability: no live leader holding a majority-backed lease
+        self.unavailable_windows: List[float] = []
+        self.unavailable_since: Optional[float] = 0.0
+
+        members = {f"server{i + 1}": f"localhost:{50051 + i}" for i in range(size)}
+        seeds = random.Random(seed)
+        for server_id, address in members.items():
+            peers = [f"{pid}:{paddr}" for pid, paddr in members.items() if pid != server_id]
+            node = ReplicaNode(
+                server_id,
+                address,
+                peers,
+                transport=self.network.transport(address),
+                timer_service=TimerService(tick=tick, autostart=False),
+                clock=self.network.clock,
+                rng=random.Random(seeds.random()),
+            )
+            node.election_manager.pre_vote = pre_vote
+            servicer = ReplicationServicer(node)
+            self.network.register(address, servicer.handle_heartbeat)
+            self.network.register(address, servicer.handle_pre_vote, "PreVote")
+            self.nodes[server_id] = node
+            self.addresses[server_id] = address
+
+        self.is_running = False
+
+    def start(self):
+        """Arm every node's timers and start the clock."""
+        if self.is_running:
+            return
+        self.is_running = True
+        for node in self.nodes.values():
+            node.is_running = True
+            node.state.is_running = True
+            node.start_consensus()
+        self.network.schedule(self.tick, self._tick)
+
+    def _tick(self):
+        """Advance the timer wheel of every live node by one tick."""
+        for server_id, node in self.nodes.items():
+            if self.addresses[server_id] not in self.network.crashed:
+                node.timers.advance(1)
+        self._observe_leaders()
+        self._observe_availability()
+        self.network.schedule(self.tick, self._tick)
+
+    def _observe_leaders(self):
+        for server_id, node in self.nodes.items():
+            if node.state.role != "leader":
+                continue
+            leaders = self.leaders_by_term.setdefault(node.state.term, set())
+            if server_id not in leaders:
+                leaders.add(server_id)
+                self.leader_history.append(
+                    (self.network.now, server_id, node.state.term)
+                )
+
+    def _observe_availability(self):
+        available = any(
+            node.state.role == "leader"
+            and self.addresses[server_id] not in self.network.crashed
+            and node.lease_manager.is_valid()
+            for server_id, node in self.nodes.items()
+        )
+        now = self.network.now
+        if available and self.unavailable_since is not None:
+            self.unavailable_windows.append(now - self.unavailable_since)
+            self.unavailable_since = None
+        elif not available and self.unavailable_since is None:
+            self.unavailable_since = now
+
+    def unavailable_time(self, include_startup=False):
+        """Seconds without a usable leader (the initial election excluded by default)."""
+        windows = list(self.unavailable_windows)
+        if self.unavailable_since is not None:
+            windows.append(self.network.now - self.unavailable_since)
+        if windows and not include_startup and self.leader_history:
+            windows = windows[1:]
+        return sum(windows)
+
+    def max_term(self):
+        """Highest term reached by any node (one per election started)."""
+        return max(node.state.term for node in self.nodes.values())
+
+    def run_for(self, duration):
+        """Run the cluster for ``duration`` virtual seconds."""
+        self.start()
+        self.network.run_for(duration)
+
+    def run_until_leader(self, timeout=60):
+        """Run until a live leader exists; returns its id or None on timeout."""
+        self.start()
+        deadline = self.network.now + timeout
+        while self.network.now < deadline:
+            leader_id = self.leader()
+            if leader_id:
+                return leader_id
+            self.network.run_for(self.tick)
+        return self.leader()
+
+    def leader(self) -> Optional[str]:
+        """The live leader with the highest term, if any."""
+        leaders = [
+            (node.state.term, server_id)
+            for server_id, node in self.nodes.items()
+            if node.state.role == "leader"
+            and self.addresses[server_id] not in self.network.crashed
+        ]
+        return max(leaders)[1] if leaders else None
+
+    def crash(self, server_id):
+        """Stop a node: its timers freeze and its messages are lost."""
+        self.network.crash(self.addresses[server_id])
+
+    def recover(self, server_id):
+        """Bring a crashed node back with the state it had."""
+        self.network.recover(self.addresses[server_id])
+
+    def partition(self, server_a, server_b):
+        self.network.partition(self.addresses[server_a], self.addresses[server_b])
+
+    def isolate(self, server_id):
+        """Cut every link between a node and the rest of the cluster."""
+        for other_id in self.nodes:
+            if other_id != server_id:
+                self.partition(server_id, other_id)
+
+    def heal(self):
+        self.network.heal()
+
+    @property
+    def now(self):
+        return self.network.now
+
+    @property
+    def steps(self):
+        """Events handled so far."""
+        return self.network.steps
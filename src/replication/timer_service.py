@@ -0,0 +1,222 @@
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from typing import Callable, List, Optional, Set
+
+from .config import (
+    TIMER_TICK,
+    TIMER_WHEEL_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    """
+    Handle for a timer scheduled on a TimerService.
+
+    Keeps the ``cancel()`` interface of ``threading.Timer`` so existing
+    callers can hold either.
+    """
+
+    __slots__ = (
+        "service",
+        "callback",
+        "interval",
+        "deadline_tick",
+        "slot",
+        "active",
+        "cancelled",
+    )
+
+    def __init__(self, service, callback: Callable, interval: Optional[float] = None):
+        self.service = service
+        self.callback = callback
+        self.interval = interval  # Set for periodic timers
+        self.deadline_tick = 0
+        self.slot = None
+        self.active = False
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop the timer from firing."""
+        self.service.cancel(self)
+
+
+class TimerService:
+    """
+    Shared timers on a hashed timing wheel.
+
+    One scheduler thread advances the wheel every ``tick`` seconds and fires
+    due timers; callbacks run on a single callback thread so a slow one never
+    delays the wheel. Scheduling, resetting and cancelling a timer are O(1)
+    bucket updates instead of a new OS thread per timer.
+
+    With ``dispatch`` (e.g. the consensus actor's ``post``) callbacks are
+    handed to it instead of the callback thread.
+    """
+
+    def __init__(
+        self,
+        tick=TIMER_TICK,
+        wheel_size=TIMER_WHEEL_SIZE,
+        autostart=True,
+        dispatch: Optional[Callable] = None,
+    ):
+        self.tick = tick
+        self.wheel_size = wheel_size
+        # Start the threads on first use; tests turn this off and call advance()
+        self.autostart = autostart
+        self.dispatch = dispatch
+        self.wheel: List[Set[Timer]] = [set() for _ in range(wheel_size)]
+        self.current_tick = 0
+        self.lock = threading.Condition()
+
+        self.is_running = False
+        self.thread = None
+        self.start_time = None
+        self.executor = None
+
+    def start(self):
+        """Start the scheduler and callback threads (idempotent)."""
+        with self.lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self.start_time = time.monotonic() - self.current_tick * self.tick
+            if self.dispatch is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="timer-callback"
+                )
+            self.thread = threading.Thread(target=self._run, name="timer-wheel")
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, timeout=1):
+        """Stop the scheduler; pending timers never fire."""
+        with self.lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+            self.lock.notify_all()
+
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def schedule(self, delay: float, callback: Callable) -> Timer:
+        """Run ``callback`` once after ``delay`` seconds."""
+        timer = Timer(self, callback)
+        self.reset(timer, delay)
+        return timer
+
+    def schedule_periodic(self, interval: float, callback: Callable) -> Timer:
+        """
+        Run ``callback`` every ``interval`` seconds. The next run is scheduled
+        when the previous one finishes, so slow callbacks never overlap.
+        """
+        timer = Timer(self, callback, interval=interval)
+        self.reset(timer, interval)
+        return timer
+
+    def reset(self, timer: Timer, delay: float) -> Timer:
+        """(Re)arm a timer to fire ``delay`` seconds from now."""
+        if self.autostart:
+            self.start()
+
+        with self.lock:
+            timer.cancelled = False
+            self._arm(timer, delay)
+        return timer
+
+    def set_interval(self, timer: Timer, interval: float):
+        """Change a periodic timer's interval from its next run on."""
+        with self.lock:
+            timer.interval = interval
+
+    def cancel(self, timer: Timer):
+        """Disarm a timer."""
+        with self.lock:
+            if timer.slot is not None:
+                self.wheel[timer.slot].discard(timer)
+            timer.slot = None
+            timer.active = False
+            timer.cancelled = True
+
+    def _arm(self, timer: Timer, delay: float):
+        """Move a timer to the bucket for its new deadline (lock held)."""
+        if timer.slot is not None:
+            self.wheel[timer.slot].discard(timer)
+
+        ticks = max(1, math.ceil(delay / self.tick))
+        timer.deadline_tick = self.current_tick + ticks
+        timer.slot = timer.deadline_tick % self.wheel_size
+        timer.active = True
+        self.wheel[timer.slot].add(timer)
+
+    def pending(self) -> int:
+        """Number of armed timers."""
+        with self.lock:
+            return sum(len(bucket) for bucket in self.wheel)
+
+    def advance(self, ticks: int = 1):
+        """
+        Move the wheel forward ``ticks`` steps and fire what is due.
+
+        Called by the scheduler thread; tests call it directly to step time.
+        """
+        for _ in range(ticks):
+            with self.lock:
+                self.current_tick += 1
+                bucket = self.wheel[self.current_tick % self.wheel_size]
+                # Timers more than one revolution out stay for a later pass
+                due = [t for t in bucket if t.deadline_tick <= self.current_tick]
+                for timer in due:
+                    bucket.discard(timer)
+                    timer.slot = None
+                    timer.active = False
+
+            for timer in due:
+                self._fire(timer)
+
+    def _fire(self, timer: Timer):
+        """Run a due timer's callback off the scheduler thread."""
+        if self.dispatch is not None:
+            self.dispatch(self._run_callback, timer)
+        elif self.executor is None:
+            self._run_callback(timer)
+        else:
+            try:
+                self.executor.submit(self._run_callback, timer)
+            except RuntimeError:
+                pass  # Stopped while firing
+
+    def _run_callback(self, timer: Timer):
+        try:
+            timer.callback()
+        except Exception as e:
+            logger.error(f"Error in timer callback {timer.callback}: {str(e)}")
+        finally:
+            if timer.interval is not None:
+                with self.lock:
+                    # Periodic: re-arm unless cancelled or re-armed meanwhile
+                    if not timer.cancelled and not timer.active:
+                        self._arm(timer, timer.interval)
+
+    def _run(self):
+        """Scheduler loop: advance one tick at a time, catching up if late."""
+        while True:
+            with self.lock:
+                if not self.is_running:
+                    break
+                next_tick_at = self.start_time + (self.current_tick + 1) * self.tick
+                wait = next_tick_at - time.monotonic()
+                if wait > 0:
+                    self.lock.wait(wait)
+                    continue
+                behind = int(-wait // self.tick) + 1
+
+            self.advance(behind)
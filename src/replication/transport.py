@@ -0,0 +1,232 @@
+import heapq
+import logging
+import random
+
+import grpc
+
+import src.protocol.grpc.replication_pb2_grpc as replication_grpc
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedRpcError(grpc.RpcError):
+    """RPC failure raised by the in-memory transport, shaped like a gRPC error."""
+
+    def __init__(self, code, details=""):
+        super().__init__(details)
+        self._code = code
+        self._details = details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+    def __str__(self):
+        return f"{self._code.name}: {self._details}"
+
+
+class Transport:
+    """
+    How consensus RPCs reach peers.
+
+    ``heartbeat`` sends a HeartbeatRequest (leader heartbeats, vote requests
+    and leader announcements all use it) and ``pre_vote`` a PreVoteRequest;
+    both return immediately. When the call completes,
+    ``callback(peer_id, response, error)`` is dispatched to the consensus
+    actor, with exactly one of response/error set.
+    """
+
+    def heartbeat(self, peer_id, peer_address, request, timeout, callback=None):
+        return self.send("Heartbeat", peer_id, peer_address, request, timeout, callback)
+
+    def pre_vote(self, peer_id, peer_address, request, timeout, callback=None):
+        return self.send("PreVote", peer_id, peer_address, request, timeout, callback)
+
+    def send(self, method, peer_id, peer_address, request, timeout, callback=None):
+        raise NotImplementedError
+
+
+class GrpcTransport(Transport):
+    """Transport over the persistent per-peer gRPC channels."""
+
+    def __init__(self, peer_senders, dispatch=None):
+        self.peer_senders = peer_senders
+        # Where completions run (the actor's post); inline when None
+        self.dispatch = dispatch
+
+    def send(self, method, peer_id, peer_address, request, timeout, callback=None):
+        try:
+            channel = self.peer_senders.get_channel(peer_id, peer_address)
+            stub = replication_grpc.ReplicationServiceStub(channel)
+            future = getattr(stub, method).future(request, timeout=timeout)
+        except Exception as e:
+            if callback:
+                self._dispatch(callback, peer_id, None, e)
+            return None
+
+        if callback:
+            future.add_done_callback(
+                lambda done: self._complete(callback, peer_id, done)
+            )
+        return future
+
+    def _complete(self, callback, peer_id, future):
+        try:
+            response, error = future.result(), None
+        except Exception as e:
+            response, error = None, e
+        self._dispatch(callback, peer_id, response, error)
+
+    def _dispatch(self, fn, *args):
+        if self.dispatch:
+            self.dispatch(fn, *args)
+        else:
+            fn(*args)
+
+
+class InMemoryNetwork:
+    """
+    Deterministic in-process network with a virtual clock.
+
+    Messages between simulated replicas are events on a single heap ordered
+    by virtual delivery time, so a whole cluster runs on one thread and the
+    same seed always produces the same execution. Crashes, partitions and
+    message loss are injected here.
+    """
+
+    def __init__(self, seed=0, min_latency=0.001, max_latency=0.005, drop_rate=0.0):
+        self.random = random.Random(seed)
+        self.min_latency = min_latency
+        self.max_latency = max_latency
+        self.drop_rate = drop_rate
+
+        self.now = 0.0
+        self.events = []  # (time, seq, fn, args)
+        self.seq = 0
+        self.steps = 0
+
+        self.handlers = {}  # (address, method) -> handler(request) -> response
+        self.crashed = set()  # addresses
+        self.cut_links = set()  # frozenset({address, address})
+
+    def clock(self):
+        """Virtual time, used as the replicas' clock."""
+        return self.now
+
+    def register(self, address, handler, method="Heartbeat"):
+        """Deliver ``method`` calls for ``address`` to ``handler``."""
+        self.handlers[(address, method)] = handler
+
+    def transport(self, address):
+        """Transport for the replica listening on ``address``."""
+        return InMemoryTransport(self, address)
+
+    def schedule(self, delay, fn, *args):
+        """Run ``fn(*args)`` after ``delay`` virtual seconds."""
+        self.seq += 1
+        heapq.heappush(self.events, (self.now + delay, self.seq, fn, args))
+
+    def step(self):
+        """Handle the next event. Returns False when nothing is left."""
+        if not self.events:
+            return False
+        self.now, _, fn, args = heapq.heappop(self.events)
+        self.steps += 1
+        fn(*args)
+        return True
+
+    def run_until(self, deadline):
+        """Handle every event due up to ``deadline``."""
+        while self.events and self.events[0][0] <= deadline:
+            self.step()
+        self.now = max(self.now, deadline)
+
+    def run_for(self, duration):
+        self.run_until(self.now + duration)
+
+    def latency(self):
+        return self.random.uniform(self.min_latency, self.max_latency)
+
+    def crash(self, address):
+        self.crashed.add(address)
+
+    def recover(self, address):
+        self.crashed.discard(address)
+
+    def partition(self, address_a, address_b):
+        """Cut the link between two replicas in both directions."""
+        self.cut_links.add(frozenset((address_a, address_b)))
+
+    def heal(self):
+        """Restore every cut link."""
+        self.cut_links.clear()
+
+    def can_reach(self, source, destination):
+        """Whether a message from source to destination gets through."""
+        if source in self.crashed or destination in self.crashed:
+            return False
+        if frozenset((source, destination)) in self.cut_links:
+            return False
+        return self.drop_rate == 0 or self.random.random() >= self.drop_rate
+
+
+class InMemoryTransport(Transport):
+    """Transport for one replica on an InMemoryNetwork."""
+
+    def __init__(self, network, address):
+        self.network = network
+        self.address = address
+
+    def send(self, method, peer_id, peer_address, request, timeout, callback=None):
+        network = self.network
+        outbound = network.latency()
+
+        if peer_address in network.crashed and self.address not in network.crashed:
+            # Connection refused comes back quickly
+            error = SimulatedRpcError(grpc.StatusCode.UNAVAILABLE, "connection refused")
+            self._fail(min(outbound, timeout), peer_id, callback, error)
+        elif outbound >= timeout or not network.can_reach(self.address, peer_address):
+            self._fail(timeout, peer_id, callback, self._deadline_error())
+        else:
+            network.schedule(
+                outbound,
+                self._deliver,
+                method,
+                peer_id,
+                peer_address,
+                request,
+                timeout - outbound,
+                callback,
+            )
+        return None
+
+    def _deliver(self, method, peer_id, peer_address, request, remaining, callback):
+        network = self.network
+        handler = network.handlers.get((peer_address, method))
+        if handler is None or peer_address in network.crashed:
+            self._fail(remaining, peer_id, callback, self._deadline_error())
+            return
+
+        response = handler(request)
+        if not callback:
+            return
+
+        inbound = network.latency()
+        if inbound >= remaining or not network.can_reach(peer_address, self.address):
+            self._fail(remaining, peer_id, callback, self._deadline_error())
+        else:
+            network.schedule(inbound, self._respond, peer_id, response, None, callback)
+
+    def _fail(self, delay, peer_id, callback, error):
+        if callback:
+            self.network.schedule(delay, self._respond, peer_id, None, error, callback)
+
+    def _respond(self, peer_id, response, error, callback):
+        # A crashed replica doesn't process completions
+        if self.address not in self.network.crashed:
+            callback(peer_id, response, error)
+
+    def _deadline_error(self):
+        return SimulatedRpcError(grpc.StatusCode.DEADLINE_EXCEEDED, "deadline exceeded")
@@ -5,16 +5,31 @@ from concurrent import futures
 from protocol.grpc import chat_pb2_grpc
 from protocol.grpc import replication_pb2_grpc
 from protocol.config_manager import ConfigManager
+from src.services.archiver import MessageArchiver
 from src.services.chatservicer import ChatServicer
+from src.services.purger import UserPurger
 from src.services.replication_servicer import ReplicationServicer
+from src.replication.config import STORAGE_ENGINE
+from src.replication.anti_entropy import AntiEntropy
+from src.replication.metrics import MetricsServer
 from src.replication.replica_node import ReplicaNode
+from src.replication.sharding import ShardMap
 
 
 logger = logging.getLogger(__name__)
 
 
 class GRPCServer:
-    def __init__(self, server_id: str = "", port: int = -1, peers: list = None):
+    def __init__(
+        self,
+        server_id: str = "",
+        port: int = -1,
+        peers: list = None,
+        shard_map: ShardMap = None,
+        group_id: str = "",
+        metrics_port: int = 0,
+        storage_engine: str = STORAGE_ENGINE,
+    ):
         """
         Initialize the gRPC server with the provided server ID, port, and list of peers.
 
@@ -22,9 +37,19 @@ class GRPCServer:
         we make these parameters optional to allow for a standalone gRPC server
         (without fault tolerance) and to avoid breaking existing tests.
 
+        To shard users and chats over several replica groups, also provide the
+        shard map and the id of the group this server (and its peers) form.
+
+        With a metrics port, replication statistics are also served as text
+        at ``http://<host>:<metrics_port>/metrics``.
+
+        The storage engine keeps this replica's users and messages in its
+        SQLite database file ("sqlite") or in memory ("memory").
         """
         self.server_id = server_id if server_id else "grpc-server"
         self.peers = peers if peers else []
+        self.shard_map = shard_map
+        self.group_id = group_id
 
         # Initialize the configuration manager that reads from config file
         self.config_manager = ConfigManager()
@@ -37,9 +62,23 @@ class GRPCServer:
 
         # Initialize this replica Node
         self.replica = ReplicaNode(self.server_id, self.address, self.peers)
-        self.chat_servicer = ChatServicer(self.replica)
+        self.chat_servicer = ChatServicer(self.replica, self.shard_map, storage_engine)
+        # Deleted accounts' messages are removed in the background
+        self.purger = UserPurger(self.chat_servicer.api.db_manager)
+        # and cold messages moved to the archive
+        self.archiver = MessageArchiver(self.chat_servicer.api.db_manager)
         self.replication_servicer = ReplicationServicer(
-            self.replica, self.chat_servicer
+            self.replica, self.chat_servicer, self.shard_map, self.group_id, self.purger,
+            self.archiver,
+        )
+
+        # Followers periodically repair divergence from the leader
+        self.anti_entropy = AntiEntropy(self.replica, self.replication_servicer.digest)
+
+        self.metrics_server = (
+            MetricsServer(self.replication_servicer.collect_stats, metrics_port)
+            if metrics_port > 0
+            else None
         )
 
         # Create gRPC server
@@ -60,6 +99,11 @@ class GRPCServer:
 
             # Start background tasks for the replica node
             self.replica.start()
+            self.anti_entropy.start()
+            self.purger.start()
+            self.archiver.start()
+            if self.metrics_server:
+                self.metrics_server.start()
 
             self.server.wait_for_termination()
         except Exception as e:
@@ -68,5 +112,10 @@ class GRPCServer:
 
     def shutdown(self):
         """Shutdown the server and cleanup resources."""
+        self.anti_entropy.stop()
+        self.purger.stop()
+        self.archiver.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
         self.server.stop(0)
         logger.info("Server %s shutdown", self.server_id)
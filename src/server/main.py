@@ -16,6 +16,8 @@ sys.path.insert(0, parent_dir)
 
 from src.server.tcp_server import TCPServer
 from src.server.grpc_server import GRPCServer
+from src.replication.sharding import ShardMap
+from src.replication.config import STORAGE_ENGINE
 
 
 # Configure logging
@@ -46,18 +48,54 @@ def main():
         "--peers", type=str, help="Comma-separated list of peer addresses (host:port)"
     )
 
+    # for sharding users and chats over several replica groups
+    parser.add_argument(
+        "--shards",
+        type=str,
+        help="Replica groups as 'g1=host:port,host:port;g2=host:port,...'",
+    )
+    parser.add_argument(
+        "--group", type=str, help="Replica group this server belongs to (with --shards)"
+    )
+
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=0,
+        help="Serve replication metrics as text on this port (at /metrics)",
+    )
+
+    parser.add_argument(
+        "--storage",
+        choices=["sqlite", "sharded", "memory"],
+        default=STORAGE_ENGINE,
+        help="Storage engine: sqlite (default), sharded (messages split across DATABASE_SHARDS files) or memory (lost on restart)",
+    )
+
     args = parser.parse_args()
 
     peers_list = None
     if args.peers:
         peers_list = args.peers.split(",")
 
+    shard_map = ShardMap.parse(args.shards) if args.shards else None
+    if shard_map and args.group not in shard_map.groups:
+        parser.error("--group must name one of the groups in --shards")
+
     if args.mode == "grpc" and args.port and args.server_id:
         logger.info("Starting gRPC server in fault-tolerant mode...")
-        server = GRPCServer(args.server_id, args.port, peers_list)
+        server = GRPCServer(
+            args.server_id,
+            args.port,
+            peers_list,
+            shard_map,
+            args.group or "",
+            args.metrics_port,
+            args.storage,
+        )
     elif args.mode == "grpc":  # standalone grpc server (legacy/first version)
         logger.info("Starting standalone gRPC server...")
-        server = GRPCServer()
+        server = GRPCServer(storage_engine=args.storage)
     else:
         server = TCPServer()
 
@@ -4,9 +4,11 @@ import os
 
 from protocol.config_manager import ConfigManager
 from protocol.protocol_factory import ProtocolFactory
+from src.services.archiver import MessageArchiver
+from src.services.purger import UserPurger
 
 from src.services.api import (
-    signup, login, delete_user, get_chats, get_all_users, update_view_limit,
+    db_manager, signup, login, delete_user, get_chats, get_all_users, update_view_limit,
     save_settings, start_chat, get_user_message_limit, delete_chats, delete_messages, get_messages, send_chat_message, get_users_to_display
 )
 
@@ -32,6 +34,11 @@ class TCPServer:
         self.active_clients = {}
         self.clients_lock = threading.Lock()
 
+        # Deleted accounts' messages are removed in the background
+        self.purger = UserPurger(db_manager)
+        # and cold messages moved to the archive
+        self.archiver = MessageArchiver(db_manager)
+
     def start(self):
         """Start the server and listen for connections"""
         try:
@@ -40,6 +47,8 @@ class TCPServer:
             print(f"Server started on {self.config.host}:{self.config.port}")
             print(f"Using protocol: {self.config.protocol}")
             print(f"Maximum clients supported: {self.config.max_clients}")
+            self.purger.start()
+            self.archiver.start()
 
             while True:
                 client_socket, address = self.server_socket.accept()
@@ -128,10 +137,10 @@ class TCPServer:
                 "start_chat": lambda: start_chat(request.get("current_user"), request.get("other_user")),
                 "get_user_message_limit": lambda: get_user_message_limit(request.get("username")),
                 "delete_chats": lambda: delete_chats(request.get("chat_ids")),
-                "delete_messages": lambda: delete_messages(request.get("chat_id"), request.get("message_indices"), request.get("current_user")),
+                "delete_messages": lambda: delete_messages(request.get("chat_id"), request.get("message_indices"), request.get("current_user"), request.get("message_seqs")),
                 "get_messages": lambda: get_messages(request),
                 "send_chat_message": lambda: send_chat_message(request.get("chat_id"), request.get("sender"), request.get("content")),
-                "get_users_to_display": lambda: get_users_to_display(request.get("current_user"), request.get("search_pattern"), request.get("current_page"), request.get("users_per_page")),
+                "get_users_to_display": lambda: get_users_to_display(request.get("current_user"), request.get("search_pattern"), request.get("current_page"), request.get("users_per_page"), request.get("after", "")),
             }
 
             handler = actions.get(action, lambda: {"success": False, "error_message": "Invalid action"})
@@ -139,5 +148,7 @@ class TCPServer:
 
     def shutdown(self):
         """Stop the server"""
+        self.purger.stop()
+        self.archiver.stop()
         self.server_socket.close()
         print("Server stopped")
\ No newline at end of file
@@ -1,7 +1,8 @@
-from src.services.db_manager import DBManager
+from src.replication.config import STORAGE_ENGINE
+from src.services.db_manager import DATABASE_FILE
+from src.services.storage_factory import StorageFactory
 
-db_manager = DBManager()
-db_manager.initialize_database()
+db_manager = StorageFactory.get_engine(STORAGE_ENGINE, DATABASE_FILE)
 
 def signup(input_data):
     """Sign up a new user. assume password encrypted"""
@@ -47,22 +48,28 @@ def delete_chats(chat_ids):
     """Delete chats."""
     return db_manager.delete_chats(chat_ids)
 
-def delete_messages(chat_id, message_indices, current_user):
-    """Delete messages."""
-    return db_manager.delete_messages(chat_id, message_indices, current_user)
+def delete_messages(chat_id, message_indices, current_user, message_seqs=None):
+    """Delete messages, by sequence number if given, else by position."""
+    return db_manager.delete_messages(chat_id, message_indices, current_user, message_seqs)
 
 def get_messages(payload):
     """Get messages for a chat."""
     if "chat_id" not in payload or "current_user" not in payload:
         print(f"DEBUG: Get messages in api.py: payload {payload} is invalid")
         return {"messages": [], "error_message": "Invalid payload."}
-    return db_manager.get_messages(payload["chat_id"], payload["current_user"])
+    return db_manager.get_messages(
+        payload["chat_id"],
+        payload["current_user"],
+        payload.get("after_seq", 0),
+        payload.get("before_seq", 0),
+        payload.get("limit", 0),
+    )
 
 
 def send_chat_message(chat_id, sender, content):
     """Send a message in a chat."""
     return db_manager.send_chat_message(chat_id, sender, content)
 
-def get_users_to_display(exclude_username, search_pattern, current_page, users_per_page):
+def get_users_to_display(exclude_username, search_pattern, current_page, users_per_page, after=""):
     """Get users to display."""
-    return db_manager.get_users_to_display(exclude_username, search_pattern, current_page, users_per_page)
+    return db_manager.get_users_to_display(exclude_username, search_pattern, current_page, users_per_page, after)
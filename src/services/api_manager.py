@@ -1,10 +1,10 @@
-from src.services.db_manager import DBManager
+from src.replication.config import STORAGE_ENGINE
+from src.services.storage_factory import StorageFactory
 
 
 class APIManager:
-    def __init__(self, db_file="database.db"):
-        self.db_manager = DBManager(db_file)
-        self.db_manager.initialize_database()
+    def __init__(self, db_file="database.db", local_users=True, engine=STORAGE_ENGINE):
+        self.db_manager = StorageFactory.get_engine(engine, db_file, local_users)
 
     def signup(self, input_data):
         """Sign up a new user. assume password encrypted"""
@@ -46,25 +46,43 @@ class APIManager:
         """Start a new chat between two users."""
         return self.db_manager.start_chat(current_user, other_user)
 
-    def delete_messages(self, chat_id, message_indices, current_user):
-        """Delete messages."""
-        return self.db_manager.delete_messages(chat_id, message_indices, current_user)
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        """Delete messages, by sequence number if given, else by position."""
+        return self.db_manager.delete_messages(chat_id, message_indices, current_user, message_seqs)
 
     def get_messages(self, payload):
         """Get messages for a chat."""
         if "chat_id" not in payload or "current_user" not in payload:
             print(f"DEBUG: Get messages in api.py: payload {payload} is invalid")
             return {"messages": [], "error_message": "Invalid payload."}
-        return self.db_manager.get_messages(payload["chat_id"], payload["current_user"])
+        return self.db_manager.get_messages(
+            payload["chat_id"],
+            payload["current_user"],
+            payload.get("after_seq", 0),
+            payload.get("before_seq", 0),
+            payload.get("limit", 0),
+        )
 
-    def send_chat_message(self, chat_id, sender, content):
+    def send_chat_message(self, chat_id, sender, content, timestamp=None, seq=None):
         """Send a message in a chat."""
-        return self.db_manager.send_chat_message(chat_id, sender, content)
+        return self.db_manager.send_chat_message(chat_id, sender, content, timestamp, seq)
+
+    def message_seqs(self, chat_id, message_indices, current_user):
+        """Sequence numbers of the messages at the given positions of a chat."""
+        return self.db_manager.message_seqs(chat_id, message_indices, current_user)
+
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        """Full-text search of a user's messages."""
+        return self.db_manager.search_messages(current_user, query, chat_id, page, page_size)
+
+    def next_message_seq(self, chat_id, sender):
+        """Reserve the sequence number of the next message of a chat."""
+        return self.db_manager.next_message_seq(chat_id, sender)
 
     def get_users_to_display(
-        self, exclude_username, search_pattern, current_page, users_per_page
+        self, exclude_username, search_pattern, current_page, users_per_page, after=""
     ):
         """Get users to display."""
         return self.db_manager.get_users_to_display(
-            exclude_username, search_pattern, current_page, users_per_page
+            exclude_username, search_pattern, current_page, users_per_page, after
         )
@@ -0,0 +1,92 @@
+"""
+Background archival of cold messages.
+"""
+
+import logging
+import threading
+
+from src.replication.config import (
+    ARCHIVE_BATCH_PAUSE,
+    ARCHIVE_BLOCK_SIZE,
+    ARCHIVE_IDLE_INTERVAL,
+    ARCHIVE_KEEP_MESSAGES,
+    ARCHIVE_MAX_AGE,
+)
+from src.services.db_manager import now_micros
+
+logger = logging.getLogger(__name__)
+
+
+class MessageArchiver:
+    """
+    Moves cold messages out of the hot ``messages`` table, a block at a time.
+
+    A message is cold once it is read and either more than ``keep``
+    messages behind the end of its chat or older than ``max_age`` seconds.
+    Each block is its own short transaction and the archiver pauses between
+    blocks, like the UserPurger. Every replica archives its own database:
+    digests cover hot and archived messages alike, so replicas that have
+    archived different amounts still agree.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        keep=ARCHIVE_KEEP_MESSAGES,
+        max_age=ARCHIVE_MAX_AGE,
+        block_size=ARCHIVE_BLOCK_SIZE,
+        pause=ARCHIVE_BATCH_PAUSE,
+        idle_interval=ARCHIVE_IDLE_INTERVAL,
+    ):
+        self.db_manager = db_manager
+        self.keep = keep
+        self.max_age = max_age
+        self.block_size = block_size
+        self.pause = pause
+        self.idle_interval = idle_interval
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Metrics
+        self.messages_archived = 0
+        self.blocks = 0
+
+    def start(self):
+        """Archive in the background until stop()."""
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="message-archiver")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.wait(self.idle_interval):
+            try:
+                self.run_round()
+            except Exception as e:
+                logger.warning(f"Archiving messages failed: {str(e)}")
+
+    def run_round(self):
+        """Archive every cold block there is now; returns how many."""
+        older_than = now_micros() - self.max_age * 1_000_000
+        blocks = 0
+        for chat in self.db_manager.archive_candidates(self.keep, older_than, self.block_size):
+            while not self.stop_event.is_set():
+                archived = self.db_manager.archive_chat(chat, self.keep, older_than, self.block_size)
+                if not archived:
+                    break
+                blocks += 1
+                self.blocks += 1
+                self.messages_archived += archived
+                self.stop_event.wait(self.pause)
+        return blocks
+
+    def stats(self):
+        return {
+            "archive_messages": self.messages_archived,
+            "archive_blocks": self.blocks,
+        }
@@ -1,8 +1,10 @@
 import grpc
 import logging
 from src.protocol.grpc import chat_pb2, chat_pb2_grpc
+from src.replication.config import STORAGE_ENGINE
 from src.services.api_manager import APIManager
-from .replication_decorator import replicate_to_followers
+from src.services.db_manager import format_micros, now_micros
+from .replication_decorator import replicate_to_followers, linearizable_read
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +12,7 @@ logger = logging.getLogger(__name__)
 class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
     """Implementation of the ChatService service."""
 
-    def __init__(self, replica=None):
+    def __init__(self, replica=None, shard_map=None, storage_engine=STORAGE_ENGINE):
         """
         Initialize the ChatServicer instance.
 
@@ -18,12 +20,18 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             replica (ReplicaNode): The replica node instance.
                     When running in standalone mode (no replication),
                     this parameter is None.
+            shard_map (ShardMap): Routing table when users and chats are
+                    spread over several replica groups; None otherwise.
+            storage_engine (str): Storage engine of this replica
+                    ("sqlite" or "memory").
         """
         self.replica = replica
         db_name = f"database_{replica.state.server_id}.db" if replica else "database.db"
 
         print(f"Using database: {db_name}")
-        self.api = APIManager(db_file=db_name)
+        # With several groups, a chat's participants may live in other groups
+        local_users = shard_map is None or len(shard_map) == 1
+        self.api = APIManager(db_file=db_name, local_users=local_users, engine=storage_engine)
 
     # ---------------------------- User Management ----------------------------#
     @replicate_to_followers("Signup")
@@ -45,6 +53,7 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             success=True, error_message=result.get("error_message", "")
         )
 
+    @linearizable_read("Login")
     def Login(self, request, context):
         result = self.api.login(
             {"username": request.username, "password": request.password}
@@ -73,6 +82,7 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             error_message=result.get("error_message", ""),
         )
 
+    @linearizable_read("GetUserMessageLimit")
     def GetUserMessageLimit(self, request, context):
         # This is a read operation, so we don't need to forward to leader
         result = self.api.get_user_message_limit(request.username)
@@ -93,6 +103,7 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             error_message=result.get("error_message", ""),
         )
 
+    @linearizable_read("GetUsersToDisplay")
     def GetUsersToDisplay(self, request, context):
         # This is a read operation, so we don't need to forward to leader
         result = self.api.get_users_to_display(
@@ -100,15 +111,19 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             request.search_pattern,
             request.current_page,
             request.users_per_page,
+            request.after,
         )
 
         return chat_pb2.UsersDisplayResponse(
             usernames=result.get("users", []),
+            next_cursor=result.get("next_cursor", ""),
             total_pages=result.get("total_pages", 0),
+            total_users=result.get("total_users", 0),
             error_message=result.get("error_message", ""),
         )
 
     # ---------------------------- Chat Management ----------------------------#
+    @linearizable_read("GetChats")
     def GetChats(self, request, context):
         # This is a read operation, so we don't need to forward to leader
         result = self.api.get_chats(request.user_id)
@@ -120,6 +135,7 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
                     chat_id=chat["chat_id"],
                     other_user=chat["other_user"],
                     unread_count=chat["unread_count"],
+                    last_message_time=chat.get("last_message_time", 0),
                 )
             )
 
@@ -142,10 +158,17 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             ),
         )
 
+    @linearizable_read("GetMessages")
     def GetMessages(self, request, context):
         # This is a read operation, so we don't need to forward to leader
         result = self.api.get_messages(
-            {"chat_id": request.chat_id, "current_user": request.current_user}
+            {
+                "chat_id": request.chat_id,
+                "current_user": request.current_user,
+                "after_seq": request.after_seq,
+                "before_seq": request.before_seq,
+                "limit": request.limit,
+            }
         )
         messages = []
         for msg in result.get("messages", []):
@@ -153,17 +176,54 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
                 chat_pb2.Message(
                     sender=msg["sender"],
                     content=msg["content"],
-                    timestamp=msg["timestamp"],
+                    timestamp=format_micros(msg["timestamp"]),
+                    seq=msg.get("seq", 0),
                 )
             )
         return chat_pb2.MessagesResponse(
             messages=messages, error_message=result.get("error_message", "")
         )
 
-    @replicate_to_followers("SendChatMessage")
+    @linearizable_read("SearchMessages")
+    def SearchMessages(self, request, context):
+        result = self.api.search_messages(
+            request.current_user,
+            request.query,
+            request.chat_id,
+            request.page,
+            request.page_size,
+        )
+        matches = [
+            chat_pb2.MessageMatch(
+                chat_id=match["chat_id"],
+                message=chat_pb2.Message(
+                    id=match["id"],
+                    sender=match["sender"],
+                    content=match["content"],
+                    timestamp=format_micros(match["timestamp"]),
+                    seq=match["seq"],
+                ),
+                snippet=match["snippet"],
+                rank=match["rank"],
+            )
+            for match in result.get("matches", [])
+        ]
+        return chat_pb2.SearchMessagesResponse(
+            matches=matches,
+            has_more=result.get("has_more", False),
+            error_message=result.get("error_message", ""),
+        )
+
+    def _stamp_message(self, request):
+        """Fix a message's time and place in its chat before it is replicated."""
+        request.timestamp = now_micros()
+        request.seq = self.api.next_message_seq(request.chat_id, request.sender)
+
+    @replicate_to_followers("SendChatMessage", prepare=_stamp_message)
     def SendChatMessage(self, request, context):
         result = self.api.send_chat_message(
-            request.chat_id, request.sender, request.content
+            request.chat_id, request.sender, request.content,
+            request.timestamp, request.seq
         )
         if not result["success"]:
             return chat_pb2.MessageResponse(
@@ -175,10 +235,23 @@ class ChatServicer(chat_pb2_grpc.ChatServiceServicer):
             error_message=result.get("error_message", ""),
         )
 
-    @replicate_to_followers("DeleteMessages")
+    def _pin_deleted_messages(self, request):
+        """Name the messages by sequence number, so every replica deletes the same ones."""
+        if request.message_indices and not request.message_seqs:
+            request.message_seqs.extend(
+                self.api.message_seqs(
+                    request.chat_id, list(request.message_indices), request.current_user
+                )
+            )
+            del request.message_indices[:]
+
+    @replicate_to_followers("DeleteMessages", prepare=_pin_deleted_messages)
     def DeleteMessages(self, request, context):
         result = self.api.delete_messages(
-            request.chat_id, list(request.message_indices), request.current_user
+            request.chat_id,
+            list(request.message_indices),
+            request.current_user,
+            list(request.message_seqs),
         )
         return chat_pb2.StatusResponse(
             success=True if not result.get("error_message") else False,
@@ -1,21 +1,166 @@
+import json
 import sqlite3
+import threading
+import time
+import zlib
 from datetime import datetime
 
+from src.protocol.cursor import decode_cursor, encode_cursor
+from src.services.storage import StorageEngine
+
 DATABASE_FILE = "chat_app.db"
 
-class DBManager:
-    def __init__(self, db_file=DATABASE_FILE):
+# PRAGMA user_version of a database with the current schema
+SCHEMA_VERSION = 7
+
+# Shortest search pattern the users_fts trigram index can look up. Shorter
+# ones are matched by scanning the users table.
+MIN_TRIGRAM_PATTERN = 3
+
+# Messages of one chat, given its pair of user ids (low, high). Matches the
+# messages_chat index, so a chat is one range of it, ordered by seq.
+CHAT_MESSAGES = "min(sender_id, receiver_id) = ? AND max(sender_id, receiver_id) = ?"
+
+# Highest seq of a chat, hot or archived; takes the chat's pair of ids twice
+CHAT_LAST_SEQ = f"""max(
+    COALESCE((SELECT MAX(seq) FROM messages WHERE {CHAT_MESSAGES}), 0),
+    COALESCE((SELECT MAX(last_seq) FROM message_archive WHERE chat_low = ? AND chat_high = ?), 0)
+)"""
+
+# Columns of the message rows stored in an archive block
+ARCHIVED_COLUMNS = "id, sender_id, receiver_id, content, timestamp, seq, read"
+
+
+def now_micros():
+    """Current time in microseconds since the epoch, as stored in messages."""
+    return time.time_ns() // 1000
+
+
+def epoch_micros(timestamp):
+    """Microseconds since the epoch of an ISO 8601 timestamp (0 if unparsable)."""
+    if not isinstance(timestamp, str):
+        return timestamp
+    try:
+        return round(datetime.fromisoformat(timestamp).timestamp() * 1_000_000)
+    except ValueError:
+        return 0
+
+
+def fts_query(text):
+    """FTS5 query matching messages that contain every word of ``text``."""
+    words = text.split()
+    return " AND ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def like_pattern(text):
+    """LIKE pattern (with ESCAPE '\\') matching ``text`` anywhere in a value."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def format_micros(timestamp):
+    """ISO 8601 form of a message timestamp, for clients."""
+    if not isinstance(timestamp, int):
+        return timestamp
+    return datetime.fromtimestamp(timestamp / 1_000_000).isoformat()
+
+
+def pack_messages(rows):
+    """Archive block holding message rows (ARCHIVED_COLUMNS)."""
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_messages(block):
+    """Message rows of an archive block."""
+    return json.loads(zlib.decompress(block))
+
+
+def connect(db_file, **kwargs):
+    """Connection to a chat database, with the SQL functions its views use."""
+    conn = sqlite3.connect(db_file, **kwargs)
+    conn.create_function(
+        "unarchive", 1, lambda block: zlib.decompress(block).decode("utf-8"), deterministic=True
+    )
+    return conn
+
+
+def chat_participants(chat_id, user):
+    """
+    The two usernames in ``chat_id`` (``"<user>_<user>"``), split around
+    ``user`` so usernames containing ``_`` still resolve: ``user`` first,
+    then the other participant, or None when ``user`` is not one.
+    """
+    if isinstance(chat_id, list):
+        chat_id = chat_id[0]
+    if user and chat_id.startswith(f"{user}_"):
+        return user, chat_id[len(user) + 1:]
+    if user and chat_id.endswith(f"_{user}"):
+        return user, chat_id[: -len(user) - 1]
+    return user, None
+
+
+def not_in_chat(chat_id, user):
+    """Error of a request naming a chat ``user`` does not take part in."""
+    return f"User '{user}' is not part of chat '{chat_id}'."
+
+
+class _ApplyConnection:
+    """
+    The connection of a replicated apply in progress. DBManager methods run
+    inside it share its transaction, and their commits are deferred to the
+    end of the apply.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def commit(self):
+        pass
+
+
+class DBManager(StorageEngine):
+    def __init__(self, db_file=DATABASE_FILE, local_users=True):
         self.db_file = db_file
+        # False when user records are sharded away from the chats that
+        # mention them: recipient checks then rely on deletion tombstones
+        self.local_users = local_users
+        # Per-thread transaction of the replicated apply under way, if any
+        self._apply = threading.local()
+        # Interned user ids (user_ids table), both ways. Ids are never
+        # reassigned, so entries only go stale when a write is rolled back.
+        self._user_ids = {}
+        self._usernames = {}
+        # Sequence numbers handed out by next_message_seq, per chat, for
+        # messages that may not be inserted yet
+        self._reserved_seqs = {}
+        self._seq_lock = threading.Lock()
 
     def _get_connection(self):
-        
-        return sqlite3.connect(self.db_file)
+        conn = getattr(self._apply, "conn", None)
+        if conn is not None:
+            return _ApplyConnection(conn)
+        return connect(self.db_file)
 
     def initialize_database(self, conn = None):
         """Initialize the database and create necessary tables."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'")
+            # Databases created before user_version was set are version 0
+            migrate = cursor.fetchone() is not None and version < SCHEMA_VERSION
+
             # Users table
             cursor.execute(
                 """
@@ -28,6 +173,38 @@ class DBManager:
                 """
             )
 
+            # Trigram index of usernames and nicknames, for substring search
+            cursor.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+                    username, nickname,
+                    content='users', content_rowid='id', tokenize='trigram'
+                )
+                """
+            )
+            # New rows are indexed by users_intern, once they have their id
+            cursor.execute("DROP TRIGGER IF EXISTS users_fts_insert")
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users
+                BEGIN
+                    INSERT INTO users_fts (users_fts, rowid, username, nickname)
+                    VALUES ('delete', OLD.id, OLD.username, OLD.nickname);
+                END
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF username, nickname ON users
+                BEGIN
+                    INSERT INTO users_fts (users_fts, rowid, username, nickname)
+                    VALUES ('delete', OLD.id, OLD.username, OLD.nickname);
+                    INSERT INTO users_fts (rowid, username, nickname)
+                    VALUES (NEW.id, NEW.username, NEW.nickname);
+                END
+                """
+            )
+
             # UserConfig table
             cursor.execute(
                 """
@@ -39,7 +216,48 @@ class DBManager:
                 """
             )
 
-            # Messages table
+            # Interned usernames. An id outlives its account, so messages of a
+            # deleted user keep their sender, and chats can name users whose
+            # records live in another shard group.
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_ids (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT UNIQUE NOT NULL
+                )
+                """
+            )
+
+            # An account's id is its interned id, however the row was inserted.
+            # It is indexed for search under that id, not the one it was
+            # inserted with.
+            if migrate and version < 6:
+                cursor.execute("DROP TRIGGER IF EXISTS users_intern")
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS users_intern AFTER INSERT ON users
+                BEGIN
+                    INSERT OR IGNORE INTO user_ids (username) VALUES (NEW.username);
+                    UPDATE users SET id = (SELECT id FROM user_ids WHERE username = NEW.username)
+                    WHERE id = NEW.id;
+                    INSERT INTO users_fts (rowid, username, nickname)
+                    SELECT id, username, nickname FROM users WHERE username = NEW.username;
+                END
+                """
+            )
+            # Indexes built before then may hold rows under the inserted ids
+            if migrate and version < 6:
+                cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+            if migrate:
+                # Recreated below over the migrated table
+                cursor.execute("DROP VIEW IF EXISTS message_rows")
+                if version < 1:
+                    self._intern_message_users(cursor)
+                if version < 2:
+                    self._sequence_messages(cursor)
+
+            # Messages table. ``seq`` numbers the messages of a chat from 1
             cursor.execute(
                 """
                 CREATE TABLE IF NOT EXISTS messages (
@@ -47,15 +265,546 @@ class DBManager:
                     sender_id INTEGER NOT NULL,
                     receiver_id INTEGER NOT NULL,
                     content TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,  -- microseconds since the epoch
+                    seq INTEGER,
                     read INTEGER DEFAULT 0,
-                    FOREIGN KEY (sender_id) REFERENCES users(id),
-                    FOREIGN KEY (receiver_id) REFERENCES users(id)
+                    FOREIGN KEY (sender_id) REFERENCES user_ids(id),
+                    FOREIGN KEY (receiver_id) REFERENCES user_ids(id)
+                )
+                """
+            )
+
+            # A chat's messages in order: the pair of user ids, then seq
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS messages_chat ON messages (
+                    min(sender_id, receiver_id), max(sender_id, receiver_id), seq
+                )
+                """
+            )
+            # A user's chats and unread messages, one index per direction
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender_id, receiver_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS messages_receiver ON messages (receiver_id, sender_id)"
+            )
+
+            # Cold messages, moved out of ``messages`` by archive_chat: blocks
+            # of consecutive messages of one chat, compressed (pack_messages)
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS message_archive (
+                    id INTEGER PRIMARY KEY,
+                    chat_low INTEGER NOT NULL,
+                    chat_high INTEGER NOT NULL,
+                    first_seq INTEGER NOT NULL,
+                    last_seq INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    last_timestamp INTEGER NOT NULL,
+                    messages BLOB NOT NULL
+                )
+                """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS message_archive_chat
+                ON message_archive (chat_low, chat_high, last_seq)
+                """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS message_archive_high ON message_archive (chat_high, chat_low)"
+            )
+
+            # Block of each archived message, so the search index can read
+            # an archived message back without decompressing every block
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS archived_messages (
+                    id INTEGER PRIMARY KEY,
+                    block_id INTEGER NOT NULL
+                )
+                """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS archived_messages_block ON archived_messages (block_id)"
+            )
+            # Hot and archived messages by id, as the search index reads them
+            cursor.execute(
+                """
+                CREATE VIEW IF NOT EXISTS message_text AS
+                SELECT id, sender_id, receiver_id, content, timestamp, seq FROM messages
+                UNION ALL
+                SELECT x.id,
+                       json_extract(j.value, '$[1]'), json_extract(j.value, '$[2]'),
+                       json_extract(j.value, '$[3]'), json_extract(j.value, '$[4]'),
+                       json_extract(j.value, '$[5]')
+                FROM archived_messages x
+                JOIN message_archive a ON a.id = x.block_id,
+                     json_each(unarchive(a.messages)) j
+                WHERE json_extract(j.value, '$[0]') = x.id
+                """
+            )
+
+            # Full-text index of message contents, archived ones included.
+            # The participants are indexed too, so a user's matches are found
+            # inside the index.
+            if migrate and version < 7:
+                cursor.execute("DROP TABLE IF EXISTS messages_fts")
+            cursor.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    content, sender_id, receiver_id, timestamp UNINDEXED, seq UNINDEXED,
+                    content='message_text', content_rowid='id'
+                )
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+                BEGIN
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    VALUES (NEW.id, NEW.content, NEW.sender_id, NEW.receiver_id);
+                END
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages
+                BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content, sender_id, receiver_id)
+                    VALUES ('delete', OLD.id, OLD.content, OLD.sender_id, OLD.receiver_id);
+                END
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS messages_fts_update
+                AFTER UPDATE OF content, sender_id, receiver_id ON messages
+                BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content, sender_id, receiver_id)
+                    VALUES ('delete', OLD.id, OLD.content, OLD.sender_id, OLD.receiver_id);
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    VALUES (NEW.id, NEW.content, NEW.sender_id, NEW.receiver_id);
+                END
+                """
+            )
+
+            # Archive blocks stay indexed: their messages leave ``messages``
+            # (and the index) before the block holding them is written
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_archive_index AFTER INSERT ON message_archive
+                BEGIN
+                    INSERT INTO archived_messages (id, block_id)
+                    SELECT json_extract(value, '$[0]'), NEW.id FROM json_each(unarchive(NEW.messages));
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    SELECT json_extract(value, '$[0]'), json_extract(value, '$[3]'),
+                           json_extract(value, '$[1]'), json_extract(value, '$[2]')
+                    FROM json_each(unarchive(NEW.messages));
+                END
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_archive_unindex AFTER DELETE ON message_archive
+                BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content, sender_id, receiver_id)
+                    SELECT 'delete', json_extract(value, '$[0]'), json_extract(value, '$[3]'),
+                           json_extract(value, '$[1]'), json_extract(value, '$[2]')
+                    FROM json_each(unarchive(OLD.messages));
+                    DELETE FROM archived_messages WHERE block_id = OLD.id;
+                END
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_archive_reindex AFTER UPDATE OF messages ON message_archive
+                BEGIN
+                    INSERT INTO messages_fts (messages_fts, rowid, content, sender_id, receiver_id)
+                    SELECT 'delete', json_extract(value, '$[0]'), json_extract(value, '$[3]'),
+                           json_extract(value, '$[1]'), json_extract(value, '$[2]')
+                    FROM json_each(unarchive(OLD.messages));
+                    DELETE FROM archived_messages WHERE block_id = OLD.id;
+                    INSERT INTO archived_messages (id, block_id)
+                    SELECT json_extract(value, '$[0]'), NEW.id FROM json_each(unarchive(NEW.messages));
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    SELECT json_extract(value, '$[0]'), json_extract(value, '$[3]'),
+                           json_extract(value, '$[1]'), json_extract(value, '$[2]')
+                    FROM json_each(unarchive(NEW.messages));
+                END
+                """
+            )
+            # The index was recreated empty. FTS5 cannot 'rebuild' from a view
+            # that reads json_each, so it is filled the way the triggers do.
+            if migrate and version < 7:
+                cursor.execute(
+                    """
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    SELECT id, content, sender_id, receiver_id FROM messages
+                    """
+                )
+                cursor.execute("DELETE FROM archived_messages")
+                cursor.execute(
+                    """
+                    INSERT INTO archived_messages (id, block_id)
+                    SELECT json_extract(j.value, '$[0]'), a.id
+                    FROM message_archive a, json_each(unarchive(a.messages)) j
+                    """
+                )
+                cursor.execute(
+                    """
+                    INSERT INTO messages_fts (rowid, content, sender_id, receiver_id)
+                    SELECT json_extract(j.value, '$[0]'), json_extract(j.value, '$[3]'),
+                           json_extract(j.value, '$[1]'), json_extract(j.value, '$[2]')
+                    FROM message_archive a, json_each(unarchive(a.messages)) j
+                    """
+                )
+
+            # Rows inserted without a seq go to the end of their chat
+            if migrate and version < 5:
+                cursor.execute("DROP TRIGGER IF EXISTS messages_seq")
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS messages_seq AFTER INSERT ON messages
+                WHEN NEW.seq IS NULL
+                BEGIN
+                    UPDATE messages SET seq = max(
+                        COALESCE((
+                            SELECT MAX(seq) FROM messages
+                            WHERE min(sender_id, receiver_id) = min(NEW.sender_id, NEW.receiver_id)
+                                AND max(sender_id, receiver_id) = max(NEW.sender_id, NEW.receiver_id)
+                        ), 0),
+                        COALESCE((
+                            SELECT MAX(last_seq) FROM message_archive
+                            WHERE chat_low = min(NEW.sender_id, NEW.receiver_id)
+                                AND chat_high = max(NEW.sender_id, NEW.receiver_id)
+                        ), 0)
+                    ) + 1
+                    WHERE id = NEW.id;
+                END
+                """
+            )
+
+            # Messages with usernames, for anti-entropy; inserts intern them
+            cursor.execute(
+                """
+                CREATE VIEW IF NOT EXISTS message_rows AS
+                SELECT m.id, m.sender_id, m.receiver_id, s.username AS sender,
+                       r.username AS receiver, m.content, m.timestamp, m.seq, m.read
+                FROM messages m
+                JOIN user_ids s ON s.id = m.sender_id
+                JOIN user_ids r ON r.id = m.receiver_id
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_rows_insert INSTEAD OF INSERT ON message_rows
+                BEGIN
+                    INSERT OR IGNORE INTO user_ids (username) VALUES (NEW.sender);
+                    INSERT OR IGNORE INTO user_ids (username) VALUES (NEW.receiver);
+                    INSERT INTO messages (sender_id, receiver_id, content, timestamp, seq, read)
+                    VALUES (
+                        (SELECT id FROM user_ids WHERE username = NEW.sender),
+                        (SELECT id FROM user_ids WHERE username = NEW.receiver),
+                        NEW.content, NEW.timestamp, NEW.seq, COALESCE(NEW.read, 0)
+                    );
+                END
+                """
+            )
+
+            # Every message, hot or archived, for anti-entropy: digests must
+            # not depend on what each replica has archived so far
+            cursor.execute(
+                f"""
+                CREATE VIEW IF NOT EXISTS message_history AS
+                SELECT id, sender_id, receiver_id, sender, receiver, content, timestamp, seq, read,
+                       min(sender_id, receiver_id) AS chat_low,
+                       max(sender_id, receiver_id) AS chat_high,
+                       0 AS archived
+                FROM message_rows
+                UNION ALL
+                SELECT m.id, m.sender_id, m.receiver_id, s.username, r.username,
+                       m.content, m.timestamp, m.seq, m.read, m.chat_low, m.chat_high, 1
+                FROM (
+                    SELECT a.chat_low, a.chat_high,
+                           json_extract(j.value, '$[0]') AS id,
+                           json_extract(j.value, '$[1]') AS sender_id,
+                           json_extract(j.value, '$[2]') AS receiver_id,
+                           json_extract(j.value, '$[3]') AS content,
+                           json_extract(j.value, '$[4]') AS timestamp,
+                           json_extract(j.value, '$[5]') AS seq,
+                           json_extract(j.value, '$[6]') AS read
+                    FROM message_archive a, json_each(unarchive(a.messages)) j
+                ) m
+                JOIN user_ids s ON s.id = m.sender_id
+                JOIN user_ids r ON r.id = m.receiver_id
+                """
+            )
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_history_insert INSTEAD OF INSERT ON message_history
+                BEGIN
+                    INSERT INTO message_rows (sender, receiver, content, timestamp, seq, read)
+                    VALUES (NEW.sender, NEW.receiver, NEW.content, NEW.timestamp, NEW.seq, NEW.read);
+                END
+                """
+            )
+            # Deleting an archived message drops its whole block. Only
+            # anti-entropy deletes through this view, and it deletes whole chats.
+            cursor.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS message_history_delete INSTEAD OF DELETE ON message_history
+                BEGIN
+                    DELETE FROM messages WHERE id = OLD.id AND NOT OLD.archived;
+                    DELETE FROM message_archive
+                    WHERE OLD.archived AND chat_low = OLD.chat_low AND chat_high = OLD.chat_high
+                        AND OLD.seq BETWEEN first_seq AND last_seq;
+                END
+                """
+            )
+
+            # Users deleted cluster-wide, for recipient checks in sharded mode
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS deleted_users (
+                    username TEXT PRIMARY KEY
                 )
                 """
             )
 
+            # Deleted users whose messages are still being purged: those up to
+            # message id ``up_to`` (later ones are from a new account)
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS purge_queue (
+                    user_id INTEGER PRIMARY KEY,
+                    up_to INTEGER NOT NULL
+                )
+                """
+            )
+
+            # Replicated operations already applied, for deduplicating retries
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS applied_operations (
+                    operation_id INTEGER NOT NULL,
+                    term INTEGER NOT NULL,
+                    PRIMARY KEY (operation_id, term)
+                ) WITHOUT ROWID
+                """
+            )
+
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+
+    def _intern_message_users(self, cursor):
+        """
+        Migrate messages that name users by username to interned ids.
+
+        Accounts keep their ids (they become the interned ids); other
+        usernames found in messages, e.g. of deleted users, get new ones.
+        """
+        cursor.execute("INSERT OR IGNORE INTO user_ids (id, username) SELECT id, username FROM users")
+        for column in ("sender_id", "receiver_id"):
+            cursor.execute(
+                f"""
+                INSERT OR IGNORE INTO user_ids (username)
+                SELECT DISTINCT {column} FROM messages WHERE typeof({column}) = 'text'
+                """
+            )
+            cursor.execute(
+                f"""
+                UPDATE messages
+                SET {column} = (SELECT id FROM user_ids WHERE username = messages.{column})
+                WHERE typeof({column}) = 'text'
+                """
+            )
+
+    def _sequence_messages(self, cursor):
+        """
+        Migrate messages to integer timestamps and per-chat sequence numbers.
+
+        The table is rebuilt: a TEXT timestamp column would turn integers
+        back into text. Each chat is numbered in timestamp order.
+        """
+        cursor.connection.create_function("epoch_micros", 1, epoch_micros, deterministic=True)
+        cursor.execute(
+            """
+            CREATE TABLE messages_v2 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id INTEGER NOT NULL,
+                receiver_id INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,  -- microseconds since the epoch
+                seq INTEGER,
+                read INTEGER DEFAULT 0,
+                FOREIGN KEY (sender_id) REFERENCES user_ids(id),
+                FOREIGN KEY (receiver_id) REFERENCES user_ids(id)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO messages_v2 (id, sender_id, receiver_id, content, timestamp, seq, read)
+            SELECT id, sender_id, receiver_id, content, epoch_micros(timestamp),
+                   ROW_NUMBER() OVER (
+                       PARTITION BY min(sender_id, receiver_id), max(sender_id, receiver_id)
+                       ORDER BY timestamp, id
+                   ),
+                   read
+            FROM messages
+            """
+        )
+        cursor.execute("DROP TABLE messages")
+        cursor.execute("ALTER TABLE messages_v2 RENAME TO messages")
+
+    def _user_id(self, cursor, username, create=False):
+        """Interned id of ``username``; interned now if ``create``, else None if unknown."""
+        user_id = self._user_ids.get(username)
+        if user_id is not None:
+            return user_id
+
+        cursor.execute("SELECT id FROM user_ids WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        if row:
+            user_id = row[0]
+        elif create:
+            # Another writer may have interned it since
+            cursor.execute("INSERT OR IGNORE INTO user_ids (username) VALUES (?)", (username,))
+            cursor.execute("SELECT id FROM user_ids WHERE username = ?", (username,))
+            user_id = cursor.fetchone()[0]
+        else:
+            return None
+
+        self._user_ids[username] = user_id
+        self._usernames[user_id] = username
+        return user_id
+
+    def _username(self, cursor, user_id):
+        """Username of an interned id."""
+        username = self._usernames.get(user_id)
+        if username is None:
+            cursor.execute("SELECT username FROM user_ids WHERE id = ?", (user_id,))
+            username = cursor.fetchone()[0]
+            self._user_ids[username] = user_id
+            self._usernames[user_id] = username
+        return username
+
+    def _chat_pair(self, cursor, chat_id, user):
+        """
+        Interned ids of ``user`` and the other participant of ``chat_id``;
+        None for a username never interned (so the chat has no messages),
+        and for the other one when ``user`` is not in the chat.
+        """
+        user, other = chat_participants(chat_id, user)
+        if other is None:
+            return self._user_id(cursor, user), None
+        return self._user_id(cursor, user), self._user_id(cursor, other)
+
+    def next_message_seq(self, chat_id, sender):
+        """
+        Reserve the sequence number of the next message of a chat.
+
+        The leader stamps it on a message before replicating it, so every
+        replica stores the same one. Numbers reserved for messages not
+        inserted yet are not handed out again.
+        """
+        sender, recipient = chat_participants(chat_id, sender)
+        if recipient is None:
+            # send_chat_message refuses the message
+            return 0
+        chat = (min(sender, recipient), max(sender, recipient))
+        with self._seq_lock:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                sender_key = self._user_id(cursor, sender)
+                recipient_key = self._user_id(cursor, recipient)
+                last = 0
+                if sender_key is not None and recipient_key is not None:
+                    pair = (min(sender_key, recipient_key), max(sender_key, recipient_key))
+                    cursor.execute(f"SELECT {CHAT_LAST_SEQ}", pair * 2)
+                    last = cursor.fetchone()[0]
+            seq = max(last, self._reserved_seqs.get(chat, 0)) + 1
+            self._reserved_seqs[chat] = seq
+            return seq
+
+    def _forget_user_ids(self):
+        # Ids interned by a rolled back write may be handed out again
+        self._user_ids.clear()
+        self._usernames.clear()
+
+    def apply_batch(self, operations, keep=None):
+        """
+        Apply consecutive replicated operations in one transaction, skipping
+        those applied before.
+
+        Each operation is a ``(term, operation_id, apply)`` tuple. Every
+        DBManager call ``apply()`` makes on this thread joins the batch's
+        transaction, and a savepoint per operation records its
+        ``(term, operation_id)`` together with the mutation, or undoes both
+        when ``apply()`` returns a falsy value or raises. Concurrent batches
+        serialize on the write lock.
+
+        Args:
+            operations (list): ``(term, operation_id, apply)`` tuples, where
+                ``apply`` performs the mutation and returns success.
+            keep (int): If set, forget operations more than ``keep`` ids
+                behind the newest one, bounding the table to the retry window.
+
+        Returns:
+            list: Per operation, None if it had already been applied,
+            otherwise the result of its ``apply()`` (False if it raised).
+        """
+        results = []
+        conn = connect(self.db_file, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for term, operation_id, apply in operations:
+                cursor = conn.execute(
+                    "SELECT 1 FROM applied_operations WHERE operation_id = ? AND term = ?",
+                    (operation_id, term),
+                )
+                if cursor.fetchone():
+                    results.append(None)
+                    continue
+
+                conn.execute("SAVEPOINT apply_operation")
+                self._apply.conn = conn
+                try:
+                    result = apply()
+                except Exception:
+                    result = False
+                finally:
+                    self._apply.conn = None
+
+                if result:
+                    conn.execute(
+                        "INSERT INTO applied_operations (operation_id, term) VALUES (?, ?)",
+                        (operation_id, term),
+                    )
+                    conn.execute("RELEASE apply_operation")
+                else:
+                    conn.execute("ROLLBACK TO apply_operation")
+                    conn.execute("RELEASE apply_operation")
+                    self._forget_user_ids()
+                results.append(result)
+
+            if keep is not None and operations:
+                newest = max(operation_id for _, operation_id, _ in operations)
+                conn.execute(
+                    "DELETE FROM applied_operations WHERE operation_id <= ?",
+                    (newest - keep,),
+                )
             conn.commit()
+            return results
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            self._forget_user_ids()
+            raise
+        finally:
+            conn.close()
 
     def add_user(self, username, nickname, password):
         """
@@ -100,6 +849,12 @@ class DBManager:
                     (username, 6)
                 )
 
+                # A re-registered username is no longer deleted
+                cursor.execute("DELETE FROM deleted_users WHERE username = ?", (username,))
+
+                # The insert trigger interned the username; remember its id
+                self._user_id(cursor, username)
+
                 conn.commit()
                 return {"success": True, "error_message": ""}
 
@@ -156,18 +911,211 @@ class DBManager:
             }
 
     def delete_user(self, user_id):
-        """Delete a user and all associated data."""
+        """
+        Delete a user and all associated data.
+
+        The account is gone at once; its messages are queued for
+        ``purge_deleted_users``, as deleting a long history here would hold
+        the write lock for seconds.
+        """
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            self._remove_account(cursor, user_id)
+            self._queue_purge(cursor, user_id)
+            conn.commit()
+            return {"success": True, "error_message": ""}
 
-            # Delete the user from the users table (cascading deletes will handle userconfig and messages)
+    def _remove_account(self, cursor, username):
+        """Delete a user's records and tombstone the username."""
+        cursor.execute(
+            "DELETE FROM users WHERE username = ?",
+            (username,)
+        )
+        cursor.execute(
+            "DELETE FROM userconfig WHERE username = ?",
+            (username,)
+        )
+        cursor.execute(
+            "INSERT OR IGNORE INTO deleted_users (username) VALUES (?)",
+            (username,)
+        )
+
+    def _queue_purge(self, cursor, username):
+        """Queue the messages a deleted user has sent or received so far."""
+        # Their interned id stays, so signing up again reclaims it; only
+        # messages up to now are purged
+        user_key = self._user_id(cursor, username)
+        if user_key is not None:
             cursor.execute(
-                "DELETE FROM users WHERE username = ?",
-                (user_id,)
+                """
+                INSERT OR REPLACE INTO purge_queue (user_id, up_to)
+                SELECT ?, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'messages'), 0)
+                """,
+                (user_key,)
             )
 
+    def purge_deleted_users(self, limit):
+        """
+        Delete up to ``limit`` messages of deleted users, in one short
+        transaction.
+
+        Returns:
+            int: Messages deleted; a user leaves the queue once a batch
+            finds none of their messages left.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT user_id, up_to FROM purge_queue LIMIT 1")
+            row = cursor.fetchone()
+            if row is None:
+                return 0
+            user_key, up_to = row
+
+            deleted = 0
+            for column in ("sender_id", "receiver_id"):
+                cursor.execute(
+                    f"""
+                    DELETE FROM messages WHERE id IN (
+                        SELECT id FROM messages WHERE {column} = ? AND id <= ? LIMIT ?
+                    )
+                    """,
+                    (user_key, up_to, limit - deleted)
+                )
+                deleted += cursor.rowcount
+                if deleted >= limit:
+                    break
+            else:
+                # Then their archived messages, a block at a time
+                deleted += self._purge_archive(cursor, user_key, up_to, limit - deleted)
+                if deleted < limit:
+                    cursor.execute("DELETE FROM purge_queue WHERE user_id = ?", (user_key,))
+
             conn.commit()
-            return {"success": True, "error_message": ""}
+            return deleted
+
+    def _purge_archive(self, cursor, user_key, up_to, limit):
+        """Delete archived messages of a user up to id ``up_to``, until ``limit`` are gone."""
+        cursor.execute(
+            """
+            SELECT id, messages FROM message_archive WHERE chat_low = ?
+            UNION ALL
+            SELECT id, messages FROM message_archive WHERE chat_high = ? AND chat_low != ?
+            """,
+            (user_key, user_key, user_key)
+        )
+        deleted = 0
+        for block_id, block in cursor.fetchall():
+            rows = unpack_messages(block)
+            kept = [row for row in rows if row[0] > up_to]
+            if len(kept) < len(rows):
+                self._rewrite_block(cursor, block_id, kept)
+                deleted += len(rows) - len(kept)
+                if deleted >= limit:
+                    break
+        return deleted
+
+    def _rewrite_block(self, cursor, block_id, rows):
+        """Store what is left of an archive block, or drop it if nothing is."""
+        if not rows:
+            cursor.execute("DELETE FROM message_archive WHERE id = ?", (block_id,))
+            return
+        cursor.execute(
+            """
+            UPDATE message_archive
+            SET first_seq = ?, last_seq = ?, count = ?, last_timestamp = ?, messages = ?
+            WHERE id = ?
+            """,
+            (rows[0][5], rows[-1][5], len(rows), max(row[4] for row in rows), pack_messages(rows), block_id)
+        )
+
+    def pending_purges(self):
+        """Number of deleted users whose messages are still being purged."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM purge_queue")
+            return cursor.fetchone()[0]
+
+    def archive_candidates(self, keep, older_than, block_size, scan=10_000):
+        """
+        Chats that may have a block of cold messages to archive: those with
+        more than ``keep`` messages plus a block, and those among the oldest
+        ``scan`` read messages sent before ``older_than`` (microseconds).
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT min(sender_id, receiver_id), max(sender_id, receiver_id) FROM messages
+                GROUP BY 1, 2
+                HAVING COUNT(*) >= ?
+                """,
+                (keep + block_size,)
+            )
+            chats = set(cursor.fetchall())
+            cursor.execute(
+                """
+                SELECT DISTINCT min(sender_id, receiver_id), max(sender_id, receiver_id)
+                FROM (
+                    SELECT sender_id, receiver_id FROM messages
+                    WHERE read AND timestamp < ?
+                    ORDER BY id LIMIT ?
+                )
+                """,
+                (older_than, scan)
+            )
+            chats.update(cursor.fetchall())
+            return sorted(chats)
+
+    def archive_chat(self, chat, keep, older_than, block_size):
+        """
+        Move the oldest ``block_size`` messages of a chat into one archive
+        block, in one short transaction, if they are all cold: read, and
+        either not among the newest ``keep`` or sent before ``older_than``.
+
+        Args:
+            chat (tuple): The chat's pair of interned user ids, as returned
+                by archive_candidates.
+
+        Returns:
+            int: Messages archived, 0 if the chat has no full cold block.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM messages WHERE {CHAT_MESSAGES}", chat)
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                SELECT {ARCHIVED_COLUMNS} FROM messages
+                WHERE {CHAT_MESSAGES}
+                ORDER BY seq
+                LIMIT ?
+                """,
+                (*chat, block_size)
+            )
+            rows = [list(row) for row in cursor.fetchall()]
+            if len(rows) < block_size:
+                return 0
+            for position, (_, _, _, _, timestamp, _, read) in enumerate(rows):
+                if not read or (total - position <= keep and timestamp >= older_than):
+                    return 0
+
+            # Out of the hot table (and the search index) first, so the
+            # block's insert trigger indexes each message once
+            cursor.execute(
+                "DELETE FROM messages WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([row[0] for row in rows]),)
+            )
+            cursor.execute(
+                """
+                INSERT INTO message_archive
+                    (chat_low, chat_high, first_seq, last_seq, count, last_timestamp, messages)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (*chat, rows[0][5], rows[-1][5], len(rows), max(row[4] for row in rows), pack_messages(rows))
+            )
+            conn.commit()
+            return len(rows)
 
     def get_chats(self, user_id):
         """
@@ -175,64 +1123,23 @@ class DBManager:
         other participants for chat list UI display.
 
         Args:
-            user_id (int): ID of the user whose chats to retrieve
+            user_id (str): Username of the user whose chats to retrieve
 
         Returns:
             dict: Contains:
                 - success (bool): Whether operation succeeded
                 - chats (list): List of chat dictionaries, each containing:
-                    - chat_id (str): Unique chat identifier (smaller_id_larger_id)
-                    - other_user (int): ID of the other chat participant
+                    - chat_id (str): Unique chat identifier (smaller_larger username)
+                    - other_user (str): Username of the other chat participant
                     - unread_count (int): Number of unread messages for current user
                 - error_message (str): Error details if any, empty if successful
         """
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute(
-                    """
-                    WITH ChatSummary AS (
-                        SELECT
-                            CASE
-                                WHEN sender_id < receiver_id THEN sender_id || '_' || receiver_id
-                                ELSE receiver_id || '_' || sender_id
-                            END as chat_id,
-                            CASE
-                                WHEN sender_id = ? THEN receiver_id
-                                ELSE sender_id
-                            END as other_user,
-                            COUNT(CASE
-                                WHEN receiver_id = ? AND read = FALSE
-                                THEN 1
-                            END) as unread_count,
-                            MAX(timestamp) as last_message_time
-                        FROM messages
-                        WHERE (sender_id = ? OR receiver_id = ?)
-                            AND sender_id != receiver_id  -- Exclude self-messages
-                        GROUP BY chat_id, other_user
-                    )
-                    SELECT chat_id, other_user, unread_count
-                    FROM ChatSummary
-                    ORDER BY last_message_time DESC
-                    """,
-                    (user_id, user_id, user_id, user_id)
-                )
-
-                chats = [
-                    {
-                        "chat_id": row[0],
-                        "other_user": row[1],
-                        "unread_count": row[2] or 0  # Convert None to 0
-                    }
-                    for row in cursor.fetchall()
-                ]
-
-                return {
-                    "success": True,
-                    "chats": chats,
-                    "error_message": ""
-                }
+            return {
+                "success": True,
+                "chats": [chat for _, chat in self._recent_chats(user_id)],
+                "error_message": ""
+            }
 
         except Exception as e:
             return {
@@ -240,6 +1147,63 @@ class DBManager:
                 "chats": [],
                 "error_message": str(e)
             }
+
+    def _recent_chats(self, user_id):
+        """``(last_message_time, chat)`` for each chat of a user, newest first."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+
+            user_key = self._user_id(cursor, user_id)
+            if user_key is None:
+                return []
+
+            # Archived messages are all read; only their time counts
+            cursor.execute(
+                """
+                SELECT other_id, SUM(unread_count), MAX(last_message_time) AS last_message_time
+                FROM (
+                    SELECT
+                        CASE WHEN sender_id = ? THEN receiver_id ELSE sender_id END as other_id,
+                        COUNT(CASE
+                            WHEN receiver_id = ? AND read = FALSE
+                            THEN 1
+                        END) as unread_count,
+                        MAX(timestamp) as last_message_time
+                    FROM messages
+                    WHERE (sender_id = ? OR receiver_id = ?)
+                        AND sender_id != receiver_id  -- Exclude self-messages
+                    GROUP BY other_id
+                    UNION ALL
+                    SELECT
+                        CASE WHEN chat_low = ? THEN chat_high ELSE chat_low END,
+                        0,
+                        MAX(last_timestamp)
+                    FROM message_archive
+                    WHERE (chat_low = ? OR chat_high = ?) AND chat_low != chat_high
+                    GROUP BY 1
+                )
+                GROUP BY other_id
+                ORDER BY last_message_time DESC
+                """,
+                (user_key,) * 7
+            )
+
+            chats = []
+            for other_id, unread_count, last_message_time in cursor.fetchall():
+                other_user = self._username(cursor, other_id)
+                chats.append(
+                    (
+                        last_message_time,
+                        {
+                            "chat_id": f"{min(user_id, other_user)}_{max(user_id, other_user)}",
+                            "other_user": other_user,
+                            "unread_count": unread_count or 0,  # Convert None to 0
+                            "last_message_time": last_message_time,
+                        },
+                    )
+                )
+            return chats
+
     def get_all_users(self, exclude_username=None):
         """Get all users except the excluded one."""
         with self._get_connection() as conn:
@@ -280,17 +1244,15 @@ class DBManager:
             chat_id = f"{min(current_user, other_user)}_{max(current_user, other_user)}"
 
             # Check if the chat already exists
-            cursor.execute(
-                """
-                SELECT id FROM messages
-                WHERE (sender_id = ? AND receiver_id = ?)
-                OR (sender_id = ? AND receiver_id = ?)
-                LIMIT 1
-                """,
-                (current_user, other_user, other_user, current_user)
-            )
-            if cursor.fetchone():
-                return {"success": True, "chat_id": chat_id, "error_message": ""}
+            current_id = self._user_id(cursor, current_user)
+            other_id = self._user_id(cursor, other_user)
+            if current_id is not None and other_id is not None:
+                cursor.execute(
+                    f"SELECT id FROM messages WHERE {CHAT_MESSAGES} LIMIT 1",
+                    (min(current_id, other_id), max(current_id, other_id))
+                )
+                if cursor.fetchone():
+                    return {"success": True, "chat_id": chat_id, "error_message": ""}
 
             conn.commit()
             return {"success": True, "chat_id": chat_id, "error_message": ""}
@@ -312,63 +1274,146 @@ class DBManager:
             return {"message_limit": str(view_limit), "error_message": ""}
         
 
-    def delete_messages(self, chat_id, message_indices, current_user):
-        """Delete specific messages from a chat."""
+    def _seqs_at(self, cursor, chat, message_indices):
+        """Sequence numbers of the messages at the given positions of a chat."""
+        cursor.execute("SELECT messages FROM message_archive WHERE chat_low = ? AND chat_high = ?", chat)
+        blocks = cursor.fetchall()
+        if blocks:
+            # Positions count archived messages too
+            cursor.execute(f"SELECT seq FROM messages WHERE {CHAT_MESSAGES}", chat)
+            seqs = [row[0] for row in cursor.fetchall()]
+            seqs = sorted(seqs + [row[5] for (block,) in blocks for row in unpack_messages(block)])
+            return sorted({seqs[i] for i in message_indices if 0 <= i < len(seqs)})
+
+        cursor.execute(
+            f"""
+            SELECT seq FROM (
+                SELECT seq, ROW_NUMBER() OVER (ORDER BY seq) - 1 AS position
+                FROM messages WHERE {CHAT_MESSAGES}
+            )
+            WHERE position IN (SELECT value FROM json_each(?))
+            """,
+            (*chat, json.dumps(list(message_indices)))
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def message_seqs(self, chat_id, message_indices, current_user):
+        """Sequence numbers of the messages at the given positions of a chat."""
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            if isinstance(chat_id, list):
-                chat_id = chat_id[0]
+            user_key, other_key = self._chat_pair(cursor, chat_id, current_user)
+            if user_key is None or other_key is None:
+                return []
+            chat = (min(user_key, other_key), max(user_key, other_key))
+            return self._seqs_at(cursor, chat, message_indices)
+
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        """
+        Delete specific messages from a chat, in one statement.
+
+        Messages are named by sequence number, or else by their position in
+        the chat; positions shift when the chat changes, sequence numbers
+        don't.
+        """
+        if chat_participants(chat_id, current_user)[1] is None:
+            return {"success": False, "error_message": not_in_chat(chat_id, current_user)}
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+
+            user_key, other_key = self._chat_pair(cursor, chat_id, current_user)
+            if user_key is None or other_key is None:
+                return {"success": True, "error_message": ""}
+            chat = (min(user_key, other_key), max(user_key, other_key))
+
+            if not message_seqs:
+                message_seqs = self._seqs_at(cursor, chat, message_indices or [])
 
-            # Fetch all messages in the chat
             cursor.execute(
-                """
-                SELECT id FROM messages
-                WHERE (sender_id = ? AND receiver_id = ?)
-                OR (sender_id = ? AND receiver_id = ?)
-                ORDER BY timestamp
+                f"""
+                DELETE FROM messages
+                WHERE {CHAT_MESSAGES} AND seq IN (SELECT value FROM json_each(?))
                 """,
-                (chat_id.split("_")[0], chat_id.split("_")[1], chat_id.split("_")[1], chat_id.split("_")[0])
+                (*chat, json.dumps(list(message_seqs)))
             )
-            messages = cursor.fetchall()
 
-            # Delete the specified messages
-            for i in message_indices:
-                if i < len(messages):
-                    cursor.execute(
-                        "DELETE FROM messages WHERE id = ?",
-                        (messages[i][0],)
-                    )
+            # Archived ones are cut out of their blocks
+            if message_seqs:
+                cursor.execute(
+                    """
+                    SELECT id, messages FROM message_archive
+                    WHERE chat_low = ? AND chat_high = ? AND last_seq >= ? AND first_seq <= ?
+                    """,
+                    (*chat, min(message_seqs), max(message_seqs))
+                )
+                doomed = set(message_seqs)
+                for block_id, block in cursor.fetchall():
+                    rows = unpack_messages(block)
+                    kept = [row for row in rows if row[5] not in doomed]
+                    if len(kept) < len(rows):
+                        self._rewrite_block(cursor, block_id, kept)
 
             conn.commit()
             return {"success": True, "error_message": ""}
 
-    def get_messages(self, chat_id, current_user):
-        """Retrieve messages for a specific chat."""
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        """
+        Retrieve messages for a specific chat, in seq order.
+
+        Only those after ``after_seq`` and before ``before_seq`` are returned
+        when given, and only the newest ``limit`` of them if set. Archived
+        messages are read only when the hot ones do not fill the page, so
+        clients showing the end of a chat never touch the archive.
+        """
+        if chat_participants(chat_id, current_user)[1] is None:
+            return {"success": False, "messages": [], "error_message": not_in_chat(chat_id, current_user)}
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            if isinstance(chat_id, list):
-                chat_id = chat_id[0]
-
-            other_user = None
-            if chat_id.split("_")[0] == current_user:
-                other_user = chat_id.split("_")[1]
-            else:
-                other_user = chat_id.split("_")[0]
+            user_key, other_key = self._chat_pair(cursor, chat_id, current_user)
+            if user_key is None or other_key is None:
+                return {"success": True, "messages": [], "error_message": ""}
+            chat = (min(user_key, other_key), max(user_key, other_key))
+            after_seq = after_seq or 0
+            before = " AND seq < ?" if before_seq else ""
+            bounds = (after_seq, before_seq) if before_seq else (after_seq,)
 
-            # Fetch all messages in the chat
+            # Newest first, so a limit keeps the end of the chat
             cursor.execute(
-                """
-                SELECT * FROM messages
-                WHERE (sender_id = ? AND receiver_id = ?)
-                OR (sender_id = ? AND receiver_id = ?)
-                ORDER BY timestamp
+                f"""
+                SELECT id, sender, receiver, content, timestamp, read, seq FROM message_rows
+                WHERE {CHAT_MESSAGES} AND seq > ?{before}
+                ORDER BY seq DESC
+                LIMIT ?
                 """,
-                (chat_id.split("_")[0], chat_id.split("_")[1], chat_id.split("_")[1], chat_id.split("_")[0])
+                (*chat, *bounds, limit or -1)
             )
             messages = cursor.fetchall()
-            
+
+            # Only blocks with messages newer than a full page's oldest can
+            # add to it
+            floor = messages[-1][6] if limit and len(messages) == limit else after_seq
+            cursor.execute(
+                f"""
+                SELECT last_seq, messages FROM message_archive
+                WHERE chat_low = ? AND chat_high = ? AND last_seq > ?{before.replace("seq", "first_seq")}
+                ORDER BY last_seq DESC
+                """,
+                (*chat, floor, *bounds[1:])
+            )
+            for last_seq, block in cursor.fetchall():
+                if limit and len(messages) >= limit and last_seq < messages[limit - 1][6]:
+                    break
+                messages += [
+                    (msg_id, self._username(cursor, sender_id), self._username(cursor, receiver_id),
+                     content, timestamp, read, seq)
+                    for msg_id, sender_id, receiver_id, content, timestamp, seq, read in unpack_messages(block)
+                    if seq > after_seq and (not before_seq or seq < before_seq)
+                ]
+                messages.sort(key=lambda msg: msg[6], reverse=True)
+
             formatted_messages = [
                 {
                     "id": msg[0],
@@ -376,9 +1421,10 @@ class DBManager:
                     "receiver": msg[2],
                     "content": msg[3],
                     "timestamp": msg[4],
-                    "read": msg[5]
+                    "read": msg[5],
+                    "seq": msg[6]
                 }
-                for msg in messages
+                for msg in reversed(messages[:limit] if limit else messages)
             ]
 
             # Mark messages as read for the current user
@@ -392,72 +1438,240 @@ class DBManager:
                 SET read = TRUE
                 WHERE receiver_id = ? AND sender_id = ?
                 """,
-                (current_user, other_user)
+                (user_key, other_key)
             )
             return {"success": True, "messages": formatted_messages, "error_message": ""}
     
-    def send_chat_message(self, chat_id, sender, content):
-        """Send a message in a chat."""
+    def send_chat_message(self, chat_id, sender, content, timestamp=None, seq=None):
+        """
+        Send a message in a chat.
+
+        ``timestamp`` (microseconds since the epoch) and ``seq`` are the
+        leader's when the message is replicated; otherwise the message is
+        stamped now and goes to the end of the chat.
+        """
         if not chat_id or not sender or not content:
             return {"success": False, "error_message": "Missing required fields."}
             
         with self._get_connection() as conn:
             cursor = conn.cursor()
             print("i'm boutta insert a message trying to be sent")
-            if isinstance(chat_id, list):
-                chat_id = chat_id[0]
-
             # Get recipient's username
-            recipient = chat_id.split("_")[1] if sender == chat_id.split("_")[0] else chat_id.split("_")[0]
-            
-            # Check if recipient still exists
-            cursor.execute("SELECT username FROM users WHERE username = ?", (recipient,))
-            if not cursor.fetchone():
-                return {"success": False, "error_message": f"Cannot send message. User '{recipient}' has deleted their account."}
-            
+            _, recipient = chat_participants(chat_id, sender)
+            if recipient is None:
+                return {"success": False, "error_message": not_in_chat(chat_id, sender)}
+
+            error = self._check_participants(cursor, sender, recipient)
+            if error:
+                return {"success": False, "error_message": error}
+
             # Insert the message
+            sender_key = self._user_id(cursor, sender, create=True)
+            recipient_key = self._user_id(cursor, recipient, create=True)
+            pair = (min(sender_key, recipient_key), max(sender_key, recipient_key))
             cursor.execute(
-                """
-                INSERT INTO messages (sender_id, receiver_id, content, timestamp)
-                VALUES (?, ?, ?, ?)
+                f"""
+                INSERT INTO messages (sender_id, receiver_id, content, timestamp, seq)
+                VALUES (?, ?, ?, ?, COALESCE(?, {CHAT_LAST_SEQ} + 1))
                 """,
-                (sender, recipient, content, datetime.now().isoformat())
+                (
+                    sender_key,
+                    recipient_key,
+                    content,
+                    timestamp or now_micros(),
+                    seq or None,
+                    *pair,
+                    *pair,
+                )
             )
             conn.commit()
             print("yay i did it")
             return {"success": True, "error_message": ""}
 
-    def get_users_to_display(self, current_user, search_pattern="", page=1, users_per_page=10):
-        """Retrieve a list of users with optional filtering and pagination."""
+    def _check_participants(self, cursor, sender, recipient):
+        """Why a message from ``sender`` to ``recipient`` is refused; "" if it is not."""
+        # Deleted accounts can't send, even before their messages are purged
+        cursor.execute("SELECT username FROM deleted_users WHERE username = ?", (sender,))
+        if cursor.fetchone():
+            return f"User '{sender}' has deleted their account."
+
+        # Check if recipient still exists
+        if self.local_users:
+            cursor.execute("SELECT username FROM users WHERE username = ?", (recipient,))
+            recipient_exists = cursor.fetchone() is not None
+        else:
+            cursor.execute("SELECT username FROM deleted_users WHERE username = ?", (recipient,))
+            recipient_exists = cursor.fetchone() is None
+        if not recipient_exists:
+            return f"Cannot send message. User '{recipient}' has deleted their account."
+        return ""
+
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        """
+        Full-text search of the messages a user sent or received.
+
+        Args:
+            current_user (str): Username whose messages are searched.
+            query (str): Words that must all appear in a message.
+            chat_id (str): If set, only search this chat.
+            page (int): Page of results, from 1.
+            page_size (int): Results per page.
+
+        Returns:
+            dict: ``matches`` best first (bm25), each with its chat id, the
+            message and a snippet with the matched words in brackets, and
+            ``has_more`` if further pages exist.
+        """
+        page = page or 1
+        page_size = page_size or 20
+        match = fts_query(query or "")
+        if chat_id and chat_participants(chat_id, current_user)[1] is None:
+            return {
+                "success": False,
+                "matches": [],
+                "has_more": False,
+                "error_message": not_in_chat(chat_id, current_user),
+            }
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+
+            user_key = self._user_id(cursor, current_user)
+            if user_key is None or not match:
+                return {"success": True, "matches": [], "has_more": False, "error_message": ""}
+
+            # Messages the user (and the other participant, for one chat) took part in
+            participants = [user_key]
+            if chat_id:
+                user_key, other_key = self._chat_pair(cursor, chat_id, current_user)
+                if other_key is None:
+                    return {"success": True, "matches": [], "has_more": False, "error_message": ""}
+                participants.append(other_key)
+            match = " AND ".join(
+                [f'{{sender_id receiver_id}} : "{key}"' for key in participants]
+                + [f"content : ({match})"]
+            )
+
+            try:
+                cursor.execute(
+                    """
+                    SELECT rowid, sender_id, receiver_id, content, timestamp, seq,
+                           snippet(messages_fts, 0, '[', ']', '...', 12),
+                           bm25(messages_fts, 1.0, 0.0, 0.0) AS rank
+                    FROM messages_fts
+                    WHERE messages_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                    """,
+                    (match, page_size + 1, (page - 1) * page_size)
+                )
+            except sqlite3.OperationalError as e:
+                return {"success": False, "matches": [], "has_more": False, "error_message": f"Invalid search: {str(e)}"}
+            rows = cursor.fetchall()
+
+            matches = []
+            for msg_id, sender_key, receiver_key, content, timestamp, seq, snippet, rank in rows[:page_size]:
+                sender = self._username(cursor, sender_key)
+                receiver = self._username(cursor, receiver_key)
+                matches.append(
+                    {
+                        "chat_id": f"{min(sender, receiver)}_{max(sender, receiver)}",
+                        "id": msg_id,
+                        "sender": sender,
+                        "receiver": receiver,
+                        "content": content,
+                        "timestamp": timestamp,
+                        "seq": seq,
+                        "snippet": snippet,
+                        "rank": rank,
+                    }
+                )
+            return {
+                "success": True,
+                "matches": matches,
+                "has_more": len(rows) > page_size,
+                "error_message": "",
+            }
+
+    def get_users_to_display(self, current_user, search_pattern="", page=1, users_per_page=10, after=""):
+        """
+        Retrieve a page of users, optionally those whose username or nickname
+        contains ``search_pattern``, ordered by username.
+
+        Patterns of MIN_TRIGRAM_PATTERN characters or more are looked up in
+        the users_fts trigram index, so neither the page nor the count scans
+        the users table.
+
+        Pages are chosen by the ``after`` cursor of the previous page when
+        given, and by ``page`` number otherwise. A cursor page starts right
+        after the previous one in the username index, so deep pages cost no
+        more than the first, and signups do not shift them. Totals are only
+        counted without a cursor, for the first page.
+
+        Returns:
+            dict: ``users`` on the page, ``next_cursor`` ("" on the last
+            page), ``total_users`` matching and ``total_pages``.
+        """
 
         # Ensure page and users_per_page are integers
         page = page if page is not None else 1
         users_per_page = users_per_page if users_per_page is not None else 10
 
+        try:
+            last_username = decode_cursor(after) if after else None
+        except ValueError:
+            return {"success": False, "users": [], "next_cursor": "", "error_message": "Invalid page cursor"}
+
+        if not search_pattern:
+            source, condition, params = "users u", "1", ()
+        elif len(search_pattern) >= MIN_TRIGRAM_PATTERN:
+            source = "users_fts JOIN users u ON u.id = users_fts.rowid"
+            condition = "users_fts MATCH ?"
+            params = ('"' + search_pattern.replace('"', '""') + '"',)
+        else:
+            source = "users u"
+            condition = "(u.username LIKE ? ESCAPE '\\' OR u.nickname LIKE ? ESCAPE '\\')"
+            params = (like_pattern(search_pattern),) * 2
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
-            if search_pattern:
+            total = 0
+            if last_username is None:
                 cursor.execute(
-                """
-                SELECT username FROM users 
-                WHERE username LIKE ? AND username != ? 
-                LIMIT ? OFFSET ?
-                """,
-                    (f"%{search_pattern}%", current_user, users_per_page, (page - 1) * users_per_page)
+                    f"SELECT COUNT(*) FROM {source} WHERE {condition} AND u.username != ?",
+                    params + (current_user,),
                 )
+                total = cursor.fetchone()[0]
+
+            if last_username is None:
+                start, offset = "", (max(page, 1) - 1) * users_per_page
             else:
-                cursor.execute(
-                    """
-                    SELECT username FROM users 
-                    WHERE username != ? 
-                    LIMIT ? OFFSET ?
-                    """,
-                    (current_user, users_per_page, (page - 1) * users_per_page)
-                )
+                start, offset = " AND u.username > ?", 0
+                params += (last_username,)
 
-            users = [row[0] for row in cursor.fetchall()]
-            return {"success": True, "users": users, "error_message": ""}
+            # One row more than the page tells whether another page follows
+            cursor.execute(
+                f"""
+                SELECT u.username FROM {source}
+                WHERE {condition}{start} AND u.username != ?
+                ORDER BY u.username
+                LIMIT ? OFFSET ?
+                """,
+                params + (current_user, users_per_page + 1, offset),
+            )
+            rows = cursor.fetchall()
+
+            users = [row[0] for row in rows[:users_per_page]]
+            more = len(rows) > users_per_page and users
+            return {
+                "success": True,
+                "users": users,
+                "next_cursor": encode_cursor(users[-1]) if more else "",
+                "total_users": total,
+                "total_pages": -(-total // users_per_page) if users_per_page > 0 else 0,
+                "error_message": "",
+            }
         
     def save_settings(self, username, message_limit):
         """Save settings for a user. updating message limits"""
@@ -0,0 +1,473 @@
+"""
+Merkle digests of a replica's database, for anti-entropy between replicas.
+"""
+
+import hashlib
+import json
+import threading
+import zlib
+from collections import namedtuple
+
+from src.replication.config import DIGEST_BUCKETS
+from src.services.db_manager import connect
+from src.services.sharded_db import shard_of
+
+# How rows of a table are grouped into keys and which columns define them.
+# ``tables`` maps each table holding rows of a key to a SourceSpec: an SQL
+# expression of the key over one of its rows, the columns behind the hashed
+# ones (changes to those are recorded), and an SQL expression of a hashed
+# row as JSON, read from ``each`` when one row of the table holds several
+# (an archive block). ``lookup(cursor, key)`` gives the SQL condition (and
+# its parameters) selecting a key's rows. Rows are read from, written to and
+# deleted through ``source`` as ``columns``; hashed rows leave out columns
+# each replica fills in locally (message read flags).
+TableSpec = namedtuple("TableSpec", "tables lookup source columns order")
+SourceSpec = namedtuple("SourceSpec", "key watched row each", defaults=("",))
+
+# A chat's key is its chat id: the usernames of both participants, smaller
+# first. Messages hold interned user ids, which differ between replicas.
+_CHAT_KEY = (
+    "(SELECT CASE WHEN s.username < r.username "
+    "THEN s.username || '_' || r.username "
+    "ELSE r.username || '_' || s.username END "
+    "FROM user_ids s, user_ids r "
+    "WHERE s.id = {{row}}{first} AND r.id = {{row}}{second})"
+)
+_USERNAME = "(SELECT u.username FROM user_ids u WHERE u.id = {id})"
+
+# Hot and archived messages hash alike, so archiving leaves a chat's hash as it was
+_MESSAGE_ROW = "json_array({sender}, {receiver}, {content}, {timestamp}, {seq})"
+_ARCHIVED = "json_extract(value, '$[{}]')"
+
+
+def _lookup_user(cursor, key):
+    return "username = ?", (key,)
+
+
+def _lookup_chat(cursor, key):
+    """
+    Messages of every chat whose id is ``key``: usernames may contain ``_``.
+
+    The chats are named by their interned ids, not by subqueries, so the
+    condition reaches the indexes of both arms of ``message_history``.
+    """
+    chats = []
+    for i, char in enumerate(key):
+        if char != "_" or key[:i] > key[i + 1:]:
+            continue
+        cursor.execute(
+            "SELECT id FROM user_ids WHERE username IN (?, ?) ORDER BY id", (key[:i], key[i + 1:])
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) == 2 or (ids and key[:i] == key[i + 1:]):
+            chats.append((ids[0], ids[-1]))
+    if not chats:
+        return "0", ()
+    condition = " OR ".join(["(chat_low = ? AND chat_high = ?)"] * len(chats))
+    return condition, tuple(user_id for chat in chats for user_id in chat)
+
+
+TABLES = {
+    "users": TableSpec(
+        tables={
+            "users": SourceSpec(
+                key="{row}username",
+                watched=("username", "nickname", "password"),
+                row="json_array({row}username, {row}nickname, {row}password)",
+            )
+        },
+        lookup=_lookup_user,
+        source="users",
+        columns=("username", "nickname", "password"),
+        order="id",
+    ),
+    "userconfig": TableSpec(
+        tables={
+            "userconfig": SourceSpec(
+                key="{row}username",
+                watched=("username", "msg_view_limit"),
+                row="json_array({row}username, {row}msg_view_limit)",
+            )
+        },
+        lookup=_lookup_user,
+        source="userconfig",
+        columns=("username", "msg_view_limit"),
+        order="rowid",
+    ),
+    # One key per chat: all messages between two users, hot or archived
+    "messages": TableSpec(
+        tables={
+            "messages": SourceSpec(
+                key=_CHAT_KEY.format(first="sender_id", second="receiver_id"),
+                watched=("sender_id", "receiver_id", "content", "timestamp", "seq"),
+                row=_MESSAGE_ROW.format(
+                    sender=_USERNAME.format(id="{row}sender_id"),
+                    receiver=_USERNAME.format(id="{row}receiver_id"),
+                    content="{row}content",
+                    timestamp="{row}timestamp",
+                    seq="{row}seq",
+                ),
+            ),
+            "message_archive": SourceSpec(
+                key=_CHAT_KEY.format(first="chat_low", second="chat_high"),
+                watched=("chat_low", "chat_high", "messages"),
+                row=_MESSAGE_ROW.format(
+                    sender=_USERNAME.format(id=_ARCHIVED.format(1)),
+                    receiver=_USERNAME.format(id=_ARCHIVED.format(2)),
+                    content=_ARCHIVED.format(3),
+                    timestamp=_ARCHIVED.format(4),
+                    seq=_ARCHIVED.format(5),
+                ),
+                each="json_each(unarchive({row}messages))",
+            ),
+        },
+        lookup=_lookup_chat,
+        source="message_history",
+        columns=("sender", "receiver", "content", "timestamp", "seq", "read"),
+        order="seq, id",
+    ),
+}
+
+EMPTY_HASH = b""
+# A key's hash is the sum of its rows' SHA-1 hashes modulo this
+HASH_MODULUS = 2**160
+
+
+def bucket_of(key, buckets=DIGEST_BUCKETS):
+    return zlib.crc32(key.encode("utf-8")) % buckets
+
+
+def row_hash(row):
+    """Hash of one row, given as its JSON text."""
+    return int.from_bytes(hashlib.sha1(row.encode("utf-8")).digest(), "big")
+
+
+def fold(changes):
+    """
+    Sum ``(table, key, sign, row)`` changes into {(table, key): [hash, rows]}.
+    Sums do not depend on the order rows come in, so a key is updated row by
+    row. They are sums rather than XORs so that two equal rows do not cancel.
+    """
+    sums = {}
+    for table, key, sign, row in changes:
+        total = sums.setdefault((table, key), [0, 0])
+        total[0] += sign * row_hash(row)
+        total[1] += sign
+    return sums
+
+
+def _record(table, source, row, sign):
+    """Trigger statement logging the rows of ``source`` held by ``row`` (NEW. or OLD.)."""
+    each = f" FROM {source.each}" if source.each else ""
+    return (
+        f"INSERT INTO digest_changes (tbl, key, sign, row) "
+        f"SELECT '{table}', {source.key}, {sign}, {source.row}{each};"
+    ).format(row=row)
+
+
+def bucket_hash(key_hashes):
+    """Hash of a bucket from its ``(key, hash)`` pairs in key order."""
+    if not key_hashes:
+        return EMPTY_HASH
+    return hashlib.sha1(json.dumps([(k, h.hex()) for k, h in key_hashes]).encode("utf-8")).digest()
+
+
+class MerkleDigest:
+    """
+    Per-key hashes of the replicated tables, grouped into buckets.
+
+    A key's hash is the sum of its rows' hashes. Triggers log every row
+    added to or removed from a key in ``digest_changes``, and ``refresh``
+    adds or subtracts just those rows, so a write costs the same however
+    long its chat's history is, and archive blocks are never read back.
+    Two replicas compare bucket hashes first, then key hashes within the
+    differing buckets, and only the keys that differ are transferred.
+    """
+
+    def __init__(self, db_file, buckets=DIGEST_BUCKETS):
+        self.db_file = db_file
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # table -> bucket hashes, rebuilt for buckets holding changed keys
+        self.bucket_cache = {}
+
+    def _get_connection(self):
+        return connect(self.db_file)
+
+    def initialize(self):
+        """Create the digest tables and change-tracking triggers."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+
+            # Keys used to be marked dirty and rehashed from all their rows
+            cursor.execute("DROP TABLE IF EXISTS digest_dirty")
+            cursor.execute("PRAGMA table_info(digest_hashes)")
+            columns = {row[1] for row in cursor.fetchall()}
+            if columns and "rows" not in columns:
+                cursor.execute("DROP TABLE digest_hashes")
+                cursor.execute("DROP TABLE IF EXISTS digest_specs")
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS digest_hashes (
+                    tbl TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    hash BLOB NOT NULL,
+                    rows INTEGER NOT NULL,
+                    PRIMARY KEY (tbl, key)
+                )
+                """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS digest_hashes_bucket ON digest_hashes (tbl, bucket)"
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS digest_changes (
+                    id INTEGER PRIMARY KEY,
+                    tbl TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    sign INTEGER NOT NULL,  -- 1 for a row added, -1 for a row removed
+                    row TEXT NOT NULL
+                )
+                """
+            )
+            # What each table's hashes were computed from
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS digest_specs (
+                    tbl TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL
+                )
+                """
+            )
+
+            # Chats used to be looked up by their key expression
+            cursor.execute("DROP INDEX IF EXISTS messages_digest_key")
+
+            # Recreated every time, so they follow changes to TABLES
+            for table, spec in TABLES.items():
+                for name, source in spec.tables.items():
+                    added = _record(table, source, "NEW.", 1)
+                    removed = _record(table, source, "OLD.", -1)
+                    for event in ("insert", "update", "delete"):
+                        cursor.execute(f"DROP TRIGGER IF EXISTS {name}_digest_{event}")
+                    cursor.execute(
+                        f"CREATE TRIGGER {name}_digest_insert AFTER INSERT ON {name} "
+                        f"BEGIN {added} END"
+                    )
+                    cursor.execute(
+                        f"CREATE TRIGGER {name}_digest_update "
+                        f"AFTER UPDATE OF {', '.join(source.watched)} ON {name} "
+                        f"BEGIN {removed} {added} END"
+                    )
+                    cursor.execute(
+                        f"CREATE TRIGGER {name}_digest_delete AFTER DELETE ON {name} "
+                        f"BEGIN {removed} END"
+                    )
+
+            # First run, or hashes of an older spec: hash the table again
+            for table, spec in TABLES.items():
+                signature = json.dumps([spec.tables, spec.source, spec.order])
+                cursor.execute("SELECT spec FROM digest_specs WHERE tbl = ?", (table,))
+                row = cursor.fetchone()
+                if row and row[0] == signature:
+                    continue
+                self._rehash(cursor, table)
+                cursor.execute(
+                    "INSERT OR REPLACE INTO digest_specs (tbl, spec) VALUES (?, ?)",
+                    (table, signature),
+                )
+            conn.commit()
+
+    def _rehash(self, cursor, table):
+        """Hash every key of ``table`` from all its rows."""
+        # Deleted first: that starts the transaction, so no write is logged
+        # after the rows below are read
+        cursor.execute("DELETE FROM digest_changes WHERE tbl = ?", (table,))
+        cursor.execute("DELETE FROM digest_hashes WHERE tbl = ?", (table,))
+        changes = []
+        for name, source in TABLES[table].tables.items():
+            each = f", {source.each}" if source.each else ""
+            cursor.execute(f"SELECT {source.key}, {source.row} FROM {name}{each}".format(row=""))
+            changes.extend((table, key, 1, row) for key, row in cursor.fetchall())
+        for (_, key), (total, rows) in fold(changes).items():
+            self._store(cursor, table, key, total, rows)
+        self.bucket_cache.pop(table, None)
+
+    def _store(self, cursor, table, key, total, rows):
+        """Save a key's hash, or drop the key once it has no rows."""
+        bucket = bucket_of(key, self.buckets)
+        if rows:
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO digest_hashes (tbl, key, bucket, hash, rows)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (table, key, bucket, (total % HASH_MODULUS).to_bytes(20, "big"), rows),
+            )
+        else:
+            cursor.execute("DELETE FROM digest_hashes WHERE tbl = ? AND key = ?", (table, key))
+        self.bucket_cache.get(table, {}).pop(bucket, None)
+
+    def refresh(self):
+        """Fold the rows changed since the last refresh into their keys' hashes."""
+        with self.lock, self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(id) FROM digest_changes")
+            last = cursor.fetchone()[0]
+            if last is None:
+                return 0
+
+            cursor.execute(
+                "SELECT tbl, key, sign, row FROM digest_changes WHERE id <= ?", (last,)
+            )
+            changed = fold(cursor.fetchall())
+            for (table, key), (total, rows) in changed.items():
+                cursor.execute(
+                    "SELECT hash, rows FROM digest_hashes WHERE tbl = ? AND key = ?", (table, key)
+                )
+                current = cursor.fetchone()
+                if current:
+                    total += int.from_bytes(current[0], "big")
+                    rows += current[1]
+                self._store(cursor, table, key, total, rows)
+            cursor.execute("DELETE FROM digest_changes WHERE id <= ?", (last,))
+            conn.commit()
+            return len(changed)
+
+    def bucket_hashes(self, table):
+        """One hash per bucket of ``table`` (EMPTY_HASH for empty buckets)."""
+        self.refresh()
+        with self.lock:
+            cache = self.bucket_cache.setdefault(table, {})
+            missing = [b for b in range(self.buckets) if b not in cache]
+            if missing:
+                with self._get_connection() as conn:
+                    cursor = conn.cursor()
+                    for bucket in missing:
+                        cursor.execute(
+                            "SELECT key, hash FROM digest_hashes "
+                            "WHERE tbl = ? AND bucket = ? ORDER BY key",
+                            (table, bucket),
+                        )
+                        cache[bucket] = bucket_hash(cursor.fetchall())
+            return [cache[b] for b in range(self.buckets)]
+
+    def key_hashes(self, table, buckets):
+        """{key: hash} for every key of ``table`` in the given buckets."""
+        self.refresh()
+        result = {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for bucket in buckets:
+                cursor.execute(
+                    "SELECT key, hash FROM digest_hashes WHERE tbl = ? AND bucket = ?",
+                    (table, bucket),
+                )
+                result.update(cursor.fetchall())
+        return result
+
+    def rows(self, table, keys):
+        """The rows of ``table`` for each key, as {key: [row, ...]}."""
+        spec = TABLES[table]
+        result = {key: [] for key in keys}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for key in keys:
+                condition, params = spec.lookup(cursor, key)
+                cursor.execute(
+                    f"SELECT {', '.join(spec.columns)} FROM {spec.source} "
+                    f"WHERE {condition} ORDER BY {spec.order}",
+                    params,
+                )
+                result[key] = [list(row) for row in cursor.fetchall()]
+        return result
+
+    def replace(self, table, rows_by_key):
+        """Overwrite the rows of the given keys in one transaction."""
+        spec = TABLES[table]
+        placeholders = ", ".join("?" for _ in spec.columns)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for key, rows in rows_by_key.items():
+                condition, params = spec.lookup(cursor, key)
+                cursor.execute(f"DELETE FROM {spec.source} WHERE {condition}", params)
+                cursor.executemany(
+                    f"INSERT INTO {spec.source} ({', '.join(spec.columns)}) VALUES ({placeholders})",
+                    rows,
+                )
+            conn.commit()
+
+
+class ShardedDigest:
+    """
+    Digest of a ShardedDBManager: users and settings are hashed in its
+    catalog, each chat in the shard that holds it.
+
+    Hashes are those a single database with the same rows would have, so
+    sharded replicas compare with unsharded ones, and with ones that have a
+    different number of shards.
+    """
+
+    # Tables whose rows live in the shards
+    SHARDED = ("messages",)
+
+    def __init__(self, db_file, shard_files, buckets=DIGEST_BUCKETS):
+        self.catalog = MerkleDigest(db_file, buckets)
+        self.shards = [MerkleDigest(shard, buckets) for shard in shard_files]
+        self.buckets = buckets
+
+    def _digests(self, table):
+        return self.shards if table in self.SHARDED else [self.catalog]
+
+    def _by_shard(self, keys):
+        """Keys grouped by the shard holding them."""
+        groups = {}
+        for key in keys:
+            groups.setdefault(shard_of(key, len(self.shards)), []).append(key)
+        return groups
+
+    def initialize(self):
+        for digest in [self.catalog] + self.shards:
+            digest.initialize()
+
+    def refresh(self):
+        return sum(digest.refresh() for digest in [self.catalog] + self.shards)
+
+    def bucket_hashes(self, table):
+        if table not in self.SHARDED:
+            return self.catalog.bucket_hashes(table)
+
+        per_shard = [digest.bucket_hashes(table) for digest in self.shards]
+        hashes = []
+        for bucket in range(self.buckets):
+            held = [shard[bucket] for shard in per_shard if shard[bucket] != EMPTY_HASH]
+            if len(held) <= 1:
+                hashes.append(held[0] if held else EMPTY_HASH)
+            else:
+                # Only when the digest has other buckets than chats are placed by
+                hashes.append(bucket_hash(sorted(self.key_hashes(table, [bucket]).items())))
+        return hashes
+
+    def key_hashes(self, table, buckets):
+        result = {}
+        for digest in self._digests(table):
+            result.update(digest.key_hashes(table, buckets))
+        return result
+
+    def rows(self, table, keys):
+        if table not in self.SHARDED:
+            return self.catalog.rows(table, keys)
+        result = {}
+        for shard, shard_keys in self._by_shard(keys).items():
+            result.update(self.shards[shard].rows(table, shard_keys))
+        return result
+
+    def replace(self, table, rows_by_key):
+        """Overwrite the rows of the given keys, in one transaction per file."""
+        if table not in self.SHARDED:
+            return self.catalog.replace(table, rows_by_key)
+        for shard, keys in self._by_shard(rows_by_key).items():
+            self.shards[shard].replace(table, {key: rows_by_key[key] for key in keys})
@@ -0,0 +1,658 @@
+"""
+In-memory storage engine: users in dicts, each chat a sorted array of
+messages. Nothing survives a restart.
+"""
+
+import bisect
+import functools
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from src.protocol.cursor import decode_cursor, encode_cursor
+from src.services.db_manager import MIN_TRIGRAM_PATTERN, chat_participants, not_in_chat, now_micros
+from src.services.storage import StorageEngine
+
+# Words as FTS5's default unicode61 tokenizer splits them
+_WORD = re.compile(r"[^\W_]+")
+
+# bm25 parameters and snippet length of DBManager.search_messages
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_TOKENS = 12
+
+
+def _fold(word):
+    """Case and diacritics folded away, as unicode61 does."""
+    decomposed = unicodedata.normalize("NFKD", word.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _words(text):
+    """(folded word, start, end) of every word of ``text``."""
+    return [(_fold(m.group()), m.start(), m.end()) for m in _WORD.finditer(text)]
+
+
+def _trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _Chat:
+    """The messages of one chat, ordered by seq."""
+
+    __slots__ = ("seqs", "messages")
+
+    def __init__(self):
+        self.seqs = []
+        self.messages = []
+
+
+class MemoryEngine(StorageEngine):
+    """
+    Storage engine keeping everything in process memory.
+
+    Returns what ``DBManager`` does for every call, search ranks and
+    snippets included, up to floating point rounding. A lock serializes
+    operations, like SQLite's write lock does. A replicated batch holds it
+    throughout and keeps an undo log, so a failed operation is rolled back
+    as its savepoint would be. There is no database file, so such a replica
+    has no digest and does not take part in anti-entropy.
+    """
+
+    def __init__(self, db_file=None, local_users=True):
+        # False when user records are sharded away from the chats that
+        # mention them: recipient checks then rely on deletion tombstones
+        self.local_users = local_users
+        self._lock = threading.RLock()
+        # Undo entries of the replicated batch under way, if any
+        self._undo = None
+
+        # Accounts: username -> {"id", "nickname", "password"}, with the
+        # usernames sorted and a trigram index of usernames and nicknames
+        self._users = {}
+        self._sorted_usernames = []
+        self._trigram_users = {}
+        self._view_limits = {}
+        self._deleted = {}
+
+        # Interned user ids, both ways; never reassigned
+        self._user_ids = {}
+        self._usernames = {}
+
+        # (low user id, high user id) -> _Chat, and user id -> chat keys
+        self._chats = {}
+        self._user_chats = {}
+        self._message_ids = 0
+        self._reserved_seqs = {}
+
+        # Word statistics for bm25: messages containing each word, and
+        # the number of words of all messages
+        self._word_messages = Counter()
+        self._word_total = 0
+
+        self._purge_queue = {}  # user id -> newest message id to purge
+        self._applied = set()  # (operation_id, term)
+        self._applied_heap = []
+
+    def initialize_database(self, conn=None):
+        """Nothing to create."""
+
+    # ---------------------------- Undo log ----------------------------#
+    def _changed(self, undo):
+        if self._undo is not None:
+            self._undo.append(undo)
+
+    def _rollback(self, savepoint):
+        undo, self._undo = self._undo, None
+        while len(undo) > savepoint:
+            undo.pop()()
+        self._undo = undo
+
+    def _set(self, mapping, key, value):
+        if key in mapping:
+            old = mapping[key]
+            self._changed(lambda: mapping.__setitem__(key, old))
+        else:
+            self._changed(lambda: mapping.pop(key, None))
+        mapping[key] = value
+
+    def _next_id(self, counter):
+        """Next value of an id counter; a rolled back write hands it out again."""
+        value = getattr(self, counter)
+        setattr(self, counter, value + 1)
+        self._changed(lambda: setattr(self, counter, value))
+        return value + 1
+
+    def _unset(self, mapping, key):
+        if key in mapping:
+            old = mapping.pop(key)
+            self._changed(lambda: mapping.__setitem__(key, old))
+
+    # ---------------------------- Users ----------------------------#
+    def _intern(self, username):
+        user_id = self._user_ids.get(username)
+        if user_id is None:
+            user_id = len(self._user_ids) + 1
+            self._user_ids[username] = user_id
+            self._usernames[user_id] = username
+            self._changed(lambda: (self._user_ids.pop(username), self._usernames.pop(user_id)))
+        return user_id
+
+    def _put_user(self, username, record):
+        self._users[username] = record
+        bisect.insort(self._sorted_usernames, username)
+        for trigram in _trigrams(username) | _trigrams(record["nickname"]):
+            self._trigram_users.setdefault(trigram, set()).add(username)
+        self._changed(lambda: self._drop_user(username))
+
+    def _drop_user(self, username):
+        record = self._users.pop(username)
+        self._sorted_usernames.pop(bisect.bisect_left(self._sorted_usernames, username))
+        for trigram in _trigrams(username) | _trigrams(record["nickname"]):
+            users = self._trigram_users[trigram]
+            users.discard(username)
+            if not users:
+                del self._trigram_users[trigram]
+        self._changed(lambda: self._put_user(username, record))
+
+    @_locked
+    def add_user(self, username, nickname, password):
+        if not username or not nickname or not password:
+            return {"success": False, "error_message": "All fields are required."}
+        if username in self._users:
+            return {"success": False, "error_message": "Username already taken."}
+
+        # Accounts take their interned id, as in DBManager
+        user_id = self._intern(username)
+        self._put_user(username, {"id": user_id, "nickname": nickname, "password": password})
+        self._set(self._view_limits, username, 6)
+        self._unset(self._deleted, username)
+        return {"success": True, "error_message": ""}
+
+    @_locked
+    def login(self, login_data):
+        username = login_data.get("username")
+        password = login_data.get("password")
+        if not username or not password:
+            return {"success": False, "error_message": "Username and password are required."}
+
+        user = self._users.get(username)
+        if user is None or password != user["password"]:
+            return {"success": False, "error_message": "Invalid username or password."}
+        return {
+            "success": True,
+            "error_message": "",
+            "user_id": user["id"],
+            "nickname": user["nickname"],
+            "view_limit": self._view_limits.get(username, 6),
+        }
+
+    @_locked
+    def delete_user(self, user_id):
+        if user_id in self._users:
+            self._drop_user(user_id)
+        self._unset(self._view_limits, user_id)
+        self._set(self._deleted, user_id, True)
+
+        # As in DBManager, only messages up to now are purged
+        user_key = self._user_ids.get(user_id)
+        if user_key is not None:
+            self._set(self._purge_queue, user_key, self._message_ids)
+        return {"success": True, "error_message": ""}
+
+    @_locked
+    def purge_deleted_users(self, limit):
+        if not self._purge_queue:
+            return 0
+        user_key, up_to = next(iter(self._purge_queue.items()))
+
+        deleted = 0
+        for column in ("sender_id", "receiver_id"):
+            for chat_key in list(self._user_chats.get(user_key, ())):
+                doomed = [
+                    message
+                    for message in self._chats[chat_key].messages
+                    if message[column] == user_key and message["id"] <= up_to
+                ]
+                for message in doomed[:limit - deleted]:
+                    self._remove_message(chat_key, message)
+                    deleted += 1
+            if deleted >= limit:
+                break
+        else:
+            self._unset(self._purge_queue, user_key)
+        return deleted
+
+    @_locked
+    def pending_purges(self):
+        return len(self._purge_queue)
+
+    @_locked
+    def get_all_users(self, exclude_username=None):
+        # In username order, as SQLite reads them from the username index
+        users = [username for username in self._sorted_usernames if username != exclude_username]
+        return {"success": True, "users": users, "error_message": ""}
+
+    @_locked
+    def get_users_to_display(self, current_user, search_pattern="", page=1, users_per_page=10, after=""):
+        page = page if page is not None else 1
+        users_per_page = users_per_page if users_per_page is not None else 10
+
+        try:
+            last_username = decode_cursor(after) if after else None
+        except ValueError:
+            return {"success": False, "users": [], "next_cursor": "", "error_message": "Invalid page cursor"}
+
+        pattern = search_pattern.lower() if search_pattern else ""
+        if not pattern:
+            names = self._sorted_usernames
+        else:
+            if len(pattern) >= MIN_TRIGRAM_PATTERN:
+                postings = sorted(
+                    (self._trigram_users.get(trigram, set()) for trigram in _trigrams(pattern)),
+                    key=len,
+                )
+                candidates = set.intersection(*postings) if postings[0] else set()
+            else:
+                candidates = self._users
+            names = sorted(
+                username
+                for username in candidates
+                if pattern in username.lower() or pattern in self._users[username]["nickname"].lower()
+            )
+
+        # The current user is left out of both the count and the pages
+        position = bisect.bisect_left(names, current_user)
+        listed = position < len(names) and names[position] == current_user
+
+        total = 0
+        if last_username is None:
+            total = len(names) - listed
+            offset = (max(page, 1) - 1) * users_per_page
+            start = offset if not listed or offset < position else offset + 1
+        else:
+            start = bisect.bisect_right(names, last_username)
+
+        rows = []
+        for username in names[start:]:
+            if len(rows) > users_per_page:
+                break
+            if username != current_user:
+                rows.append(username)
+
+        users = rows[:users_per_page]
+        more = len(rows) > users_per_page and users
+        return {
+            "success": True,
+            "users": users,
+            "next_cursor": encode_cursor(users[-1]) if more else "",
+            "total_users": total,
+            "total_pages": -(-total // users_per_page) if users_per_page > 0 else 0,
+            "error_message": "",
+        }
+
+    @_locked
+    def update_view_limit(self, username, new_limit):
+        if username in self._view_limits:
+            self._set(self._view_limits, username, new_limit)
+        return {"success": True, "error_message": ""}
+
+    def save_settings(self, username, message_limit):
+        return self.update_view_limit(username, message_limit)
+
+    @_locked
+    def get_user_message_limit(self, username):
+        return {"message_limit": str(self._view_limits.get(username, 6)), "error_message": ""}
+
+    # ---------------------------- Messages ----------------------------#
+    def _chat_key(self, chat_id, user):
+        """(low, high) user ids of a chat, or None if it can have no messages."""
+        user, other = chat_participants(chat_id, user)
+        if other is None:
+            return self._user_ids.get(user), None, None
+        user_key, other_key = self._user_ids.get(user), self._user_ids.get(other)
+        if user_key is None or other_key is None:
+            return None, None, None
+        return user_key, other_key, (min(user_key, other_key), max(user_key, other_key))
+
+    def _insert_message(self, chat_key, message):
+        chat = self._chats.get(chat_key)
+        if chat is None:
+            chat = self._chats[chat_key] = _Chat()
+            for user_key in chat_key:
+                self._user_chats.setdefault(user_key, set()).add(chat_key)
+        position = bisect.bisect_right(chat.seqs, message["seq"])
+        chat.seqs.insert(position, message["seq"])
+        chat.messages.insert(position, message)
+
+        words = _words(message["content"])
+        self._word_messages.update({word for word, _, _ in words})
+        self._word_total += len(words)
+        self._changed(lambda: self._remove_message(chat_key, message))
+
+    def _remove_message(self, chat_key, message):
+        chat = self._chats[chat_key]
+        position = bisect.bisect_left(chat.seqs, message["seq"])
+        while chat.messages[position] is not message:
+            position += 1
+        del chat.seqs[position]
+        del chat.messages[position]
+        if not chat.messages:
+            del self._chats[chat_key]
+            for user_key in chat_key:
+                self._user_chats[user_key].discard(chat_key)
+
+        words = _words(message["content"])
+        self._word_messages.subtract({word for word, _, _ in words})
+        self._word_total -= len(words)
+        self._changed(lambda: self._insert_message(chat_key, message))
+
+    def _mark_read(self, message):
+        message["read"] = 1
+        self._changed(lambda: message.__setitem__("read", 0))
+
+    def _format(self, message):
+        return {
+            "id": message["id"],
+            "sender": self._usernames[message["sender_id"]],
+            "receiver": self._usernames[message["receiver_id"]],
+            "content": message["content"],
+            "timestamp": message["timestamp"],
+            "read": message["read"],
+            "seq": message["seq"],
+        }
+
+    @_locked
+    def get_chats(self, user_id):
+        user_key = self._user_ids.get(user_id)
+        if user_key is None:
+            return {"success": True, "chats": [], "error_message": ""}
+
+        rows = []
+        for chat_key in self._user_chats.get(user_key, ()):
+            low, high = chat_key
+            if low == high:  # Self-messages
+                continue
+            messages = self._chats[chat_key].messages
+            unread = sum(1 for m in messages if m["receiver_id"] == user_key and not m["read"])
+            last = max(m["timestamp"] for m in messages)
+            rows.append((last, high if low == user_key else low, unread))
+        rows.sort(key=lambda row: row[0], reverse=True)
+
+        chats = []
+        for last, other_key, unread in rows:
+            other_user = self._usernames[other_key]
+            chats.append(
+                {
+                    "chat_id": f"{min(user_id, other_user)}_{max(user_id, other_user)}",
+                    "other_user": other_user,
+                    "unread_count": unread,
+                    "last_message_time": last,
+                }
+            )
+        return {"success": True, "chats": chats, "error_message": ""}
+
+    def start_chat(self, current_user, other_user):
+        chat_id = f"{min(current_user, other_user)}_{max(current_user, other_user)}"
+        return {"success": True, "chat_id": chat_id, "error_message": ""}
+
+    @_locked
+    def next_message_seq(self, chat_id, sender):
+        sender, recipient = chat_participants(chat_id, sender)
+        if recipient is None:
+            # send_chat_message refuses the message
+            return 0
+        chat_name = (min(sender, recipient), max(sender, recipient))
+        _, _, chat_key = self._chat_key(chat_id, sender)
+        chat = self._chats.get(chat_key)
+        last = chat.seqs[-1] if chat else 0
+        seq = max(last, self._reserved_seqs.get(chat_name, 0)) + 1
+        self._reserved_seqs[chat_name] = seq
+        return seq
+
+    @_locked
+    def send_chat_message(self, chat_id, sender, content, timestamp=None, seq=None):
+        if not chat_id or not sender or not content:
+            return {"success": False, "error_message": "Missing required fields."}
+
+        _, recipient = chat_participants(chat_id, sender)
+        if recipient is None:
+            return {"success": False, "error_message": not_in_chat(chat_id, sender)}
+        if sender in self._deleted:
+            return {"success": False, "error_message": f"User '{sender}' has deleted their account."}
+        if self.local_users:
+            recipient_exists = recipient in self._users
+        else:
+            recipient_exists = recipient not in self._deleted
+        if not recipient_exists:
+            return {"success": False, "error_message": f"Cannot send message. User '{recipient}' has deleted their account."}
+
+        sender_key = self._intern(sender)
+        recipient_key = self._intern(recipient)
+        chat_key = (min(sender_key, recipient_key), max(sender_key, recipient_key))
+        if not seq:
+            chat = self._chats.get(chat_key)
+            seq = chat.seqs[-1] + 1 if chat else 1
+
+        message = {
+            "id": self._next_id("_message_ids"),
+            "sender_id": sender_key,
+            "receiver_id": recipient_key,
+            "content": content,
+            "timestamp": timestamp or now_micros(),
+            "seq": seq,
+            "read": 0,
+        }
+        self._insert_message(chat_key, message)
+        return {"success": True, "error_message": ""}
+
+    @_locked
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        if chat_participants(chat_id, current_user)[1] is None:
+            return {"success": False, "messages": [], "error_message": not_in_chat(chat_id, current_user)}
+        user_key, other_key, chat_key = self._chat_key(chat_id, current_user)
+        chat = self._chats.get(chat_key)
+        if chat is None:
+            return {"success": True, "messages": [], "error_message": ""}
+
+        start = bisect.bisect_right(chat.seqs, after_seq or 0)
+        end = bisect.bisect_left(chat.seqs, before_seq) if before_seq else len(chat.seqs)
+        if limit:
+            start = max(start, end - limit)
+        messages = [self._format(message) for message in chat.messages[start:end]]
+
+        # Mark messages as read for the current user
+        for message in chat.messages:
+            if message["receiver_id"] == user_key and message["sender_id"] == other_key and not message["read"]:
+                self._mark_read(message)
+        return {"success": True, "messages": messages, "error_message": ""}
+
+    def _seqs_at(self, chat, message_indices):
+        positions = sorted({i for i in message_indices if 0 <= i < len(chat.seqs)})
+        return [chat.seqs[i] for i in positions]
+
+    @_locked
+    def message_seqs(self, chat_id, message_indices, current_user):
+        _, _, chat_key = self._chat_key(chat_id, current_user)
+        chat = self._chats.get(chat_key)
+        return self._seqs_at(chat, message_indices) if chat else []
+
+    @_locked
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        if chat_participants(chat_id, current_user)[1] is None:
+            return {"success": False, "error_message": not_in_chat(chat_id, current_user)}
+        _, _, chat_key = self._chat_key(chat_id, current_user)
+        chat = self._chats.get(chat_key)
+        if chat is None:
+            return {"success": True, "error_message": ""}
+
+        doomed = set(message_seqs or self._seqs_at(chat, message_indices or []))
+        for message in [m for m in chat.messages if m["seq"] in doomed]:
+            self._remove_message(chat_key, message)
+        return {"success": True, "error_message": ""}
+
+    # ---------------------------- Search ----------------------------#
+    def _containing(self, phrase):
+        """Number of messages containing ``phrase`` (a list of words)."""
+        if len(phrase) == 1:
+            return self._word_messages[phrase[0]]
+        count = 0
+        for chat in self._chats.values():
+            for message in chat.messages:
+                folded = [word for word, _, _ in _words(message["content"])]
+                count += any(
+                    folded[i:i + len(phrase)] == phrase
+                    for i in range(len(folded) - len(phrase) + 1)
+                )
+        return count
+
+    def _score(self, phrases, containing, words):
+        """
+        bm25 of a message (its words given) for the phrases it contains,
+        as FTS5 computes it, and the word ranges they matched; None if it
+        lacks one of them.
+        """
+        count = sum(len(chat.messages) for chat in self._chats.values())
+        # Messages are indexed with their two participant ids
+        average = (self._word_total + 2 * count) / count
+        length = len(words) + 2
+
+        score, spans = 0.0, []
+        folded = [word for word, _, _ in words]
+        for phrase, contain in zip(phrases, containing):
+            hits = [
+                i for i in range(len(folded) - len(phrase) + 1)
+                if folded[i:i + len(phrase)] == phrase
+            ]
+            if not hits:
+                return None, []
+            spans.extend((i, i + len(phrase)) for i in hits)
+            idf = math.log((count - contain + 0.5) / (contain + 0.5))
+            idf = idf if idf > 0 else 1e-6
+            frequency = len(hits)
+            score += idf * frequency * (BM25_K1 + 1) / (
+                frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average)
+            )
+        return -score, sorted(spans)
+
+    def _snippet(self, content, words, spans):
+        """Up to SNIPPET_TOKENS words around the first match, matches in brackets."""
+        first, last = spans[0]
+        start = first - (SNIPPET_TOKENS - (last - first)) // 2
+        start = max(0, min(start, len(words) - SNIPPET_TOKENS))
+        end = min(len(words), start + SNIPPET_TOKENS)
+
+        text_start = 0 if start == 0 else words[start][1]
+        text_end = len(content) if end == len(words) else words[end - 1][2]
+        pieces, position = [], text_start
+        for span_start, span_end in spans:
+            if span_start < start or span_end > end:
+                continue
+            begin, finish = words[span_start][1], words[span_end - 1][2]
+            if begin < position:
+                continue
+            pieces += [content[position:begin], "[", content[begin:finish], "]"]
+            position = finish
+        pieces.append(content[position:text_end])
+        return ("..." if start > 0 else "") + "".join(pieces) + ("..." if end < len(words) else "")
+
+    @_locked
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        page = page or 1
+        page_size = page_size or 20
+        empty = {"success": True, "matches": [], "has_more": False, "error_message": ""}
+        if chat_id and chat_participants(chat_id, current_user)[1] is None:
+            return dict(empty, success=False, error_message=not_in_chat(chat_id, current_user))
+
+        phrases = [[word for word, _, _ in _words(text)] for text in (query or "").split()]
+        user_key = self._user_ids.get(current_user)
+        if user_key is None or not phrases or not all(phrases):
+            return empty
+
+        if chat_id:
+            _, _, chat_key = self._chat_key(chat_id, current_user)
+            chat_keys = [chat_key] if chat_key in self._chats else []
+        else:
+            chat_keys = self._user_chats.get(user_key, ())
+
+        containing = [self._containing(phrase) for phrase in phrases]
+        found = []
+        for chat_key in chat_keys:
+            for message in self._chats[chat_key].messages:
+                words = _words(message["content"])
+                rank, spans = self._score(phrases, containing, words)
+                if rank is not None:
+                    found.append((rank, message["id"], message, words, spans))
+        found.sort(key=lambda entry: entry[:2])
+
+        start = (page - 1) * page_size
+        matches = []
+        for rank, _, message, words, spans in found[start:start + page_size]:
+            match = self._format(message)
+            del match["read"]
+            sender, receiver = match["sender"], match["receiver"]
+            match.update(
+                chat_id=f"{min(sender, receiver)}_{max(sender, receiver)}",
+                snippet=self._snippet(message["content"], words, spans),
+                rank=rank,
+            )
+            matches.append(match)
+        return {
+            "success": True,
+            "matches": matches,
+            "has_more": len(found) > start + page_size,
+            "error_message": "",
+        }
+
+    # ---------------------------- Replicated apply ----------------------------#
+    @_locked
+    def apply_batch(self, operations, keep=None):
+        """
+        Apply consecutive replicated operations atomically, skipping those
+        applied before; see ``DBManager.apply_batch``. An operation whose
+        ``apply()`` returns a falsy value or raises is undone.
+        """
+        results = []
+        self._undo = []
+        try:
+            for term, operation_id, apply in operations:
+                if (operation_id, term) in self._applied:
+                    results.append(None)
+                    continue
+
+                savepoint = len(self._undo)
+                try:
+                    result = apply()
+                except Exception:
+                    result = False
+
+                if result:
+                    self._applied.add((operation_id, term))
+                    heapq.heappush(self._applied_heap, (operation_id, term))
+                    self._changed(lambda key=(operation_id, term): self._applied.discard(key))
+                else:
+                    self._rollback(savepoint)
+                results.append(result)
+
+            if keep is not None and operations:
+                newest = max(operation_id for _, operation_id, _ in operations)
+                while self._applied_heap and self._applied_heap[0][0] <= newest - keep:
+                    self._applied.discard(heapq.heappop(self._applied_heap))
+            return results
+        except Exception:
+            self._rollback(0)
+            raise
+        finally:
+            self._undo = None
@@ -0,0 +1,80 @@
+"""
+Background purge of the messages of deleted accounts.
+"""
+
+import logging
+import threading
+
+from src.replication.config import (
+    PURGE_BATCH_PAUSE,
+    PURGE_BATCH_SIZE,
+    PURGE_IDLE_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UserPurger:
+    """
+    Deletes the messages of deleted users in small batches.
+
+    ``DBManager.delete_user`` only queues a user's messages. Each batch here
+    is its own short transaction, and the purger pauses between batches, so
+    foreground writes wait at most one batch for the write lock. Every
+    replica purges its own database: the deletion itself is replicated.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        batch_size=PURGE_BATCH_SIZE,
+        pause=PURGE_BATCH_PAUSE,
+        idle_interval=PURGE_IDLE_INTERVAL,
+    ):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.pause = pause
+        self.idle_interval = idle_interval
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Metrics
+        self.messages_purged = 0
+        self.batches = 0
+
+    def start(self):
+        """Purge in the background until stop()."""
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="user-purger")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        delay = 0
+        while not self.stop_event.wait(delay):
+            try:
+                delay = self.pause if self.run_batch() else self.idle_interval
+            except Exception as e:
+                logger.warning(f"Purging deleted users failed: {str(e)}")
+                delay = self.idle_interval
+
+    def run_batch(self):
+        """Purge one batch; returns whether deleted users are left to purge."""
+        if not self.db_manager.pending_purges():
+            return False
+        deleted = self.db_manager.purge_deleted_users(self.batch_size)
+        self.batches += 1
+        self.messages_purged += deleted
+        return self.db_manager.pending_purges() > 0
+
+    def stats(self):
+        return {
+            "purge_pending_users": self.db_manager.pending_purges(),
+            "purge_messages": self.messages_purged,
+            "purge_batches": self.batches,
+        }
@@ -2,17 +2,47 @@ import functools
 import grpc
 import logging
 from src.protocol.grpc import chat_pb2
+from src.replication.config import READ_CONSISTENCY
 
 logger = logging.getLogger(__name__)
 
+# Response type returned by each read method, used to build error replies
+READ_RESPONSES = {
+    "Login": chat_pb2.UserResponse,
+    "GetUserMessageLimit": chat_pb2.MessageLimitResponse,
+    "GetUsersToDisplay": chat_pb2.UsersDisplayResponse,
+    "GetChats": chat_pb2.ChatsResponse,
+    "GetMessages": chat_pb2.MessagesResponse,
+    "SearchMessages": chat_pb2.SearchMessagesResponse,
+}
 
-def replicate_to_followers(method_name):
+# Reads that also write locally (GetMessages marks the chat read), which
+# followers must not serve themselves even within the staleness bound
+READS_WITH_SIDE_EFFECTS = {"GetMessages"}
+
+
+def _write_error(method_name, error_message):
+    """Failed response of the type a write method returns."""
+    if method_name in ["Signup", "Login"]:
+        return chat_pb2.UserResponse(success=False, error_message=error_message)
+    elif method_name in ["StartChat"]:
+        return chat_pb2.ChatResponse(success=False, error_message=error_message)
+    elif method_name in ["SendChatMessage"]:
+        return chat_pb2.MessageResponse(success=False, error_message=error_message)
+    else:
+        return chat_pb2.StatusResponse(success=False, error_message=error_message)
+
+
+def replicate_to_followers(method_name, prepare=None):
     """
     Decorator to handle replication of write operations to follower nodes.
 
     Args:
         method_name (str): The name of the method being decorated.
                            Used for logging and forwarding to followers.
+        prepare (callable): Optional ``prepare(self, request)`` run on the
+                            leader before the request is replicated, to fill
+                            in values every replica must apply alike.
 
     Returns:
         Decorated function that handles replication before executing the original method.
@@ -27,67 +57,50 @@ def replicate_to_followers(method_name):
 
             # Handle replication
             try:
+                # Followers proxy the write to the leader and relay its answer
+                if self.replica.state.role != "leader":
+                    response = self.replica.forward_to_leader(
+                        method_name, request, context
+                    )
+                    if response is not None:
+                        return response
+
                 logger.info(
                     f"Request to {method_name} is of type: {str(type(request))}"
                 )
+                if prepare:
+                    prepare(self, request)
                 serialized_request = request.SerializeToString()
                 success = self.replica.replicate_to_followers(
                     "ChatServicer", method_name, serialized_request
                 )
 
+                if not success and self.replica.state.role == "leader":
+                    # Without a quorum the leader does not apply the write either
+                    context.set_code(grpc.StatusCode.UNAVAILABLE)
+                    context.set_details(
+                        "Operation did not reach a majority of replicas; client should retry"
+                    )
+                    return _write_error(
+                        method_name, "Could not replicate to a majority of replicas"
+                    )
                 if not success:
-                    # This happens when we are follower replica, and we
-                    # couldn't forward this to a known leader. So client should retry
+                    # This happens when we are follower replica, and forwarding
+                    # to the known leader failed. So client should retry
                     context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
                     context.set_details(
                         "Operation must be performed on leader, and we couldn't forward it to a known leader; client should retry"
                     )
-
-                    # Return appropriate response type based on method
-                    if method_name in ["Signup", "Login"]:
-                        return chat_pb2.UserResponse(
-                            success=False,
-                            error_message="Contacted followers but couldn't forward",
-                        )
-                    elif method_name in ["StartChat"]:
-                        return chat_pb2.ChatResponse(
-                            success=False,
-                            error_message="Contacted followers but couldn't forward",
-                        )
-                    elif method_name in ["SendChatMessage"]:
-                        return chat_pb2.MessageResponse(
-                            success=False,
-                            error_message="Contacted followers but couldn't forward",
-                        )
-                    else:
-                        return chat_pb2.StatusResponse(
-                            success=False,
-                            error_message="Contacted followers but couldn't forward",
-                        )
+                    # Tell the client who the leader is so it can redirect directly
+                    context.set_trailing_metadata(self.replica.get_leader_hint())
+                    return _write_error(
+                        method_name, "Contacted followers but couldn't forward"
+                    )
             except Exception as e:
                 logger.error(f"Error replicating to followers in {method_name}: {e}")
-
-                # Return appropriate response type based on method
-                if method_name in ["Signup", "Login"]:
-                    return chat_pb2.UserResponse(
-                        success=False,
-                        error_message=f"Error 500: Internal Server Error: {e}",
-                    )
-                elif method_name in ["StartChat"]:
-                    return chat_pb2.ChatResponse(
-                        success=False,
-                        error_message=f"Error 500: Internal Server Error: {e}",
-                    )
-                elif method_name in ["SendChatMessage"]:
-                    return chat_pb2.MessageResponse(
-                        success=False,
-                        error_message=f"Error 500: Internal Server Error: {e}",
-                    )
-                else:
-                    return chat_pb2.StatusResponse(
-                        success=False,
-                        error_message=f"Error 500: Internal Server Error: {e}",
-                    )
+                return _write_error(
+                    method_name, f"Error 500: Internal Server Error: {e}"
+                )
 
             logger.info(
                 f"ChatServicer.{method_name}: replication handled, now handling locally"
@@ -97,3 +110,75 @@ def replicate_to_followers(method_name):
         return wrapper
 
     return decorator
+
+
+def linearizable_read(method_name):
+    """
+    Decorator to serve read operations with linearizable consistency.
+
+    The leader answers from its local database while it holds a read lease,
+    and confirms its leadership with a quorum round when the lease has lapsed.
+    Followers forward the read to the leader, unless the client asked for
+    bounded staleness and they are within MAX_READ_LAG of the leader. With
+    READ_CONSISTENCY set to "local" every replica answers from its own database.
+
+    Args:
+        method_name (str): The name of the method being decorated.
+                           Used for logging and forwarding to the leader.
+
+    Returns:
+        Decorated function that checks read consistency before executing the original method.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, context, *args, **kwargs):
+            # Skip the consistency check if not in replica mode
+            if not self.replica or READ_CONSISTENCY != "linearizable":
+                return func(self, request, context, *args, **kwargs)
+
+            response_type = READ_RESPONSES[method_name]
+            try:
+                if self.replica.state.role == "leader":
+                    if self.replica.ensure_read_lease():
+                        return func(self, request, context, *args, **kwargs)
+
+                    # Couldn't reach a majority: we may have been deposed
+                    context.set_code(grpc.StatusCode.UNAVAILABLE)
+                    context.set_details(
+                        "Leadership could not be confirmed for a consistent read; client should retry"
+                    )
+                    return response_type(
+                        error_message="Leadership could not be confirmed"
+                    )
+
+                # Clients that accept bounded staleness can read from us
+                if (
+                    method_name not in READS_WITH_SIDE_EFFECTS
+                    and self.replica.can_serve_bounded_read(context)
+                ):
+                    return func(self, request, context, *args, **kwargs)
+
+                response = self.replica.forward_to_leader(
+                    method_name, request, context
+                )
+                if response is not None:
+                    return response
+
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details(
+                    "Read must be performed on leader, and we couldn't forward it to a known leader; client should retry"
+                )
+                context.set_trailing_metadata(self.replica.get_leader_hint())
+                return response_type(
+                    error_message="Contacted followers but couldn't forward"
+                )
+            except Exception as e:
+                logger.error(f"Error serving consistent read in {method_name}: {e}")
+                return response_type(
+                    error_message=f"Error 500: Internal Server Error: {e}"
+                )
+
+        return wrapper
+
+    return decorator
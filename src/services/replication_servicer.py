@@ -4,10 +4,15 @@ server replicas.
 """
 
 import grpc
+import json
 import logging
 
 from src.protocol.grpc import replication_pb2 as replication
 from src.protocol.grpc import replication_pb2_grpc
+from src.replication.config import ELECTION_TIMEOUT_MIN
+from src.replication.metrics import stats_to_proto
+from src.services.digest import TABLES, MerkleDigest, ShardedDigest
+from src.services.state_machine import ChatStateMachine
 
 
 logger = logging.getLogger(__name__)
@@ -16,13 +21,44 @@ logger = logging.getLogger(__name__)
 class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
     """Replication service implementation for handling replication"""
 
-    def __init__(self, replica, chat_servicer=None):
+    def __init__(self, replica, chat_servicer=None, shard_map=None, group_id="", purger=None, archiver=None):
         self.replica = replica
         self.replica_state = replica.state
         self.chat_servicer = chat_servicer
+        # Routing table of a sharded deployment, served by GetNetworkState
+        self.shard_map = shard_map
+        self.group_id = group_id
+        # Background purge of deleted accounts, reported with the stats
+        self.purger = purger
+        # Background archival of cold messages, reported with the stats
+        self.archiver = archiver
+        # Replicated writes are applied to the database directly, not
+        # through the ChatServicer
+        self.state_machine = (
+            ChatStateMachine(chat_servicer.api.db_manager) if chat_servicer else None
+        )
+        # Database digest compared by anti-entropy; in-memory replicas have none
+        self.digest = None
+        db_manager = chat_servicer.api.db_manager if chat_servicer else None
+        if db_manager and db_manager.shard_files:
+            self.digest = ShardedDigest(db_manager.db_file, db_manager.shard_files)
+        elif db_manager and db_manager.db_file:
+            self.digest = MerkleDigest(db_manager.db_file)
+        if self.digest:
+            self.digest.initialize()
 
     def Heartbeat(self, request, context):
         """Process heartbeat from another server."""
+        # Consensus state is only touched on the replica's actor
+        return self.replica.run_on_actor(self.handle_heartbeat, request)
+
+    def handle_heartbeat(self, request):
+        """
+        Apply a heartbeat (or vote request) to the consensus state.
+
+        Runs on the consensus actor; the in-memory simulation delivers
+        heartbeats here directly.
+        """
         # Reset election timer on receiving heartbeat
         self.replica.election_manager.reset_election_timer()
 
@@ -40,6 +76,19 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
         else:
             self.replica_state.servers_info[peer_id].role = peer_role
 
+        # While a live leader exists, ignore vote requests without touching our
+        # term, so a rival can't be elected while the leader's read lease holds
+        if peer_role == "candidate" and self._leader_is_alive():
+            logger.info(
+                f"Ignoring vote request from {peer_id} for term {peer_term}: leader {self.replica_state.leader_id} is alive"
+            )
+            return replication.HeartbeatResponse(
+                success=False,
+                server_id=self.replica_state.server_id,
+                term=self.replica_state.term,
+                role=self.replica_state.role,
+            )
+
         # If the peer has a higher term, update our term and become follower
         if peer_term > self.replica_state.term:
             logger.info(
@@ -68,18 +117,78 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
 
         # If peer is a leader and term is valid, acknowledge leadership
         if peer_role == "leader" and peer_term >= self.replica_state.term:
-            if self.replica_state.leader_id != peer_id:
-                logger.info(f"Acknowledging {peer_id} as leader for term {peer_term}")
-                self.replica_state.leader_id = peer_id
-                self.replica_state.role = "follower"
-                self.replica_state.term = peer_term
-                self.replica_state.voted_for = None
+            self._acknowledge_leader(peer_id, peer_term)
+            self.replica_state.leader_operation_id = request.last_operation_id
 
         return replication.HeartbeatResponse(
             success=True,
             server_id=self.replica_state.server_id,
             term=self.replica_state.term,
             role=self.replica_state.role,
+            applied_operation_id=self.replica_state.last_applied_operation_id,
+        )
+
+    def _acknowledge_leader(self, peer_id, peer_term):
+        """Follow peer_id as leader of peer_term and note that we heard from it."""
+        if self.replica_state.leader_id != peer_id:
+            logger.info(f"Acknowledging {peer_id} as leader for term {peer_term}")
+            self.replica_state.leader_id = peer_id
+            self.replica_state.role = "follower"
+            self.replica_state.term = peer_term
+            self.replica_state.voted_for = None
+        self.replica_state.last_leader_contact = self.replica_state.clock()
+        self.replica.election_manager.leader_heard()
+
+    def handle_replication_contact(self, request):
+        """
+        A ReplicateOperation from the current leader doubles as its heartbeat,
+        so the leader can skip explicit heartbeats while writes flow. Runs on
+        the consensus actor.
+        """
+        if request.term < self.replica_state.term:
+            return
+        self.replica.election_manager.reset_election_timer()
+        self._acknowledge_leader(request.server_id, request.term)
+        self.replica_state.leader_operation_id = max(
+            self.replica_state.leader_operation_id, request.operation_id
+        )
+
+    def PreVote(self, request, context):
+        """Say whether we would vote for the sender, without changing our state."""
+        return self.replica.run_on_actor(self.handle_pre_vote, request)
+
+    def handle_pre_vote(self, request):
+        """
+        Grant a pre-vote when the sender's proposed term is ahead of ours, we
+        have no live leader and the sender has applied at least as much as us.
+        Runs on the consensus actor; nothing is changed either way.
+        """
+        granted = (
+            request.term > self.replica_state.term
+            and not self._leader_is_alive()
+            and request.last_operation_id
+            >= self.replica_state.last_applied_operation_id
+        )
+        if not granted:
+            logger.debug(
+                f"Refusing pre-vote from {request.server_id} for term {request.term}"
+            )
+
+        return replication.PreVoteResponse(
+            granted=granted,
+            server_id=self.replica_state.server_id,
+            term=self.replica_state.term,
+        )
+
+    def _leader_is_alive(self):
+        """True if we are a leased leader or heard from our leader recently."""
+        if self.replica_state.role == "leader":
+            return self.replica.lease_manager.is_valid()
+
+        return (
+            bool(self.replica_state.leader_id)
+            and self.replica_state.clock() - self.replica_state.last_leader_contact
+            < ELECTION_TIMEOUT_MIN
         )
 
     def JoinNetwork(self, request, context):
@@ -110,14 +219,22 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
                     logger.error(f"Error forwarding join request to leader: {str(e)}")
                     context.set_code(grpc.StatusCode.UNAVAILABLE)
                     context.set_details("Leader unavailable. Try again later.")
+                    context.set_trailing_metadata(self.replica.get_leader_hint())
                     return replication.JoinResponse(success=False)
             else:
                 context.set_code(grpc.StatusCode.UNAVAILABLE)
                 context.set_details(
                     "Cannot process join request: not the leader and no leader known"
                 )
+                context.set_trailing_metadata(self.replica.get_leader_hint())
                 return replication.JoinResponse(success=False)
 
+        return self.replica.run_on_actor(
+            self._add_server, new_server_id, new_server_address
+        )
+
+    def _add_server(self, new_server_id, new_server_address):
+        """Add a joining server to the membership (leader only, on the actor)."""
         # If server ID already exists, ignore the request
         if (
             new_server_id in self.replica_state.peers
@@ -179,14 +296,71 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
         """Return the current state of the network."""
         logger.info(f"Received network state request from {request.server_id}")
 
+        # Our own entry reflects what we have applied right now
+        own_info = self.replica_state.servers_info.get(self.replica_state.server_id)
+        if own_info is not None:
+            own_info.role = self.replica_state.role
+            own_info.applied_operation_id = (
+                self.replica_state.last_applied_operation_id
+            )
+            own_info.lag = self.replica_state.replication_lag()
+
         return replication.NetworkStateResponse(
             servers=list(self.replica_state.servers_info.values()),
             leader_id=(
                 self.replica_state.leader_id if self.replica_state.leader_id else ""
             ),
             term=self.replica_state.term,
+            shards=self.shard_map.to_proto() if self.shard_map else [],
+            group_id=self.group_id,
         )
 
+    def GetDigest(self, request, context):
+        """Bucket hashes of a table, or the key hashes in the requested buckets."""
+        if not self._check_digest_table(request.table, context):
+            return replication.DigestResponse()
+
+        if not request.buckets:
+            return replication.DigestResponse(
+                bucket_hashes=self.digest.bucket_hashes(request.table)
+            )
+
+        key_hashes = self.digest.key_hashes(request.table, request.buckets)
+        return replication.DigestResponse(
+            keys=[
+                replication.KeyHash(key=key, hash=digest)
+                for key, digest in key_hashes.items()
+            ]
+        )
+
+    def GetRows(self, request, context):
+        """Rows of the requested keys of a table, for anti-entropy repair."""
+        if not self._check_digest_table(request.table, context):
+            return replication.RowsResponse()
+
+        rows = self.digest.rows(request.table, list(request.keys))
+        return replication.RowsResponse(rows_json=json.dumps(rows))
+
+    def _check_digest_table(self, table, context):
+        if self.digest is None or table not in TABLES:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"No digest for table {table!r}")
+            return False
+        return True
+
+    def collect_stats(self):
+        """Replication statistics, with the progress of the account purge and archive."""
+        stats = self.replica.get_replication_stats()
+        if self.purger:
+            stats.update(self.purger.stats())
+        if self.archiver:
+            stats.update(self.archiver.stats())
+        return stats
+
+    def GetReplicationStats(self, request, context):
+        """Lag, latency and election statistics, for tuning the timeouts."""
+        return stats_to_proto(self.collect_stats())
+
     def ReplicateOperation(self, request, context):
         """Handle replicated operations from the leader"""
         try:
@@ -199,42 +373,40 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
                 f"Received replicated operation: {service_name}.{method_name} (ID: {operation_id})"
             )
 
-            # Create a dummy context
-            class DummyContext:
-                def set_code(self, code):
-                    pass
-
-                def set_details(self, details):
-                    pass
-
-            dummy_context = DummyContext()
-
-            # Get the appropriate service
-            service = None
-            if service_name == "ChatServicer":
-                service = self.chat_servicer
-            else:
-                logger.error(f"Unknown service: {service_name}")
+            # Reject operations from a deposed leader, pointing it at the new one
+            if request.term < self.replica_state.term:
+                logger.warning(
+                    f"Rejecting operation {operation_id} from {request.server_id}: stale term {request.term} < {self.replica_state.term}"
+                )
+                context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+                context.set_details("Stale term: sender is no longer the leader")
+                context.set_trailing_metadata(self.replica.get_leader_hint())
                 return replication.OperationResponse(
                     success=False, server_id=self.replica_state.server_id
                 )
 
-            # Deserialize the request based on service and method
-            request_obj = self._deserialize_request(
-                service_name, method_name, serialized_request
-            )
-            if not request_obj:
-                logger.error(
-                    f"Failed to deserialize request for {service_name}.{method_name}"
-                )
+            # The leader is alive: this counts as its heartbeat
+            self.replica.run_on_actor(self.handle_replication_contact, request)
+
+            if self.state_machine is None:
+                logger.error(f"No state machine to apply {service_name}.{method_name}")
                 return replication.OperationResponse(
                     success=False, server_id=self.replica_state.server_id
                 )
 
-            # Call the method without triggering replication
-            success = self._execute_without_replication(
-                service, method_name, request_obj, dummy_context
+            # Apply at most once: leader retries of an applied operation are skipped
+            success = self.state_machine.apply(
+                request.term, operation_id, service_name, method_name, serialized_request
             )
+            if success is None:
+                logger.info(
+                    f"Skipping duplicate operation {operation_id} from term {request.term}"
+                )
+                success = True
+            if success:
+                self.replica.run_on_actor(
+                    self.replica_state.record_applied, operation_id
+                )
 
             logger.info(
                 f"Successfully processed replicated operation: {service_name}.{method_name} (ID: {operation_id})"
@@ -249,55 +421,3 @@ class ReplicationServicer(replication_pb2_grpc.ReplicationServiceServicer):
             return replication.OperationResponse(
                 success=False, server_id=self.replica_state.server_id
             )
-
-    def _deserialize_request(self, service_name, method_name, serialized_request):
-        """Deserialize request based on service and method name"""
-        from src.protocol.grpc import chat_pb2
-
-        # Map for ChatServicer methods
-        if service_name == "ChatServicer":
-            request_classes = {
-                "Signup": chat_pb2.SignupRequest,
-                "Login": chat_pb2.LoginRequest,
-                "DeleteUser": chat_pb2.DeleteUserRequest,
-                "GetUserMessageLimit": chat_pb2.GetUserMessageLimitRequest,
-                "SaveSettings": chat_pb2.SaveSettingsRequest,
-                "GetUsersToDisplay": chat_pb2.GetUsersToDisplayRequest,
-                "GetChats": chat_pb2.GetChatsRequest,
-                "StartChat": chat_pb2.StartChatRequest,
-                "GetMessages": chat_pb2.GetMessagesRequest,
-                "SendChatMessage": chat_pb2.SendMessageRequest,
-                "DeleteMessages": chat_pb2.DeleteMessagesRequest,
-            }
-
-            if method_name in request_classes:
-                request_class = request_classes[method_name]
-                request_obj = request_class()
-                request_obj.ParseFromString(serialized_request)
-                return request_obj
-
-        return None
-
-    def _execute_without_replication(self, service, method_name, request_obj, context):
-        """Execute a method without triggering replication"""
-        try:
-            # Check if the method exists
-            if not hasattr(service, method_name):
-                logger.error(f"Method {method_name} not found on service")
-                return False
-
-            method = getattr(service, method_name)
-
-            # Temporarily disable replication
-            original_replica = service.replica
-            try:
-                # the evil move lol
-                service.replica = None
-                method(request_obj, context)
-                return True
-            finally:
-                # Rerestore the replica
-                service.replica = original_replica
-        except Exception as e:
-            logger.error(f"Error executing method {method_name}: {str(e)}")
-            return False
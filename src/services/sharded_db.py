@@ -0,0 +1,266 @@
+"""
+Storage engine that spreads a replica's messages across several SQLite files.
+"""
+
+import heapq
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from src.replication.config import DATABASE_SHARDS, DIGEST_BUCKETS
+from src.services.db_manager import DATABASE_FILE, DBManager, chat_participants, connect, not_in_chat
+
+
+def shard_file(db_file, index):
+    """File of shard ``index`` next to the catalog ``db_file``."""
+    root, ext = os.path.splitext(db_file)
+    return f"{root}.shard{index}{ext}"
+
+
+def shard_of(chat_key, shards):
+    """
+    Shard holding the chat whose id is ``chat_key``. Chats are placed by
+    their digest bucket, so each bucket of the messages digest lives in one
+    shard.
+    """
+    return zlib.crc32(chat_key.encode("utf-8")) % DIGEST_BUCKETS % shards
+
+
+class ShardedDBManager(DBManager):
+    """
+    A DBManager whose messages live in ``shards`` SQLite files, each chat in
+    the one its id hashes to.
+
+    Its own file is the catalog: users, settings and deletion tombstones,
+    which every request checks but few write. Each shard is a DBManager of
+    its own that only holds messages. Every shard has its own write lock,
+    so messages to different chats are written in parallel. A user's chat
+    list and searches across chats read every shard in parallel and merge
+    the results.
+    """
+
+    def __init__(self, db_file=DATABASE_FILE, local_users=True, shards=DATABASE_SHARDS):
+        super().__init__(db_file, local_users)
+        # Users are checked in the catalog before a message reaches its shard
+        self.shards = [DBManager(shard_file(db_file, i), local_users=False) for i in range(shards)]
+        self.shard_files = [shard.db_file for shard in self.shards]
+        self._pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="db-shard")
+
+    def initialize_database(self, conn=None):
+        super().initialize_database()
+        for shard in self.shards:
+            shard.initialize_database()
+
+    def _shard(self, chat_id, user):
+        """The shard holding a chat."""
+        user, other = chat_participants(chat_id, user)
+        if other is None:
+            # Any shard refuses a chat the user is not in
+            return self.shards[0]
+        return self.shards[shard_of(f"{min(user, other)}_{max(user, other)}", len(self.shards))]
+
+    # ---------------------------- Replicated apply ----------------------------#
+    def apply_batch(self, operations, keep=None):
+        """
+        Apply consecutive replicated operations, each at most once; see
+        ``DBManager.apply_batch``.
+
+        The batch runs in one transaction per file. An operation is recorded
+        in the catalog and in each shard it wrote to. The shards commit
+        before the catalog. If a crash comes between those commits, the
+        retried operation finds its record in the shards that committed, and
+        its writes there are undone rather than applied twice.
+        """
+        managers = [self] + self.shards
+        conns = [connect(manager.db_file, isolation_level=None) for manager in managers]
+        results = []
+        recorded = {0}
+        try:
+            conns[0].execute("BEGIN IMMEDIATE")
+            # Shards only take their write lock once written to
+            for conn in conns[1:]:
+                conn.execute("BEGIN")
+
+            for term, operation_id, apply in operations:
+                applied = [
+                    conn.execute(
+                        "SELECT 1 FROM applied_operations WHERE operation_id = ? AND term = ?",
+                        (operation_id, term),
+                    ).fetchone() is not None
+                    for conn in conns
+                ]
+                if applied[0]:
+                    results.append(None)
+                    continue
+
+                changes = []
+                for manager, conn in zip(managers, conns):
+                    conn.execute("SAVEPOINT apply_operation")
+                    changes.append(conn.total_changes)
+                    manager._apply.conn = conn
+                try:
+                    result = apply()
+                except Exception:
+                    result = False
+                finally:
+                    for manager in managers:
+                        manager._apply.conn = None
+
+                for i, (manager, conn) in enumerate(zip(managers, conns)):
+                    wrote = conn.total_changes != changes[i]
+                    if result and not applied[i] and (wrote or i == 0):
+                        conn.execute(
+                            "INSERT INTO applied_operations (operation_id, term) VALUES (?, ?)",
+                            (operation_id, term),
+                        )
+                        recorded.add(i)
+                    elif not result or applied[i]:
+                        conn.execute("ROLLBACK TO apply_operation")
+                        manager._forget_user_ids()
+                    conn.execute("RELEASE apply_operation")
+                results.append(result)
+
+            if keep is not None and operations:
+                newest = max(operation_id for _, operation_id, _ in operations)
+                for i in recorded:
+                    conns[i].execute(
+                        "DELETE FROM applied_operations WHERE operation_id <= ?",
+                        (newest - keep,),
+                    )
+            for conn in conns[1:] + conns[:1]:
+                conn.commit()
+            return results
+        except Exception:
+            for manager, conn in zip(managers, conns):
+                if conn.in_transaction:
+                    conn.rollback()
+                manager._forget_user_ids()
+            raise
+        finally:
+            for conn in conns:
+                conn.close()
+
+    # ---------------------------- Users ----------------------------#
+    def delete_user(self, user_id):
+        """
+        Delete a user from the catalog at once, and queue their messages in
+        every shard for ``purge_deleted_users``.
+        """
+        with self._get_connection() as conn:
+            self._remove_account(conn.cursor(), user_id)
+            conn.commit()
+        for shard in self.shards:
+            with shard._get_connection() as conn:
+                shard._queue_purge(conn.cursor(), user_id)
+                conn.commit()
+        return {"success": True, "error_message": ""}
+
+    def purge_deleted_users(self, limit):
+        """Delete up to ``limit`` messages of deleted users, shard by shard."""
+        deleted = 0
+        for shard in self.shards:
+            if deleted >= limit:
+                break
+            deleted += shard.purge_deleted_users(limit - deleted)
+        return deleted
+
+    def pending_purges(self):
+        """Number of deleted users whose messages are still being purged in any shard."""
+        usernames = set()
+        for shard in self.shards:
+            with shard._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT u.username FROM purge_queue q JOIN user_ids u ON u.id = q.user_id"
+                )
+                usernames.update(row[0] for row in cursor.fetchall())
+        return len(usernames)
+
+    # ---------------------------- Archive ----------------------------#
+    def archive_candidates(self, keep, older_than, block_size, scan=10_000):
+        """Chats of every shard that may have a cold block, as ``(shard, chat)``."""
+        return [
+            (i, chat)
+            for i, shard in enumerate(self.shards)
+            for chat in shard.archive_candidates(keep, older_than, block_size, scan)
+        ]
+
+    def archive_chat(self, chat, keep, older_than, block_size):
+        shard, pair = chat
+        return self.shards[shard].archive_chat(pair, keep, older_than, block_size)
+
+    # ---------------------------- Chats and messages ----------------------------#
+    def get_chats(self, user_id):
+        """A user's chats from every shard, most recent first; see ``DBManager.get_chats``."""
+        try:
+            per_shard = self._pool.map(lambda shard: shard._recent_chats(user_id), self.shards)
+            chats = heapq.merge(*per_shard, key=lambda chat: chat[0], reverse=True)
+            return {"success": True, "chats": [chat for _, chat in chats], "error_message": ""}
+        except Exception as e:
+            return {"success": False, "chats": [], "error_message": str(e)}
+
+    def start_chat(self, current_user, other_user):
+        return self._shard(f"{current_user}_{other_user}", current_user).start_chat(current_user, other_user)
+
+    def next_message_seq(self, chat_id, sender):
+        return self._shard(chat_id, sender).next_message_seq(chat_id, sender)
+
+    def send_chat_message(self, chat_id, sender, content, timestamp=None, seq=None):
+        if not chat_id or not sender or not content:
+            return {"success": False, "error_message": "Missing required fields."}
+
+        # Only read from the catalog, so senders in different shards never wait on it
+        _, recipient = chat_participants(chat_id, sender)
+        if recipient is None:
+            return {"success": False, "error_message": not_in_chat(chat_id, sender)}
+        with self._get_connection() as conn:
+            error = self._check_participants(conn.cursor(), sender, recipient)
+        if error:
+            return {"success": False, "error_message": error}
+        return self._shard(chat_id, sender).send_chat_message(chat_id, sender, content, timestamp, seq)
+
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        return self._shard(chat_id, current_user).get_messages(
+            chat_id, current_user, after_seq, before_seq, limit
+        )
+
+    def message_seqs(self, chat_id, message_indices, current_user):
+        return self._shard(chat_id, current_user).message_seqs(chat_id, message_indices, current_user)
+
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        return self._shard(chat_id, current_user).delete_messages(
+            chat_id, message_indices, current_user, message_seqs
+        )
+
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        """
+        Full-text search of a user's messages; see ``DBManager.search_messages``.
+
+        A search without a chat takes every shard's best matches down to the
+        end of the page and merges them by rank. Each shard ranks against
+        its own index, as each group does in a sharded cluster.
+        """
+        if chat_id:
+            return self._shard(chat_id, current_user).search_messages(
+                current_user, query, chat_id, page, page_size
+            )
+
+        page = page or 1
+        page_size = page_size or 20
+        results = list(
+            self._pool.map(
+                lambda shard: shard.search_messages(current_user, query, "", 1, page * page_size),
+                self.shards,
+            )
+        )
+        for result in results:
+            if not result["success"]:
+                return result
+
+        matches = list(heapq.merge(*(result["matches"] for result in results), key=lambda m: m["rank"]))
+        return {
+            "success": True,
+            "matches": matches[(page - 1) * page_size : page * page_size],
+            "has_more": len(matches) > page * page_size or any(result["has_more"] for result in results),
+            "error_message": "",
+        }
@@ -0,0 +1,156 @@
+"""
+Apply path for replicated ChatServicer writes on followers.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import logging
+import threading
+
+from src.protocol.grpc import chat_pb2
+from src.replication.config import APPLY_BATCH_SIZE, APPLY_DEDUP_WINDOW
+
+logger = logging.getLogger(__name__)
+
+# Replicated method -> (request message, DBManager mutation). Mirrors the
+# ChatServicer write methods the leader ran.
+CHAT_OPERATIONS = {
+    "Signup": (
+        chat_pb2.SignupRequest,
+        lambda db, r: db.add_user(r.username, r.nickname, r.password),
+    ),
+    "DeleteUser": (
+        chat_pb2.DeleteUserRequest,
+        lambda db, r: db.delete_user(r.username),
+    ),
+    "SaveSettings": (
+        chat_pb2.SaveSettingsRequest,
+        lambda db, r: db.save_settings(r.username, r.message_limit),
+    ),
+    "StartChat": (
+        chat_pb2.StartChatRequest,
+        lambda db, r: db.start_chat(r.current_user, r.other_user),
+    ),
+    "SendChatMessage": (
+        chat_pb2.SendMessageRequest,
+        lambda db, r: db.send_chat_message(
+            r.chat_id, r.sender, r.content, r.timestamp, r.seq
+        ),
+    ),
+    "DeleteMessages": (
+        chat_pb2.DeleteMessagesRequest,
+        lambda db, r: db.delete_messages(
+            r.chat_id, list(r.message_indices), r.current_user, list(r.message_seqs)
+        ),
+    ),
+}
+
+
+class ChatStateMachine:
+    """
+    Applies replicated ChatServicer operations straight to the DBManager.
+
+    Operations are decoded through a precomputed method table and never go
+    through the ChatServicer, so no servicer state is touched and no gRPC
+    response is built. Concurrent deliveries are group-committed: the caller
+    that finds no batch in progress applies everything queued, up to
+    ``max_batch`` operations per transaction, while the others wait for
+    their result.
+    """
+
+    def __init__(self, db_manager, max_batch=APPLY_BATCH_SIZE, keep=APPLY_DEDUP_WINDOW):
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        # Applied operation ids remembered to drop leader retries
+        self.keep = keep
+
+        self.lock = threading.Lock()
+        self.queue = collections.deque()  # (term, operation_id, apply, future)
+        self.applying = False
+
+        # Metrics
+        self.batches = 0
+        self.operations_applied = 0
+
+    def decode(self, service_name, method_name, serialized_request):
+        """The mutation for a replicated operation, or None if it is unknown."""
+        if service_name != "ChatServicer":
+            logger.error(f"Unknown service: {service_name}")
+            return None
+
+        operation = CHAT_OPERATIONS.get(method_name)
+        if operation is None:
+            logger.error(f"No apply path for {service_name}.{method_name}")
+            return None
+
+        request_class, mutation = operation
+        try:
+            request = request_class.FromString(serialized_request)
+        except Exception as e:
+            logger.error(
+                f"Failed to deserialize request for {service_name}.{method_name}: {str(e)}"
+            )
+            return None
+        return functools.partial(self._run, method_name, mutation, request)
+
+    def apply(self, term, operation_id, service_name, method_name, serialized_request):
+        """
+        Apply a replicated operation at most once.
+
+        Returns:
+            None if it had already been applied, True once applied (or
+            refused by the engine), and False if it could not be decoded or
+            raised while applied.
+        """
+        apply = self.decode(service_name, method_name, serialized_request)
+        if apply is None:
+            return False
+
+        future = concurrent.futures.Future()
+        with self.lock:
+            self.queue.append((term, operation_id, apply, future))
+            lead = not self.applying
+            self.applying = True
+
+        if lead:
+            self._drain()
+        return future.result()
+
+    def _drain(self):
+        """Apply queued operations batch by batch until the queue is empty."""
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.applying = False
+                    return
+                batch = [
+                    self.queue.popleft()
+                    for _ in range(min(len(self.queue), self.max_batch))
+                ]
+
+            try:
+                results = self.db_manager.apply_batch(
+                    [(term, operation_id, apply) for term, operation_id, apply, _ in batch],
+                    self.keep,
+                )
+            except Exception as e:
+                logger.error(f"Error applying batch of {len(batch)} operations: {str(e)}")
+                results = [False] * len(batch)
+
+            self.batches += 1
+            self.operations_applied += sum(1 for result in results if result)
+            for (_, _, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run(self, method_name, mutation, request):
+        try:
+            result = mutation(self.db_manager, request)
+        except Exception as e:
+            logger.error(f"Error applying {method_name}: {str(e)}")
+            return False
+        # Every replica refuses the same writes (a taken username, an unknown
+        # recipient), so a refusal is this operation's outcome: record it
+        if not result.get("success"):
+            logger.info(f"{method_name} was refused: {result.get('error_message', '')}")
+        return True
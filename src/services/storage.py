@@ -0,0 +1,127 @@
+"""
+Storage engine interface: the operations the chat services need from a
+replica's store of users and messages.
+"""
+
+from abc import ABC, abstractmethod
+
+
+class StorageEngine(ABC):
+    """
+    A replica's store of users, settings and messages.
+
+    Every method returns the same dicts ``DBManager`` does, so APIManager,
+    the replicated apply path and the purger work with any engine.
+    """
+
+    # SQLite file behind the engine, if any. Database digests, and so
+    # anti-entropy, are computed from it.
+    db_file = None
+    # SQLite files holding the engine's messages, when they are split off
+    # from ``db_file``
+    shard_files = ()
+
+    @abstractmethod
+    def initialize_database(self):
+        """Create whatever the engine needs before its first use."""
+        pass
+
+    # ---------------------------- Replicated apply ----------------------------#
+    @abstractmethod
+    def apply_batch(self, operations, keep=None):
+        """
+        Apply ``(term, operation_id, apply)`` operations atomically, each one
+        at most once; see ``DBManager.apply_batch``.
+        """
+        pass
+
+    # ---------------------------- Users ----------------------------#
+    @abstractmethod
+    def add_user(self, username, nickname, password):
+        pass
+
+    @abstractmethod
+    def login(self, login_data):
+        pass
+
+    @abstractmethod
+    def delete_user(self, user_id):
+        """Delete an account at once and queue its messages for the purger."""
+        pass
+
+    @abstractmethod
+    def purge_deleted_users(self, limit):
+        """Delete up to ``limit`` messages of deleted users; returns how many."""
+        pass
+
+    @abstractmethod
+    def pending_purges(self):
+        """Number of deleted users whose messages are still being purged."""
+        pass
+
+    @abstractmethod
+    def get_all_users(self, exclude_username=None):
+        pass
+
+    @abstractmethod
+    def get_users_to_display(self, current_user, search_pattern="", page=1, users_per_page=10, after=""):
+        pass
+
+    @abstractmethod
+    def update_view_limit(self, username, new_limit):
+        pass
+
+    @abstractmethod
+    def save_settings(self, username, message_limit):
+        pass
+
+    @abstractmethod
+    def get_user_message_limit(self, username):
+        pass
+
+    # ---------------------------- Chats and messages ----------------------------#
+    @abstractmethod
+    def get_chats(self, user_id):
+        pass
+
+    @abstractmethod
+    def start_chat(self, current_user, other_user):
+        pass
+
+    @abstractmethod
+    def next_message_seq(self, chat_id, sender):
+        """Reserve the sequence number of the next message of a chat."""
+        pass
+
+    @abstractmethod
+    def send_chat_message(self, chat_id, sender, content, timestamp=None, seq=None):
+        pass
+
+    @abstractmethod
+    def get_messages(self, chat_id, current_user, after_seq=0, before_seq=0, limit=0):
+        """A chat's messages between the given seqs, only the newest ``limit`` if set."""
+        pass
+
+    @abstractmethod
+    def message_seqs(self, chat_id, message_indices, current_user):
+        """Sequence numbers of the messages at the given positions of a chat."""
+        pass
+
+    @abstractmethod
+    def delete_messages(self, chat_id, message_indices, current_user, message_seqs=None):
+        pass
+
+    @abstractmethod
+    def search_messages(self, current_user, query, chat_id="", page=1, page_size=20):
+        pass
+
+    # ---------------------------- Archive ----------------------------#
+    # Engines without a colder tier than the one they serve from have
+    # nothing to archive.
+    def archive_candidates(self, keep, older_than, block_size):
+        """Chats that may have a block of cold messages to archive."""
+        return []
+
+    def archive_chat(self, chat, keep, older_than, block_size):
+        """Archive the oldest block of a chat if it is cold; returns messages moved."""
+        return 0
@@ -0,0 +1,41 @@
+from typing import Type
+
+from src.services.db_manager import DBManager
+from src.services.memory_engine import MemoryEngine
+from src.services.sharded_db import ShardedDBManager
+from src.services.storage import StorageEngine
+
+
+class StorageFactory:
+    """
+    A factory class for creating storage engines.
+    """
+
+    _engines = {"sqlite": DBManager, "sharded": ShardedDBManager, "memory": MemoryEngine}
+
+    @classmethod
+    def register_engine(cls, name: str, engine_class: Type[StorageEngine]):
+        """
+        Register a new storage engine class with the factory.
+        :param name: The engine name (identifier).
+        :param engine_class: The engine class (must be a subclass of StorageEngine).
+        """
+        if not issubclass(engine_class, StorageEngine):
+            raise TypeError(f"{engine_class} is not a subclass of StorageEngine")
+        cls._engines[name] = engine_class
+
+    @classmethod
+    def get_engine(cls, engine_name: str, db_file: str, local_users: bool = True) -> StorageEngine:
+        """
+        Create an engine of the specified kind, ready for use.
+        :param engine_name: The name of the engine ('sqlite', 'sharded' or 'memory').
+        :param db_file: The database file, for engines that keep one.
+        :param local_users: Whether all users are stored with their chats.
+        :return: An initialized StorageEngine.
+        """
+        engine_class = cls._engines.get(engine_name)
+        if not engine_class:
+            raise ValueError(f"Unknown storage engine: {engine_name}")
+        engine = engine_class(db_file, local_users)
+        engine.initialize_database()
+        return engine
@@ -19,6 +19,7 @@ def mock_replication_stub():
     
     mock_network_response = Mock()
     mock_network_response.servers = [mock_server]
+    mock_network_response.shards = []
     replication_stub.GetNetworkState.return_value = mock_network_response
     
     return replication_stub
@@ -9,6 +9,7 @@ from src.client.grpc_logic import (
     MAX_RETRIES, 
     RETRY_DELAY
 )
+from src.protocol.cursor import encode_cursor
 from src.protocol.grpc import chat_pb2, chat_pb2_grpc, replication_pb2
 
 
@@ -54,9 +55,11 @@ def test_discover_replicas_success():
         server2.server_id = "server2"
         server2.address = "localhost:50052"
         server2.role = "follower"
+        server2.lag = 0
         
         response = Mock()
         response.servers = [server1, server2]
+        response.shards = []
         
         # Set up the replication stub
         mock_repl_stub = Mock()
@@ -73,6 +76,7 @@ def test_discover_replicas_success():
         assert "localhost:50051" in chat_logic.known_replicas
         assert "localhost:50052" in chat_logic.known_replicas
         assert chat_logic.current_leader == "localhost:50051"
+        assert chat_logic.read_replicas == ["localhost:50052"]
         assert mock_logger.info.call_count >= 2
 
 
@@ -349,6 +353,25 @@ def test_get_users_to_display_success():
             assert request.users_per_page == 10
 
 
+def test_get_users_page_sends_cursor():
+    """Pages after the first are asked for by the previous page's cursor."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'):
+
+        chat_logic = ChatAppLogicGRPC()
+        response = chat_pb2.UsersDisplayResponse(usernames=["user4", "user5"], next_cursor="abc")
+
+        with patch.object(chat_logic, '_execute_with_failover', return_value=response) as mock_exec:
+            page, error = chat_logic.get_users_page("user1", "", "xyz", 2)
+
+            assert page == {"users": ["user4", "user5"], "next_cursor": "abc", "total_users": 0}
+            assert error == ""
+            request = mock_exec.call_args[0][1]
+            assert (request.after, request.users_per_page) == ("xyz", 2)
+
+
 def test_login_failure():
     """Test failed login."""
     with patch('grpc.insecure_channel'), \
@@ -439,4 +462,353 @@ def test_start_chat_failure():
             
             # Verify result
             assert chat_id is None
-            assert error == "User not found"
\ No newline at end of file
+            assert error == "User not found"
+
+class HintedRpcError(MockRpcError):
+    """Rejection carrying a leader hint in its trailing metadata."""
+
+    def __init__(self, leader_address, term, code=grpc.StatusCode.FAILED_PRECONDITION):
+        super().__init__(code, "not the leader")
+        self._metadata = (
+            ("x-leader-id", "server2"),
+            ("x-leader-address", leader_address),
+            ("x-leader-term", str(term)),
+        )
+
+    def trailing_metadata(self):
+        return self._metadata
+
+
+def test_execute_with_failover_redirects_to_hinted_leader():
+    """A rejection with a leader hint is retried on the leader in one hop."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub') as mock_stub_class, \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas') as mock_discover, \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic = ChatAppLogicGRPC()
+        mock_discover.reset_mock()
+        chat_logic.known_replicas = {
+            chat_logic.primary_address: True,
+            "localhost:50099": True,  # should never be tried
+        }
+
+        # Follower rejects and names the leader
+        chat_logic.stub = Mock()
+        chat_logic.stub.SendChatMessage.side_effect = HintedRpcError("localhost:50052", 3)
+
+        leader_stub = Mock()
+        leader_response = Mock()
+        leader_stub.SendChatMessage.return_value = leader_response
+        mock_stub_class.return_value = leader_stub
+
+        result = chat_logic._execute_with_failover("SendChatMessage", Mock())
+
+        assert result == leader_response
+        assert chat_logic.primary_address == "localhost:50052"
+        assert chat_logic.current_leader == "localhost:50052"
+        assert chat_logic.leader_term == 3
+        leader_stub.SendChatMessage.assert_called_once()
+        mock_discover.assert_not_called()
+
+        # Later writes go straight to the cached leader
+        chat_logic._execute_with_failover("SendChatMessage", Mock())
+        assert leader_stub.SendChatMessage.call_count == 2
+
+
+def test_stale_leader_hint_is_ignored():
+    """Hints older than the cached leader's term are not followed."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic = ChatAppLogicGRPC()
+        chat_logic.current_leader = "localhost:50053"
+        chat_logic.leader_term = 5
+
+        assert chat_logic._get_leader_hint(HintedRpcError("localhost:50052", 4)) is None
+        assert chat_logic.current_leader == "localhost:50053"
+        assert chat_logic._get_leader_hint(MockRpcError()) is None
+
+
+def test_reads_round_robin_across_followers():
+    """Reads alternate between fresh followers and ask for bounded staleness."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub') as mock_stub_class, \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic = ChatAppLogicGRPC()
+        chat_logic.last_discovery = time.monotonic()
+        chat_logic.stub = Mock()
+        chat_logic.read_replicas = ["localhost:50052", "localhost:50053"]
+
+        follower_stubs = {}
+
+        def make_stub(channel):
+            stub = Mock()
+            follower_stubs[len(follower_stubs)] = stub
+            return stub
+
+        mock_stub_class.side_effect = make_stub
+
+        for _ in range(4):
+            chat_logic._execute_read("GetChats", Mock())
+
+        assert follower_stubs[0].GetChats.call_count == 2
+        assert follower_stubs[1].GetChats.call_count == 2
+        chat_logic.stub.GetChats.assert_not_called()
+        _, kwargs = follower_stubs[0].GetChats.call_args
+        assert kwargs["metadata"] == (("x-read-consistency", "bounded"),)
+
+
+def test_get_messages_is_not_sent_to_followers():
+    """Opening a chat marks it read, so it goes to the leader."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub') as mock_stub_class, \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic = ChatAppLogicGRPC()
+        chat_logic.last_discovery = time.monotonic()
+        chat_logic.stub = Mock()
+        chat_logic.stub.GetMessages.return_value = chat_pb2.MessagesResponse()
+        chat_logic.read_replicas = ["localhost:50052"]
+        follower_stub = Mock()
+        mock_stub_class.return_value = follower_stub
+
+        assert chat_logic.get_messages("alice_bob", "alice") == ([], "")
+
+        chat_logic.stub.GetMessages.assert_called_once()
+        follower_stub.GetMessages.assert_not_called()
+
+
+def test_read_falls_back_to_leader_when_followers_fail():
+    """A failing follower is dropped and the read goes to the primary."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub') as mock_stub_class, \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic = ChatAppLogicGRPC()
+        chat_logic.last_discovery = time.monotonic()
+        chat_logic.stub = Mock()
+        leader_response = Mock()
+        chat_logic.stub.GetMessages.return_value = leader_response
+        chat_logic.read_replicas = ["localhost:50052"]
+
+        follower_stub = Mock()
+        follower_stub.GetMessages.side_effect = MockRpcError(grpc.StatusCode.UNAVAILABLE)
+        mock_stub_class.return_value = follower_stub
+
+        result = chat_logic._execute_read("GetMessages", Mock())
+
+        assert result == leader_response
+        assert chat_logic.read_replicas == []
+        assert chat_logic.read_stubs == {}
+
+
+def make_sharded_logic():
+    """Client with a two-group shard map and one mock stub per replica."""
+    from src.replication.sharding import ShardMap
+
+    chat_logic = ChatAppLogicGRPC()
+    chat_logic.shard_map = ShardMap.parse("g1=localhost:50051,localhost:50052;g2=localhost:50061")
+    stubs = {
+        address: Mock(name=address)
+        for addresses in chat_logic.shard_map.groups.values()
+        for address in addresses
+    }
+    chat_logic._get_group_stub = lambda address: stubs[address]
+    return chat_logic, stubs
+
+
+def test_sharded_requests_go_to_owning_group():
+    """Keyed requests reach only the group that owns their user or chat."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        owner = chat_logic.shard_map.group_for_chat("alice_bob", "alice")
+        owner_address = chat_logic.shard_map.groups[owner][0]
+        stubs[owner_address].SendChatMessage.return_value = chat_pb2.MessageResponse(success=True)
+        chat_logic.known_users.add("alice")
+
+        assert chat_logic.send_chat_message("bob_alice", "bob", "hi") == (True, "")
+
+        for address, stub in stubs.items():
+            assert stub.SendChatMessage.called == (address == owner_address)
+        assert chat_logic.group_leaders[owner] == owner_address
+
+
+def test_sharded_send_checks_recipient_in_its_group():
+    """Messages to users no group has an account for are refused before routing."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        for stub in stubs.values():
+            stub.SendChatMessage.return_value = chat_pb2.MessageResponse(success=True)
+            # Substring matches come first; "bob" is on the second page
+            stub.GetUsersToDisplay.side_effect = lambda request: (
+                chat_pb2.UsersDisplayResponse(usernames=["abob"], next_cursor=encode_cursor("abob"))
+                if not request.after
+                else chat_pb2.UsersDisplayResponse(usernames=["bob", "bobby"])
+            )
+
+        assert chat_logic.send_chat_message("alice_bob", "alice", "hi") == (True, "")
+        assert chat_logic.known_users == {"bob"}
+        owner = stubs[chat_logic.shard_map.groups[chat_logic.shard_map.group_for_user("bob")][0]]
+        assert owner.GetUsersToDisplay.call_count == 2
+        assert owner.GetUsersToDisplay.call_args[0][0].search_pattern == "bob"
+        # Known recipients are not looked up again
+        chat_logic.send_chat_message("alice_bob", "alice", "again")
+        assert owner.GetUsersToDisplay.call_count == 2
+
+        sent = sum(stub.SendChatMessage.call_count for stub in stubs.values())
+        assert chat_logic.send_chat_message("alice_bobb", "alice", "hi") == (
+            False,
+            "Cannot send message. User 'bobb' does not exist.",
+        )
+        assert chat_logic.send_chat_message("bob_carol", "alice", "hi") == (
+            False,
+            "Sender is not part of this chat.",
+        )
+        assert sum(stub.SendChatMessage.call_count for stub in stubs.values()) == sent
+
+
+def test_sharded_chats_are_merged_most_recent_first():
+    """Chat lists from several groups are interleaved by their last message."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        stubs["localhost:50051"].GetChats.return_value = chat_pb2.ChatsResponse(
+            chats=[
+                chat_pb2.Chat(chat_id="alice_bob", other_user="bob", last_message_time=30),
+                chat_pb2.Chat(chat_id="alice_carol", other_user="carol", last_message_time=10),
+            ]
+        )
+        stubs["localhost:50061"].GetChats.return_value = chat_pb2.ChatsResponse(
+            chats=[chat_pb2.Chat(chat_id="alice_dave", other_user="dave", last_message_time=20)]
+        )
+
+        chats, error = chat_logic.get_chats("alice")
+
+        assert error == ""
+        assert [c["other_user"] for c in chats] == ["bob", "dave", "carol"]
+
+
+def test_sharded_request_fails_over_within_group():
+    """An unreachable member is skipped for another member of the same group."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        chat_logic.group_leaders["g1"] = "localhost:50051"
+        stubs["localhost:50051"].Signup.side_effect = MockRpcError(grpc.StatusCode.UNAVAILABLE)
+        stubs["localhost:50052"].Signup.return_value = chat_pb2.UserResponse(success=True)
+
+        request = chat_pb2.SignupRequest(username="alice")
+        with patch.object(chat_logic.shard_map, 'group_for_key', return_value="g1"):
+            response = chat_logic._execute_with_failover("Signup", request)
+
+        assert response.success
+        assert chat_logic.group_leaders["g1"] == "localhost:50052"
+
+
+def test_sharded_fan_out_merges_groups():
+    """Requests spanning groups go to each of them and the answers are merged."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        g1, g2 = stubs["localhost:50051"], stubs["localhost:50061"]
+        g1.GetUsersToDisplay.return_value = chat_pb2.UsersDisplayResponse(
+            usernames=["carol", "alice"], total_users=3
+        )
+        g2.GetUsersToDisplay.return_value = chat_pb2.UsersDisplayResponse(
+            usernames=["bob", "dave"], total_users=2
+        )
+        g1.DeleteUser.return_value = chat_pb2.StatusResponse(success=True)
+        g2.DeleteUser.return_value = chat_pb2.StatusResponse(success=False, error_message="db locked")
+
+        users, error = chat_logic.get_users_to_display("me", "", 2, 2)
+        assert (users, error) == (["carol", "dave"], "")
+        # Each group is asked for everything up to the requested page
+        sent = g1.GetUsersToDisplay.call_args[0][0]
+        assert (sent.current_page, sent.users_per_page) == (1, 4)
+        # Totals are added up across groups
+        merged = chat_logic._merge_responses(
+            "GetUsersToDisplay",
+            chat_pb2.GetUsersToDisplayRequest(current_page=2, users_per_page=2),
+            [g1.GetUsersToDisplay.return_value, g2.GetUsersToDisplay.return_value],
+        )
+        assert (merged.total_users, merged.total_pages) == (5, 3)
+
+        # A cursor page is asked of every group as is
+        g1.GetUsersToDisplay.return_value = chat_pb2.UsersDisplayResponse(usernames=["carol", "erin"])
+        g2.GetUsersToDisplay.return_value = chat_pb2.UsersDisplayResponse(
+            usernames=["dave"], next_cursor=encode_cursor("dave")
+        )
+        page, error = chat_logic.get_users_page("me", "", encode_cursor("bob"), 2)
+        assert page["users"] == ["carol", "dave"]
+        assert page["next_cursor"] == encode_cursor("dave")
+        sent = g2.GetUsersToDisplay.call_args[0][0]
+        assert (sent.after, sent.users_per_page) == (encode_cursor("bob"), 2)
+
+        assert chat_logic.delete_account("alice") == (False, "db locked")
+        g1.DeleteUser.assert_called_once()
+        g2.DeleteUser.assert_called_once()
+
+
+def test_sharded_search_merges_by_rank():
+    """Searches across all chats ask every group and keep the best matches."""
+    with patch('grpc.insecure_channel'), \
+         patch('src.protocol.grpc.chat_pb2_grpc.ChatServiceStub'), \
+         patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub'), \
+         patch.object(ChatAppLogicGRPC, '_discover_replicas'), \
+         patch('src.client.grpc_logic.logger'):
+
+        chat_logic, stubs = make_sharded_logic()
+        g1, g2 = stubs["localhost:50051"], stubs["localhost:50061"]
+
+        def matches(*ranked):
+            return chat_pb2.SearchMessagesResponse(
+                matches=[
+                    chat_pb2.MessageMatch(
+                        chat_id=chat_id, message=chat_pb2.Message(content=chat_id), rank=rank
+                    )
+                    for chat_id, rank in ranked
+                ]
+            )
+
+        g1.SearchMessages.return_value = matches(("alice_bob", -3.0), ("alice_carol", -1.0))
+        g2.SearchMessages.return_value = matches(("alice_dave", -2.0))
+
+        results, error = chat_logic.search_messages("alice", "lunch", page=1, page_size=2)
+        assert error == ""
+        assert [r["chat_id"] for r in results] == ["alice_bob", "alice_dave"]
+        sent = g1.SearchMessages.call_args[0][0]
+        assert (sent.page, sent.page_size) == (1, 2)
@@ -95,6 +95,17 @@ class TestChatAppLogic(unittest.TestCase):
         self.assertEqual(users, ["bob", "charlie"])
         self.assertEqual(error, "")
 
+    def test_get_users_page(self):
+        """Pages of the user list are asked for by cursor."""
+        self.mock_client.receive_message.return_value = {
+            "users": ["dave"], "next_cursor": "", "total_users": 0, "error_message": ""
+        }
+        page, error = self.logic.get_users_page("alice", "", "Ym9i", 10)
+        self.assertEqual(page, {"users": ["dave"], "next_cursor": "", "total_users": 0})
+        self.assertEqual(error, "")
+        sent = self.mock_client.send_message.call_args[0][0]
+        self.assertEqual(sent["after"], "Ym9i")
+
     @patch('PyQt6.QtWidgets.QMessageBox')
     def test_save_settings(self, mock_qmessagebox):
         """Test saving user settings."""
@@ -0,0 +1,96 @@
+"""
+Tests for follower anti-entropy against the leader's database.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.replication.anti_entropy import AntiEntropy
+from src.services.api_manager import APIManager
+from src.services.replication_servicer import ReplicationServicer
+
+# Message timestamps are the leader's, so replicas store the same ones
+STAMP = 1_700_000_000_000_000
+
+
+class ServicerStub:
+    """Calls a ReplicationServicer in-process, counting rows transferred."""
+
+    def __init__(self, servicer):
+        self.servicer = servicer
+        self.rows_requested = []
+
+    def GetDigest(self, request, timeout=None):
+        return self.servicer.GetDigest(request, MagicMock())
+
+    def GetRows(self, request, timeout=None):
+        self.rows_requested.extend(request.keys)
+        return self.servicer.GetRows(request, MagicMock())
+
+
+def make_servicer(path):
+    chat_servicer = MagicMock()
+    chat_servicer.api = APIManager(db_file=str(path))
+    return ReplicationServicer(MagicMock(), chat_servicer)
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    leader = make_servicer(tmp_path / "leader.db")
+    follower = make_servicer(tmp_path / "follower.db")
+    for servicer in (leader, follower):
+        db = servicer.chat_servicer.api.db_manager
+        for i in range(50):
+            db.add_user(f"user{i}", f"User {i}", "pw")
+            db.send_chat_message(
+                f"user{i}_user{(i + 1) % 50}", f"user{i}", "hello", timestamp=STAMP + i
+            )
+
+    replica = MagicMock()
+    replica.state.role = "follower"
+    replica.state.replication_lag.return_value = 0
+    anti_entropy = AntiEntropy(replica, follower.digest)
+    return leader, follower, anti_entropy, ServicerStub(leader)
+
+
+def test_repairs_only_diverged_keys_after_two_rounds(cluster):
+    leader, follower, anti_entropy, stub = cluster
+    leader_db = leader.chat_servicer.api.db_manager
+    # Operations the follower missed
+    leader_db.send_chat_message("user3_user4", "user3", "missed")
+    leader_db.save_settings("user7", 3)
+
+    # A difference seen once may be a write in flight
+    assert anti_entropy.run_round(stub) == 0
+    assert anti_entropy.run_round(stub) == 2
+    assert sorted(stub.rows_requested) == ["user3_user4", "user7"]
+
+    for table in ("users", "userconfig", "messages"):
+        assert follower.digest.bucket_hashes(table) == leader.digest.bucket_hashes(table)
+    assert anti_entropy.run_round(stub) == 0
+
+
+def test_transient_difference_is_not_repaired(cluster):
+    leader, follower, anti_entropy, stub = cluster
+    leader.chat_servicer.api.db_manager.send_chat_message(
+        "user1_user2", "user1", "in flight", timestamp=STAMP
+    )
+
+    assert anti_entropy.run_round(stub) == 0
+    # The follower applies the write before the next round
+    follower.chat_servicer.api.db_manager.send_chat_message(
+        "user1_user2", "user1", "in flight", timestamp=STAMP
+    )
+    assert anti_entropy.run_round(stub) == 0
+    assert stub.rows_requested == []
+
+
+def test_leader_and_lagging_followers_skip_rounds(cluster):
+    _, _, anti_entropy, stub = cluster
+    anti_entropy.state.replication_lag.return_value = 3
+    assert anti_entropy.run_round(stub) == 0
+    anti_entropy.state.role = "leader"
+    anti_entropy.state.replication_lag.return_value = 0
+    assert anti_entropy.run_round(stub) == 0
+    assert anti_entropy.rounds == 0
@@ -24,3 +24,16 @@ def test_config_constants():
     # Test that heartbeat interval is less than election timeout
     # (important for proper functioning of the consensus algorithm)
     assert HEARTBEAT_INTERVAL < ELECTION_TIMEOUT_MIN
+
+
+def test_adaptive_heartbeat_bounds():
+    """The adaptive interval can never starve followers or the read lease."""
+    from src.replication.config import (
+        HEARTBEAT_INTERVAL_MIN,
+        HEARTBEAT_INTERVAL_MAX,
+        LEASE_DURATION,
+    )
+
+    assert HEARTBEAT_INTERVAL_MIN <= HEARTBEAT_INTERVAL <= HEARTBEAT_INTERVAL_MAX
+    assert MAX_MISSED_HEARTBEATS * HEARTBEAT_INTERVAL_MAX <= ELECTION_TIMEOUT_MIN
+    assert 2 * HEARTBEAT_INTERVAL_MAX <= LEASE_DURATION
@@ -0,0 +1,87 @@
+"""
+Tests for the single-threaded consensus actor.
+"""
+
+import threading
+
+import pytest
+
+from src.replication.consensus_actor import ConsensusActor
+from src.replication.timer_service import TimerService
+
+
+@pytest.fixture
+def actor():
+    actor = ConsensusActor(name="test-consensus")
+    yield actor
+    actor.stop()
+
+
+def test_runs_inline_when_not_started():
+    """Without the loop thread, messages run on the caller's thread."""
+    actor = ConsensusActor()
+    seen = []
+
+    actor.post(seen.append, 1)
+    assert seen == [1]
+    assert actor.call(lambda: threading.current_thread()) is threading.current_thread()
+
+
+def test_messages_run_in_order_on_one_thread(actor):
+    """Posted messages are handled one at a time, in arrival order, on the actor."""
+    actor.start()
+    seen = []
+    threads = set()
+
+    def record(i):
+        seen.append(i)
+        threads.add(threading.current_thread().name)
+
+    for i in range(100):
+        actor.post(record, i)
+
+    assert actor.call(len, seen) == 100
+    assert seen == list(range(100))
+    assert threads == {"test-consensus"}
+
+
+def test_call_returns_result_and_raises(actor):
+    """call() hands back the result or the exception from the actor thread."""
+    actor.start()
+
+    assert actor.call(lambda a, b: a + b, 2, 3) == 5
+    with pytest.raises(ValueError):
+        actor.call(int, "not a number")
+
+
+def test_errors_in_posted_messages_do_not_stop_the_loop(actor):
+    """A failing message is logged and the next one still runs."""
+    actor.start()
+
+    actor.post(int, "not a number")
+    assert actor.call(lambda: "alive") == "alive"
+
+
+def test_reentrant_call_from_actor_runs_inline(actor):
+    """A message that calls back into the actor doesn't deadlock."""
+    actor.start()
+
+    assert actor.call(lambda: actor.call(lambda: 42)) == 42
+
+
+def test_timer_callbacks_are_dispatched_to_actor(actor):
+    """With dispatch set, due timers run on the actor instead of a callback thread."""
+    actor.start()
+    timers = TimerService(tick=0.1, wheel_size=8, autostart=False, dispatch=actor.post)
+    fired = threading.Event()
+    names = []
+
+    def callback():
+        names.append(threading.current_thread().name)
+        fired.set()
+
+    timers.schedule(0.1, callback)
+    timers.advance(1)
+
+    assert fired.wait(1)
+    assert names == ["test-consensus"]
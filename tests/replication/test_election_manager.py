@@ -0,0 +1,129 @@
+"""
+Tests for pre-vote and election backoff in the ElectionManager.
+"""
+
+import random
+
+import grpc
+import pytest
+from unittest.mock import MagicMock
+
+from src.protocol.grpc import replication_pb2 as replication
+from src.replication.config import ELECTION_TIMEOUT_MAX, ELECTION_TIMEOUT_MIN
+from src.replication.election_manager import ElectionManager
+from src.replication.replica_state import ReplicaState
+from src.replication.transport import SimulatedRpcError
+
+
+@pytest.fixture
+def state():
+    return ReplicaState(
+        "server1",
+        "localhost:50051",
+        ["server2:localhost:50052", "server3:localhost:50053"],
+    )
+
+
+@pytest.fixture
+def manager(state):
+    return ElectionManager(
+        state,
+        transport=MagicMock(),
+        timer_service=MagicMock(),
+        rng=random.Random(0),
+        pre_vote=True,
+        backoff_max=30,
+    )
+
+
+def _granted(granted=True, term=0):
+    return replication.PreVoteResponse(granted=granted, term=term)
+
+
+def test_timeout_starts_pre_vote_without_bumping_term(manager, state):
+    """The first step of an election asks for pre-votes in the next term."""
+    manager.start_election()
+
+    assert state.term == 0
+    assert state.role == "follower"
+    assert manager.transport.pre_vote.call_count == 2
+    request = manager.transport.pre_vote.call_args.args[2]
+    assert request.term == 1
+    manager.transport.heartbeat.assert_not_called()
+
+
+def test_majority_of_pre_votes_starts_real_election(manager, state):
+    """Once a majority would vote for us, the term is bumped and votes requested."""
+    manager.start_election()
+
+    manager.handle_pre_vote_response(1, "server2", _granted(), None)
+
+    assert state.term == 1
+    assert state.role == "candidate"
+    assert manager.transport.heartbeat.call_count == 2
+
+    # Late pre-votes for that round change nothing
+    manager.handle_pre_vote_response(1, "server3", _granted(), None)
+    assert state.term == 1
+    assert manager.transport.heartbeat.call_count == 2
+
+
+def test_refused_or_failed_pre_votes_keep_term(manager, state):
+    """A node that can't win never inflates its term."""
+    deadline = SimulatedRpcError(grpc.StatusCode.DEADLINE_EXCEEDED, "deadline exceeded")
+    for _ in range(5):
+        manager.start_election()
+        manager.handle_pre_vote_response(1, "server2", _granted(False), None)
+        manager.handle_pre_vote_response(1, "server3", None, deadline)
+
+    assert state.term == 0
+    assert state.role == "follower"
+    manager.transport.heartbeat.assert_not_called()
+
+
+def test_pre_vote_can_be_disabled(manager, state):
+    """Without pre-vote, a timeout goes straight to a real election."""
+    manager.pre_vote = False
+
+    manager.start_election()
+
+    assert state.term == 1
+    assert state.role == "candidate"
+    manager.transport.pre_vote.assert_not_called()
+
+
+def test_election_timeout_backs_off_and_resets(manager):
+    """Each failed attempt doubles the timeout's upper bound, up to the cap."""
+    assert ELECTION_TIMEOUT_MIN <= manager.election_timeout() <= ELECTION_TIMEOUT_MAX
+
+    manager.failed_attempts = 2
+    timeouts = [manager.election_timeout() for _ in range(200)]
+    assert max(timeouts) > ELECTION_TIMEOUT_MAX
+    assert max(timeouts) <= ELECTION_TIMEOUT_MAX * 4
+
+    manager.failed_attempts = 50
+    assert all(manager.election_timeout() <= 30 for _ in range(200))
+
+    manager.leader_heard()
+    assert manager.failed_attempts == 0
+    assert manager.election_timeout() <= ELECTION_TIMEOUT_MAX
+
+
+def test_election_metrics(manager, state):
+    """Elections are counted and timed from the first timeout to a leader."""
+    now = [100.0]
+    state.clock = lambda: now[0]
+
+    manager.start_election()
+    now[0] = 104.0
+    manager.start_election()
+    manager.handle_pre_vote_response(1, "server2", _granted(), None)
+    now[0] = 104.5
+    manager.handle_vote_response(1, "server2", replication.HeartbeatResponse(success=True, term=1), None)
+
+    assert state.role == "leader"
+    assert manager.elections == 1
+    assert manager.elections_won == 1
+    duration = manager.election_duration.snapshot()
+    assert duration["count"] == 1
+    assert duration["sum"] == pytest.approx(4.5)
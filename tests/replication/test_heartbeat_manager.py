@@ -5,9 +5,33 @@ import grpc
 
 from src.replication.heartbeat_manager import HeartbeatManager
 from src.replication.replica_state import ReplicaState
+from src.replication.timer_service import TimerService
 import src.protocol.grpc.replication_pb2 as replication
 import src.protocol.grpc.replication_pb2_grpc as replication_grpc
-from src.replication.config import HEARTBEAT_INTERVAL, MAX_MISSED_HEARTBEATS
+from src.replication.config import (
+    HEARTBEAT_INTERVAL,
+    HEARTBEAT_INTERVAL_MAX,
+    HEARTBEAT_INTERVAL_MIN,
+    HEARTBEAT_RPC_TIMEOUT,
+    MAX_MISSED_HEARTBEATS,
+)
+
+
+class FakeTransport:
+    """Answers heartbeats inline from a per-peer table (a response or an exception)."""
+
+    def __init__(self):
+        self.responses = {}
+        self.sent = []
+
+    def heartbeat(self, peer_id, peer_address, request, timeout, callback=None):
+        self.sent.append((peer_id, peer_address, request, timeout))
+        answer = self.responses.get(peer_id, Exception("no route"))
+        if callback:
+            if isinstance(answer, Exception):
+                callback(peer_id, None, answer)
+            else:
+                callback(peer_id, answer, None)
 
 
 class TestHeartbeatManager(unittest.TestCase):
@@ -22,261 +46,179 @@ class TestHeartbeatManager(unittest.TestCase):
         self.state.peers = {}
         self.state.servers_info = {}
         self.state.is_running = True
+        self.state.last_operation_id = 0
+        self.state.clock = Mock(return_value=1000)
         
-        # Create the heartbeat manager
-        self.heartbeat_manager = HeartbeatManager(self.state)
+        # Create the heartbeat manager with a transport that answers inline
+        self.transport = FakeTransport()
+        self.heartbeat_manager = HeartbeatManager(self.state, self.transport)
         
         # Create a mock election manager
         self.election_manager = Mock()
         self.heartbeat_manager.set_election_manager(self.election_manager)
 
-    @patch('time.sleep')  # Patch sleep to avoid actual waiting
-    @patch('src.replication.heartbeat_manager.logger')
-    def test_heartbeat_loop_as_leader(self, mock_logger, mock_sleep):
-        """Test the heartbeat loop when the node is a leader."""
-        # Set up the state as leader
+    def start_ticking(self):
+        """Tick on a hand-stepped wheel; returns it and the ticks per interval."""
+        timers = TimerService(tick=0.1, wheel_size=8, autostart=False)
+        self.heartbeat_manager.start_ticking(timers)
+        return timers, round(HEARTBEAT_INTERVAL / timers.tick)
+
+    def test_tick_as_leader(self):
+        """The timer sends a heartbeat round every interval while leader."""
         self.state.role = "leader"
-        
-        # Mock _send_heartbeats_as_leader to track calls
         self.heartbeat_manager._send_heartbeats_as_leader = Mock()
-        
-        # Set up a side effect to stop the loop after one iteration
-        def stop_loop(*args, **kwargs):
-            self.state.is_running = False
-            
-        mock_sleep.side_effect = stop_loop
-        
-        # Run the heartbeat loop
-        self.heartbeat_manager.heartbeat_loop()
-        
-        # Verify _send_heartbeats_as_leader was called
+        timers, interval = self.start_ticking()
+
+        timers.advance(interval - 1)
+        self.heartbeat_manager._send_heartbeats_as_leader.assert_not_called()
+        timers.advance(1)
         self.heartbeat_manager._send_heartbeats_as_leader.assert_called_once()
-        
-        # Verify sleep was called with the correct interval
-        mock_sleep.assert_called_once_with(HEARTBEAT_INTERVAL)
+        timers.advance(interval)
+        self.assertEqual(self.heartbeat_manager._send_heartbeats_as_leader.call_count, 2)
 
-    @patch('time.sleep')
-    @patch('src.replication.heartbeat_manager.logger')
-    def test_heartbeat_loop_as_follower(self, mock_logger, mock_sleep):
-        """Test the heartbeat loop when the node is a follower with a leader."""
-        # Set up the state as follower with a leader
+    def test_tick_as_follower(self):
+        """The timer checks the leader's liveness while following one."""
         self.state.role = "follower"
         self.state.leader_id = "server2"
-        
-        # Mock _check_leader_liveness to track calls
         self.heartbeat_manager._check_leader_liveness = Mock()
-        
-        # Set up a side effect to stop the loop after one iteration
-        def stop_loop(*args, **kwargs):
-            self.state.is_running = False
-            
-        mock_sleep.side_effect = stop_loop
-        
-        # Run the heartbeat loop
-        self.heartbeat_manager.heartbeat_loop()
-        
-        # Verify _check_leader_liveness was called
+        timers, interval = self.start_ticking()
+        timers.advance(interval)
+
         self.heartbeat_manager._check_leader_liveness.assert_called_once()
-        
-        # Verify sleep was called with the correct interval
-        mock_sleep.assert_called_once_with(HEARTBEAT_INTERVAL)
 
-    @patch('time.sleep')
-    @patch('src.replication.heartbeat_manager.logger')
-    def test_heartbeat_loop_exception(self, mock_logger, mock_sleep):
-        """Test the heartbeat loop when an exception occurs."""
-        # Set up the state as leader
+    @patch('src.replication.timer_service.logger')
+    def test_tick_keeps_running_after_exception(self, mock_logger):
+        """A failing round is logged and the next interval still ticks."""
         self.state.role = "leader"
-        
-        # Mock _send_heartbeats_as_leader to raise an exception
         self.heartbeat_manager._send_heartbeats_as_leader = Mock(side_effect=Exception("Test exception"))
-        
-        # Set up a side effect to stop the loop after one iteration
-        call_count = 0
-        def stop_loop(*args, **kwargs):
-            nonlocal call_count
-            call_count += 1
-            if call_count >= 2:  # Allow for both HEARTBEAT_INTERVAL and error sleep
-                self.state.is_running = False
-            
-        mock_sleep.side_effect = stop_loop
-        
-        # Run the heartbeat loop
-        self.heartbeat_manager.heartbeat_loop()
-        
-        # Verify the exception was logged - using assert_called instead of assert_called_once
-        # because the error might be logged multiple times depending on the loop execution
-        self.assertTrue(mock_logger.error.called)
-        mock_logger.error.assert_called_with("Error in heartbeat loop: Test exception")
-        
-        # Verify sleep was called with 1 second after the exception
-        mock_sleep.assert_any_call(1)
+        timers, interval = self.start_ticking()
+        timers.advance(2 * interval)
+
+        self.assertEqual(self.heartbeat_manager._send_heartbeats_as_leader.call_count, 2)
+        self.assertEqual(mock_logger.error.call_count, 2)
+        self.assertIn("Test exception", mock_logger.error.call_args[0][0])
 
-    @patch('grpc.insecure_channel')
-    @patch('time.time')
     @patch('src.replication.heartbeat_manager.logger')
-    def test_send_heartbeats_as_leader_success(self, mock_logger, mock_time, mock_channel):
+    def test_send_heartbeats_as_leader_success(self, mock_logger):
         """Test sending heartbeats as leader with successful responses."""
         # Set up the state as leader with peers
         self.state.role = "leader"
         self.state.peers = {"server2": "localhost:50052", "server3": "localhost:50053"}
-        
-        # Mock time.time() to return a consistent value
-        mock_time.return_value = 1000
-        
-        # Set up the mock channel and stub
-        mock_stub = Mock()
-        mock_channel.return_value.__enter__.return_value = Mock()
-        mock_channel_context = mock_channel.return_value.__enter__.return_value
-        mock_stub_instance = mock_stub.return_value
-        
-        # Create a mock for the ReplicationServiceStub
-        with patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub', return_value=mock_stub_instance):
-            # Set up the mock response
-            mock_response = Mock()
-            mock_response.term = 1  # Same term as the leader
-            mock_response.role = "follower"
-            mock_stub_instance.Heartbeat.return_value = mock_response
-            
-            # Call the method
-            last_heartbeat_time = {}
-            connection_failure_count = {}
-            self.heartbeat_manager._send_heartbeats_as_leader(last_heartbeat_time, connection_failure_count)
-            
-            # Verify the stub was created for each peer
-            self.assertEqual(mock_channel.call_count, 2)
-            
-            # Verify Heartbeat was called for each peer
-            self.assertEqual(mock_stub_instance.Heartbeat.call_count, 2)
-            
-            # Verify the last heartbeat time was updated for each peer
-            self.assertEqual(len(last_heartbeat_time), 2)
-            self.assertEqual(last_heartbeat_time["server2"], 1000)
-            self.assertEqual(last_heartbeat_time["server3"], 1000)
-            
-            # Verify the connection failure count was reset for each peer
-            self.assertEqual(connection_failure_count["server2"], 0)
-            self.assertEqual(connection_failure_count["server3"], 0)
-            
-            # Verify server info was updated
-            self.assertEqual(len(self.state.servers_info), 2)
-
-    @patch('grpc.insecure_channel')
-    @patch('time.time')
+
+        # Both peers acknowledge in our term
+        ack = Mock(term=1, role="follower", applied_operation_id=0)
+        self.transport.responses = {"server2": ack, "server3": ack}
+
+        # Call the method
+        last_heartbeat_time = {}
+        connection_failure_count = {}
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader(last_heartbeat_time, connection_failure_count)
+
+        # Verify Heartbeat was sent to each peer, with a deadline
+        self.assertEqual(len(self.transport.sent), 2)
+        self.assertEqual(self.transport.sent[0][3], HEARTBEAT_RPC_TIMEOUT)
+
+        # Verify the round settled with both acks
+        self.assertTrue(heartbeat_round.done.is_set())
+        self.assertEqual(heartbeat_round.acks, 2)
+        self.assertTrue(heartbeat_round.confirmed)
+
+        # Verify the last heartbeat time was updated for each peer
+        self.assertEqual(len(last_heartbeat_time), 2)
+        self.assertEqual(last_heartbeat_time["server2"], 1000)
+        self.assertEqual(last_heartbeat_time["server3"], 1000)
+
+        # Verify the connection failure count was reset for each peer
+        self.assertEqual(connection_failure_count["server2"], 0)
+        self.assertEqual(connection_failure_count["server3"], 0)
+
+        # Verify server info was updated
+        self.assertEqual(len(self.state.servers_info), 2)
+
     @patch('src.replication.heartbeat_manager.logger')
-    def test_send_heartbeats_as_leader_higher_term(self, mock_logger, mock_time, mock_channel):
+    def test_send_heartbeats_as_leader_higher_term(self, mock_logger):
         """Test sending heartbeats as leader and discovering a higher term."""
         # Set up the state as leader with peers
         self.state.role = "leader"
         self.state.peers = {"server2": "localhost:50052"}
-        
-        # Mock time.time() to return a consistent value
-        mock_time.return_value = 1000
-        
-        # Set up the mock channel and stub
-        mock_stub = Mock()
-        mock_channel.return_value.__enter__.return_value = Mock()
-        mock_channel_context = mock_channel.return_value.__enter__.return_value
-        mock_stub_instance = mock_stub.return_value
-        
-        # Create a mock for the ReplicationServiceStub
-        with patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub', return_value=mock_stub_instance):
-            # Set up the mock response with higher term
-            mock_response = Mock()
-            mock_response.term = 2  # Higher term than the leader (1)
-            mock_response.role = "leader"
-            mock_stub_instance.Heartbeat.return_value = mock_response
-            
-            # Call the method
-            last_heartbeat_time = {}
-            connection_failure_count = {}
-            self.heartbeat_manager._send_heartbeats_as_leader(last_heartbeat_time, connection_failure_count)
-            
-            # Verify the leader reverted to follower
-            self.assertEqual(self.state.term, 2)
-            self.assertEqual(self.state.role, "follower")
-            self.assertIsNone(self.state.leader_id)
-            
-            # Verify the election timer was reset
-            self.election_manager.reset_election_timer.assert_called_once()
-            
-            # Verify the info was logged
-            mock_logger.info.assert_called_once_with("Discovered higher term 2, reverting to follower")
-
-    @patch('grpc.insecure_channel')
-    @patch('time.time')
+
+        # Set up the response with higher term
+        self.transport.responses = {"server2": Mock(term=2, role="leader")}
+
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+
+        # Verify the leader reverted to follower
+        self.assertEqual(self.state.term, 2)
+        self.assertEqual(self.state.role, "follower")
+        self.assertIsNone(self.state.leader_id)
+        self.assertFalse(heartbeat_round.confirmed)
+
+        # Verify the election timer was reset
+        self.election_manager.reset_election_timer.assert_called_once()
+
+        # Verify the info was logged
+        mock_logger.info.assert_called_once_with("Discovered higher term 2, reverting to follower")
+
     @patch('src.replication.heartbeat_manager.logger')
-    def test_send_heartbeats_as_leader_connection_failure(self, mock_logger, mock_time, mock_channel):
+    def test_send_heartbeats_as_leader_connection_failure(self, mock_logger):
         """Test sending heartbeats as leader with connection failures."""
         # Set up the state as leader with peers
         self.state.role = "leader"
         self.state.peers = {"server2": "localhost:50052"}
-        
-        # Mock time.time() to return a consistent value
-        mock_time.return_value = 1000
-        
-        # Set up the mock channel to raise an exception
-        mock_channel.return_value.__enter__.side_effect = Exception("Connection failed")
-        
+
+        # Set up the heartbeat call to fail
+        self.transport.responses = {"server2": Exception("Connection failed")}
+
         # Call the method
         last_heartbeat_time = {}
         connection_failure_count = {}
         self.heartbeat_manager._send_heartbeats_as_leader(last_heartbeat_time, connection_failure_count)
-        
+
         # Verify the connection failure count was incremented
         self.assertEqual(connection_failure_count["server2"], 1)
-        
+
         # Verify the warning was logged
         mock_logger.warning.assert_called_once_with(
             "Failed to send heartbeat to server2 at localhost:50052: Connection failed"
         )
 
-    @patch('grpc.insecure_channel')
-    @patch('time.time')
     @patch('src.replication.heartbeat_manager.logger')
-    def test_send_heartbeats_as_leader_remove_unresponsive_peer(self, mock_logger, mock_time, mock_channel):
+    def test_send_heartbeats_as_leader_remove_unresponsive_peer(self, mock_logger):
         """Test removing an unresponsive peer after too many failures."""
         # Set up the state as leader with peers
         self.state.role = "leader"
         self.state.peers = {"server2": "localhost:50052"}
         self.state.servers_info = {"server2": Mock()}
-        
-        # Mock time.time() to return a consistent value
         current_time = 1000
-        mock_time.return_value = current_time
-        
-        # Set up the mock channel to raise an exception
-        mock_channel.return_value.__enter__.side_effect = Exception("Connection failed")
-        
+
+        # Set up the heartbeat call to fail
+        self.transport.responses = {"server2": Exception("Connection failed")}
+
         # Set up last heartbeat time to be older than the threshold
         last_heartbeat_time = {"server2": current_time - (MAX_MISSED_HEARTBEATS * HEARTBEAT_INTERVAL + 1)}
         connection_failure_count = {"server2": MAX_MISSED_HEARTBEATS}
-        
+
         # Call the method
         self.heartbeat_manager._send_heartbeats_as_leader(last_heartbeat_time, connection_failure_count)
-        
+
         # Verify the peer was removed
         self.assertEqual(len(self.state.peers), 0)
         self.assertEqual(len(self.state.servers_info), 0)
         self.assertEqual(len(last_heartbeat_time), 0)
         self.assertEqual(len(connection_failure_count), 0)
-        
+
         # Verify the warning was logged
         mock_logger.warning.assert_any_call("Peer server2 has been unresponsive, removing from peers")
 
-    @patch('time.time')
     @patch('src.replication.heartbeat_manager.logger')
-    def test_check_leader_liveness_leader_timeout(self, mock_logger, mock_time):
+    def test_check_leader_liveness_leader_timeout(self, mock_logger):
         """Test checking leader liveness when the leader has timed out."""
         # Set up the state as follower with a leader
         self.state.role = "follower"
         self.state.leader_id = "server2"
         self.state.peers = {"server2": "localhost:50052"}
-        
-        # Mock time.time() to return a value that indicates leader timeout
         current_time = 1000
-        mock_time.return_value = current_time
-        
+
         # Set up last heartbeat time to be older than the threshold
         last_heartbeat_time = {"server2": current_time - (MAX_MISSED_HEARTBEATS * HEARTBEAT_INTERVAL + 1)}
         connection_failure_count = {}
@@ -318,61 +260,53 @@ class TestHeartbeatManager(unittest.TestCase):
         # Verify the warning was logged
         mock_logger.warning.assert_called_once_with("Leader server2 has been unreachable")
 
-    @patch('grpc.insecure_channel')
     @patch('src.replication.heartbeat_manager.logger')
-    def test_check_leader_status_success(self, mock_logger, mock_channel):
+    def test_check_leader_status_success(self, mock_logger):
         """Test checking leader status with a successful response."""
         # Set up the state as follower with a leader
         self.state.role = "follower"
         self.state.leader_id = "server2"
         self.state.peers = {"server2": "localhost:50052"}
-        
-        # Set up the mock channel and stub
-        mock_stub = Mock()
-        mock_channel.return_value.__enter__.return_value = Mock()
-        mock_channel_context = mock_channel.return_value.__enter__.return_value
-        mock_stub_instance = mock_stub.return_value
-        
-        # Create a mock for the ReplicationServiceStub
-        with patch('src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub', return_value=mock_stub_instance):
-            # Set up the mock response
-            mock_response = Mock()
-            mock_stub_instance.Heartbeat.return_value = mock_response
-            
-            # Call the method
-            result = self.heartbeat_manager.check_leader_status()
-            
-            # Verify the result is True (leader is responsive)
-            self.assertTrue(result)
-            
-            # Verify the debug message was logged
-            mock_logger.debug.assert_called_once_with(
-                "Checking status of leader server2 at localhost:50052"
-            )
-
-    @patch('grpc.insecure_channel')
+        self.transport.responses = {"server2": Mock()}
+
+        # Call the method
+        result = self.heartbeat_manager.check_leader_status()
+
+        # Verify the result is True (leader is responsive)
+        self.assertTrue(result)
+
+        # Verify the leader was checked with a short deadline
+        peer_id, peer_address, _, timeout = self.transport.sent[0]
+        self.assertEqual((peer_id, peer_address), ("server2", "localhost:50052"))
+        self.assertEqual(timeout, HEARTBEAT_RPC_TIMEOUT)
+
+        # Verify the debug message was logged
+        mock_logger.debug.assert_called_once_with(
+            "Checking status of leader server2 at localhost:50052"
+        )
+
     @patch('src.replication.heartbeat_manager.logger')
-    def test_check_leader_status_failure(self, mock_logger, mock_channel):
+    def test_check_leader_status_failure(self, mock_logger):
         """Test checking leader status with a connection failure."""
         # Set up the state as follower with a leader
         self.state.role = "follower"
         self.state.leader_id = "server2"
         self.state.peers = {"server2": "localhost:50052"}
-        
-        # Set up the mock channel to raise an exception
-        mock_channel.return_value.__enter__.side_effect = Exception("Connection failed")
-        
+
+        # Set up the heartbeat call to fail
+        self.transport.responses = {"server2": Exception("Connection failed")}
+
         # Call the method
         result = self.heartbeat_manager.check_leader_status()
-        
+
         # Verify the result is False (leader is not responsive)
         self.assertFalse(result)
-        
+
         # Verify the warning was logged
         mock_logger.warning.assert_called_once_with(
             "Leader server2 appears to be down: Connection failed"
         )
-        
+
         # Verify the election was started
         self.election_manager.start_election.assert_called_once()
 
@@ -389,5 +323,184 @@ class TestHeartbeatManager(unittest.TestCase):
         self.assertIsNone(result)
 
 
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_majority_round_renews_read_lease(self, mock_logger):
+        """A round acknowledged by a majority renews the read lease."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052", "server3": "localhost:50053"}
+        lease_manager = Mock()
+        self.heartbeat_manager.set_lease_manager(lease_manager)
+
+        # One peer acks, the other is unreachable: 2 of 3 is a majority
+        self.transport.responses = {
+            "server2": Mock(term=1, role="follower", applied_operation_id=0),
+            "server3": Exception("down"),
+        }
+
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+
+        self.assertEqual(heartbeat_round.acks, 1)
+        lease_manager.renew.assert_called_once_with(1000)
+
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_minority_round_does_not_renew_lease(self, mock_logger):
+        """Without a majority the lease is left to expire."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052", "server3": "localhost:50053"}
+        lease_manager = Mock()
+        lease_manager.is_valid.return_value = False
+        self.heartbeat_manager.set_lease_manager(lease_manager)
+
+        confirmed = self.heartbeat_manager.confirm_leadership()
+
+        self.assertFalse(confirmed)
+        lease_manager.renew.assert_not_called()
+
+    def test_confirm_leadership_uses_valid_lease(self):
+        """A lease renewed by a concurrent round skips another round."""
+        self.state.role = "leader"
+        lease_manager = Mock()
+        lease_manager.is_valid.return_value = True
+        self.heartbeat_manager.set_lease_manager(lease_manager)
+        self.heartbeat_manager._send_heartbeats_as_leader = Mock()
+
+        self.assertTrue(self.heartbeat_manager.confirm_leadership())
+        self.heartbeat_manager._send_heartbeats_as_leader.assert_not_called()
+
+    def test_confirm_leadership_joins_round_in_flight(self):
+        """A confirmation waits on the round already in flight instead of starting one."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052", "server3": "localhost:50053"}
+        pending = []
+        # Hold the answers back, as a real network would
+        self.transport.heartbeat = lambda *args: pending.append(args)
+
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+        self.assertIs(self.heartbeat_manager._confirmation_round(), heartbeat_round)
+        self.assertEqual(len(pending), 2)
+
+        ack = Mock(term=1, role="follower", applied_operation_id=0)
+        for peer_id, _, _, _, callback in pending:
+            callback(peer_id, ack, None)
+
+        self.assertTrue(heartbeat_round.done.is_set())
+        self.assertTrue(heartbeat_round.confirmed)
+
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_round_settles_when_last_peer_answers(self, mock_logger):
+        """Sending never blocks; the round settles on the last answer."""
+        self.state.role = "leader"
+        self.state.peers = {f"server{i}": f"localhost:5005{i}" for i in range(2, 6)}
+        pending = []
+        self.transport.heartbeat = lambda *args: pending.append(args)
+
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+
+        # All four calls are out before any answer
+        self.assertEqual(len(pending), 4)
+        self.assertFalse(heartbeat_round.done.is_set())
+
+        for peer_id, _, _, _, callback in pending:
+            callback(peer_id, None, Exception("deadline exceeded"))
+
+        self.assertTrue(heartbeat_round.done.is_set())
+        self.assertFalse(heartbeat_round.confirmed)
+
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_round_metrics(self, mock_logger):
+        """Round durations and per-peer RTTs are recorded."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052"}
+        self.assertEqual(self.heartbeat_manager.get_round_metrics()["rounds"], 0)
+
+        self.transport.responses = {"server2": Mock(term=1, role="follower", applied_operation_id=0)}
+        self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+        self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+
+        metrics = self.heartbeat_manager.get_round_metrics()
+        self.assertEqual(metrics["rounds"], 2)
+        self.assertGreaterEqual(metrics["max"], metrics["avg"])
+        self.assertIn("server2", metrics["peer_rtts"])
+
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_replication_ack_replaces_heartbeat(self, mock_logger):
+        """Peers that acked a write this interval are skipped, except when confirming."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052", "server3": "localhost:50053"}
+        self.transport.responses = {
+            "server2": Mock(term=1, role="follower", applied_operation_id=0),
+            "server3": Mock(term=1, role="follower", applied_operation_id=0),
+        }
+
+        self.heartbeat_manager.record_replication_ack("server2", 999.8, 1)
+        heartbeat_round = self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+
+        self.assertEqual([sent[0] for sent in self.transport.sent], ["server3"])
+        self.assertEqual(heartbeat_round.skipped, {"server2"})
+        self.assertTrue(heartbeat_round.confirmed)
+
+        # Leadership confirmation needs a fresh answer from everyone
+        self.transport.sent.clear()
+        self.heartbeat_manager._send_heartbeats_as_leader({}, {}, force=True)
+        self.assertEqual(len(self.transport.sent), 2)
+
+        metrics = self.heartbeat_manager.get_round_metrics()
+        self.assertEqual(metrics["heartbeats_skipped"], 1)
+        self.assertEqual(metrics["heartbeats_sent"], 3)
+
+    def test_replication_acks_from_old_term_are_ignored(self):
+        """An ack for a write sent in an earlier term proves nothing now."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052"}
+
+        self.heartbeat_manager.record_replication_ack("server2", 999.8, 0)
+
+        self.assertNotIn("server2", self.heartbeat_manager.replication_contact)
+
+    def test_replication_acks_renew_lease_from_quorum(self):
+        """A majority of write acks keeps the lease alive from the oldest needed send."""
+        self.state.role = "leader"
+        self.state.peers = {f"server{i}": f"localhost:5005{i}" for i in range(2, 6)}
+        lease_manager = Mock()
+        self.heartbeat_manager.set_lease_manager(lease_manager)
+
+        self.heartbeat_manager.record_replication_ack("server2", 998.0, 1)
+        lease_manager.renew.assert_not_called()
+
+        # Two of four peers plus us is a majority of five
+        self.heartbeat_manager.record_replication_ack("server3", 999.0, 1)
+        lease_manager.renew.assert_called_once_with(998.0)
+
+    @patch('src.replication.heartbeat_manager.logger')
+    def test_interval_adapts_to_rtt(self, mock_logger):
+        """Slow peers shrink the interval; once they speed up it returns to the ceiling."""
+        self.state.role = "leader"
+        self.state.peers = {"server2": "localhost:50052"}
+        ack = Mock(term=1, role="follower", applied_operation_id=0)
+        timers = Mock()
+        self.heartbeat_manager.start_ticking(timers)
+        self.assertEqual(self.heartbeat_manager.interval, HEARTBEAT_INTERVAL)
+
+        pending = []
+        self.transport.heartbeat = lambda *args: pending.append(args)
+
+        def round_with_rtt(rtt):
+            pending.clear()
+            self.state.clock.return_value = 1000
+            self.heartbeat_manager._send_heartbeats_as_leader({}, {})
+            self.state.clock.return_value = 1000 + rtt
+            for peer_id, _, _, _, callback in pending:
+                callback(peer_id, ack, None)
+
+        for _ in range(30):
+            round_with_rtt(1.0)
+        self.assertEqual(self.heartbeat_manager.interval, HEARTBEAT_INTERVAL_MIN)
+        timers.set_interval.assert_called_with(timers.schedule_periodic.return_value, HEARTBEAT_INTERVAL_MIN)
+
+        for _ in range(60):
+            round_with_rtt(0.001)
+        self.assertAlmostEqual(self.heartbeat_manager.interval, HEARTBEAT_INTERVAL_MAX, places=1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for the leader read lease.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.replication.lease_manager import LeaseManager
+
+
+@pytest.fixture
+def state():
+    state = MagicMock()
+    state.role = "leader"
+    state.term = 3
+    state.clock.return_value = 100.5
+    return state
+
+
+def test_renew_grants_lease_until_round_start_plus_duration(state):
+    """A majority round extends the lease from when the round started."""
+    lease = LeaseManager(state, duration=2)
+
+    lease.renew(round_start=100.0)
+
+    state.clock.return_value = 101.5
+    assert lease.is_valid()
+    assert lease.remaining() == pytest.approx(0.5)
+
+    state.clock.return_value = 102.0
+    assert not lease.is_valid()
+    assert lease.remaining() == 0.0
+
+
+def test_lease_is_tied_to_term_and_role(state):
+    """Stepping down or moving to a new term voids the lease."""
+    lease = LeaseManager(state, duration=2)
+    lease.renew(round_start=100.0)
+    assert lease.is_valid()
+
+    state.term = 4
+    assert not lease.is_valid()
+
+    state.term = 3
+    state.role = "follower"
+    assert not lease.is_valid()
+
+
+def test_followers_cannot_renew_and_invalidate_drops_lease(state):
+    """Only a leader can hold a lease, and invalidate() ends it early."""
+    lease = LeaseManager(state, duration=2)
+
+    state.role = "follower"
+    lease.renew(round_start=100.0)
+    state.role = "leader"
+    assert not lease.is_valid()
+
+    lease.renew(round_start=100.0)
+    assert lease.is_valid()
+    lease.invalidate()
+    assert not lease.is_valid()
@@ -0,0 +1,86 @@
+"""
+Tests for the replication metrics: histograms and the text exposition.
+"""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.replication.metrics import Histogram, MetricsServer, render_text, stats_to_proto
+from src.replication.replica_node import ReplicaNode
+
+
+@pytest.fixture
+def stats():
+    node = ReplicaNode(server_id="server1", address="localhost:50051")
+    node.election_manager.become_leader()
+    node.state.peers = {"server2": "localhost:50052"}
+    node.state.last_operation_id = 7
+    node.replication_manager.match_index["server2"] = 5
+    node.replication_manager.commit_latency.observe(0.003)
+    node.heartbeat_manager.peer_rtts["server2"] = 0.002
+    return node.get_replication_stats()
+
+
+def test_histogram_buckets():
+    histogram = Histogram(bounds=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    # Bounds are inclusive; the last bucket holds everything above them
+    assert snapshot["counts"] == [2, 1, 1]
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == pytest.approx(3.65)
+
+
+def test_stats_report_peer_lag(stats):
+    assert stats["peers"]["server2"]["match_index"] == 5
+    assert stats["peers"]["server2"]["lag"] == 2
+    assert stats["commit_latency"]["count"] == 1
+
+    response = stats_to_proto(stats)
+    assert response.role == "leader"
+    assert response.peers[0].server_id == "server2"
+    assert response.peers[0].lag == 2
+    assert sum(response.commit_latency.counts) == 1
+
+
+def test_render_text(stats):
+    text = render_text(stats)
+
+    assert 'replica_info{server_id="server1",role="leader",leader_id="server1"} 1' in text
+    assert 'replica_peer_lag{peer="server2"} 2' in text
+    assert "# TYPE replica_commit_seconds histogram" in text
+    # Buckets are cumulative
+    assert 'replica_commit_seconds_bucket{le="0.0025"} 0' in text
+    assert 'replica_commit_seconds_bucket{le="0.005"} 1' in text
+    assert 'replica_commit_seconds_bucket{le="+Inf"} 1' in text
+    assert "replica_commit_seconds_count 1" in text
+
+
+def test_metrics_server(stats):
+    server = MetricsServer(lambda: stats, port=0, host="127.0.0.1")
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert "replica_term" in response.read().decode("utf-8")
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.stop()
+
+
+def test_purge_progress_is_reported(stats):
+    assert "replica_purge_pending_users" not in render_text(stats)
+
+    stats.update({"purge_pending_users": 2, "purge_messages": 1500, "purge_batches": 3})
+    text = render_text(stats)
+    assert "replica_purge_pending_users 2" in text
+    assert "replica_purge_messages_total 1500" in text
+    assert stats_to_proto(stats).purge_messages == 1500
@@ -0,0 +1,151 @@
+"""
+Tests for the per-peer sender workers.
+"""
+
+import queue
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.replication.peer_sender import PeerSender, PeerSenderPool
+
+
+@pytest.fixture(autouse=True)
+def mock_channel():
+    """Avoid opening real gRPC channels."""
+    with patch("src.replication.peer_sender.grpc.insecure_channel") as mock:
+        mock.side_effect = lambda address: MagicMock(name=f"channel-{address}")
+        yield mock
+
+
+@pytest.fixture
+def state():
+    state = MagicMock()
+    state.peers = {"peer1": "localhost:50052", "peer2": "localhost:50053"}
+    return state
+
+
+def test_submit_runs_call_with_persistent_channel():
+    """Calls run on the worker with the sender's channel as first argument."""
+    sender = PeerSender("peer1", "localhost:50052")
+    try:
+        future = sender.submit(lambda channel, x: (channel, x * 2), 21)
+        channel, result = future.result(timeout=1)
+
+        assert channel is sender.channel
+        assert result == 42
+        # Same channel reused across calls
+        assert sender.submit(lambda channel: channel).result(timeout=1) is channel
+    finally:
+        sender.stop(timeout=1)
+
+
+def test_submit_propagates_exceptions():
+    """Errors raised by a call surface on its future."""
+    sender = PeerSender("peer1", "localhost:50052")
+    try:
+
+        def fail(channel):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            sender.submit(fail).result(timeout=1)
+    finally:
+        sender.stop(timeout=1)
+
+
+def test_full_queue_applies_backpressure():
+    """A full queue fails new calls after the enqueue timeout."""
+    sender = PeerSender("peer1", "localhost:50052", max_queue_size=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block(channel):
+        started.set()
+        release.wait(timeout=2)
+
+    try:
+        sender.submit(block)
+        started.wait(timeout=1)
+        sender.submit(lambda channel: None)  # fills the queue
+
+        assert sender.queue_depth() == 1
+
+        rejected = sender.submit(lambda channel: None, timeout=0.01)
+        with pytest.raises(queue.Full):
+            rejected.result(timeout=1)
+    finally:
+        release.set()
+        sender.stop(timeout=1)
+
+
+def test_stop_cancels_pending_and_closes_channel():
+    """Stopping a sender cancels queued calls and closes its channel."""
+    sender = PeerSender("peer1", "localhost:50052")
+    release = threading.Event()
+    started = threading.Event()
+
+    def block(channel):
+        started.set()
+        release.wait(timeout=2)
+
+    sender.submit(block)
+    started.wait(timeout=1)
+    pending = sender.submit(lambda channel: None)
+
+    release.set()
+    sender.stop(timeout=1)
+
+    assert not sender.thread.is_alive()
+    assert pending.cancelled() or pending.done()
+    sender.channel.close.assert_called_once()
+
+    with pytest.raises(RuntimeError):
+        sender.submit(lambda channel: None).result(timeout=1)
+
+
+def test_pool_reuses_sender_per_peer(state):
+    """The pool keeps one long-lived sender per peer."""
+    pool = PeerSenderPool(state)
+    try:
+        first = pool.get_sender("peer1", "localhost:50052")
+        second = pool.get_sender("peer1", "localhost:50052")
+
+        assert first is second
+        assert pool.get_channel("peer1", "localhost:50052") is first.channel
+    finally:
+        pool.shutdown()
+
+
+def test_pool_replaces_sender_when_address_changes(state):
+    """A peer that moved gets a fresh sender and channel."""
+    pool = PeerSenderPool(state)
+    try:
+        old = pool.get_sender("peer1", "localhost:50052")
+        new = pool.get_sender("peer1", "localhost:60000")
+
+        assert new is not old
+        assert new.address == "localhost:60000"
+        assert not old.is_running
+    finally:
+        pool.shutdown()
+
+
+def test_pool_queue_depths_and_prune(state):
+    """Queue depth is reported per peer and removed peers are pruned."""
+    pool = PeerSenderPool(state)
+    try:
+        pool.submit("peer1", "localhost:50052", lambda channel: None).result(timeout=1)
+        pool.submit("peer2", "localhost:50053", lambda channel: None).result(timeout=1)
+
+        assert pool.queue_depths() == {"peer1": 0, "peer2": 0}
+
+        del state.peers["peer2"]
+        pool.prune()
+
+        assert list(pool.queue_depths()) == ["peer1"]
+    finally:
+        pool.shutdown()
+
+    assert pool.queue_depths() == {}
@@ -2,8 +2,13 @@
 Tests for the ReplicaNode implementation.
 """
 
+import threading
+import time
+
+import grpc
 import pytest
 from unittest.mock import patch, MagicMock
+from src.replication.config import FORWARD_TIMEOUT, MAX_FORWARD_HOPS, MAX_READ_LAG
 from src.replication.replica_node import ReplicaNode
 from src.protocol.grpc import replication_pb2 as replication
 
@@ -156,3 +161,237 @@ def test_become_leader(replica_node):
     # Test the election_manager's become_leader method
     replica_node.election_manager.become_leader()
     # No assertions needed, just verifying it doesn't raise exceptions
+
+
+@pytest.fixture
+def follower_node(replica_node_with_peers):
+    """A follower that knows peer1 is the leader."""
+    replica_node_with_peers.state.role = "follower"
+    replica_node_with_peers.state.leader_id = "peer1"
+    return replica_node_with_peers
+
+
+def _context(metadata=(), time_remaining=None):
+    context = MagicMock()
+    context.invocation_metadata.return_value = metadata
+    context.time_remaining.return_value = time_remaining
+    return context
+
+
+@patch("src.replication.replica_node.chat_grpc.ChatServiceStub")
+def test_forward_to_leader_relays_response(mock_stub_class, follower_node):
+    """A follower proxies the write to the leader over the pooled channel."""
+    leader_response = MagicMock()
+    mock_stub_class.return_value.SendChatMessage.return_value = leader_response
+    request = MagicMock()
+
+    with patch.object(follower_node.peer_senders, "get_channel") as mock_get_channel:
+        response = follower_node.forward_to_leader(
+            "SendChatMessage", request, _context(time_remaining=1.5)
+        )
+
+    assert response is leader_response
+    mock_get_channel.assert_called_once_with("peer1", "localhost:50052")
+    mock_stub_class.return_value.SendChatMessage.assert_called_once_with(
+        request, timeout=1.5, metadata=(("x-forward-hops", "1"),)
+    )
+
+
+@patch("src.replication.replica_node.chat_grpc.ChatServiceStub")
+def test_forward_to_leader_uses_default_timeout(mock_stub_class, follower_node):
+    """Without a client deadline the forward uses FORWARD_TIMEOUT."""
+    with patch.object(follower_node.peer_senders, "get_channel"):
+        follower_node.forward_to_leader("Signup", MagicMock(), _context())
+
+    _, kwargs = mock_stub_class.return_value.Signup.call_args
+    assert kwargs["timeout"] == FORWARD_TIMEOUT
+
+
+@patch("src.replication.replica_node.chat_grpc.ChatServiceStub")
+def test_forward_to_leader_respects_hop_limit(mock_stub_class, follower_node):
+    """Requests that were already forwarded too often are not forwarded again."""
+    context = _context(metadata=(("x-forward-hops", str(MAX_FORWARD_HOPS)),))
+
+    assert follower_node.forward_to_leader("Signup", MagicMock(), context) is None
+    mock_stub_class.return_value.Signup.assert_not_called()
+
+
+def test_forward_to_leader_without_leader(replica_node_with_peers):
+    """Nothing to forward to when no leader is known or we are the leader."""
+    assert replica_node_with_peers.forward_to_leader("Signup", MagicMock(), _context()) is None
+
+    replica_node_with_peers.state.role = "leader"
+    replica_node_with_peers.state.leader_id = "test_server"
+    assert replica_node_with_peers.forward_to_leader("Signup", MagicMock(), _context()) is None
+
+
+@patch("src.replication.replica_node.chat_grpc.ChatServiceStub")
+def test_forward_to_leader_failure(mock_stub_class, follower_node):
+    """A failed forward returns None so the caller can reject the write."""
+    mock_stub_class.return_value.Signup.side_effect = grpc.RpcError()
+
+    with patch.object(follower_node.peer_senders, "get_channel"):
+        assert follower_node.forward_to_leader("Signup", MagicMock(), _context()) is None
+
+
+def test_get_leader_hint(follower_node):
+    """Followers advertise the leader's id, address and term."""
+    follower_node.state.term = 4
+
+    assert follower_node.get_leader_hint() == (
+        ("x-leader-id", "peer1"),
+        ("x-leader-address", "localhost:50052"),
+        ("x-leader-term", "4"),
+    )
+
+
+def test_get_leader_hint_self_and_unknown(replica_node):
+    """The leader points at itself; with no leader there is no hint."""
+    assert replica_node.get_leader_hint() == ()
+
+    replica_node.state.leader_id = "test_server"
+    assert dict(replica_node.get_leader_hint())["x-leader-address"] == "localhost:50051"
+
+
+def test_can_serve_bounded_read(follower_node):
+    """Fresh followers serve reads that ask for bounded staleness."""
+    bounded = _context(metadata=(("x-read-consistency", "bounded"),))
+    follower_node.state.leader_operation_id = 20
+    follower_node.state.record_applied(20 - MAX_READ_LAG)
+
+    follower_node.state.clock = MagicMock(return_value=100.0)
+    follower_node.state.last_leader_contact = 99.0
+    assert follower_node.can_serve_bounded_read(bounded)
+    # Clients that didn't opt in always get the leader's view
+    assert not follower_node.can_serve_bounded_read(_context())
+
+    # Too far behind the leader
+    follower_node.state.leader_operation_id = 21
+    assert not follower_node.can_serve_bounded_read(bounded)
+
+    # Lag is unknown when the leader has gone quiet
+    follower_node.state.leader_operation_id = 20
+    follower_node.state.last_leader_contact = 90.0
+    assert not follower_node.can_serve_bounded_read(bounded)
+
+
+def test_leader_assigns_one_operation_id_per_write(replica_node):
+    """Each replicated write advances the operation id by exactly one."""
+    replica_node.state.role = "leader"
+
+    with patch.object(replica_node.replication_manager, "replicate_to_followers") as mock_replicate:
+        replica_node.replicate_to_followers("ChatServicer", "Signup", b"")
+        replica_node.replicate_to_followers("ChatServicer", "Signup", b"")
+
+    assert replica_node.state.last_operation_id == 2
+    assert replica_node.state.last_applied_operation_id == 2
+    assert [c.args[3] for c in mock_replicate.call_args_list] == [1, 2]
+
+
+def test_replication_retries_timed_out_calls(replica_node):
+    """A timed-out ReplicateOperation is sent again; other failures are not."""
+    replica_node.state.role = "leader"
+    timeout = grpc.RpcError()
+    timeout.code = lambda: grpc.StatusCode.DEADLINE_EXCEEDED
+    rejected = grpc.RpcError()
+    rejected.code = lambda: grpc.StatusCode.FAILED_PRECONDITION
+    manager = replica_node.replication_manager
+
+    with patch("src.replication.replication_manager.replication_grpc.ReplicationServiceStub") as mock_stub_class:
+        stub = mock_stub_class.return_value
+        stub.ReplicateOperation.side_effect = [timeout, replication.OperationResponse(success=True)]
+        assert manager.replicate_to_one_follower(MagicMock(), "peer1", "ChatServicer", "Signup", b"", 1)
+        assert stub.ReplicateOperation.call_count == 2
+
+        stub.ReplicateOperation.reset_mock()
+        stub.ReplicateOperation.side_effect = [rejected]
+        assert not manager.replicate_to_one_follower(MagicMock(), "peer1", "ChatServicer", "Signup", b"", 2)
+        assert stub.ReplicateOperation.call_count == 1
+
+
+def test_replication_records_match_index_and_commit_latency(replica_node_with_peers):
+    """Acks advance each peer's match index; reaching a majority is timed once."""
+    node = replica_node_with_peers
+    node.state.role = "leader"
+    manager = node.replication_manager
+
+    with patch("src.replication.replication_manager.replication_grpc.ReplicationServiceStub") as mock_stub_class:
+        mock_stub_class.return_value.ReplicateOperation.return_value = replication.OperationResponse(success=True)
+        assert manager.replicate_to_followers("ChatServicer", "Signup", b"", 3)
+        # The write returned at quorum; the other follower is still acked
+        for _ in range(100):
+            if len(manager.match_index) == 2:
+                break
+            time.sleep(0.01)
+    node.peer_senders.shutdown()
+
+    assert manager.match_index == {"peer1": 3, "peer2": 3}
+    assert manager.replication_latency.snapshot()["count"] == 2
+    assert manager.commit_latency.snapshot()["count"] == 1
+
+    node.state.last_operation_id = 4
+    stats = node.get_replication_stats()
+    assert stats["peers"]["peer1"]["lag"] == 1
+
+
+def test_replication_returns_at_quorum(replica_node_with_peers):
+    """A follower that never answers does not hold up the write."""
+    node = replica_node_with_peers
+    node.state.role = "leader"
+    manager = node.replication_manager
+    released = threading.Event()
+
+    def replicate(request, timeout):
+        if replicate.calls.pop(0) == "blackholed":
+            released.wait(timeout)
+            raise TimeoutError()
+        return replication.OperationResponse(success=True)
+
+    replicate.calls = ["blackholed", "healthy"]
+    with patch("src.replication.replication_manager.replication_grpc.ReplicationServiceStub") as mock_stub_class:
+        mock_stub_class.return_value.ReplicateOperation.side_effect = replicate
+        started = time.monotonic()
+        assert manager.replicate_to_followers("ChatServicer", "Signup", b"", 1)
+        assert time.monotonic() - started < 1
+    released.set()
+    node.peer_senders.shutdown()
+
+
+def test_write_fails_when_every_follower_fails(replica_node_with_peers):
+    """Without a majority the leader reports the write as not replicated."""
+    node = replica_node_with_peers
+    node.state.role = "leader"
+    rejected = grpc.RpcError()
+    rejected.code = lambda: grpc.StatusCode.FAILED_PRECONDITION
+
+    with patch("src.replication.replication_manager.replication_grpc.ReplicationServiceStub") as mock_stub_class:
+        mock_stub_class.return_value.ReplicateOperation.side_effect = rejected
+        assert node.replicate_to_followers("ChatServicer", "Signup", b"") is False
+    node.peer_senders.shutdown()
+
+    assert node.replication_manager.match_index == {}
+    assert node.replication_manager.commit_latency.snapshot()["count"] == 0
+
+
+def test_replication_retries_stop_at_deadline(replica_node):
+    """Retries share one deadline, and expired operations are not sent."""
+    timeout = grpc.RpcError()
+    timeout.code = lambda: grpc.StatusCode.DEADLINE_EXCEEDED
+    manager = replica_node.replication_manager
+    now = [100.0]
+    replica_node.state.clock = lambda: now[0]
+
+    def replicate(request, timeout):
+        replicate.timeouts.append(timeout)
+        now[0] += timeout
+        raise replicate.error
+
+    replicate.timeouts = []
+    replicate.error = timeout
+    with patch("src.replication.replication_manager.replication_grpc.ReplicationServiceStub") as mock_stub_class:
+        mock_stub_class.return_value.ReplicateOperation.side_effect = replicate
+        assert not manager.replicate_to_one_follower(MagicMock(), "peer1", "ChatServicer", "Signup", b"", 1, 103.0)
+        assert replicate.timeouts == [2, 1]
+
+        assert not manager.replicate_to_one_follower(MagicMock(), "peer1", "ChatServicer", "Signup", b"", 2, 90.0)
+        assert replicate.timeouts == [2, 1]
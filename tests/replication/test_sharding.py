@@ -0,0 +1,78 @@
+"""
+Tests for the shard map that places users and chats on replica groups.
+"""
+
+import pytest
+
+from src.protocol.grpc import chat_pb2
+from src.replication.sharding import ShardMap, canonical_chat_id, shard_key
+
+
+@pytest.fixture
+def shard_map():
+    return ShardMap.parse(
+        "g1=localhost:50051,localhost:50052;g2=localhost:50061,localhost:50062;g3=localhost:50071"
+    )
+
+
+def test_parse(shard_map):
+    assert shard_map.group_ids == ["g1", "g2", "g3"]
+    assert shard_map.groups["g2"] == ["localhost:50061", "localhost:50062"]
+    assert shard_map.group_of_address("localhost:50071") == "g3"
+    assert shard_map.group_of_address("localhost:1") is None
+
+    with pytest.raises(ValueError):
+        ShardMap.parse("g1=")
+    with pytest.raises(ValueError):
+        ShardMap.parse("")
+
+
+def test_proto_round_trip(shard_map):
+    assert ShardMap.from_proto(shard_map.to_proto()).groups == shard_map.groups
+
+
+def test_both_participants_route_a_chat_to_one_group(shard_map):
+    assert canonical_chat_id("bob", "alice") == "alice_bob"
+    assert shard_map.group_for_chat("bob_alice", "bob") == shard_map.group_for_chat("alice_bob", "bob")
+
+    start = chat_pb2.StartChatRequest(current_user="bob", other_user="alice")
+    send = chat_pb2.SendMessageRequest(chat_id="bob_alice", sender="bob", content="hi")
+    assert shard_key("StartChat", start) == shard_key("SendChatMessage", send) == ("chat", "alice_bob")
+
+
+def test_chats_of_usernames_with_underscores_route_to_one_group():
+    """ "a_b_a" and "b_a_a" are one chat between "a" and "b_a"."""
+    requests = [
+        ("SendChatMessage", chat_pb2.SendMessageRequest(chat_id="a_b_a", sender="a")),
+        ("SendChatMessage", chat_pb2.SendMessageRequest(chat_id="b_a_a", sender="a")),
+        ("SendChatMessage", chat_pb2.SendMessageRequest(chat_id="b_a_a", sender="b_a")),
+        ("GetMessages", chat_pb2.GetMessagesRequest(chat_id="a_b_a", current_user="b_a")),
+        ("DeleteMessages", chat_pb2.DeleteMessagesRequest(chat_id="b_a_a", current_user="a")),
+    ]
+    assert {shard_key(method, request) for method, request in requests} == {("chat", "a_b_a")}
+
+    # "a_b" and "a" share the id "a_b_a" with them, but are another chat
+    send = chat_pb2.SendMessageRequest(chat_id="a_b_a", sender="a_b")
+    assert shard_key("SendChatMessage", send) == ("chat", "a_a_b")
+
+
+def test_requests_spanning_groups_have_no_key():
+    assert shard_key("Signup", chat_pb2.SignupRequest(username="alice")) == ("user", "alice")
+    assert shard_key("GetChats", chat_pb2.GetChatsRequest(user_id="alice")) is None
+    assert shard_key("DeleteUser", chat_pb2.DeleteUserRequest(username="alice")) is None
+    assert shard_key("GetUsersToDisplay", chat_pb2.GetUsersToDisplayRequest()) is None
+    assert shard_key("SearchMessages", chat_pb2.SearchMessagesRequest(current_user="alice")) is None
+    assert shard_key(
+        "SearchMessages", chat_pb2.SearchMessagesRequest(current_user="alice", chat_id="bob_alice")
+    ) == ("chat", "alice_bob")
+
+
+def test_placement_is_stable_and_spread(shard_map):
+    users = [f"user{i}" for i in range(3000)]
+    placement = [shard_map.group_for_user(u) for u in users]
+
+    # Same answer from an independently built map (other clients/servers)
+    other = ShardMap.from_proto(shard_map.to_proto())
+    assert placement == [other.group_for_user(u) for u in users]
+    for group_id in shard_map.group_ids:
+        assert 800 < placement.count(group_id) < 1200
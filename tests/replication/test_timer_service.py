@@ -0,0 +1,109 @@
+"""
+Tests for the shared timing-wheel timer service.
+"""
+
+import threading
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.replication.election_manager import ElectionManager
+from src.replication.timer_service import TimerService
+
+
+@pytest.fixture
+def timers():
+    """A wheel stepped by hand: 0.1s ticks, 8 slots."""
+    return TimerService(tick=0.1, wheel_size=8, autostart=False)
+
+
+def test_timer_fires_after_delay(timers):
+    """A timer fires on the tick its delay rounds up to, exactly once."""
+    callback = MagicMock()
+    timers.schedule(0.25, callback)
+
+    timers.advance(2)
+    callback.assert_not_called()
+
+    timers.advance(1)
+    callback.assert_called_once()
+
+    timers.advance(10)
+    callback.assert_called_once()
+    assert timers.pending() == 0
+
+
+def test_reset_moves_timer_and_cancel_disarms(timers):
+    """Resetting pushes the deadline out; cancelled timers never fire."""
+    callback = MagicMock()
+    timer = timers.schedule(0.2, callback)
+
+    timers.advance(1)
+    timers.reset(timer, 0.3)
+    timers.advance(2)
+    callback.assert_not_called()
+    timers.advance(1)
+    callback.assert_called_once()
+
+    other = MagicMock()
+    timer = timers.schedule(0.1, other)
+    timer.cancel()
+    timers.advance(5)
+    other.assert_not_called()
+
+
+def test_timers_beyond_one_revolution(timers):
+    """Delays longer than the wheel wait for the right revolution."""
+    callback = MagicMock()
+    timers.schedule(2.0, callback)  # 20 ticks on an 8-slot wheel
+
+    timers.advance(19)
+    callback.assert_not_called()
+    timers.advance(1)
+    callback.assert_called_once()
+
+
+def test_periodic_timer_rearms_until_cancelled(timers):
+    """Periodic timers run every interval until cancelled."""
+    callback = MagicMock()
+    timer = timers.schedule_periodic(0.2, callback)
+
+    timers.advance(6)
+    assert callback.call_count == 3
+
+    timer.cancel()
+    timers.advance(6)
+    assert callback.call_count == 3
+
+
+def test_scheduler_thread_fires_timers():
+    """With the scheduler running, timers fire in real time on one thread."""
+    timers = TimerService(tick=0.01)
+    fired = threading.Event()
+    try:
+        timers.schedule(0.02, fired.set)
+        assert fired.wait(timeout=1)
+    finally:
+        timers.stop()
+
+    assert not timers.thread.is_alive()
+
+
+def test_election_timer_reset_reuses_timer(timers):
+    """Resetting the election timer moves one timer instead of creating threads."""
+    state = MagicMock()
+    state.election_timer = None
+    manager = ElectionManager(state, transport=MagicMock(), timer_service=timers)
+
+    manager.reset_election_timer()
+    first = state.election_timer
+    threads_before = threading.active_count()
+    for _ in range(100):
+        manager.reset_election_timer()
+
+    assert state.election_timer is first
+    assert timers.pending() == 1
+    assert threading.active_count() == threads_before
+
+    manager.cancel_election_timer()
+    assert timers.pending() == 0
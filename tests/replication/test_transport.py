@@ -0,0 +1,66 @@
+"""
+Tests for the consensus transports.
+"""
+
+import grpc
+from unittest.mock import MagicMock, patch
+
+from src.replication.transport import GrpcTransport, InMemoryNetwork
+from src.protocol.grpc import replication_pb2 as replication
+
+
+def test_grpc_transport_dispatches_completion():
+    """Completed calls are handed to dispatch with (peer_id, response, error)."""
+    dispatched = []
+    transport = GrpcTransport(MagicMock(), dispatch=lambda fn, *args: dispatched.append(args))
+    response = replication.HeartbeatResponse(success=True)
+
+    with patch("src.protocol.grpc.replication_pb2_grpc.ReplicationServiceStub") as mock_stub:
+        future = mock_stub.return_value.Heartbeat.future.return_value
+        future.result.return_value = response
+        future.add_done_callback.side_effect = lambda done: done(future)
+
+        transport.heartbeat("server2", "localhost:50052", replication.HeartbeatRequest(), 0.5, MagicMock())
+
+    mock_stub.return_value.Heartbeat.future.assert_called_once()
+    assert dispatched == [("server2", response, None)]
+
+
+def test_in_memory_network_delivers_and_times_out():
+    """Messages arrive after their latency; cut links fail at the deadline."""
+    network = InMemoryNetwork(seed=1)
+    network.register("b", lambda request: replication.HeartbeatResponse(term=request.term))
+    transport = network.transport("a")
+    results = []
+
+    def callback(peer_id, response, error):
+        results.append((network.now, response, error))
+
+    transport.heartbeat("B", "b", replication.HeartbeatRequest(term=3), 0.5, callback)
+    network.run_for(1)
+    _, response, error = results[0]
+    assert error is None and response.term == 3
+    assert results[0][0] < 0.011
+
+    network.partition("a", "b")
+    transport.heartbeat("B", "b", replication.HeartbeatRequest(term=3), 0.5, callback)
+    network.run_for(1)
+    at, response, error = results[1]
+    assert response is None
+    assert error.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    assert at == 1.5
+
+
+def test_in_memory_network_refuses_crashed_peer():
+    """A crashed peer is reported UNAVAILABLE, as a refused connection would be."""
+    network = InMemoryNetwork(seed=1)
+    network.register("b", lambda request: replication.HeartbeatResponse())
+    network.crash("b")
+    results = []
+
+    network.transport("a").heartbeat(
+        "B", "b", replication.HeartbeatRequest(), 0.5, lambda *args: results.append(args)
+    )
+    network.run_for(1)
+
+    assert results[0][2].code() == grpc.StatusCode.UNAVAILABLE
@@ -187,7 +187,7 @@ def test_delete_messages(mock_db_manager):
     
     # Assert
     assert result == {"success": True}
-    mock_db_manager.delete_messages.assert_called_once_with(1, [0, 1, 2], "testuser")
+    mock_db_manager.delete_messages.assert_called_once_with(1, [0, 1, 2], "testuser", None)
 
 def get_messages(payload):
     """Get messages for a chat."""
@@ -238,4 +238,4 @@ def test_get_users_to_display(mock_db_manager):
         "users": [{"username": "user1"}],
         "total_pages": 1
     }
-    mock_db_manager.get_users_to_display.assert_called_once_with("currentuser", "user", 1, 10)
\ No newline at end of file
+    mock_db_manager.get_users_to_display.assert_called_once_with("currentuser", "user", 1, 10, "")
\ No newline at end of file
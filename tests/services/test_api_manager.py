@@ -192,7 +192,7 @@ def test_delete_messages(api_manager):
     # Assert
     assert result == {"success": True}
     api_manager.db_manager.delete_messages.assert_called_once_with(
-        chat_id, message_indices, current_user
+        chat_id, message_indices, current_user, None
     )
 
 
@@ -210,7 +210,7 @@ def test_get_messages_valid_payload(api_manager):
 
     # Assert
     assert result == {"messages": [{"id": 1, "content": "Hello"}], "success": True}
-    api_manager.db_manager.get_messages.assert_called_once_with(1, "testuser")
+    api_manager.db_manager.get_messages.assert_called_once_with(1, "testuser", 0, 0, 0)
 
 
 def test_get_messages_invalid_payload_missing_chat_id(api_manager):
@@ -256,7 +256,7 @@ def test_send_chat_message(api_manager):
     # Assert
     assert result == {"success": True, "message_id": 1}
     api_manager.db_manager.send_chat_message.assert_called_once_with(
-        chat_id, sender, content
+        chat_id, sender, content, None, None
     )
 
 
@@ -285,5 +285,5 @@ def test_get_users_to_display(api_manager):
         "total_pages": 1,
     }
     api_manager.db_manager.get_users_to_display.assert_called_once_with(
-        exclude_username, search_pattern, current_page, users_per_page
+        exclude_username, search_pattern, current_page, users_per_page, ""
     )
@@ -0,0 +1,62 @@
+"""
+Tests for archiving cold messages in the background.
+"""
+
+import pytest
+
+from src.services.archiver import MessageArchiver
+from src.services.db_manager import DBManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DBManager(str(tmp_path / "archive.db"))
+    manager.initialize_database()
+    for username in ("alice", "bob", "carol"):
+        manager.add_user(username, username.title(), "pw")
+    for i in range(10):
+        manager.send_chat_message("alice_bob", "alice", f"to bob {i}")
+    manager.send_chat_message("bob_carol", "carol", "unrelated")
+    manager.get_messages("alice_bob", "bob")
+    return manager
+
+
+def count_hot(db):
+    with db._get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def test_archives_beyond_the_newest_messages(db):
+    archiver = MessageArchiver(db, keep=3, block_size=3, pause=0)
+
+    assert archiver.run_round() == 2
+    # The newest `keep` and the partial block stay, as does the unread chat
+    assert count_hot(db) == 5
+    assert archiver.stats() == {"archive_messages": 6, "archive_blocks": 2}
+    assert archiver.run_round() == 0
+
+    messages = db.get_messages("alice_bob", "alice")["messages"]
+    assert [m["content"] for m in messages] == [f"to bob {i}" for i in range(10)]
+
+
+def test_archives_old_messages(db):
+    with db._get_connection() as conn:
+        conn.execute("UPDATE messages SET timestamp = 0")
+    archiver = MessageArchiver(db, keep=100, max_age=60, block_size=5, pause=0)
+
+    assert archiver.run_round() == 2
+    assert count_hot(db) == 1
+
+
+def test_background_thread_archives(db):
+    archiver = MessageArchiver(db, keep=0, block_size=5, pause=0, idle_interval=0.01)
+    archiver.start()
+    try:
+        for _ in range(500):
+            if archiver.blocks == 2:
+                break
+            archiver.stop_event.wait(0.01)
+    finally:
+        archiver.stop()
+
+    assert count_hot(db) == 1
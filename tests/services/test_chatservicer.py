@@ -197,6 +197,7 @@ class TestChatServicer(unittest.TestCase):
         mock_get_users.return_value = {
             "users": ["user1", "user2", "user3"],
             "total_pages": 2,
+            "total_users": 12,
         }
 
         # Create request
@@ -213,10 +214,11 @@ class TestChatServicer(unittest.TestCase):
         # Verify the response
         self.assertEqual(response.usernames, ["user1", "user2", "user3"])
         self.assertEqual(response.total_pages, 2)
+        self.assertEqual(response.total_users, 12)
         self.assertEqual(response.error_message, "")
 
         # Verify the API call
-        mock_get_users.assert_called_once_with("currentuser", "user", 1, 10)
+        mock_get_users.assert_called_once_with("currentuser", "user", 1, 10, "")
 
     @patch("src.services.api_manager.APIManager.get_users_to_display")
     def test_get_users_to_display_error(self, mock_get_users):
@@ -360,6 +362,62 @@ class TestChatServicer(unittest.TestCase):
         self.assertEqual(response.messages[1].timestamp, "2023-01-01 12:01:00")
         self.assertEqual(response.error_message, "")
 
+    @patch("src.services.api_manager.APIManager.get_messages")
+    def test_get_messages_after_seq(self, mock_get_messages):
+        """Test getting the messages after a sequence number."""
+        mock_get_messages.return_value = {
+            "messages": [
+                {
+                    "sender": "user1",
+                    "content": "Hello",
+                    "timestamp": 1_700_000_000_000_000,
+                    "seq": 4,
+                },
+            ]
+        }
+
+        request = chat_pb2.GetMessagesRequest(
+            chat_id="chat123", current_user="testuser", after_seq=3, before_seq=9, limit=5
+        )
+        response = self.servicer.GetMessages(request, self.context)
+
+        mock_get_messages.assert_called_once_with(
+            {"chat_id": "chat123", "current_user": "testuser", "after_seq": 3, "before_seq": 9, "limit": 5}
+        )
+        self.assertEqual(response.messages[0].seq, 4)
+        # Microsecond timestamps reach clients in ISO 8601
+        self.assertTrue(response.messages[0].timestamp.startswith("2023-11-1"))
+
+    @patch("src.services.api_manager.APIManager.search_messages")
+    def test_search_messages(self, mock_search_messages):
+        """Test searching messages."""
+        mock_search_messages.return_value = {
+            "matches": [
+                {
+                    "chat_id": "alice_bob",
+                    "id": 3,
+                    "sender": "bob",
+                    "content": "Lunch at noon?",
+                    "timestamp": 1_700_000_000_000_000,
+                    "seq": 2,
+                    "snippet": "[Lunch] at noon?",
+                    "rank": -1.5,
+                }
+            ],
+            "has_more": True,
+        }
+
+        request = chat_pb2.SearchMessagesRequest(
+            current_user="alice", query="lunch", page=2, page_size=1
+        )
+        response = self.servicer.SearchMessages(request, self.context)
+
+        mock_search_messages.assert_called_once_with("alice", "lunch", "", 2, 1)
+        self.assertTrue(response.has_more)
+        self.assertEqual(response.matches[0].chat_id, "alice_bob")
+        self.assertEqual(response.matches[0].message.seq, 2)
+        self.assertEqual(response.matches[0].snippet, "[Lunch] at noon?")
+
     @patch("src.services.api_manager.APIManager.get_messages")
     def test_get_messages_error(self, mock_get_messages):
         """Test getting messages with error."""
@@ -396,9 +454,9 @@ class TestChatServicer(unittest.TestCase):
         self.assertTrue(response.success)
         self.assertEqual(response.error_message, "")
 
-        # Verify the API call
+        # Verify the API call: standalone, the database stamps the message
         mock_send_message.assert_called_once_with(
-            "chat123", "testuser", "Hello, world!"
+            "chat123", "testuser", "Hello, world!", 0, 0
         )
 
     @patch("src.services.api_manager.APIManager.send_chat_message")
@@ -441,7 +499,20 @@ class TestChatServicer(unittest.TestCase):
         self.assertEqual(response.error_message, "")
 
         # Verify the API call
-        mock_delete_messages.assert_called_once_with("chat123", [1, 2, 3], "testuser")
+        mock_delete_messages.assert_called_once_with("chat123", [1, 2, 3], "testuser", [])
+
+    @patch("src.services.api_manager.APIManager.message_seqs", return_value=[5, 9])
+    def test_deleted_messages_are_pinned_to_seqs(self, mock_message_seqs):
+        """Before replicating, the leader turns positions into sequence numbers."""
+        request = chat_pb2.DeleteMessagesRequest(
+            chat_id="chat123", message_indices=[1, 2], current_user="testuser"
+        )
+
+        self.servicer._pin_deleted_messages(request)
+
+        mock_message_seqs.assert_called_once_with("chat123", [1, 2], "testuser")
+        self.assertEqual(list(request.message_seqs), [5, 9])
+        self.assertEqual(list(request.message_indices), [])
 
     @patch("src.services.api_manager.APIManager.delete_messages")
     def test_delete_messages_failure(self, mock_delete_messages):
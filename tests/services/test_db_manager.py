@@ -6,7 +6,7 @@ import os
 # timedelta
 from datetime import datetime, timedelta
 
-from src.services.db_manager import DBManager
+from src.services.db_manager import SCHEMA_VERSION, DBManager, epoch_micros
 
 @pytest.fixture
 def db_manager():
@@ -106,8 +106,8 @@ def test_get_chats(db_manager):
         # Add test messages
         current_time = datetime.now()
         messages = [
-            (user1_id, user2_id, "Hello!", current_time.isoformat(), False),
-            (user2_id, user1_id, "Hi back!", current_time.isoformat(), True)
+            (user1_id, user2_id, "Hello!", epoch_micros(current_time.isoformat()), False),
+            (user2_id, user1_id, "Hi back!", epoch_micros(current_time.isoformat()), True)
         ]
 
         cursor.execute(
@@ -119,7 +119,7 @@ def test_get_chats(db_manager):
         )
         conn.commit()
 
-    response = db_manager.get_chats(user1_id)
+    response = db_manager.get_chats("user1")
 
     # Test basic response structure
     assert response["success"] is True
@@ -129,9 +129,8 @@ def test_get_chats(db_manager):
 
     # Test chat content
     chat = response["chats"][0]
-    expected_chat_id = f"{min(user1_id, user2_id)}_{max(user1_id, user2_id)}"
-    assert chat["chat_id"] == expected_chat_id
-    assert chat["other_user"] == user2_id
+    assert chat["chat_id"] == "user1_user2"
+    assert chat["other_user"] == "user2"
     assert chat["unread_count"] == 0  # user1 has no unread messages
 
 def test_get_chats_with_unread(db_manager):
@@ -150,9 +149,9 @@ def test_get_chats_with_unread(db_manager):
         # Add messages with some unread
         current_time = datetime.now()
         messages = [
-            (user2_id, user1_id, "Hi!", current_time.isoformat(), False),
-            (user2_id, user1_id, "Hello again!", current_time.isoformat(), False),
-            (user1_id, user2_id, "Hey!", current_time.isoformat(), True)
+            (user2_id, user1_id, "Hi!", epoch_micros(current_time.isoformat()), False),
+            (user2_id, user1_id, "Hello again!", epoch_micros(current_time.isoformat()), False),
+            (user1_id, user2_id, "Hey!", epoch_micros(current_time.isoformat()), True)
         ]
 
         cursor.executemany(
@@ -164,7 +163,7 @@ def test_get_chats_with_unread(db_manager):
         )
         conn.commit()
 
-    response = db_manager.get_chats(user1_id)
+    response = db_manager.get_chats("user1")
     chat = response["chats"][0]
     assert chat["unread_count"] == 2  # user1 has 2 unread messages
 
@@ -189,10 +188,10 @@ def test_get_chats_ordering(db_manager):
         messages = [
             # Older message with user2
             (user1_id, user2_id, "Old message",
-             (base_time - timedelta(hours=1)).isoformat(), True),
+             epoch_micros((base_time - timedelta(hours=1)).isoformat()), True),
             # Recent message with user3
             (user3_id, user1_id, "Recent message",
-             base_time.isoformat(), False)
+             epoch_micros(base_time.isoformat()), False)
         ]
 
         cursor.executemany(
@@ -204,12 +203,12 @@ def test_get_chats_ordering(db_manager):
         )
         conn.commit()
 
-    response = db_manager.get_chats(user1_id)
+    response = db_manager.get_chats("user1")
     chats = response["chats"]
     assert len(chats) == 2
     # Chat with user3 should be first (more recent)
-    assert chats[0]["other_user"] == user3_id
-    assert chats[1]["other_user"] == user2_id
+    assert chats[0]["other_user"] == "user3"
+    assert chats[1]["other_user"] == "user2"
 
 def test_get_chats_exclude_self_messages(db_manager):
     """Test that self-messages are excluded from chat list."""
@@ -227,11 +226,11 @@ def test_get_chats_exclude_self_messages(db_manager):
             INSERT INTO messages (sender_id, receiver_id, content, timestamp, read)
             VALUES (?, ?, ?, ?, ?)
             """,
-            (user1_id, user1_id, "Note to self", datetime.now().isoformat(), True)
+            (user1_id, user1_id, "Note to self", epoch_micros(datetime.now().isoformat()), True)
         )
         conn.commit()
 
-    response = db_manager.get_chats(user1_id)
+    response = db_manager.get_chats("user1")
     assert len(response["chats"]) == 0  # No chats should be returned
 def test_get_all_users(db_manager, sample_users):
     """Test getting all users except excluded one."""
@@ -381,4 +380,439 @@ def test_concurrent_database_access(db_manager):
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(DISTINCT username) FROM users")
         distinct_count = cursor.fetchone()[0]
-        assert distinct_count == 10
\ No newline at end of file
+        assert distinct_count == 10
+
+def test_apply_batch_skips_duplicates(db_manager):
+    """A replicated operation delivered twice is applied once."""
+    apply = lambda: db_manager.add_user("dup_user", "Dup", "password123")["success"]
+
+    assert db_manager.apply_batch([(1, 7, apply)])[0] is True
+    assert db_manager.apply_batch([(1, 7, apply)])[0] is None
+    # Out-of-order and same id from another term are distinct operations
+    assert db_manager.apply_batch([(1, 5, lambda: True)])[0] is True
+    assert db_manager.apply_batch([(2, 7, lambda: True)])[0] is True
+
+    with db_manager._get_connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM users WHERE username = 'dup_user'").fetchone()[0]
+    assert count == 1
+
+
+def test_apply_batch_rolls_back_failed_apply(db_manager):
+    """A failed apply leaves neither its writes nor a dedup entry behind."""
+
+    def apply():
+        db_manager.add_user("half_applied", "Half", "password123")
+        raise RuntimeError("boom")
+
+    assert db_manager.apply_batch([(1, 3, apply)])[0] is False
+
+    with db_manager._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    # Not recorded, so the leader's retry is applied
+    assert db_manager.apply_batch([(1, 3, lambda: db_manager.add_user("half_applied", "Half", "pw")["success"])])[0] is True
+
+
+def test_apply_batch_isolates_failed_operations(db_manager):
+    """Operations in one batch commit together; a failing one only undoes itself."""
+
+    def fail():
+        db_manager.add_user("failed_user", "Failed", "pw")
+        raise RuntimeError("boom")
+
+    results = db_manager.apply_batch([
+        (1, 1, lambda: db_manager.add_user("first", "First", "pw")["success"]),
+        (1, 2, fail),
+        (1, 3, lambda: db_manager.add_user("third", "Third", "pw")["success"]),
+        (1, 1, lambda: db_manager.add_user("first_again", "First", "pw")["success"]),
+    ])
+
+    assert results == [True, False, True, None]
+    assert sorted(db_manager.get_all_users()["users"]) == ["first", "third"]
+
+
+def test_apply_batch_forgets_operations_outside_window(db_manager):
+    """Dedup entries older than the retry window are pruned."""
+    for operation_id in range(1, 6):
+        db_manager.apply_batch([(1, operation_id, lambda: True)], keep=2)
+
+    with db_manager._get_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT operation_id FROM applied_operations ORDER BY operation_id")]
+    assert ids == [4, 5]
+
+
+def test_sharded_recipient_check_uses_tombstones(tmp_path):
+    """With users in other groups, only recipients deleted cluster-wide are refused."""
+    db = DBManager(str(tmp_path / "shard.db"), local_users=False)
+    db.initialize_database()
+
+    # bob's record lives in another group: sending is allowed
+    assert db.send_chat_message("alice_bob", "alice", "hi")["success"] is True
+
+    # The DeleteUser fan-out reaches this group too
+    db.delete_user("bob")
+    result = db.send_chat_message("alice_bob", "alice", "still there?")
+    assert result["success"] is False
+    assert "deleted their account" in result["error_message"]
+
+
+def test_messages_store_interned_user_ids(db_manager, sample_users):
+    """Messages hold integer ids; a user's account id is their interned id."""
+    db_manager.send_chat_message("user1_user2", "user1", "hi")
+
+    with db_manager._get_connection() as conn:
+        row = conn.execute("SELECT sender_id, receiver_id FROM messages").fetchone()
+        ids = dict(conn.execute("SELECT username, id FROM users"))
+    assert row == (ids["user1"], ids["user2"])
+
+    # Deleting an account keeps its id, so its messages still name it
+    db_manager.delete_user("user1")
+    messages = db_manager.get_messages("user1_user2", "user2")["messages"]
+    assert messages[0]["sender"] == "user1"
+    db_manager.add_user("user1", "User One", "password1")
+    assert db_manager.login({"username": "user1", "password": "password1"})["user_id"] == ids["user1"]
+
+
+def test_usernames_with_underscores(db_manager):
+    """Chat ids are split around the current user, not at the first underscore."""
+    for username in ("a_b", "c", "a", "b_c"):
+        db_manager.add_user(username, username, "pw")
+
+    assert db_manager.send_chat_message("a_b_c", "c", "to a_b")["success"] is True
+    assert db_manager.send_chat_message("a_b_c", "a", "to b_c")["success"] is True
+
+    assert [m["content"] for m in db_manager.get_messages("a_b_c", "a_b")["messages"]] == ["to a_b"]
+    assert [m["content"] for m in db_manager.get_messages("a_b_c", "b_c")["messages"]] == ["to b_c"]
+    assert {c["other_user"] for c in db_manager.get_chats("c")["chats"]} == {"a_b"}
+
+    # "b" is in neither chat, so "a_b_c" is not split at a guess
+    db_manager.add_user("b", "b", "pw")
+    refused = db_manager.send_chat_message("a_b_c", "b", "to whom?")
+    assert refused == {"success": False, "error_message": "User 'b' is not part of chat 'a_b_c'."}
+    assert db_manager.get_messages("a_b_c", "b")["success"] is False
+    with db_manager._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 2
+
+
+def test_migrates_messages_keyed_by_username(tmp_path):
+    """Databases from before interning get their messages converted in place."""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                            nickname TEXT NOT NULL, password TEXT NOT NULL);
+        CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, sender_id INTEGER NOT NULL,
+                               receiver_id INTEGER NOT NULL, content TEXT NOT NULL,
+                               timestamp TEXT NOT NULL, read INTEGER DEFAULT 0);
+        INSERT INTO users (username, nickname, password) VALUES ('bob', 'Bob', 'pw'), ('alice', 'Alice', 'pw');
+        INSERT INTO messages (sender_id, receiver_id, content, timestamp)
+        VALUES ('alice', 'bob', 'hi', '2024-01-01T00:00:00'), ('gone', 'alice', 'bye', '2024-01-01T00:00:01');
+        """
+    )
+    conn.close()
+
+    manager = DBManager(path)
+    manager.initialize_database()
+
+    with manager._get_connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        types = {row[0] for row in conn.execute("SELECT typeof(sender_id) FROM messages")}
+        bob_id = conn.execute("SELECT id FROM user_ids WHERE username = 'bob'").fetchone()[0]
+    assert types == {"integer"}
+    assert bob_id == 1
+    assert [m["content"] for m in manager.get_messages("alice_bob", "bob")["messages"]] == ["hi"]
+    assert manager.get_messages("alice_gone", "alice")["messages"][0]["sender"] == "gone"
+
+    # Existing messages and users are in the full-text indexes
+    assert manager.search_messages("alice", "bye")["matches"][0]["chat_id"] == "alice_gone"
+    assert manager.get_users_to_display("bob", "lic")["users"] == ["alice"]
+
+    # Timestamps became microseconds since the epoch, and each chat starts at seq 1
+    hi = manager.get_messages("alice_bob", "bob")["messages"][0]
+    assert hi["timestamp"] == epoch_micros("2024-01-01T00:00:00")
+    assert hi["seq"] == 1
+
+
+def test_messages_are_sequenced_per_chat(db_manager, sample_users):
+    db_manager.send_chat_message("user1_user2", "user1", "one")
+    db_manager.send_chat_message("user1_user2", "user2", "two")
+    db_manager.send_chat_message("user1_user3", "user1", "other chat")
+    # A replicated message keeps the leader's timestamp and seq
+    db_manager.send_chat_message("user1_user2", "user1", "four", timestamp=42, seq=4)
+
+    messages = db_manager.get_messages("user1_user2", "user1")["messages"]
+    assert [(m["seq"], m["content"]) for m in messages] == [(1, "one"), (2, "two"), (4, "four")]
+    assert isinstance(messages[0]["timestamp"], int)
+    assert messages[2]["timestamp"] == 42
+    assert db_manager.get_messages("user1_user3", "user3")["messages"][0]["seq"] == 1
+
+    # Rows inserted without a seq are numbered too
+    with db_manager._get_connection() as conn:
+        conn.execute(
+            "INSERT INTO messages (sender_id, receiver_id, content, timestamp) "
+            "SELECT s.id, r.id, 'raw', 0 FROM user_ids s, user_ids r "
+            "WHERE s.username = 'user2' AND r.username = 'user1'"
+        )
+    assert db_manager.get_messages("user1_user2", "user1")["messages"][-1]["seq"] == 5
+
+
+def test_get_messages_after_seq(db_manager, sample_users):
+    for i in range(5):
+        db_manager.send_chat_message("user1_user2", "user1", f"message {i}")
+
+    messages = db_manager.get_messages("user1_user2", "user2", after_seq=3)["messages"]
+    assert [m["content"] for m in messages] == ["message 3", "message 4"]
+
+    # One range of the chat index, already in seq order
+    with db_manager._get_connection() as conn:
+        plan = " ".join(
+            row[3]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM messages "
+                "WHERE min(sender_id, receiver_id) = 1 AND max(sender_id, receiver_id) = 2 "
+                "AND seq > 3 ORDER BY seq"
+            )
+        )
+    assert "USING INDEX messages_chat" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_next_message_seq_skips_reserved_numbers(db_manager, sample_users):
+    db_manager.send_chat_message("user1_user2", "user1", "one")
+
+    assert db_manager.next_message_seq("user1_user2", "user1") == 2
+    # Not inserted yet, but already taken
+    assert db_manager.next_message_seq("user1_user2", "user2") == 3
+    assert db_manager.next_message_seq("user1_user3", "user1") == 1
+
+
+def test_search_messages(db_manager, sample_users):
+    db_manager.send_chat_message("user1_user2", "user1", "Lunch at noon?")
+    db_manager.send_chat_message("user1_user2", "user2", "Lunch, lunch, always lunch")
+    db_manager.send_chat_message("user1_user3", "user3", "lunch tomorrow")
+    db_manager.send_chat_message("user2_user3", "user3", "lunch without user1")
+
+    result = db_manager.search_messages("user1", "LUNCH")
+    assert result["success"] is True
+    # Best match first (more hits, shorter text); other users' chats are not searched
+    assert [m["content"] for m in result["matches"]] == [
+        "Lunch, lunch, always lunch", "lunch tomorrow", "Lunch at noon?"
+    ]
+    assert result["matches"][1]["chat_id"] == "user1_user3"
+    assert result["matches"][2]["snippet"] == "[Lunch] at noon?"
+
+    # Every word must match; a chat narrows the search
+    assert [m["seq"] for m in db_manager.search_messages("user1", "noon lunch")["matches"]] == [1]
+    assert len(db_manager.search_messages("user1", "lunch", chat_id="user3_user1")["matches"]) == 1
+
+    page = db_manager.search_messages("user1", "lunch", page=2, page_size=2)
+    assert [m["content"] for m in page["matches"]] == ["Lunch at noon?"]
+    assert page["has_more"] is False
+    assert db_manager.search_messages("user1", "lunch", page_size=2)["has_more"] is True
+
+
+def test_search_index_follows_deletes(db_manager, sample_users):
+    db_manager.send_chat_message("user1_user2", "user1", "secret plan")
+    assert db_manager.search_messages("user2", "plan")["matches"]
+
+    db_manager.delete_messages("user1_user2", [0], "user1")
+    assert db_manager.search_messages("user2", "plan")["matches"] == []
+    # Query syntax in user input is searched for literally
+    assert db_manager.search_messages("user2", 'plan" OR (')["success"] is True
+
+
+def test_user_search_uses_trigram_index(db_manager, sample_users):
+    db_manager.add_user("carol", "Caroline", "pw")
+    db_manager.add_user("dave", "Mr_Three", "pw")
+
+    # Usernames and nicknames, anywhere and in any case
+    result = db_manager.get_users_to_display("user1", "THREE")
+    assert result["users"] == ["dave", "user3"]
+    assert (result["total_users"], result["total_pages"]) == (2, 1)
+    assert db_manager.get_users_to_display("user1", "lin")["users"] == ["carol"]
+
+    # Pages are in username order, with the total for all of them
+    page = db_manager.get_users_to_display("user1", "user", page=2, users_per_page=1)
+    assert page["users"] == ["user3"]
+    assert (page["total_users"], page["total_pages"]) == (2, 2)
+
+    # The index follows deletions
+    db_manager.delete_user("dave")
+    assert db_manager.get_users_to_display("user1", "three")["users"] == ["user3"]
+
+    with db_manager._get_connection() as conn:
+        plan = [
+            row[3]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT u.username FROM users_fts "
+                "JOIN users u ON u.id = users_fts.rowid WHERE users_fts MATCH 'abc'"
+            )
+        ]
+    # Matches come from the index; users are only looked up by id
+    assert plan[0].startswith("SCAN users_fts VIRTUAL TABLE")
+    assert plan[1].startswith("SEARCH u USING INTEGER PRIMARY KEY")
+
+
+def test_user_search_short_patterns(db_manager, sample_users):
+    """Patterns too short for trigrams are still substrings, LIKE wildcards literal."""
+    db_manager.add_user("a_b", "Underscore", "pw")
+
+    assert db_manager.get_users_to_display("user1", "2")["users"] == ["user2"]
+    assert db_manager.get_users_to_display("user1", "_")["users"] == ["a_b"]
+    assert db_manager.get_users_to_display("user1", "%")["total_users"] == 0
+    assert db_manager.get_users_to_display("user1")["total_users"] == 3
+
+
+def test_user_search_after_signing_up_again(db_manager, sample_users):
+    """Accounts are indexed under their interned id, which outlives them."""
+    db_manager.delete_user("user1")
+    db_manager.add_user("other", "Other", "pw")
+    db_manager.add_user("user1", "Back Again", "pw")
+    # Interned by a chat before signing up
+    db_manager.send_chat_message("user2_user9", "user2", "early")
+    db_manager.add_user("user9", "Late Comer", "pw")
+
+    assert db_manager.get_users_to_display("user2", "user1")["users"] == ["user1"]
+    assert db_manager.get_users_to_display("user2", "again")["users"] == ["user1"]
+    assert db_manager.get_users_to_display("user2", "comer")["users"] == ["user9"]
+
+    # Deletes find the rows they index
+    db_manager.delete_user("user9")
+    assert db_manager.get_users_to_display("user2", "comer")["users"] == []
+    with db_manager._get_connection() as conn:
+        conn.execute("INSERT INTO users_fts (users_fts) VALUES ('integrity-check')")
+
+
+def test_user_pages_by_cursor(db_manager):
+    for i in range(1, 8):
+        db_manager.add_user(f"user{i}", f"User {i}", "pw")
+
+    first = db_manager.get_users_to_display("user1", users_per_page=3)
+    assert first["users"] == ["user2", "user3", "user4"]
+    assert (first["total_users"], first["total_pages"]) == (6, 2)
+
+    # A signup before the cursor does not shift the next page
+    db_manager.add_user("user0", "User 0", "pw")
+    second = db_manager.get_users_to_display("user1", users_per_page=3, after=first["next_cursor"])
+    assert second["users"] == ["user5", "user6", "user7"]
+    assert second["next_cursor"] == ""
+
+    # Works for searches, and rejects cursors it did not make
+    matches = db_manager.get_users_to_display("user1", "User", users_per_page=2)
+    rest = db_manager.get_users_to_display("user1", "User", users_per_page=5, after=matches["next_cursor"])
+    assert matches["users"] + rest["users"] == [f"user{i}" for i in (0, 2, 3, 4, 5, 6, 7)]
+    assert db_manager.get_users_to_display("user1", after="!")["success"] is False
+
+    # The page is read straight from the username index
+    with db_manager._get_connection() as conn:
+        plan = [
+            row[3]
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT u.username FROM users u "
+                "WHERE 1 AND u.username > ? AND u.username != ? ORDER BY u.username LIMIT 4",
+                ("user4", "user1"),
+            )
+        ]
+    assert plan == ["SEARCH u USING COVERING INDEX sqlite_autoindex_users_1 (username>?)"]
+
+
+def archive_all(db_manager, keep=0, block_size=2):
+    """Archive every cold block of every chat; returns messages moved."""
+    moved = 0
+    for chat in db_manager.archive_candidates(keep, 0, block_size):
+        while archived := db_manager.archive_chat(chat, keep, 0, block_size):
+            moved += archived
+    return moved
+
+
+def test_archive_moves_read_blocks_out_of_the_hot_table(db_manager, sample_users):
+    for i in range(7):
+        db_manager.send_chat_message("user1_user2", "user1", f"message {i}")
+    # Unread messages stay hot
+    assert archive_all(db_manager) == 0
+
+    db_manager.get_messages("user1_user2", "user2")
+    db_manager.send_chat_message("user1_user2", "user1", "unread")
+    # Blocks are full, and the newest `keep` messages stay hot
+    assert archive_all(db_manager, keep=2) == 6
+
+    with db_manager._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM message_archive").fetchone()[0] == 3
+
+    # Read through, in order, and paged from the end
+    messages = db_manager.get_messages("user1_user2", "user2")["messages"]
+    assert [m["seq"] for m in messages] == list(range(1, 9))
+    assert messages[0]["content"] == "message 0"
+    assert messages[0]["read"]
+    page = db_manager.get_messages("user1_user2", "user2", limit=3)["messages"]
+    assert [m["seq"] for m in page] == [6, 7, 8]
+    page = db_manager.get_messages("user1_user2", "user2", before_seq=6, limit=3)["messages"]
+    assert [m["seq"] for m in page] == [3, 4, 5]
+    page = db_manager.get_messages("user1_user2", "user2", after_seq=2, before_seq=5)["messages"]
+    assert [m["seq"] for m in page] == [3, 4]
+
+    # Numbering continues past archived messages
+    db_manager.send_chat_message("user1_user2", "user2", "after the archive")
+    assert db_manager.get_messages("user1_user2", "user1", after_seq=8)["messages"][0]["seq"] == 9
+
+
+def test_archived_chats_are_listed_and_deletable(db_manager, sample_users):
+    for i in range(4):
+        db_manager.send_chat_message("user1_user3", "user3", f"message {i}")
+    db_manager.get_messages("user1_user3", "user1")
+    assert archive_all(db_manager) == 4
+
+    chats = db_manager.get_chats("user1")["chats"]
+    assert [(c["other_user"], c["unread_count"]) for c in chats] == [("user3", 0)]
+
+    # Deleting by position or seq cuts messages out of their blocks
+    assert db_manager.delete_messages("user1_user3", [0], "user1")["success"]
+    assert db_manager.delete_messages("user1_user3", [], "user1", message_seqs=[3, 4])["success"]
+    messages = db_manager.get_messages("user1_user3", "user1")["messages"]
+    assert [m["content"] for m in messages] == ["message 1"]
+    with db_manager._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM message_archive").fetchone()[0] == 1
+
+
+def test_search_finds_archived_messages(db_manager, sample_users):
+    for i in range(4):
+        db_manager.send_chat_message("user1_user2", "user2", f"lunch plan {i}")
+    db_manager.send_chat_message("user1_user2", "user2", "lunch is hot")
+    db_manager.get_messages("user1_user2", "user1")
+    assert archive_all(db_manager, keep=1) == 4
+
+    matches = db_manager.search_messages("user1", "lunch")["matches"]
+    assert sorted(m["seq"] for m in matches) == [1, 2, 3, 4, 5]
+    archived = next(m for m in matches if m["seq"] == 2)
+    assert (archived["sender"], archived["content"], archived["snippet"]) == ("user2", "lunch plan 1", "[lunch] plan 1")
+    assert len(db_manager.search_messages("user2", "plan", chat_id="user1_user2")["matches"]) == 4
+
+    # Messages cut out of their block leave the index with it
+    db_manager.delete_messages("user1_user2", [], "user1", message_seqs=[1, 3])
+    assert [m["seq"] for m in db_manager.search_messages("user1", "plan")["matches"]] == [2, 4]
+    with db_manager._get_connection() as conn:
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('integrity-check')")
+
+    # Databases from before archives were indexed get them indexed again
+    with db_manager._get_connection() as conn:
+        conn.execute("PRAGMA user_version = 6")
+    db_manager.initialize_database()
+    assert sorted(m["seq"] for m in db_manager.search_messages("user1", "lunch")["matches"]) == [2, 4, 5]
+    with db_manager._get_connection() as conn:
+        conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('integrity-check')")
+
+
+def test_purge_reaches_archived_messages(db_manager, sample_users):
+    for i in range(4):
+        db_manager.send_chat_message("user1_user2", "user2", f"message {i}")
+    db_manager.get_messages("user1_user2", "user1")
+    archive_all(db_manager)
+    db_manager.send_chat_message("user1_user2", "user2", "hot")
+
+    db_manager.delete_user("user2")
+    assert db_manager.purge_deleted_users(3) == 3
+    assert db_manager.pending_purges() == 1
+    assert db_manager.purge_deleted_users(10) == 2
+    assert db_manager.pending_purges() == 0
+    assert db_manager.get_chats("user1")["chats"] == []
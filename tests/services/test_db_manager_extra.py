@@ -3,7 +3,7 @@ import sqlite3
 import os
 from datetime import datetime, timedelta
 
-from src.services.db_manager import DBManager
+from src.services.db_manager import DBManager, epoch_micros
 
 
 @pytest.fixture
@@ -42,16 +42,16 @@ def sample_messages(db_manager, sample_users):
     with db_manager._get_connection() as conn:
         cursor = conn.cursor()
         # Get user IDs
-        cursor.execute("SELECT username FROM users")
-        usernames = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM users ORDER BY username")
+        user_ids = [row[0] for row in cursor.fetchall()]
         
         # Create messages
         now = datetime.now()
         messages = [
-            (usernames[0], usernames[1], "Hello from user1", now.isoformat()),
-            (usernames[1], usernames[0], "Hello from user2", now.isoformat()),
-            (usernames[0], usernames[2], "Hello to user3", now.isoformat()),
-            (usernames[2], usernames[0], "Hello back from user3", now.isoformat())
+            (user_ids[0], user_ids[1], "Hello from user1", epoch_micros(now.isoformat())),
+            (user_ids[1], user_ids[0], "Hello from user2", epoch_micros(now.isoformat())),
+            (user_ids[0], user_ids[2], "Hello to user3", epoch_micros(now.isoformat())),
+            (user_ids[2], user_ids[0], "Hello back from user3", epoch_micros(now.isoformat()))
         ]
         
         for sender, receiver, content, timestamp in messages:
@@ -139,6 +139,24 @@ def test_delete_messages_invalid_index(db_manager, sample_users, sample_messages
     assert result["error_message"] == ""
 
 
+def test_delete_messages_by_seq(db_manager, sample_users):
+    """Sequence numbers keep naming the same messages when the chat changes."""
+    for i in range(5):
+        db_manager.send_chat_message("user1_user2", "user1", f"message {i}")
+    db_manager.send_chat_message("user1_user3", "user1", "other chat")
+    assert db_manager.message_seqs("user1_user2", [1, 3, 100], "user2") == [2, 4]
+
+    # Someone else deletes the first message; positions shift, seqs don't
+    db_manager.delete_messages("user1_user2", [0], "user2")
+    result = db_manager.delete_messages("user1_user2", [], "user1", message_seqs=[2, 4])
+
+    assert result["success"] is True
+    remaining = db_manager.get_messages("user1_user2", "user1")["messages"]
+    assert [m["content"] for m in remaining] == ["message 2", "message 4"]
+    # Only the named chat is touched
+    assert len(db_manager.get_messages("user1_user3", "user1")["messages"]) == 1
+
+
 def test_get_messages(db_manager, sample_users, sample_messages):
     """Test retrieving messages for a specific chat."""
     chat_id = "user1_user2"
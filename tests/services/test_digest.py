@@ -0,0 +1,138 @@
+"""
+Tests for the database Merkle digest used by anti-entropy.
+"""
+
+import pytest
+
+from src.services.db_manager import DBManager
+from src.services.digest import EMPTY_HASH, MerkleDigest, bucket_of
+
+
+def make_replica(path):
+    db = DBManager(str(path))
+    db.initialize_database()
+    digest = MerkleDigest(str(path), buckets=16)
+    digest.initialize()
+    return db, digest
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    """Two databases holding the same users and chat."""
+    pair = [make_replica(tmp_path / "a.db"), make_replica(tmp_path / "b.db")]
+    for db, _ in pair:
+        db.add_user("alice", "Alice", "pw")
+        db.add_user("bob", "Bob", "pw")
+        # Stamped by the leader, so the same on every replica
+        db.send_chat_message("alice_bob", "alice", "hi", timestamp=1_700_000_000_000_000)
+    return pair
+
+
+def test_equal_databases_have_equal_digests(replicas):
+    (_, a), (_, b) = replicas
+    for table in ("users", "userconfig", "messages"):
+        assert a.bucket_hashes(table) == b.bucket_hashes(table)
+    assert a.bucket_hashes("messages")[bucket_of("alice_bob", 16)] != EMPTY_HASH
+
+
+def test_divergence_is_narrowed_to_its_bucket_and_key(replicas):
+    (_, a), (db_b, b) = replicas
+    db_b.send_chat_message("bob_alice", "bob", "only on b")
+
+    differing = [
+        bucket
+        for bucket, (x, y) in enumerate(zip(a.bucket_hashes("messages"), b.bucket_hashes("messages")))
+        if x != y
+    ]
+    assert differing == [bucket_of("alice_bob", 16)]
+    assert a.key_hashes("messages", differing).keys() == {"alice_bob"}
+    assert a.bucket_hashes("users") == b.bucket_hashes("users")
+
+
+def test_refresh_rehashes_only_changed_keys(replicas):
+    (db_a, a), _ = replicas
+    a.refresh()
+    assert a.refresh() == 0
+
+    db_a.save_settings("alice", 10)
+    # Reading messages flips read flags, which are not part of the digest
+    db_a.get_messages("alice_bob", "bob")
+    assert a.refresh() == 1
+
+
+def test_replace_copies_rows_between_replicas(replicas):
+    (db_a, a), (db_b, b) = replicas
+    db_a.send_chat_message("alice_bob", "bob", "missed by b")
+    db_a.delete_user("alice")
+
+    for table in ("users", "messages"):
+        keys = ["alice", "bob"] if table == "users" else ["alice_bob"]
+        b.replace(table, a.rows(table, keys))
+        assert a.bucket_hashes(table) == b.bucket_hashes(table)
+
+    messages = db_b.get_messages("alice_bob", "bob")["messages"]
+    assert [m["content"] for m in messages] == ["hi", "missed by b"]
+
+
+def test_chat_keys_resolve_usernames_with_underscores(tmp_path):
+    """Chats whose ids coincide ("a_b" + "c", "a" + "b_c") form one key."""
+    (db_a, a), (db_b, b) = make_replica(tmp_path / "a.db"), make_replica(tmp_path / "b.db")
+    for username in ("a_b", "c", "a", "b_c"):
+        db_a.add_user(username, username, "pw")
+    db_a.send_chat_message("a_b_c", "c", "to a_b")
+    db_a.send_chat_message("a_b_c", "a", "to b_c")
+
+    assert a.key_hashes("messages", [bucket_of("a_b_c", 16)]).keys() == {"a_b_c"}
+    b.replace("messages", a.rows("messages", ["a_b_c"]))
+
+    assert a.bucket_hashes("messages") == b.bucket_hashes("messages")
+    assert [m["content"] for m in db_b.get_messages("a_b_c", "b_c")["messages"]] == ["to b_c"]
+
+
+def test_archiving_leaves_digest_unchanged(replicas):
+    (db_a, a), (_, b) = replicas
+    for db, _ in replicas:
+        db.send_chat_message("alice_bob", "bob", "hello", timestamp=1_700_000_000_000_001, seq=2)
+    db_a.get_messages("alice_bob", "bob")
+    db_a.get_messages("alice_bob", "alice")
+    a.refresh()
+    before = a.bucket_hashes("messages")
+
+    for chat in db_a.archive_candidates(0, 0, 2):
+        assert db_a.archive_chat(chat, 0, 0, 2) == 2
+    a.refresh()
+
+    # Replicas agree however much each has archived
+    assert a.bucket_hashes("messages") == before == b.bucket_hashes("messages")
+
+    b.replace("messages", a.rows("messages", ["alice_bob"]))
+    assert a.bucket_hashes("messages") == b.bucket_hashes("messages")
+
+
+def test_writes_are_folded_in_row_by_row(replicas):
+    (db_a, a), (db_b, b) = replicas
+    for db, _ in replicas:
+        db.send_chat_message("alice_bob", "bob", "hello", timestamp=1_700_000_000_000_001, seq=2)
+    for chat in db_a.archive_candidates(0, 0, 2):
+        db_a.archive_chat(chat, 0, 0, 2)
+    a.refresh()
+
+    # A message to an archived chat logs that one row, not the chat's history
+    for db, _ in replicas:
+        db.send_chat_message("alice_bob", "alice", "again", timestamp=1_700_000_000_000_002, seq=3)
+    with db_a._get_connection() as conn:
+        changes = conn.execute("SELECT tbl, key, sign FROM digest_changes").fetchall()
+    assert changes == [("messages", "alice_bob", 1)]
+    assert a.refresh() == 1
+
+    db_b.delete_messages("alice_bob", [], "bob", message_seqs=[1])
+    db_b.send_chat_message("alice_bob", "alice", "hi", timestamp=1_700_000_000_000_000, seq=1)
+    assert a.bucket_hashes("messages") == b.bucket_hashes("messages")
+
+    # Hashing the tables from scratch gives the same hashes
+    with db_b._get_connection() as conn:
+        conn.execute("DELETE FROM digest_specs")
+    rehashed = MerkleDigest(db_b.db_file, buckets=16)
+    rehashed.initialize()
+    for table in ("users", "userconfig", "messages"):
+        assert rehashed.bucket_hashes(table) == b.bucket_hashes(table) == a.bucket_hashes(table)
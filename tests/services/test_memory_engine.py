@@ -0,0 +1,159 @@
+"""Test cases for the in-memory storage engine."""
+
+import pytest
+
+from src.services.db_manager import DBManager
+from src.services.memory_engine import MemoryEngine
+from src.services.storage_factory import StorageFactory
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """A fresh SQLite engine and a fresh in-memory engine."""
+    return (
+        StorageFactory.get_engine("sqlite", str(tmp_path / "parity.db")),
+        StorageFactory.get_engine("memory", None),
+    )
+
+
+def scenario(engine):
+    """Run the same calls on an engine, collecting every result."""
+    results = []
+    for username in ["carol", "alice", "bob", "dave_x", "eve"]:
+        results.append(engine.add_user(username, username.title(), "pw"))
+    results.append(engine.add_user("alice", "Again", "pw"))
+    results.append(engine.login({"username": "alice", "password": "pw"}))
+    results.append(engine.login({"username": "alice", "password": "wrong"}))
+
+    lines = [
+        ("alice_bob", "alice", "Don't panic! The target's here."),
+        ("alice_bob", "bob", "target"),
+        ("alice_bob", "alice", "one two three four five six seven eight nine ten eleven "
+                               "twelve thirteen fourteen fifteen target sixteen seventeen, eighteen."),
+        ("alice_carol", "carol", "Hello Alice, café at noon?"),
+        ("alice_carol", "alice", "Cafe sounds good"),
+        ("bob_dave_x", "dave_x", "hi bob"),
+        ("alice_alice", "alice", "note to self: target"),
+    ]
+    for timestamp, (chat_id, sender, content) in enumerate(lines, start=1):
+        results.append(engine.send_chat_message(chat_id, sender, content, timestamp=timestamp))
+    results.append(engine.send_chat_message("alice_zed", "alice", "anyone?"))
+    # Chats the user is not part of are refused, not guessed at
+    results.append(engine.send_chat_message("bob_dave_x", "alice", "hi"))
+    results.append(engine.next_message_seq("bob_dave_x", "alice"))
+    results.append(engine.get_messages("bob_dave_x", "alice"))
+    results.append(engine.delete_messages("bob_dave_x", [0], "alice"))
+    results.append(engine.search_messages("alice", "hi", "bob_dave_x"))
+
+    results.append(engine.get_chats("alice"))
+    results.append(engine.get_messages("alice_bob", "alice"))
+    results.append(engine.get_chats("bob"))
+    results.append(engine.get_messages("alice_bob", "bob", after_seq=1))
+    results.append(engine.get_messages("alice_bob", "bob", limit=2))
+    results.append(engine.get_messages("alice_bob", "bob", before_seq=3, limit=1))
+    results.append(engine.message_seqs("alice_bob", [0, 2, 7], "alice"))
+    results.append(engine.next_message_seq("alice_bob", "bob"))
+
+    for query, chat_id in [("target", ""), ("don't", ""), ("cafe", ""), ("!!!", ""),
+                           ("target", "alice_bob"), ("seventeen target", "")]:
+        results.append(engine.search_messages("alice", query, chat_id, page_size=2))
+
+    for pattern, after in [("", ""), ("a", ""), ("ali", ""), ("%", ""), ("", "Ym9i"), ("", "!")]:
+        results.append(engine.get_users_to_display("carol", pattern, 1, 2, after))
+    results.append(engine.get_users_to_display("carol", "", 2, 2))
+
+    results.append(engine.update_view_limit("bob", 12))
+    results.append(engine.get_user_message_limit("bob"))
+    results.append(engine.delete_messages("alice_bob", [1], "alice"))
+    results.append(engine.get_messages("alice_bob", "alice"))
+
+    results.append(engine.delete_user("carol"))
+    results.append(engine.send_chat_message("alice_carol", "alice", "still there?"))
+    results.append(engine.get_all_users("alice"))
+    results.append(engine.pending_purges())
+    results.append(engine.purge_deleted_users(1))
+    results.append(engine.purge_deleted_users(10))
+    results.append(engine.pending_purges())
+    results.append(engine.get_chats("alice"))
+    results.append(engine.add_user("carol", "Carol", "pw"))
+    results.append(engine.login({"username": "carol", "password": "pw"}))
+    # Messaged before signing up: the account takes the id messages use
+    results.append(engine.add_user("zed", "Zed", "pw"))
+    results.append(engine.login({"username": "zed", "password": "pw"}))
+    results.append(engine.get_all_users())
+    results.append(engine.get_users_to_display("bob", "car"))
+    results.append(engine.get_users_to_display("bob", "Carol"))
+    return results
+
+
+def test_engines_agree(engines):
+    """Both engines return the same results for the same calls."""
+    sqlite_engine, memory_engine = engines
+    expected = scenario(sqlite_engine)
+    actual = scenario(memory_engine)
+
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        if isinstance(want, dict) and "matches" in want:
+            for match, wanted in zip(got["matches"], want["matches"]):
+                assert match["rank"] == pytest.approx(wanted["rank"], abs=1e-9)
+                match["rank"] = wanted["rank"]
+        assert got == want
+
+
+def test_factory_rejects_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown storage engine"):
+        StorageFactory.get_engine("paper", None)
+    with pytest.raises(TypeError):
+        StorageFactory.register_engine("paper", dict)
+
+
+def test_apply_batch_undoes_failed_operations():
+    engine = MemoryEngine()
+    engine.add_user("alice", "Alice", "pw")
+    engine.add_user("bob", "Bob", "pw")
+
+    def fail():
+        engine.send_chat_message("alice_bob", "alice", "lost")
+        engine.add_user("carol", "Carol", "pw")
+        engine.delete_user("bob")
+        raise RuntimeError("boom")
+
+    results = engine.apply_batch(
+        [
+            (1, 1, lambda: engine.send_chat_message("alice_bob", "alice", "kept")["success"]),
+            (1, 2, fail),
+            (1, 1, lambda: True),
+        ]
+    )
+
+    assert results == [True, False, None]
+    messages = engine.get_messages("alice_bob", "alice")["messages"]
+    assert [(m["id"], m["content"]) for m in messages] == [(1, "kept")]
+    assert engine.get_all_users()["users"] == ["alice", "bob"]
+    assert engine.search_messages("alice", "lost")["matches"] == []
+    assert engine.apply_batch([(1, 2, lambda: True)])[0] is True
+    assert engine.apply_batch([(1, 2, lambda: True)])[0] is None
+
+
+def test_apply_batch_forgets_operations_outside_window():
+    engine = MemoryEngine()
+    for operation_id in range(1, 6):
+        engine.apply_batch([(1, operation_id, lambda: True)], keep=2)
+
+    assert engine.apply_batch([(1, 4, lambda: True)])[0] is None
+    assert engine.apply_batch([(1, 3, lambda: True)])[0] is True
+
+
+def test_sharded_recipient_check_uses_tombstones():
+    engine = MemoryEngine(local_users=False)
+
+    assert engine.send_chat_message("alice_bob", "alice", "hi")["success"]
+    engine.delete_user("bob")
+    assert not engine.send_chat_message("alice_bob", "alice", "hi")["success"]
+
+
+def test_sqlite_engine_is_a_db_manager(engines):
+    sqlite_engine, memory_engine = engines
+    assert isinstance(sqlite_engine, DBManager)
+    assert memory_engine.db_file is None
@@ -0,0 +1,89 @@
+"""
+Tests for deleting accounts and purging their messages in the background.
+"""
+
+import pytest
+
+from src.services.db_manager import DBManager
+from src.services.purger import UserPurger
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DBManager(str(tmp_path / "purge.db"))
+    manager.initialize_database()
+    for username in ("alice", "bob", "carol"):
+        manager.add_user(username, username.title(), "pw")
+    for i in range(5):
+        manager.send_chat_message("alice_bob", "alice", f"to bob {i}")
+        manager.send_chat_message("alice_bob", "bob", f"to alice {i}")
+    manager.send_chat_message("bob_carol", "carol", "unrelated")
+    return manager
+
+
+def count_messages(db):
+    with db._get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def test_deleted_user_is_hidden_and_rejected_at_once(db):
+    db.delete_user("alice")
+
+    assert "alice" not in db.get_users_to_display("bob")["users"]
+    assert not db.send_chat_message("alice_bob", "alice", "still here?")["success"]
+    assert not db.send_chat_message("alice_bob", "bob", "hello?")["success"]
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM userconfig WHERE username = 'alice'").fetchone()[0] == 0
+
+    # Messages are left for the purger
+    assert count_messages(db) == 11
+    assert db.pending_purges() == 1
+
+
+def test_purges_in_batches(db):
+    db.delete_user("alice")
+    purger = UserPurger(db, batch_size=4)
+
+    assert purger.run_batch() is True
+    assert count_messages(db) == 7
+    # Sent and received messages both go
+    assert purger.run_batch() is True
+    assert purger.run_batch() is False
+
+    assert count_messages(db) == 1
+    assert purger.stats() == {
+        "purge_pending_users": 0,
+        "purge_messages": 10,
+        "purge_batches": 3,
+    }
+    assert purger.run_batch() is False
+    assert purger.batches == 3
+
+
+def test_signing_up_again_keeps_new_messages(db):
+    db.delete_user("alice")
+    db.add_user("alice", "Alice again", "pw")
+    db.send_chat_message("alice_bob", "alice", "I'm back")
+
+    purger = UserPurger(db, batch_size=100)
+    while purger.run_batch():
+        pass
+
+    messages = db.get_messages("alice_bob", "bob")["messages"]
+    assert [m["content"] for m in messages] == ["I'm back"]
+
+
+def test_background_thread_purges(db):
+    db.delete_user("bob")
+    purger = UserPurger(db, batch_size=3, pause=0, idle_interval=0.01)
+    purger.start()
+    try:
+        for _ in range(500):
+            if not db.pending_purges():
+                break
+            purger.stop_event.wait(0.01)
+    finally:
+        purger.stop()
+
+    assert db.pending_purges() == 0
+    assert count_messages(db) == 0
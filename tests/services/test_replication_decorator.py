@@ -0,0 +1,222 @@
+"""Test cases for the replicate_to_followers and linearizable_read decorators."""
+
+import unittest
+from unittest.mock import MagicMock
+
+import grpc
+
+from src.protocol.grpc import chat_pb2
+from src.services.replication_decorator import replicate_to_followers, linearizable_read
+
+
+class FakeServicer:
+    """Minimal servicer exposing a decorated write method."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.calls = 0
+
+    @replicate_to_followers("SendChatMessage")
+    def SendChatMessage(self, request, context):
+        self.calls += 1
+        return chat_pb2.MessageResponse(success=True)
+
+    def _stamp(self, request):
+        request.seq = 7
+
+    @replicate_to_followers("DeleteMessages", prepare=_stamp)
+    def StampedMessage(self, request, context):
+        self.calls += 1
+        return chat_pb2.MessageResponse(success=True)
+
+    @linearizable_read("GetChats")
+    def GetChats(self, request, context):
+        self.calls += 1
+        return chat_pb2.ChatsResponse(chats=[chat_pb2.Chat(chat_id="alice_bob")])
+
+    @linearizable_read("GetMessages")
+    def GetMessages(self, request, context):
+        self.calls += 1
+        return chat_pb2.MessagesResponse()
+
+
+class TestReplicationDecorator(unittest.TestCase):
+    """Test cases for write handling on leaders and followers."""
+
+    def setUp(self):
+        self.replica = MagicMock()
+        self.servicer = FakeServicer(self.replica)
+        self.context = MagicMock()
+        self.request = chat_pb2.SendMessageRequest(
+            chat_id="alice_bob", sender="alice", content="hi"
+        )
+
+    def test_standalone_runs_locally(self):
+        """Without a replica the method runs directly."""
+        servicer = FakeServicer(None)
+        response = servicer.SendChatMessage(self.request, self.context)
+
+        self.assertTrue(response.success)
+        self.assertEqual(servicer.calls, 1)
+
+    def test_leader_replicates_then_runs_locally(self):
+        """The leader replicates the write and applies it."""
+        self.replica.state.role = "leader"
+        self.replica.replicate_to_followers.return_value = True
+
+        response = self.servicer.SendChatMessage(self.request, self.context)
+
+        self.assertTrue(response.success)
+        self.assertEqual(self.servicer.calls, 1)
+        self.replica.forward_to_leader.assert_not_called()
+        self.replica.replicate_to_followers.assert_called_once_with(
+            "ChatServicer", "SendChatMessage", self.request.SerializeToString()
+        )
+
+    def test_leader_prepares_request_before_replicating(self):
+        """Values filled in by ``prepare`` reach the followers."""
+        self.replica.state.role = "leader"
+        self.replica.replicate_to_followers.return_value = True
+
+        self.servicer.StampedMessage(self.request, self.context)
+
+        self.assertEqual(self.request.seq, 7)
+        self.replica.replicate_to_followers.assert_called_once_with(
+            "ChatServicer", "DeleteMessages", self.request.SerializeToString()
+        )
+
+    def test_leader_without_quorum_rejects(self):
+        """A write no majority acknowledged is not applied on the leader."""
+        self.replica.state.role = "leader"
+        self.replica.replicate_to_followers.return_value = False
+
+        response = self.servicer.SendChatMessage(self.request, self.context)
+
+        self.assertFalse(response.success)
+        self.assertEqual(self.servicer.calls, 0)
+        self.context.set_code.assert_called_once_with(grpc.StatusCode.UNAVAILABLE)
+
+    def test_follower_relays_leader_response(self):
+        """A follower returns the leader's answer without applying locally."""
+        self.replica.state.role = "follower"
+        leader_response = chat_pb2.MessageResponse(success=True)
+        self.replica.forward_to_leader.return_value = leader_response
+
+        response = self.servicer.SendChatMessage(self.request, self.context)
+
+        self.assertIs(response, leader_response)
+        self.assertEqual(self.servicer.calls, 0)
+        self.replica.forward_to_leader.assert_called_once_with(
+            "SendChatMessage", self.request, self.context
+        )
+        self.replica.replicate_to_followers.assert_not_called()
+
+    def test_follower_rejects_when_forwarding_fails(self):
+        """If the leader cannot be reached the write is rejected."""
+        self.replica.state.role = "follower"
+        self.replica.forward_to_leader.return_value = None
+        self.replica.replicate_to_followers.return_value = False
+
+        response = self.servicer.SendChatMessage(self.request, self.context)
+
+        self.assertFalse(response.success)
+        self.assertEqual(self.servicer.calls, 0)
+        self.context.set_code.assert_called_once_with(
+            grpc.StatusCode.FAILED_PRECONDITION
+        )
+        self.context.set_trailing_metadata.assert_called_once_with(
+            self.replica.get_leader_hint.return_value
+        )
+
+
+class TestLinearizableRead(unittest.TestCase):
+    """Test cases for read handling on leaders and followers."""
+
+    def setUp(self):
+        self.replica = MagicMock()
+        self.servicer = FakeServicer(self.replica)
+        self.context = MagicMock()
+        self.request = chat_pb2.GetChatsRequest(user_id="alice")
+
+    def test_leader_with_lease_serves_locally(self):
+        """A leased leader answers without contacting anyone."""
+        self.replica.state.role = "leader"
+        self.replica.ensure_read_lease.return_value = True
+
+        response = self.servicer.GetChats(self.request, self.context)
+
+        self.assertEqual(response.chats[0].chat_id, "alice_bob")
+        self.assertEqual(self.servicer.calls, 1)
+        self.replica.forward_to_leader.assert_not_called()
+
+    def test_unconfirmed_leader_rejects(self):
+        """A leader that can't confirm its leadership refuses the read."""
+        self.replica.state.role = "leader"
+        self.replica.ensure_read_lease.return_value = False
+
+        response = self.servicer.GetChats(self.request, self.context)
+
+        self.assertEqual(self.servicer.calls, 0)
+        self.assertTrue(response.error_message)
+        self.context.set_code.assert_called_once_with(grpc.StatusCode.UNAVAILABLE)
+
+    def test_follower_forwards_read(self):
+        """Followers relay the leader's answer."""
+        self.replica.state.role = "follower"
+        self.replica.can_serve_bounded_read.return_value = False
+        leader_response = chat_pb2.ChatsResponse()
+        self.replica.forward_to_leader.return_value = leader_response
+
+        response = self.servicer.GetChats(self.request, self.context)
+
+        self.assertIs(response, leader_response)
+        self.assertEqual(self.servicer.calls, 0)
+        self.replica.forward_to_leader.assert_called_once_with(
+            "GetChats", self.request, self.context
+        )
+
+    def test_follower_rejects_with_hint_when_forwarding_fails(self):
+        """Unforwardable reads are rejected with the leader hint."""
+        self.replica.state.role = "follower"
+        self.replica.can_serve_bounded_read.return_value = False
+        self.replica.forward_to_leader.return_value = None
+
+        response = self.servicer.GetChats(self.request, self.context)
+
+        self.assertIsInstance(response, chat_pb2.ChatsResponse)
+        self.assertEqual(self.servicer.calls, 0)
+        self.context.set_code.assert_called_once_with(
+            grpc.StatusCode.FAILED_PRECONDITION
+        )
+        self.context.set_trailing_metadata.assert_called_once_with(
+            self.replica.get_leader_hint.return_value
+        )
+
+    def test_follower_serves_bounded_read_locally(self):
+        """A fresh-enough follower answers bounded-staleness reads itself."""
+        self.replica.state.role = "follower"
+        self.replica.can_serve_bounded_read.return_value = True
+
+        response = self.servicer.GetChats(self.request, self.context)
+
+        self.assertEqual(response.chats[0].chat_id, "alice_bob")
+        self.assertEqual(self.servicer.calls, 1)
+        self.replica.can_serve_bounded_read.assert_called_once_with(self.context)
+        self.replica.forward_to_leader.assert_not_called()
+
+    def test_follower_forwards_reads_that_mark_messages_read(self):
+        """GetMessages writes the read flag, so followers never serve it locally."""
+        self.replica.state.role = "follower"
+        self.replica.can_serve_bounded_read.return_value = True
+        request = chat_pb2.GetMessagesRequest(chat_id="alice_bob", current_user="alice")
+
+        self.servicer.GetMessages(request, self.context)
+
+        self.assertEqual(self.servicer.calls, 0)
+        self.replica.forward_to_leader.assert_called_once_with(
+            "GetMessages", request, self.context
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,6 +21,10 @@ def mock_replica():
     state.term = 1
     state.leader_id = "test_server"
     state.peers = {"peer1": "localhost:50052", "peer2": "localhost:50053"}
+    state.last_applied_operation_id = 0
+    state.replication_lag.return_value = 0
+    state.clock.return_value = 0.0
+    state.leader_operation_id = 0
     
     # Create proper ServerInfo objects
     test_server_info = replication.ServerInfo()
@@ -50,6 +54,8 @@ def mock_replica():
     
     # Add election_manager for reset_election_timer calls
     replica.election_manager = MagicMock()
+    # No actor thread in tests: state changes run inline
+    replica.run_on_actor.side_effect = lambda fn, *args: fn(*args)
     return replica
 
 
@@ -77,6 +83,107 @@ def test_heartbeat(servicer):
     assert response.role == servicer.replica_state.role
 
 
+def test_heartbeat_ignores_vote_while_leader_alive(servicer):
+    """Followers that just heard from the leader don't vote or bump their term."""
+    servicer.replica_state.role = "follower"
+    servicer.replica_state.leader_id = "peer2"
+    servicer.replica_state.voted_for = None
+
+    servicer.replica_state.clock.return_value = 100.0
+    servicer.replica_state.last_leader_contact = 99.5
+
+    request = MagicMock()
+    request.server_id = "peer1"
+    request.term = 2
+    request.role = "candidate"
+    response = servicer.Heartbeat(request, MagicMock())
+
+    assert response.success is False
+    assert servicer.replica_state.term == 1
+    assert servicer.replica_state.voted_for is None
+
+
+def test_heartbeat_grants_vote_after_leader_silence(servicer):
+    """Once the leader has been silent long enough, votes are granted."""
+    servicer.replica_state.role = "follower"
+    servicer.replica_state.leader_id = "peer2"
+    servicer.replica_state.voted_for = None
+
+    servicer.replica_state.clock.return_value = 100.0
+    servicer.replica_state.last_leader_contact = 90.0
+
+    request = MagicMock()
+    request.server_id = "peer1"
+    request.term = 2
+    request.role = "candidate"
+    response = servicer.Heartbeat(request, MagicMock())
+
+    assert response.success is True
+    assert servicer.replica_state.term == 2
+    assert servicer.replica_state.voted_for == "peer1"
+
+
+def test_heartbeat_tracks_leader_progress(servicer):
+    """Leader heartbeats carry its latest op id; we answer with what we applied."""
+    servicer.replica_state.role = "follower"
+    servicer.replica_state.leader_id = "peer1"
+    servicer.replica_state.last_applied_operation_id = 7
+
+    request = replication.HeartbeatRequest(
+        server_id="peer1", term=1, role="leader", last_operation_id=9
+    )
+    response = servicer.Heartbeat(request, MagicMock())
+
+    assert servicer.replica_state.leader_operation_id == 9
+    assert response.applied_operation_id == 7
+
+
+def test_pre_vote_granted_only_without_live_leader(servicer):
+    """Pre-votes are refused while the leader is alive and never change state."""
+    servicer.replica_state.role = "follower"
+    servicer.replica_state.leader_id = "peer2"
+    servicer.replica_state.voted_for = None
+    servicer.replica_state.clock.return_value = 100.0
+    request = replication.PreVoteRequest(server_id="peer1", term=2, last_operation_id=0)
+
+    servicer.replica_state.last_leader_contact = 99.5
+    assert servicer.PreVote(request, MagicMock()).granted is False
+
+    servicer.replica_state.last_leader_contact = 90.0
+    assert servicer.PreVote(request, MagicMock()).granted is True
+
+    # Candidates that are behind us, or not ahead in term, are refused
+    servicer.replica_state.last_applied_operation_id = 5
+    assert servicer.PreVote(request, MagicMock()).granted is False
+    servicer.replica_state.last_applied_operation_id = 0
+    stale = replication.PreVoteRequest(server_id="peer1", term=1)
+    assert servicer.PreVote(stale, MagicMock()).granted is False
+
+    assert servicer.replica_state.term == 1
+    assert servicer.replica_state.voted_for is None
+
+
+def test_heartbeat_runs_on_consensus_actor(servicer, mock_replica):
+    """Inbound heartbeats are handed to the replica's actor, not applied in place."""
+    request = replication.HeartbeatRequest(server_id="peer1", term=1, role="follower")
+
+    servicer.Heartbeat(request, MagicMock())
+
+    mock_replica.run_on_actor.assert_called_once_with(servicer.handle_heartbeat, request)
+
+
+def test_get_network_state_reports_own_lag(servicer, mock_replica):
+    """A replica reports its applied operation id and lag for itself."""
+    mock_replica.state.last_applied_operation_id = 5
+    mock_replica.state.replication_lag.return_value = 3
+
+    response = servicer.GetNetworkState(replication.NetworkStateRequest(), MagicMock())
+
+    own = next(s for s in response.servers if s.server_id == "test_server")
+    assert own.applied_operation_id == 5
+    assert own.lag == 3
+
+
 def test_replicate_operation(servicer):
     """Test the ReplicateOperation method."""
     request = MagicMock()
@@ -245,3 +352,148 @@ def test_get_network_state(servicer, mock_replica):
     # # Verify
     # assert response.leader_id == mock_replica.leader_id if mock_replica.leader_id else ""
     # assert response.term == mock_replica.term
+
+
+def test_replicate_operation_counts_as_leader_heartbeat(servicer, mock_replica):
+    """A write from the current leader refreshes leader liveness like a heartbeat."""
+    mock_replica.state.role = "follower"
+    mock_replica.state.leader_id = "peer1"
+    mock_replica.state.clock.return_value = 50.0
+    request = replication.OperationRequest(
+        service_name="Unknown", operation_id=12, server_id="peer1", term=1
+    )
+
+    servicer.ReplicateOperation(request, MagicMock())
+
+    mock_replica.election_manager.reset_election_timer.assert_called_once()
+    mock_replica.election_manager.leader_heard.assert_called_once()
+    assert mock_replica.state.last_leader_contact == 50.0
+    assert mock_replica.state.leader_operation_id == 12
+
+
+def test_replicate_operation_applies_retries_once(mock_replica, tmp_path):
+    """A retried operation is acknowledged but not applied a second time."""
+    from src.protocol.grpc import chat_pb2
+    from src.services.api_manager import APIManager
+
+    mock_replica.state.role = "follower"
+    chat_servicer = MagicMock()
+    chat_servicer.api = APIManager(db_file=str(tmp_path / "follower.db"))
+    servicer = ReplicationServicer(mock_replica, chat_servicer)
+    request = replication.OperationRequest(
+        service_name="ChatServicer",
+        method_name="Signup",
+        serialized_request=chat_pb2.SignupRequest(
+            username="alice", nickname="Alice", password="pw"
+        ).SerializeToString(),
+        operation_id=9,
+        server_id="peer1",
+        term=1,
+    )
+
+    first = servicer.ReplicateOperation(request, MagicMock())
+    retry = servicer.ReplicateOperation(request, MagicMock())
+
+    assert first.success and retry.success
+    assert chat_servicer.api.get_all_users()["users"] == ["alice"]
+    # Applied straight to the database, not through the ChatServicer
+    chat_servicer.Signup.assert_not_called()
+    assert mock_replica.state.record_applied.call_count == 2
+
+
+def test_in_memory_replica_applies_without_digest(mock_replica):
+    """An in-memory replica applies replicated writes but has no digest to compare."""
+    from src.protocol.grpc import chat_pb2
+    from src.services.api_manager import APIManager
+
+    mock_replica.state.role = "follower"
+    chat_servicer = MagicMock()
+    chat_servicer.api = APIManager(db_file=None, engine="memory")
+    servicer = ReplicationServicer(mock_replica, chat_servicer)
+    request = replication.OperationRequest(
+        service_name="ChatServicer",
+        method_name="Signup",
+        serialized_request=chat_pb2.SignupRequest(
+            username="alice", nickname="Alice", password="pw"
+        ).SerializeToString(),
+        operation_id=3,
+        server_id="peer1",
+        term=1,
+    )
+
+    assert servicer.ReplicateOperation(request, MagicMock()).success
+    assert chat_servicer.api.get_all_users()["users"] == ["alice"]
+    assert servicer.digest is None
+
+
+def test_replicate_operation_rejects_stale_term(servicer, mock_replica):
+    """Operations from a deposed leader are rejected with a leader hint."""
+    mock_replica.state.term = 5
+    request = replication.OperationRequest(
+        service_name="ChatServicer",
+        method_name="SendChatMessage",
+        operation_id=7,
+        server_id="old_leader",
+        term=4,
+    )
+    context = MagicMock()
+
+    response = servicer.ReplicateOperation(request, context)
+
+    assert response.success is False
+    context.set_code.assert_called_once_with(grpc.StatusCode.FAILED_PRECONDITION)
+    context.set_trailing_metadata.assert_called_once_with(
+        mock_replica.get_leader_hint.return_value
+    )
+
+
+def test_join_network_without_leader_sends_hint(servicer, mock_replica):
+    """Rejected joins carry the leader hint trailers."""
+    mock_replica.state.role = "follower"
+    mock_replica.state.leader_id = None
+    context = MagicMock()
+
+    servicer.JoinNetwork(replication.JoinRequest(server_id="s", address="a:1"), context)
+
+    context.set_trailing_metadata.assert_called_once_with(
+        mock_replica.get_leader_hint.return_value
+    )
+
+
+def test_get_network_state_reports_shard_map(mock_replica):
+    """Sharded servers publish the routing table and their own group."""
+    from src.replication.sharding import ShardMap
+
+    shard_map = ShardMap.parse("g1=localhost:50051;g2=localhost:50061")
+    servicer = ReplicationServicer(mock_replica, shard_map=shard_map, group_id="g1")
+
+    response = servicer.GetNetworkState(replication.NetworkStateRequest(server_id="client"), MagicMock())
+
+    assert response.group_id == "g1"
+    assert ShardMap.from_proto(response.shards).groups == shard_map.groups
+
+    unsharded = ReplicationServicer(mock_replica).GetNetworkState(
+        replication.NetworkStateRequest(server_id="client"), MagicMock()
+    )
+    assert list(unsharded.shards) == []
+
+
+def test_get_replication_stats():
+    """Stats come from the replica's managers, with per-peer lag on the leader."""
+    from src.replication.replica_node import ReplicaNode
+
+    node = ReplicaNode(server_id="server1", address="localhost:50051", peers=["server2:localhost:50052"])
+    node.election_manager.become_leader()
+    node.state.last_operation_id = 3
+    node.replication_manager.match_index["server2"] = 1
+    node.heartbeat_manager.heartbeat_rtt.observe(0.01)
+
+    response = ReplicationServicer(node).GetReplicationStats(
+        replication.ReplicationStatsRequest(server_id="client"), MagicMock()
+    )
+
+    assert response.role == "leader"
+    assert response.last_operation_id == 3
+    assert [(p.server_id, p.match_index, p.lag) for p in response.peers] == [("server2", 1, 2)]
+    assert response.heartbeat_rtt.count == 1
+    assert len(response.heartbeat_rtt.counts) == len(response.heartbeat_rtt.bounds) + 1
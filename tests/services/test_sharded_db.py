@@ -0,0 +1,192 @@
+"""
+Test cases for the storage engine that shards messages across files.
+"""
+
+import threading
+
+import pytest
+
+from src.services.db_manager import DBManager
+from src.services.digest import MerkleDigest, ShardedDigest
+from src.services.sharded_db import ShardedDBManager, shard_of
+from src.services.storage_factory import StorageFactory
+
+USERS = ("alice", "bob", "carol", "dave", "erin", "frank")
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = ShardedDBManager(str(tmp_path / "chat.db"), shards=3)
+    manager.initialize_database()
+    for username in USERS:
+        manager.add_user(username, username.title(), "pw")
+    return manager
+
+
+def count_messages(manager):
+    with manager._get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def chat_pairs():
+    return [(a, b) for i, a in enumerate(USERS) for b in USERS[i + 1:]]
+
+
+def test_messages_are_spread_across_shards(db, tmp_path):
+    for a, b in chat_pairs():
+        assert db.send_chat_message(f"{a}_{b}", a, f"hi {b}")["success"]
+
+    # Users stay in the catalog, messages go to the shard of their chat
+    assert count_messages(db) == 0
+    assert [count_messages(shard) for shard in db.shards] == [
+        sum(1 for a, b in chat_pairs() if shard_of(f"{a}_{b}", 3) == i) for i in range(3)
+    ]
+    assert all(count_messages(shard) for shard in db.shards)
+    assert db.shard_files[1] == str(tmp_path / "chat.shard1.db")
+
+    messages = db.get_messages("bob_alice", "bob")["messages"]
+    assert [(m["sender"], m["content"], m["seq"]) for m in messages] == [("alice", "hi bob", 1)]
+    assert db.next_message_seq("alice_bob", "bob") == 2
+    assert db.get_all_users("alice")["users"] == list(USERS[1:])
+
+
+def test_chats_are_merged_across_shards_newest_first(db):
+    for timestamp, other in enumerate(USERS[1:], start=1):
+        db.send_chat_message(f"alice_{other}", other, "hello", timestamp=timestamp)
+    db.send_chat_message("alice_carol", "alice", "again", timestamp=10)
+
+    chats = db.get_chats("alice")["chats"]
+    assert [c["other_user"] for c in chats] == ["carol", "frank", "erin", "dave", "bob"]
+    assert [c["unread_count"] for c in chats] == [1, 1, 1, 1, 1]
+    assert chats[0]["chat_id"] == "alice_carol"
+
+
+def test_users_are_checked_in_the_catalog(db):
+    assert not db.send_chat_message("alice_nobody", "alice", "hi")["success"]
+
+    db.send_chat_message("alice_bob", "alice", "hi")
+    db.send_chat_message("bob_carol", "bob", "hi")
+    db.delete_user("bob")
+    assert not db.send_chat_message("alice_bob", "alice", "hi")["success"]
+    assert not db.send_chat_message("bob_carol", "bob", "hi")["success"]
+
+    # Queued in every shard holding their messages, counted once
+    assert db.pending_purges() == 1
+    assert db.purge_deleted_users(1) == 1
+    while db.pending_purges():
+        db.purge_deleted_users(10)
+    assert sum(count_messages(shard) for shard in db.shards) == 0
+
+    db.add_user("bob", "Bob again", "pw")
+    assert db.send_chat_message("alice_bob", "bob", "back")["success"]
+
+
+def test_search_merges_shards_by_rank(db):
+    for a, b in chat_pairs():
+        if a == "alice":
+            db.send_chat_message(f"{a}_{b}", b, f"lunch with {b}" + " today" * len(b))
+
+    first = db.search_messages("alice", "lunch", page_size=2)
+    second = db.search_messages("alice", "lunch", page=2, page_size=2)
+    third = db.search_messages("alice", "lunch", page=3, page_size=2)
+    ranked = first["matches"] + second["matches"] + third["matches"]
+    assert len(ranked) == 5
+    assert [m["rank"] for m in ranked] == sorted(m["rank"] for m in ranked)
+    assert first["has_more"] and second["has_more"] and not third["has_more"]
+
+    one_chat = db.search_messages("alice", "lunch", chat_id="alice_dave")["matches"]
+    assert [m["content"] for m in one_chat] == ["lunch with dave" + " today" * 4]
+
+
+def test_apply_batch_spans_catalog_and_shards(db):
+    def fail():
+        db.send_chat_message("alice_bob", "alice", "lost")
+        db.save_settings("alice", 99)
+        raise RuntimeError("boom")
+
+    results = db.apply_batch(
+        [
+            (1, 1, lambda: db.send_chat_message("alice_bob", "alice", "kept")["success"]),
+            (1, 2, fail),
+            (1, 3, lambda: db.save_settings("bob", 12)["success"]),
+            (1, 1, lambda: True),
+        ]
+    )
+
+    assert results == [True, False, True, None]
+    assert [m["content"] for m in db.get_messages("alice_bob", "bob")["messages"]] == ["kept"]
+    assert db.get_user_message_limit("alice")["message_limit"] == "6"
+    assert db.get_user_message_limit("bob")["message_limit"] == "12"
+
+
+def test_apply_batch_skips_shards_that_committed_before_a_crash(db):
+    send = lambda: db.send_chat_message("alice_bob", "alice", "once", seq=1)["success"]
+    assert db.apply_batch([(1, 1, send)]) == [True]
+
+    # The catalog lost its record: the shard was committed, the catalog not
+    with db._get_connection() as conn:
+        conn.execute("DELETE FROM applied_operations")
+
+    assert db.apply_batch([(1, 1, send)]) == [True]
+    assert [m["content"] for m in db.get_messages("alice_bob", "bob")["messages"]] == ["once"]
+    assert db.apply_batch([(1, 1, send)]) == [None]
+
+
+def test_parallel_senders(db):
+    def send(a, b):
+        for i in range(20):
+            assert db.send_chat_message(f"{a}_{b}", a, f"message {i}")["success"]
+
+    threads = [threading.Thread(target=send, args=pair) for pair in chat_pairs()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for a, b in chat_pairs():
+        messages = db.get_messages(f"{a}_{b}", b)["messages"]
+        assert [m["seq"] for m in messages] == list(range(1, 21))
+
+
+def test_archive_in_shards(db):
+    for a, b in chat_pairs()[:4]:
+        for i in range(3):
+            db.send_chat_message(f"{a}_{b}", a, f"message {i}")
+        db.get_messages(f"{a}_{b}", b)
+
+    archived = 0
+    for chat in db.archive_candidates(0, 0, 3):
+        archived += db.archive_chat(chat, 0, 0, 3)
+    assert archived == 12
+    assert sum(count_messages(shard) for shard in db.shards) == 0
+    assert len(db.get_messages("alice_bob", "alice")["messages"]) == 3
+
+
+def test_digest_matches_unsharded_database(db, tmp_path):
+    single = StorageFactory.get_engine("sqlite", str(tmp_path / "single.db"))
+    assert isinstance(db, DBManager)
+    for manager in (db, single):
+        for username in USERS:
+            manager.add_user(username, username.title(), "pw")
+        for timestamp, (a, b) in enumerate(chat_pairs(), start=1):
+            manager.send_chat_message(f"{a}_{b}", a, f"hi {b}", timestamp=timestamp)
+
+    sharded = ShardedDigest(db.db_file, db.shard_files)
+    sharded.initialize()
+    # Smaller buckets than chats are placed by, so buckets span shards
+    small = ShardedDigest(db.db_file, db.shard_files, buckets=16)
+    reference = MerkleDigest(single.db_file)
+    reference.initialize()
+    small_reference = MerkleDigest(single.db_file, buckets=16)
+
+    for table in ("users", "userconfig", "messages"):
+        assert sharded.bucket_hashes(table) == reference.bucket_hashes(table)
+        assert small.bucket_hashes(table) == small_reference.bucket_hashes(table)
+
+    # Rows are copied into the shard holding their chat
+    rows = reference.rows("messages", ["alice_bob", "carol_dave"])
+    db.delete_messages("alice_bob", [], "alice", message_seqs=[1])
+    assert sharded.bucket_hashes("messages") != reference.bucket_hashes("messages")
+    sharded.replace("messages", rows)
+    assert sharded.rows("messages", ["alice_bob", "carol_dave"]) == rows
+    assert sharded.bucket_hashes("messages") == reference.bucket_hashes("messages")
@@ -0,0 +1,104 @@
+"""
+Tests for the follower apply path (ChatStateMachine).
+"""
+
+import threading
+
+import pytest
+
+from src.protocol.grpc import chat_pb2
+from src.services.db_manager import DBManager
+from src.services.state_machine import CHAT_OPERATIONS, ChatStateMachine
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DBManager(str(tmp_path / "state_machine.db"))
+    manager.initialize_database()
+    return manager
+
+
+@pytest.fixture
+def state_machine(db_manager):
+    return ChatStateMachine(db_manager)
+
+
+def signup(username):
+    return chat_pb2.SignupRequest(
+        username=username, nickname=username.title(), password="pw"
+    ).SerializeToString()
+
+
+def test_every_replicated_write_has_an_apply_path():
+    """Each ChatServicer write the decorator replicates can be applied."""
+    assert set(CHAT_OPERATIONS) == {
+        "Signup",
+        "DeleteUser",
+        "SaveSettings",
+        "StartChat",
+        "SendChatMessage",
+        "DeleteMessages",
+    }
+
+
+def test_apply_writes_to_database(state_machine, db_manager):
+    assert state_machine.apply(1, 1, "ChatServicer", "Signup", signup("alice")) is True
+    assert state_machine.apply(1, 2, "ChatServicer", "Signup", signup("bob")) is True
+    message = chat_pb2.SendMessageRequest(chat_id="alice_bob", sender="alice", content="hi")
+    assert state_machine.apply(1, 3, "ChatServicer", "SendChatMessage", message.SerializeToString())
+
+    messages = db_manager.get_messages("alice_bob", "bob")["messages"]
+    assert [m["content"] for m in messages] == ["hi"]
+    # A retry is reported as a duplicate
+    assert state_machine.apply(1, 3, "ChatServicer", "SendChatMessage", message.SerializeToString()) is None
+
+
+def test_apply_rejects_unknown_operations(state_machine):
+    assert state_machine.apply(1, 1, "OtherService", "Signup", signup("alice")) is False
+    assert state_machine.apply(1, 2, "ChatServicer", "GetChats", b"") is False
+    assert state_machine.apply(1, 3, "ChatServicer", "Signup", b"\xff\xff") is False
+
+
+def test_refused_operations_are_recorded(state_machine, db_manager):
+    """A write every replica refuses is acknowledged once, like an applied one."""
+    message = chat_pb2.SendMessageRequest(chat_id="alice_bob", sender="alice", content="hi")
+    state_machine.apply(1, 1, "ChatServicer", "Signup", signup("alice"))
+
+    assert state_machine.apply(1, 2, "ChatServicer", "SendChatMessage", message.SerializeToString()) is True
+    assert state_machine.apply(1, 3, "ChatServicer", "Signup", signup("alice")) is True
+    assert state_machine.apply(1, 3, "ChatServicer", "Signup", signup("alice")) is None
+    assert state_machine.operations_applied == 3
+
+    state_machine.apply(1, 4, "ChatServicer", "Signup", signup("bob"))
+    assert db_manager.get_messages("alice_bob", "bob")["messages"] == []
+
+
+def test_concurrent_operations_share_transactions(state_machine, db_manager):
+    """Operations queued while a batch commits go out together in the next one."""
+    release = threading.Event()
+    original = db_manager.apply_batch
+
+    def slow_apply_batch(operations, keep=None):
+        release.wait(5)
+        return original(operations, keep)
+
+    db_manager.apply_batch = slow_apply_batch
+    threads = [
+        threading.Thread(
+            target=state_machine.apply,
+            args=(1, i + 1, "ChatServicer", "Signup", signup(f"user{i}")),
+        )
+        for i in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    # Let every caller queue up behind the first batch before it commits
+    while len(state_machine.queue) < 9 and any(t.is_alive() for t in threads):
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(db_manager.get_all_users()["users"]) == 10
+    assert state_machine.operations_applied == 10
+    assert state_machine.batches == 2